@@ -0,0 +1,45 @@
+# Test class using pytest
+
+import os, sys
+
+p = os.path.abspath('.')
+sys.path.insert(1, p)
+
+import numpy as np
+
+from core.util.columnar_recorder import ColumnarRecorder
+
+
+class StoreStub:
+    """ Collects the rows streamed by ColumnarRecorder """
+    def __init__(self):
+        self.rows = list()
+
+    def extend(self, rows):
+        self.rows.extend(np.array(rows))
+
+
+class TestColumnarRecorder:
+    """
+    Test streaming the recorded rows of ColumnarRecorder to a store
+    """
+
+    def test_attach_after_close(self):
+        '''
+        Test if a store attached after closing the previous one receives the whole recording
+        '''
+        rows = np.arange(30, dtype=float).reshape((10, 3))
+        first_store = StoreStub()
+        recorder = ColumnarRecorder(3, chunk_rows=4, store=first_store)
+        recorder.extend(rows[:5])
+        recorder.close()
+        assert recorder.store is None
+        assert np.array_equal(first_store.rows, rows[:5])
+
+        second_store = StoreStub()
+        recorder.attach(second_store)
+        recorder.extend(rows[5:])
+        assert np.array_equal(second_store.rows, rows[:8])
+        recorder.close()
+        assert np.array_equal(second_store.rows, rows)
+        assert np.array_equal(first_store.rows, rows[:5])
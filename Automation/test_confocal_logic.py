@@ -0,0 +1,283 @@
+# Test class using pytest
+
+import os, sys
+
+p = os.path.abspath('.')
+sys.path.insert(1, p)
+
+import threading
+import time
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pytest
+from qtpy import QtCore
+
+import hardware.confocal_scanner_dummy as confocal_scanner_dummy
+from core.util.tiled_image import TiledImage
+from hardware.confocal_scanner_dummy import ConfocalScannerDummy
+from logic.confocal_logic import ConfocalLogic
+from logic.confocal_save import read_scan_image
+from logic.fit_logic import FitLogic
+
+
+class ScannerStub:
+    """ Provides the scanner axes and count channels ConfocalLogic builds its scan path for """
+    def get_scanner_axes(self):
+        return ['x', 'y', 'z']
+
+    def get_scanner_count_channels(self):
+        return ['counts']
+
+
+class SaveLogicStub:
+    """ Provides the data directory and figure settings ConfocalLogic saves its images with """
+    active_poi_name = ''
+    mpl_qd_style = dict()
+    save_pdf = False
+    save_png = False
+
+    def __init__(self, path):
+        self.path = path
+
+    def get_path_for_module(self, module_name):
+        return self.path
+
+    def get_additional_parameters(self):
+        return dict()
+
+
+@pytest.fixture(scope='module')
+def app():
+    return QtCore.QCoreApplication.instance() or QtCore.QCoreApplication(sys.argv)
+
+
+def create_confocal_logic(path, **config):
+    """ Activate a ConfocalLogic with the dummy scanner scanning without waiting """
+    fit_logic = FitLogic(manager=None, name='fitlogic', config={})
+    fit_logic.module_state.activate()
+    scanner = ConfocalScannerDummy(manager=None,
+                                   name='confocalscanner',
+                                   config={'clock_frequency': 100, 'realistic_timing': False})
+    scanner.connectors['fitlogic'].obj = fit_logic
+    scanner.module_state.activate()
+    logic = ConfocalLogic(manager=None, name='confocal', config=config)
+    logic.connectors['confocalscanner1'].obj = scanner
+    logic.connectors['savelogic'].obj = SaveLogicStub(path)
+    logic.module_state.activate()
+    return logic
+
+
+def wait_for(app, condition, timeout=30):
+    """ Process events until condition() is True """
+    start = time.time()
+    while not condition():
+        assert time.time() - start < timeout
+        app.processEvents()
+        time.sleep(0.001)
+
+
+def scan_xy_image(app, logic, resolution=10):
+    """ Scan an xy image and wait until the scan has finished """
+    logic.xy_resolution = resolution
+    logic.start_scanning()
+    # The image is initialized when the scan starts
+    wait_for(app, lambda: logic.xy_image.shape[:2] == (resolution, resolution) and
+             logic.module_state() == 'idle')
+
+
+class TestAdaptiveScan:
+    """
+    Test the tile resolution of adaptive confocal scans (ConfocalLogic.adaptive_scan)
+    """
+    number_of_lines = 16
+    number_of_pixels = 16
+    coarse_factor = 4
+
+    @pytest.fixture
+    def logic(self):
+        logic = ConfocalLogic(manager=None, name='confocal', config={})
+        logic._scanning_device = ScannerStub()
+        logic.return_slowness = 10
+        logic.adaptive_coarse_factor = self.coarse_factor
+        logic.adaptive_threshold = 5
+        logic.adaptive_gradient_threshold = 0
+        logic._current_z = 0.0
+        logic._current_a = 0.0
+        line_positions = np.zeros((self.number_of_lines, 3))
+        line_positions[:, 1] = np.arange(self.number_of_lines)
+        pixel_positions = np.zeros((self.number_of_pixels, 3))
+        pixel_positions[:, 0] = np.arange(self.number_of_pixels)
+        logic.xy_image = TiledImage(line_positions, pixel_positions, 1, tile_lines=4)
+        logic._init_scan_path(logic.xy_image, 0, np.linspace(self.number_of_pixels - 1, 0, 10))
+        # the scan requests sent to the scan worker
+        logic.requests = list()
+        logic._sigScanLines.connect(logic.requests.append)
+        return logic
+
+    def answer_request(self, logic, bright_pixel):
+        """ Scan the oldest request with a single bright pixel in the image """
+        request = logic.requests.pop(0)
+        number_of_paths = request['line_paths'].shape[0]
+        step = request['pixel_step']
+        counts = np.zeros((number_of_paths, request['number_of_pixels'], 1))
+        if request['number_of_lines'] > 0:
+            # image line and pixel of each scanned line and pixel
+            lines = request['first_line'] + np.arange(number_of_paths) * step + step // 2
+            pixels = (request['first_pixel'] + np.arange(request['number_of_pixels']) * step
+                      + step // 2)
+            counts[np.ix_(lines == bright_pixel[0], pixels == bright_pixel[1])] = 100
+        request['counts'] = counts
+        logic._lines_scanned(request)
+        return request
+
+    def test_stopped_refinement(self, logic):
+        '''
+        Test if the tiles not scanned by a stopped fine pass are still marked coarse
+        '''
+        bright_pixel = (6, 6)
+        logic._start_adaptive_frame((0, 0, 0, 0))
+        logic._queue_adaptive_scan_lines()
+        # coarse pass
+        while logic._adaptive_pass == 'coarse':
+            self.answer_request(logic, bright_pixel)
+            logic._queue_adaptive_scan_lines()
+        assert np.all(logic.xy_tile_resolution == self.coarse_factor)
+
+        # the bright tile and the tiles around it are refined, stop after the first row of them
+        # and half of the second row
+        scanned_lines = 0
+        while scanned_lines < self.coarse_factor * 3 // 2:
+            request = self.answer_request(logic, bright_pixel)
+            scanned_lines += request['number_of_lines']
+            logic._queue_adaptive_scan_lines()
+
+        expected = np.full((4, 4), self.coarse_factor)
+        expected[0, :3] = 1
+        assert np.array_equal(logic.xy_tile_resolution, expected)
+
+
+class TestSaveScanImage:
+    """
+    Test saving confocal images in the binary format (ConfigOption save_format of ConfocalLogic,
+    logic.confocal_save)
+    """
+
+    @pytest.fixture
+    def logic(self, app, tmp_path):
+        # Figures drawn in the calling thread need a QApplication with the Qt backends
+        plt.switch_backend('agg')
+        logic = create_confocal_logic(str(tmp_path),
+                                      save_format='binary',
+                                      save_figures_in_process=False)
+        scan_xy_image(app, logic)
+        yield logic
+        logic.module_state.deactivate()
+
+    def check_saved_image(self, logic, path):
+        """ Compare the single saved image in path with the xy image of logic """
+        data_files = [name for name in os.listdir(path) if name.endswith('_xy_data.npy')]
+        assert len(data_files) == 1
+        counts, metadata = read_scan_image(os.path.join(path, data_files[0][:-4]))
+        channels = list(logic.get_scanner_count_channels())
+        assert metadata['channels'] == channels
+        assert counts.shape == (len(channels), logic.xy_resolution, logic.xy_resolution)
+        for index in range(len(channels)):
+            assert np.array_equal(counts[index], logic.xy_image[:, :, 3 + index])
+        positions = metadata['line_positions'][:, np.newaxis] + \
+            metadata['pixel_positions'][np.newaxis, :]
+        assert np.allclose(positions, logic.xy_image[:, :, :3])
+        assert metadata['parameters']['XY resolution (samples per range)'] == logic.xy_resolution
+
+    def test_default_format(self, app, tmp_path):
+        '''
+        Test if images are saved as text files by default
+        '''
+        logic = create_confocal_logic(str(tmp_path))
+        assert logic._save_format == 'text'
+        logic.module_state.deactivate()
+
+    def test_blocking_save(self, logic, tmp_path):
+        '''
+        Test if an image saved in the calling thread is read back unchanged
+        '''
+        logic.save_xy_data(block=True)
+        self.check_saved_image(logic, str(tmp_path))
+
+    def test_save_worker(self, app, logic, tmp_path, monkeypatch):
+        '''
+        Test if an image saved by the save worker is read back unchanged and the scanner position
+        is only queried in the save thread
+        '''
+        get_scanner_position = logic._scanning_device.get_scanner_position
+        position_threads = list()
+
+        def recording_get_scanner_position():
+            position_threads.append(threading.current_thread())
+            return get_scanner_position()
+        monkeypatch.setattr(logic._scanning_device, 'get_scanner_position',
+                            recording_get_scanner_position)
+        saved = list()
+        logic.signal_xy_data_saved.connect(lambda: saved.append(True))
+        logic.save_xy_data(block=False)
+        wait_for(app, lambda: saved)
+        assert len(position_threads) == 1
+        assert position_threads[0] is not threading.current_thread()
+        self.check_saved_image(logic, str(tmp_path))
+
+
+class TestScanRequests:
+    """
+    Test the scan requests sent to the scan worker (ConfigOption scan_lines_per_call of
+    ConfocalLogic)
+    """
+    resolution = 30
+
+    @pytest.fixture(params=[1, 3, 0])
+    def logic(self, app, tmp_path, monkeypatch, request):
+        # Without the noise of the dummy scanner all scans of a position give the same counts
+        monkeypatch.setattr(confocal_scanner_dummy.np.random, 'uniform',
+                            lambda low, high, size: np.zeros(size))
+        logic = create_confocal_logic(str(tmp_path), scan_lines_per_call=request.param)
+        # the number of lines of each request and whether it shares memory with the scan path
+        logic.requests = list()
+
+        def record_request(scan_request):
+            logic.requests.append((scan_request['number_of_lines'],
+                                   np.shares_memory(scan_request['line_paths'], logic._scan_path)))
+        logic._sigScanLines.connect(record_request)
+        scan_xy_image(app, logic, self.resolution)
+        yield logic
+        logic.module_state.deactivate()
+
+    def synchronous_counts(self, logic):
+        """ Counts of the image pixels scanned line by line with ConfocalScannerDummy.scan_line """
+        scanner = logic._scanning_device
+        counts = np.zeros((self.resolution, self.resolution, 2))
+        for line in range(self.resolution):
+            counts[line] = scanner.scan_line(logic.xy_image[line, :, :3].T.copy())[:, :2]
+        return counts
+
+    def test_image(self, logic):
+        '''
+        Test if the image scanned in requests of several lines matches the image scanned line by
+        line and the requests hold copies of the scan path
+        '''
+        # The third channel of the dummy scanner only depends on the first line of a request
+        assert np.allclose(logic.xy_image[:, :, 3:5], self.synchronous_counts(logic))
+        assert sum(lines for lines, shared in logic.requests) == self.resolution
+        assert not any(shared for lines, shared in logic.requests)
+
+    def test_lines_per_call(self, logic):
+        '''
+        Test if the requests hold scan_lines_per_call lines, with 0 the lines of about
+        _max_call_duration instead of the whole frame
+        '''
+        lines_per_call = logic._get_lines_per_call(logic._scan_path.shape[2])
+        assert max(lines for lines, shared in logic.requests) == lines_per_call
+        if logic._scan_lines_per_call == 0:
+            assert 1 < lines_per_call < self.resolution
+            logic.set_clock_frequency(logic._clock_frequency * 2)
+            assert logic._get_lines_per_call(logic._scan_path.shape[2]) >= 2 * lines_per_call - 1
+        else:
+            assert lines_per_call == logic._scan_lines_per_call
@@ -0,0 +1,97 @@
+# Test class using pytest
+
+import os, sys
+
+p = os.path.abspath('.')
+sys.path.insert(1, p)
+
+import time
+
+import numpy as np
+import pytest
+
+from hardware.confocal_scanner_dummy import ConfocalScannerDummy
+from logic.fit_logic import FitLogic
+
+
+@pytest.fixture
+def scanner():
+    np.random.seed(0)
+    fit_logic = FitLogic(manager=None, name='fitlogic', config={})
+    fit_logic.module_state.activate()
+    scanner = ConfocalScannerDummy(manager=None, name='confocalscanner', config={})
+    scanner.connectors['fitlogic'].obj = fit_logic
+    scanner.module_state.activate()
+    yield scanner
+    scanner.module_state.deactivate()
+
+
+class TestEmitterCounts:
+    """
+    Test the emitter counts of the dummy scanner evaluated through the grid of emitter cells
+    (ConfocalScannerDummy._emitter_counts)
+    """
+
+    @staticmethod
+    def brute_force_counts(scanner, x, y, z):
+        """ Sum of twoD_gaussian_function times gaussian_function over all emitters """
+        counts = np.zeros(x.size)
+        for point, point_z in zip(scanner._points, scanner._points_z):
+            counts += (scanner.twoD_gaussian_function((x, y), *point)
+                       * scanner.gaussian_function(z, *point_z))
+        return counts
+
+    def test_random_positions(self, scanner):
+        '''
+        Test if the counts at random positions in and around the scan range match the sum over all
+        emitters
+        '''
+        rng = np.random.default_rng(1)
+        # more positions than a chunk, also outside of the grid and far from the emitters in z
+        x = rng.uniform(-5e-6, 105e-6, 3000)
+        y = rng.uniform(-5e-6, 105e-6, 3000)
+        z = rng.uniform(40e-6, 60e-6, 3000)
+        counts = scanner._emitter_counts(x, y, z)
+        assert np.max(counts) > 1e5
+        assert np.allclose(counts, self.brute_force_counts(scanner, x, y, z), rtol=0, atol=0.01)
+
+    def test_emitter_positions(self, scanner):
+        '''
+        Test if the counts at the emitters and on a line through a cell border match the sum over
+        all emitters
+        '''
+        x = np.concatenate((scanner._points[:, 1],
+                            np.full(200, scanner._grid_origin[0] + scanner._cutoff_radius)))
+        y = np.concatenate((scanner._points[:, 2], np.linspace(0, 100e-6, 200)))
+        z = np.concatenate((scanner._points_z[:, 1], np.full(200, 50e-6)))
+        counts = scanner._emitter_counts(x, y, z)
+        assert np.allclose(counts, self.brute_force_counts(scanner, x, y, z), rtol=0, atol=0.01)
+
+
+class TestRealisticTiming:
+    """
+    Test the optional line duration of the dummy scanner (ConfigOption realistic_timing of
+    ConfocalScannerDummy)
+    """
+
+    def scan_duration(self, scanner, number_of_pixels=20):
+        scanner.set_up_scanner_clock(clock_frequency=100)
+        line_path = np.zeros((4, number_of_pixels))
+        line_path[:3] = 50e-6
+        start = time.perf_counter()
+        scanner.scan_line(line_path)
+        return time.perf_counter() - start
+
+    def test_default(self, scanner):
+        '''
+        Test if scans return without waiting for the line duration by default
+        '''
+        assert not scanner._realistic_timing
+        assert self.scan_duration(scanner) < 0.1
+
+    def test_realistic_timing(self, scanner):
+        '''
+        Test if scans take the line duration at the clock frequency with realistic timing
+        '''
+        scanner._realistic_timing = True
+        assert self.scan_duration(scanner) >= 0.2
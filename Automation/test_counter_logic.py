@@ -0,0 +1,48 @@
+# Test class using pytest
+
+import os, sys
+
+p = os.path.abspath('.')
+sys.path.insert(1, p)
+
+import numpy as np
+import pytest
+
+from hardware.slow_counter_dummy import SlowCounterDummy
+from logic.counter_logic import CounterLogic
+
+
+class TestCountTraces:
+    """
+    Test the count traces CounterLogic hands to the GUI (countdata, countdata_smoothed)
+    """
+
+    @pytest.fixture
+    def logic(self):
+        counter = SlowCounterDummy(manager=None, name='counter', config={})
+        counter.module_state.activate()
+        logic = CounterLogic(manager=None, name='counterlogic', config={})
+        logic.connectors['counter1'].obj = counter
+        logic.connectors['savelogic'].obj = object()
+        logic.module_state.activate()
+        yield logic
+        logic.module_state.deactivate()
+        counter.module_state.deactivate()
+
+    def test_trace_copy(self, logic):
+        '''
+        Test if the traces are read-only copies made once per counter update
+        '''
+        countdata = logic.countdata
+        smoothed = logic.countdata_smoothed
+        assert not countdata.flags.writeable
+        assert logic.countdata is countdata
+        assert logic.countdata_smoothed is smoothed
+
+        number_of_channels = countdata.shape[0]
+        logic._add_count_values(np.arange(1, number_of_channels + 1))
+        assert np.array_equal(countdata[:, -1], np.zeros(number_of_channels))
+        assert logic.countdata is not countdata
+        assert np.array_equal(logic.countdata[:, -1], np.arange(1, number_of_channels + 1))
+        assert np.array_equal(logic.countdata[:, :-1], countdata[:, 1:])
+        assert logic.countdata_smoothed is not smoothed
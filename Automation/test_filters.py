@@ -0,0 +1,31 @@
+# Test class using pytest
+
+import os, sys
+
+p = os.path.abspath('.')
+sys.path.insert(1, p)
+
+import numpy as np
+import pytest
+
+from core.util.filters import RunningMedian
+
+
+class TestRunningMedian:
+    """
+    Test the incrementally updated median of the last values (core.util.filters.RunningMedian)
+    """
+
+    @pytest.mark.parametrize('window_length', [1, 4, 5])
+    def test_sliding_window(self, window_length):
+        '''
+        Test if the running median equals numpy.median of the sliding window of each channel
+        '''
+        rng = np.random.default_rng(0)
+        # repeated values are removed from the sorted window one by one
+        values = rng.integers(0, 5, (50, 3)).astype(float)
+        running_median = RunningMedian(3, window_length)
+        history = np.zeros((window_length, 3))
+        for row in values:
+            history = np.vstack((history[1:], row))
+            assert np.array_equal(running_median.update(row), np.median(history, axis=0))
@@ -0,0 +1,61 @@
+# Test class using pytest
+
+import os, sys
+
+p = os.path.abspath('.')
+sys.path.insert(1, p)
+
+import numpy as np
+
+from core.util.min_max_pyramid import MinMaxPyramid
+
+
+class TestMinMaxPyramid:
+    """
+    Test the incrementally updated min/max decimation pyramid (core.util.min_max_pyramid)
+    """
+    capacity = 1000
+    number_of_channels = 2
+
+    def test_bins(self):
+        '''
+        Test if the bins of all levels match a brute force minimum and maximum of their samples,
+        for ranges starting and ending within bins
+        '''
+        rng = np.random.default_rng(0)
+        pyramid = MinMaxPyramid(self.capacity, self.number_of_channels, factor=4, min_bins=4)
+        assert pyramid.bin_sizes == [4, 16, 64]
+        samples = np.empty((0, self.number_of_channels))
+        for frame_size in [1, 3, 70, 2, 5, 300, 1, 17, 1500, 64, 9] * 3:
+            frame = rng.normal(size=(frame_size, self.number_of_channels))
+            samples = np.concatenate((samples, frame))
+            pyramid.extend(frame)
+            number_of_samples = samples.shape[0]
+            assert pyramid.number_of_samples == number_of_samples
+            for level, bin_size in enumerate(pyramid.bin_sizes):
+                completed = number_of_samples // bin_size * bin_size
+                for start, stop in ((number_of_samples - self.capacity, number_of_samples),
+                                    (number_of_samples - 123, number_of_samples - 7)):
+                    start = max(start, 0)
+                    stop = max(stop, start)
+                    first, minima, maxima = pyramid.bins(level, start, stop)
+                    # the bins overlap the range up to the last completed bin
+                    assert first == start // bin_size * bin_size
+                    last = first + minima.shape[0] * bin_size
+                    assert last == min(-(-stop // bin_size) * bin_size, completed)
+                    binned = samples[first:last].reshape((-1, bin_size, self.number_of_channels))
+                    assert np.array_equal(minima, binned.min(axis=1))
+                    assert np.array_equal(maxima, binned.max(axis=1))
+
+    def test_clear(self):
+        '''
+        Test if a cleared pyramid starts binning at sample 0 again
+        '''
+        pyramid = MinMaxPyramid(self.capacity, 1, factor=4, min_bins=4)
+        pyramid.extend(np.arange(10.).reshape(-1, 1))
+        pyramid.clear()
+        pyramid.extend(np.arange(8.).reshape(-1, 1))
+        first, minima, maxima = pyramid.bins(0, 0, 8)
+        assert first == 0
+        assert np.array_equal(minima[:, 0], [0, 4])
+        assert np.array_equal(maxima[:, 0], [3, 7])
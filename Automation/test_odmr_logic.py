@@ -0,0 +1,255 @@
+# Test class using pytest
+
+import os, sys
+
+p = os.path.abspath('.')
+sys.path.insert(1, p)
+
+import time
+
+import numpy as np
+import pytest
+from qtpy import QtCore
+
+from hardware.microwave.mw_source_dummy import MicrowaveDummy
+from hardware.odmr_counter_dummy import ODMRCounterDummy
+from logic.fit_logic import FitLogic
+from logic.odmr_logic import ODMRAutoFitWorker, ODMRLogic
+
+
+class SaveLogicStub:
+    """ Provides the data directory ODMRLogic writes its raw data files to """
+    def __init__(self, path):
+        self.path = path
+
+    def get_path_for_module(self, module_name):
+        return self.path
+
+
+class TaskRunnerStub:
+    """ ODMRLogic requires a task runner connection but does not use it while scanning """
+
+
+def count_ones(length=100):
+    """ count_odmr of the dummy ODMR counter returning a sweep of ones on two channels """
+    return False, np.ones((2, length))
+
+
+@pytest.fixture(scope='module')
+def app():
+    return QtCore.QCoreApplication.instance() or QtCore.QCoreApplication(sys.argv)
+
+
+def lorentzian_dip(x, center, fwhm=5e6, contrast=0.2, offset=1e5, noise=0.0, seed=0):
+    """ Count rate of a Lorentzian ODMR dip with optional Gaussian noise """
+    rng = np.random.default_rng(seed)
+    counts = offset * (1 - contrast / (1 + ((x - center) / (fwhm / 2)) ** 2))
+    return counts + rng.normal(0, noise * offset, np.size(x))
+
+
+@pytest.fixture
+def logic(app, tmp_path):
+    fit_logic = FitLogic(manager=None, name='fitlogic', config={})
+    fit_logic.module_state.activate()
+    microwave = MicrowaveDummy(manager=None, name='microwave', config={})
+    microwave.module_state.activate()
+    counter = ODMRCounterDummy(manager=None, name='odmrcounter', config={})
+    counter.connectors['fitlogic'].obj = fit_logic
+    counter.module_state.activate()
+    logic = ODMRLogic(manager=None, name='odmrlogic', config={})
+    logic.connectors['odmrcounter'].obj = counter
+    logic.connectors['fitlogic'].obj = fit_logic
+    logic.connectors['microwave1'].obj = microwave
+    logic.connectors['savelogic'].obj = SaveLogicStub(str(tmp_path))
+    logic.connectors['taskrunner'].obj = TaskRunnerStub()
+    logic.module_state.activate()
+    # No fit parameters set by the user in the fit settings of the GUI
+    logic.fc.fit_list['Lorentzian dip']['use_settings'] = dict()
+    logic.fc.set_current_fit('Lorentzian dip')
+    logic.odmr_plot_y[0] = lorentzian_dip(np.asarray(logic.final_freq_list), 2.87e9, noise=0.01)
+    yield logic
+    logic.module_state.deactivate()
+    counter.module_state.deactivate()
+    microwave.module_state.deactivate()
+    fit_logic.module_state.deactivate()
+
+
+def wait_for_auto_fit(app, logic, timeout=30):
+    """ Process events until the automatic fit in flight has finished """
+    start = time.time()
+    while logic._auto_fit_in_flight:
+        assert time.time() - start < timeout
+        app.processEvents()
+        time.sleep(0.001)
+
+
+class TestODMRRawData:
+    """
+    Test the mean ODMR signal with the raw data kept in memory and spilled to a raw data file
+    (ConfigOption spill_raw_data of ODMRLogic)
+    """
+    number_of_sweeps = 20
+    number_of_lines = 5
+
+    def run_scan(self, app, path, spill_raw_data, lines_to_average):
+        """
+        Scan until number_of_sweeps sweeps have been added and return the mean ODMR signal.
+
+        @return numpy.ndarray: odmr_plot_y after the scan
+        """
+        fit_logic = FitLogic(manager=None, name='fitlogic', config={})
+        fit_logic.module_state.activate()
+        counter = ODMRCounterDummy(manager=None,
+                                   name='odmrcounter',
+                                   config={'clock_frequency': 100, 'number_of_channels': 2})
+        counter.connectors['fitlogic'].obj = fit_logic
+        counter.module_state.activate()
+        counter.count_odmr = count_ones
+        microwave = MicrowaveDummy(manager=None, name='microwave', config={})
+        microwave.module_state.activate()
+
+        odmr = ODMRLogic(manager=None,
+                         name='odmrlogic',
+                         config={'scanmode': 'LIST', 'spill_raw_data': spill_raw_data})
+        odmr.connectors['odmrcounter'].obj = counter
+        odmr.connectors['fitlogic'].obj = fit_logic
+        odmr.connectors['microwave1'].obj = microwave
+        odmr.connectors['savelogic'].obj = SaveLogicStub(path)
+        odmr.connectors['taskrunner'].obj = TaskRunnerStub()
+        odmr.module_state.activate()
+        odmr.number_of_lines = self.number_of_lines
+        odmr.lines_to_average = lines_to_average
+        odmr.run_time = 3600
+
+        odmr.start_odmr_scan()
+        while odmr.elapsed_sweeps < self.number_of_sweeps:
+            app.processEvents()
+        odmr.stop_odmr_scan()
+        while odmr.module_state() == 'locked':
+            app.processEvents()
+        odmr_plot_y = np.array(odmr.odmr_plot_y)
+
+        odmr.module_state.deactivate()
+        microwave.module_state.deactivate()
+        counter.module_state.deactivate()
+        fit_logic.module_state.deactivate()
+        return odmr_plot_y
+
+    @pytest.mark.parametrize('spill_raw_data', [False, True])
+    @pytest.mark.parametrize('lines_to_average', [0, 3])
+    def test_mean_signal(self, app, tmp_path, spill_raw_data, lines_to_average):
+        '''
+        Test if the mean signal of all sweeps and of the last lines_to_average sweeps is exact
+        with more sweeps than the raw data ring buffer holds in spill mode
+        '''
+        odmr_plot_y = self.run_scan(app, str(tmp_path), spill_raw_data, lines_to_average)
+        assert np.all(odmr_plot_y == 1)
+
+
+class TestAutoFit:
+    """
+    Test the automatic fits of the mean ODMR signal in the fit worker thread
+    (ODMRLogic.set_auto_fit, ODMRAutoFitWorker)
+    """
+
+    def test_warm_start(self, app, logic):
+        '''
+        Test if the first automatic fit uses the estimator and the next ones start from the
+        previous result of the same data range
+        '''
+        results = list()
+        logic.sigOdmrFitUpdated.connect(lambda x, y, result, name: results.append(name))
+        assert logic.set_auto_fit(1) == 1
+        logic._request_auto_fit()
+        wait_for_auto_fit(app, logic)
+        statistics = logic.get_auto_fit_statistics()
+        assert (statistics['fits'], statistics['warm_started']) == (1, 0)
+        center = logic.fc.current_fit_result.params['center'].value
+        assert center == pytest.approx(2.87e9, abs=0.5e6)
+        assert results == ['Lorentzian dip']
+
+        logic._request_auto_fit()
+        wait_for_auto_fit(app, logic)
+        statistics = logic.get_auto_fit_statistics()
+        assert (statistics['fits'], statistics['warm_started']) == (2, 1)
+        assert logic.fc.current_fit_result.params['center'].value == pytest.approx(center)
+        assert statistics['last_latency'] > 0
+        assert 'channel: 0, range: 0' in logic.fits_performed
+
+        # A new data range starts from the estimator again
+        logic.set_auto_fit(1, fit_range=-1)
+        logic._request_auto_fit()
+        wait_for_auto_fit(app, logic)
+        assert logic.get_auto_fit_statistics()['warm_started'] == 1
+
+    def test_dropped_requests(self, app, logic):
+        '''
+        Test if requests are dropped and counted while a fit is in flight
+        '''
+        logic.set_auto_fit(1)
+        logic._request_auto_fit()
+        logic._request_auto_fit()
+        logic._request_auto_fit()
+        wait_for_auto_fit(app, logic)
+        statistics = logic.get_auto_fit_statistics()
+        assert (statistics['fits'], statistics['dropped']) == (1, 2)
+
+    def test_no_fit(self, app, logic):
+        '''
+        Test if no fit is requested without a fit function
+        '''
+        logic.fc.set_current_fit('No Fit')
+        logic.set_auto_fit(1)
+        logic._request_auto_fit()
+        assert not logic._auto_fit_in_flight
+        assert logic.get_auto_fit_statistics()['fits'] == 0
+
+
+class TestAutoFitWorker:
+    """
+    Test the fallback of the fit worker to the estimator (ODMRAutoFitWorker.do_fit)
+    """
+
+    @staticmethod
+    def fit(logic, y_data, initial_params=None, previous_redchi=None):
+        """ Fit y_data in the calling thread and return the finished request """
+        worker = ODMRAutoFitWorker(logic.fc)
+        finished = list()
+        worker.sigFitFinished.connect(finished.append)
+        x_data = np.asarray(logic.final_freq_list)
+        worker.do_fit({'key': ('Lorentzian dip', 0, 0),
+                       'fit_name': 'Lorentzian dip',
+                       'x_data': x_data,
+                       'y_data': y_data,
+                       'use_settings': logic.fc.use_settings,
+                       'initial_params': initial_params,
+                       'previous_redchi': previous_redchi,
+                       'request_time': time.perf_counter()})
+        assert len(finished) == 1
+        return finished[0]
+
+    def test_container_state(self, logic):
+        '''
+        Test if fitting in the worker does not change the fit container
+        '''
+        request = self.fit(logic, logic.odmr_plot_y[0])
+        assert request['result'].success
+        assert not request['warm_started']
+        assert logic.fc.current_fit_result is None
+
+    def test_fallback(self, logic):
+        '''
+        Test if a warm started fit much worse than the previous one is repeated with the estimator
+        '''
+        x_data = np.asarray(logic.final_freq_list)
+        previous = self.fit(logic, lorentzian_dip(x_data, 2.82e9))['result']
+        # The dip moved far away from the previous result
+        y_data = lorentzian_dip(x_data, 2.92e9, noise=0.01)
+        request = self.fit(logic, y_data, previous.params, previous_redchi=1e-6)
+        assert not request['warm_started']
+        assert request['result'].params['center'].value == pytest.approx(2.92e9, abs=0.5e6)
+
+        request = self.fit(logic, y_data, request['result'].params,
+                           previous_redchi=request['result'].redchi)
+        assert request['warm_started']
+        assert request['result'].params['center'].value == pytest.approx(2.92e9, abs=0.5e6)
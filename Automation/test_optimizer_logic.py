@@ -0,0 +1,125 @@
+# Test class using pytest
+
+import os, sys
+
+p = os.path.abspath('.')
+sys.path.insert(1, p)
+
+import numpy as np
+import pytest
+from qtpy import QtCore
+
+from hardware.confocal_scanner_dummy import ConfocalScannerDummy
+from logic.fit_logic import FitLogic
+from logic.optimizer_logic import OptimizerLogic
+
+
+@pytest.fixture(scope='module')
+def app():
+    return QtCore.QCoreApplication.instance() or QtCore.QCoreApplication(sys.argv)
+
+
+class TestFastRefocus:
+    """
+    Test the fast refocus scanning an x and a y line through the last optimum
+    (StatusVar fast_refocus of OptimizerLogic)
+    """
+    spot = np.array([50e-6, 50e-6, 50e-6])
+    sigma = 0.7e-6
+
+    @pytest.fixture
+    def logic(self, app, monkeypatch):
+        np.random.seed(0)
+        fit_logic = FitLogic(manager=None, name='fitlogic', config={})
+        fit_logic.module_state.activate()
+        scanner = ConfocalScannerDummy(manager=None,
+                                       name='confocalscanner',
+                                       config={'clock_frequency': 100, 'realistic_timing': False})
+        scanner.connectors['fitlogic'].obj = fit_logic
+        scanner.module_state.activate()
+        # a single emitter at the spot position
+        scanner._points = scanner._points[:1]
+        scanner._points[0, :5] = [4e5, self.spot[0], self.spot[1], self.sigma, self.sigma]
+        scanner._points_z = scanner._points_z[:1]
+        scanner._points_z[0, :3] = [1, self.spot[2], 0.5e-6]
+        scanner._build_emitter_index()
+
+        logic = OptimizerLogic(manager=None, name='optimizer', config={})
+        logic.connectors['confocalscanner1'].obj = scanner
+        logic.connectors['fitlogic'].obj = fit_logic
+        logic.module_state.activate()
+        logic.fast_refocus = True
+        logic.optimization_sequence = ['XY']
+        logic.refocus_XY_size = 3e-6
+        logic.hw_settle_time = 0
+
+        # the lengths of the scanned lines and the start values of the 1D fits
+        logic.line_lengths = list()
+        scan_line = scanner.scan_line
+
+        def recording_scan_line(line_path=None, pixel_clock=False):
+            logic.line_lengths.append(np.shape(line_path)[1])
+            return scan_line(line_path, pixel_clock)
+        monkeypatch.setattr(scanner, 'scan_line', recording_scan_line)
+        logic.fit_seeds = list()
+        get_fit_seed = logic._get_fit_seed
+
+        def recording_get_fit_seed(axis, center):
+            seed = get_fit_seed(axis, center)
+            if axis in 'xy':
+                logic.fit_seeds.append(seed)
+            return seed
+        monkeypatch.setattr(logic, '_get_fit_seed', recording_get_fit_seed)
+        yield logic
+        logic.module_state.deactivate()
+        scanner.module_state.deactivate()
+
+    def refocus(self, app, logic, initial_pos):
+        """ Refocus from the initial position and return the optimized position """
+        results = list()
+        logic.sigRefocusFinished.connect(lambda tag, pos: results.append(pos))
+        logic.line_lengths.clear()
+        logic.fit_seeds.clear()
+        logic.start_refocus(list(initial_pos))
+        while not results:
+            app.processEvents()
+        return np.array(results[0][:3])
+
+    def test_fit_seed(self, app, logic):
+        '''
+        Test if the cross fits start at the current optimum and with the width of the last refocus
+        '''
+        initial_pos = self.spot + [0.3e-6, -0.2e-6, 0]
+        position = self.refocus(app, logic, initial_pos)
+        assert np.allclose(position[:2], self.spot[:2], rtol=0, atol=0.1e-6)
+        # an x and a y line, no full xy image
+        assert logic.line_lengths.count(logic.fast_refocus_points) == 2
+        assert logic.line_lengths.count(logic.optimizer_XY_res) == 0
+        assert len(logic.fit_seeds) == 2
+        assert logic.fit_seeds == [{'center': {'value': initial_pos[0]}},
+                                   {'center': {'value': initial_pos[1]}}]
+        sigma_x = logic.optim_sigma_x
+        sigma_y = logic.optim_sigma_y
+
+        position = self.refocus(app, logic, position)
+        assert logic.fit_seeds[0]['sigma'] == {'value': sigma_x}
+        assert logic.fit_seeds[1]['sigma'] == {'value': sigma_y}
+        assert np.allclose(position[:2], self.spot[:2], rtol=0, atol=0.1e-6)
+
+    def test_edge_rescan(self, app, logic):
+        '''
+        Test if a line is scanned once more when the spot is found at its edge
+        '''
+        position = self.refocus(app, logic, self.spot + [1.4e-6, 0, 0])
+        assert logic.line_lengths.count(logic.fast_refocus_points) == 3
+        assert logic.fit_seeds[1]['center']['value'] != logic.fit_seeds[0]['center']['value']
+        assert np.allclose(position[:2], self.spot[:2], rtol=0, atol=0.1e-6)
+
+    def test_fallback(self, app, logic):
+        '''
+        Test if the full xy optimization image is scanned if the spot is not on a cross line
+        '''
+        position = self.refocus(app, logic, self.spot + [2.5e-6, 0, 0])
+        # forward and return lines of the xy optimization image
+        assert logic.line_lengths.count(logic.optimizer_XY_res) == 2 * logic.optimizer_XY_res
+        assert len(logic.fit_seeds) == 1
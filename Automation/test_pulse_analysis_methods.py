@@ -0,0 +1,78 @@
+# Test class using pytest
+
+import os, sys
+
+p = os.path.abspath('.')
+sys.path.insert(1, p)
+
+import warnings
+
+import numpy as np
+import pytest
+
+from logic.pulsed.pulsed_analysis_methods.basic_analysis_methods import BasicPulseAnalyzer
+from tools.pulse_analysis_benchmark import CASES, MeasurementLogicStub
+
+bin_width = 1e-9
+
+
+def laser_data_sets():
+    """ Laser data covering the zero division and NaN rules of the analysis methods """
+    rng = np.random.default_rng(0)
+    counts = rng.poisson(5, size=(50, 600)).astype('int64')
+    # empty lasers and lasers without counts in the signal or normalization window only
+    counts[::7] = 0
+    counts[3, :200] = 0
+    counts[4, 300:500] = 0
+    floats = counts.astype(float)
+    # negative values e.g. after a background subtraction and NaNs of missing data
+    floats[5, :100] = -3
+    floats[6, 350:400] = -20
+    floats[8, 10] = np.nan
+    floats[9, 400] = np.nan
+    return {'int': counts, 'float': floats, 'single_laser': counts[1:2], 'no_lasers': counts[:0]}
+
+
+@pytest.fixture(scope='module')
+def analyzer():
+    return BasicPulseAnalyzer(MeasurementLogicStub(bin_width))
+
+
+class TestAnalysisMethods:
+    """
+    Test that the analysis methods of BasicPulseAnalyzer working on the whole laser data matrix
+    give the results of the previous loops over the lasers (tools/pulse_analysis_benchmark.py)
+    """
+
+    @pytest.mark.parametrize('data_set', ['int', 'float', 'single_laser', 'no_lasers'])
+    @pytest.mark.parametrize('method_name, reference, params', CASES,
+                             ids=[case[0] for case in CASES])
+    def test_reference(self, analyzer, data_set, method_name, reference, params):
+        '''
+        Test if the results equal the reference including NaNs
+        '''
+        laser_data = laser_data_sets()[data_set]
+        self.check(analyzer, laser_data, method_name, reference, params)
+
+    @pytest.mark.parametrize('method_name, reference, params', CASES,
+                             ids=[case[0] for case in CASES])
+    def test_windows(self, analyzer, method_name, reference, params):
+        '''
+        Test if empty windows and windows beyond the end of the lasers give the reference results
+        '''
+        laser_data = laser_data_sets()['int']
+        empty = {key: 100e-9 for key in params}
+        self.check(analyzer, laser_data, method_name, reference, empty)
+        beyond = {key: value + 500e-9 for key, value in params.items()}
+        self.check(analyzer, laser_data, method_name, reference, beyond)
+
+    @staticmethod
+    def check(analyzer, laser_data, method_name, reference, params):
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            expected = reference(laser_data, bin_width, **params)
+            result = getattr(analyzer, method_name)(laser_data, **params)
+        assert len(result) == len(expected)
+        for values, expected_values in zip(result, expected):
+            assert np.shape(values) == np.shape(expected_values)
+            assert np.array_equal(values, expected_values, equal_nan=True)
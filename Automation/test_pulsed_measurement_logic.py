@@ -0,0 +1,258 @@
+# Test class using pytest
+
+import os, sys
+
+p = os.path.abspath('.')
+sys.path.insert(1, p)
+
+import numpy as np
+import pytest
+from qtpy import QtCore
+
+import hardware.fast_counter_dummy as fast_counter_dummy
+from hardware.fast_counter_dummy import FastCounterDummy
+from hardware.microwave.mw_source_dummy import MicrowaveDummy
+from hardware.pulser_dummy import PulserDummy
+from logic.fit_logic import FitLogic
+from logic.pulsed.pulsed_measurement_logic import PulsedMeasurementLogic
+
+
+class SaveLogicStub:
+    """ PulsedMeasurementLogic requires a save logic connection but does not use it here """
+
+
+class FastCounterTrace:
+    """ Gated trace of the dummy fast counter gaining counts in the laser pulses on every call """
+    number_of_lasers = 4
+    number_of_bins = 200
+    laser_bins = slice(50, 130)
+
+    def __init__(self, seed=0):
+        self.rng = np.random.default_rng(seed)
+        self.data = np.zeros((self.number_of_lasers, self.number_of_bins), dtype='int64')
+        # Decaying fluorescence of a laser pulse. Its flank does not depend on the counts.
+        number_of_laser_bins = self.laser_bins.stop - self.laser_bins.start
+        self.laser_pulse = np.round(10 * np.exp(-np.arange(number_of_laser_bins) / 40) + 5)
+
+    def count(self):
+        """ Add laser pulses with random amplitudes to a random range of gates """
+        first_gate = self.rng.integers(self.number_of_lasers)
+        last_gate = self.rng.integers(first_gate, self.number_of_lasers)
+        amplitudes = self.rng.integers(1, 10, last_gate + 1 - first_gate)
+        self.data[first_gate:last_gate + 1, self.laser_bins] += (
+                amplitudes[:, np.newaxis] * self.laser_pulse).astype('int64')
+
+    def get_data_trace(self):
+        self.count()
+        return self.data.copy(), {'elapsed_sweeps': None, 'elapsed_time': None}
+
+    def get_data_trace_into(self, buffer):
+        self.count()
+        buffer[:] = self.data
+        return {'elapsed_sweeps': None, 'elapsed_time': None}
+
+
+@pytest.fixture(scope='module')
+def app():
+    return QtCore.QCoreApplication.instance() or QtCore.QCoreApplication(sys.argv)
+
+
+def create_logic(path, incremental_analysis, trace):
+    """ Activate a PulsedMeasurementLogic with dummy hardware reading the given trace """
+    fit_logic = FitLogic(manager=None, name='fitlogic', config={})
+    fit_logic.module_state.activate()
+    fast_counter = FastCounterDummy(manager=None, name='fastcounter', config={'gated': True})
+    fast_counter.module_state.activate()
+    fast_counter.get_data_trace = trace.get_data_trace
+    fast_counter.get_data_trace_into = trace.get_data_trace_into
+    microwave = MicrowaveDummy(manager=None, name='microwave', config={})
+    microwave.module_state.activate()
+    pulser = PulserDummy(manager=None, name='pulser', config={})
+    pulser.module_state.activate()
+
+    logic = PulsedMeasurementLogic(manager=None,
+                                   name='pulsedmeasurementlogic',
+                                   config={'raw_data_stash_path': path,
+                                           'incremental_analysis': incremental_analysis})
+    logic.connectors['fitlogic'].obj = fit_logic
+    logic.connectors['fastcounter'].obj = fast_counter
+    logic.connectors['microwave'].obj = microwave
+    logic.connectors['pulsegenerator'].obj = pulser
+    logic.connectors['savelogic'].obj = SaveLogicStub()
+    logic.module_state.activate()
+    logic.set_measurement_settings(number_of_lasers=trace.number_of_lasers,
+                                   controlled_variable=np.arange(trace.number_of_lasers))
+    bin_width = logic.fast_counter_settings['bin_width']
+    logic.set_fast_counter_settings(number_of_gates=trace.number_of_lasers,
+                                    record_length=trace.number_of_bins * bin_width)
+    return logic
+
+
+@pytest.fixture(params=[False, True], ids=['full', 'incremental'])
+def logic(app, tmp_path, monkeypatch, request):
+    monkeypatch.setattr(fast_counter_dummy.time, 'sleep', lambda seconds: None)
+    logic = create_logic(str(tmp_path), request.param, FastCounterTrace())
+    logic.start_pulsed_measurement()
+    yield logic
+    logic.stop_pulsed_measurement()
+    logic.module_state.deactivate()
+
+
+class TestPublishedRawData:
+    """
+    Test that the raw data handed to other threads (PulsedMasterLogic.raw_data) is not altered by
+    the running measurement
+    """
+
+    def test_raw_data_copy(self, logic):
+        '''
+        Test if the published raw data does not change on the next analysis runs
+        '''
+        logic._pulsed_analysis_loop()
+        raw_data = logic.get_raw_data_copy()
+        expected = raw_data.copy()
+        assert not raw_data.flags.writeable
+        # The copy is only made once per update
+        assert logic.get_raw_data_copy() is raw_data
+        for tick in range(3):
+            logic._pulsed_analysis_loop()
+            assert np.array_equal(raw_data, expected)
+        assert np.array_equal(logic.get_raw_data_copy(), logic.raw_data)
+        assert not np.array_equal(logic.raw_data, expected)
+
+
+class TestIncrementalAnalysis:
+    """
+    Test the incremental analysis of the changed fast counter bins
+    (ConfigOption incremental_analysis of PulsedMeasurementLogic)
+    """
+
+    def test_incremental_analysis(self, app, tmp_path, monkeypatch):
+        '''
+        Test if the incremental analysis matches the full analysis after several analysis runs
+        '''
+        monkeypatch.setattr(fast_counter_dummy.time, 'sleep', lambda seconds: None)
+        # Connectors are shared by all instances of a module class. Run one logic after the other.
+        results = dict()
+        for incremental_analysis in (False, True):
+            logic = create_logic(str(tmp_path / str(incremental_analysis)),
+                                 incremental_analysis,
+                                 FastCounterTrace(seed=1))
+            logic.start_pulsed_measurement()
+            results[incremental_analysis] = list()
+            for tick in range(10):
+                logic._pulsed_analysis_loop()
+                results[incremental_analysis].append((logic.raw_data.copy(),
+                                                      logic.laser_data.copy(),
+                                                      logic.signal_data.copy(),
+                                                      logic.measurement_error.copy()))
+            logic.stop_pulsed_measurement()
+            logic.module_state.deactivate()
+
+        for full, incremental in zip(results[False], results[True]):
+            assert np.array_equal(incremental[0], full[0])
+            assert np.array_equal(incremental[1], full[1])
+            assert np.allclose(incremental[2], full[2])
+            assert np.allclose(incremental[3], full[3])
+
+
+class TestFlankCache:
+    """
+    Test the cache of laser pulse flanks of the conv_deriv extraction methods
+    (logic.pulsed.pulse_extraction_methods.basic_extraction_methods)
+    """
+
+    @staticmethod
+    def extractor(logic):
+        return logic._pulseextractor.extraction_methods['conv_deriv'].__self__
+
+    def test_hit(self, logic):
+        '''
+        Test if the cached flanks are used while the laser pulses do not move
+        '''
+        logic._pulsed_analysis_loop()
+        extractor = self.extractor(logic)
+        statistics = extractor.get_flank_cache_statistics()
+        assert statistics['misses'] > 0
+        rising_index = extractor._flank_cache['gated_conv_deriv'][1].copy()
+        for tick in range(3):
+            logic._pulsed_analysis_loop()
+        return_dict = logic._pulseextractor.extract_laser_pulses(logic.raw_data)
+        statistics_after = extractor.get_flank_cache_statistics()
+        assert statistics_after['misses'] == statistics['misses']
+        assert statistics_after['hits'] > statistics['hits']
+        assert return_dict['laser_indices_rising'] == rising_index[0]
+
+    def test_key(self, logic):
+        '''
+        Test if the cached flanks are not used with other extraction parameters
+        '''
+        logic._pulsed_analysis_loop()
+        extractor = self.extractor(logic)
+        misses = extractor.get_flank_cache_statistics()['misses']
+        logic._pulseextractor.extract_laser_pulses(logic.raw_data[:2])
+        assert extractor.get_flank_cache_statistics()['misses'] == misses + 1
+        logic._pulseextractor.extraction_settings = {'conv_std_dev': 10.0}
+        logic._pulseextractor.extract_laser_pulses(logic.raw_data)
+        assert extractor.get_flank_cache_statistics()['misses'] == misses + 2
+
+    def test_invalidation(self, logic):
+        '''
+        Test if the cached flanks are discarded when the sequence changes or a measurement starts
+        '''
+        extractor = self.extractor(logic)
+        logic._pulsed_analysis_loop()
+        assert 'gated_conv_deriv' in extractor._flank_cache
+        logic.sampling_information = {'pulse_block_ensemble': 'other'}
+        assert extractor._flank_cache == dict()
+
+        logic._pulseextractor.extract_laser_pulses(logic.raw_data)
+        assert 'gated_conv_deriv' in extractor._flank_cache
+        logic.measurement_information = dict()
+        assert extractor._flank_cache == dict()
+
+        logic._pulseextractor.extract_laser_pulses(logic.raw_data)
+        assert 'gated_conv_deriv' in extractor._flank_cache
+        logic.stop_pulsed_measurement()
+        logic.start_pulsed_measurement()
+        assert extractor._flank_cache == dict()
+        assert extractor.get_flank_cache_statistics() == {'hits': 0, 'misses': 0}
+
+
+class TestStashedRawData:
+    """
+    Test stashing the raw data of a stopped measurement and recalling it in the next one
+    (logic.pulsed.raw_data_stash)
+    """
+
+    def test_recall(self, app, tmp_path, monkeypatch):
+        '''
+        Test if the recalled raw data is added to the raw data of the next measurement and the
+        stash file is left unchanged
+        '''
+        monkeypatch.setattr(fast_counter_dummy.time, 'sleep', lambda seconds: None)
+        # Connectors are shared by all instances of a module class. Run one logic after the other.
+        for incremental_analysis in (False, True):
+            path = tmp_path / str(incremental_analysis)
+            logic = create_logic(str(path), incremental_analysis, FastCounterTrace())
+            logic.start_pulsed_measurement()
+            for tick in range(3):
+                logic._pulsed_analysis_loop()
+            logic.stop_pulsed_measurement('stash')
+            stashed = logic.raw_data.copy()
+            assert len(os.listdir(str(path))) == 1
+
+            trace = FastCounterTrace(seed=2)
+            fast_counter = logic.fastcounter()
+            monkeypatch.setattr(fast_counter, 'get_data_trace', trace.get_data_trace)
+            monkeypatch.setattr(fast_counter, 'get_data_trace_into', trace.get_data_trace_into)
+            logic.start_pulsed_measurement('stash')
+            for tick in range(3):
+                logic._pulsed_analysis_loop()
+                assert np.array_equal(logic.raw_data, stashed + trace.data)
+            logic.stop_pulsed_measurement()
+            assert np.array_equal(logic._saved_raw_data.get('stash')[0], stashed)
+
+            # The stash files are deleted on deactivation
+            logic.module_state.deactivate()
+            assert os.listdir(str(path)) == list()
@@ -0,0 +1,109 @@
+# Test class using pytest
+
+import os, sys
+
+p = os.path.abspath('.')
+sys.path.insert(1, p)
+
+import numpy as np
+import pytest
+
+from logic.pulsed.raw_data_stash import RawDataStash
+
+
+def raw_data(seed=0, shape=(4, 250)):
+    return np.random.default_rng(seed).integers(0, 100, shape)
+
+
+class TestRawDataStash:
+    """
+    Test the memory mapped stash files of pulsed raw data (logic.pulsed.raw_data_stash)
+    """
+
+    def test_stash(self, tmp_path):
+        '''
+        Test if stashed raw data is read back unchanged from a read-only memory map and replaced
+        by a new stash of the same tag
+        '''
+        # chunks not aligned with the lines of the raw data
+        stash = RawDataStash(str(tmp_path), chunk_bytes=1000)
+        data = raw_data()
+        stash.stash('tag', data, {'elapsed_sweeps': 10, 'elapsed_time': 1.5})
+        assert 'tag' in stash and len(stash) == 1
+        assert stash.get('other') is None
+        stash_map, info = stash.get('tag')
+        assert isinstance(stash_map, np.memmap)
+        assert not stash_map.flags.writeable
+        assert np.array_equal(stash_map, data)
+        assert info == {'elapsed_sweeps': 10, 'elapsed_time': 1.5}
+        assert stash.total_bytes == data.nbytes
+        assert len(os.listdir(str(tmp_path))) == 1
+
+        # stash the memory map itself under the same tag
+        stash.stash('tag', stash_map * 2, {'elapsed_sweeps': 20, 'elapsed_time': 3.0})
+        assert np.array_equal(stash.get('tag')[0], 2 * data)
+        del stash_map
+        stash.stash('tag', stash.get('tag')[0], {'elapsed_sweeps': 20, 'elapsed_time': 3.0})
+        assert np.array_equal(stash.get('tag')[0], 2 * data)
+        assert len(stash) == 1
+
+    def test_add_to(self, tmp_path):
+        '''
+        Test if the stashed raw data is added chunk by chunk to integer and float data
+        '''
+        stash = RawDataStash(str(tmp_path), chunk_bytes=1000)
+        data = raw_data()
+        stash.stash('tag', data, {'elapsed_sweeps': 1, 'elapsed_time': 1.0})
+        counts = raw_data(seed=1)
+        expected = counts + data
+        assert stash.add_to('tag', counts) is counts
+        assert np.array_equal(counts, expected)
+        float_counts = raw_data(seed=1).astype(float)
+        stash.add_to('tag', float_counts)
+        assert np.array_equal(float_counts, expected)
+
+    def test_eviction(self, tmp_path):
+        '''
+        Test if the least recently used stashes are deleted when the size limit is exceeded
+        '''
+        data = raw_data()
+        stash = RawDataStash(str(tmp_path), max_bytes=2 * data.nbytes)
+        info = {'elapsed_sweeps': 1, 'elapsed_time': 1.0}
+        stash.stash('first', data, info)
+        stash.stash('second', data, info)
+        stash.get('first')
+        stash.stash('third', data, info)
+        assert stash.keys() == ['first', 'third']
+        assert len(os.listdir(str(tmp_path))) == 2
+        # a stash larger than the limit is still kept
+        stash.stash('large', raw_data(shape=(4, 1000)), info)
+        assert stash.keys() == ['large']
+        assert len(os.listdir(str(tmp_path))) == 1
+
+    def test_clear(self, tmp_path):
+        '''
+        Test if clear deletes the stash files and files left over by another run but no other files
+        '''
+        stash = RawDataStash(str(tmp_path))
+        stash.stash('tag', raw_data(), {'elapsed_sweeps': 1, 'elapsed_time': 1.0})
+        RawDataStash(str(tmp_path)).stash('left_over', raw_data(), {'elapsed_sweeps': 1,
+                                                                    'elapsed_time': 1.0})
+        other_files = ['raw_data_stash_notes.npy', 'measurement.npy']
+        for file_name in other_files:
+            np.save(str(tmp_path / file_name), np.zeros(3))
+        assert len(os.listdir(str(tmp_path))) == 4
+        stash.clear()
+        assert len(stash) == 0
+        assert sorted(os.listdir(str(tmp_path))) == sorted(other_files)
+
+    def test_failed_stash(self, tmp_path):
+        '''
+        Test if a stash that can not be written keeps the previous stash of the tag
+        '''
+        stash = RawDataStash(str(tmp_path))
+        data = raw_data()
+        stash.stash('tag', data, {'elapsed_sweeps': 1, 'elapsed_time': 1.0})
+        # object arrays can not be memory mapped
+        stash.stash('tag', np.array([None, 1]), {'elapsed_sweeps': 2, 'elapsed_time': 2.0})
+        assert np.array_equal(stash.get('tag')[0], data)
+        assert len(os.listdir(str(tmp_path))) == 1
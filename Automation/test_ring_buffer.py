@@ -0,0 +1,78 @@
+# Test class using pytest
+
+import os, sys
+
+p = os.path.abspath('.')
+sys.path.insert(1, p)
+
+import numpy as np
+import pytest
+
+from core.util.ring_buffer import RingBuffer
+
+
+class TestRingBuffer:
+    """
+    Test the preallocated circular buffer (core.util.ring_buffer)
+    """
+    capacity = 7
+
+    @pytest.mark.parametrize('mirrored', [False, True], ids=['plain', 'mirrored'])
+    def test_wrap_around(self, mirrored):
+        '''
+        Test if the rows are returned in chronological order after wrapping around several times
+        '''
+        buffer = RingBuffer(self.capacity, (2,), mirrored=mirrored)
+        rows = np.arange(100, dtype=float).reshape(-1, 2)
+        written = 0
+        # single rows and blocks shorter and longer than the capacity
+        for length in (1, 3, 1, 5, 9, 2, 6, 1, 7, 4):
+            if length == 1:
+                buffer.append(rows[written])
+            else:
+                buffer.extend(rows[written:written + length])
+            written += length
+            expected = rows[max(0, written - self.capacity):written]
+            assert len(buffer) == expected.shape[0]
+            assert np.array_equal(buffer.latest(), expected)
+            assert np.array_equal(buffer.latest(3), expected[-3:])
+            assert np.array_equal(buffer.latest(newest_first=True), expected[::-1])
+            assert np.array_equal(buffer.get(0), expected[-1])
+            assert np.array_equal(buffer.get(len(buffer) - 1), expected[0])
+        with pytest.raises(IndexError):
+            buffer.get(self.capacity)
+
+    @pytest.mark.parametrize('mirrored', [False, True], ids=['plain', 'mirrored'])
+    def test_fill_latest(self, mirrored):
+        '''
+        Test if overwriting the newest rows across the end of the storage leaves the others
+        '''
+        buffer = RingBuffer(self.capacity, mirrored=mirrored)
+        buffer.extend(np.arange(self.capacity + 2, dtype=float))
+        expected = buffer.latest().copy()
+        buffer.fill_latest(4, -1)
+        expected[-4:] = -1
+        assert np.array_equal(buffer.latest(), expected)
+        # the mirrored copy is overwritten as well
+        buffer.append(100)
+        assert np.array_equal(buffer.latest(), np.append(expected[1:], 100))
+
+    def test_mirrored_view(self):
+        '''
+        Test if a mirrored buffer returns the most recent rows as view of its storage
+        '''
+        buffer = RingBuffer(self.capacity, mirrored=True)
+        buffer.extend(np.arange(self.capacity + 3, dtype=float))
+        assert np.shares_memory(buffer.latest(), buffer._data)
+
+    def test_resize(self):
+        '''
+        Test if resizing keeps the most recent rows in order
+        '''
+        buffer = RingBuffer(self.capacity)
+        buffer.extend(np.arange(self.capacity + 3, dtype=float))
+        buffer.resize(4)
+        assert np.array_equal(buffer.latest(), np.arange(self.capacity - 1, self.capacity + 3))
+        buffer.append(100)
+        assert np.array_equal(buffer.latest(), [self.capacity, self.capacity + 1,
+                                                self.capacity + 2, 100])
@@ -0,0 +1,39 @@
+# Test class using pytest
+
+import os, sys
+
+p = os.path.abspath('.')
+sys.path.insert(1, p)
+
+import numpy as np
+
+from logic.pulsed.sampling_function_defs.basic_sampling_functions import Sin
+
+
+class TestPeriodBins:
+    """
+    Test the periods of sampling functions used for lookup tables (SamplingBase.get_period_bins)
+    """
+    sample_rate = 1e9
+    max_period_bins = 2 ** 16
+
+    def test_exact_period(self):
+        '''
+        Test if the period of a sine wave with a rational frequency is found
+        '''
+        sin = Sin(amplitude=1.0, frequency=1.25e8)
+        assert sin.get_period_bins(self.sample_rate, self.max_period_bins) == 8
+
+    def test_phase_error_tolerance(self):
+        '''
+        Test if frequencies are only treated as periodic while the phase error after
+        max_phase_samples samples stays below the float32 resolution
+        '''
+        # 1 ulp above 125 MHz: phase error 9.4e-8 rad after 1e9 samples
+        frequency = np.nextafter(1.25e8, np.inf)
+        sin = Sin(amplitude=1.0, frequency=frequency)
+        assert sin.get_period_bins(self.sample_rate, self.max_period_bins) == 8
+        # 2 ulp above 125 MHz: phase error 1.9e-7 rad after 1e9 samples
+        frequency = np.nextafter(frequency, np.inf)
+        sin = Sin(amplitude=1.0, frequency=frequency)
+        assert sin.get_period_bins(self.sample_rate, self.max_period_bins) is None
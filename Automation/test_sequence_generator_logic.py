@@ -0,0 +1,290 @@
+# Test class using pytest
+
+import os, sys
+
+p = os.path.abspath('.')
+sys.path.insert(1, p)
+
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pytest
+
+import hardware.pulser_dummy as pulser_dummy
+import logic.pulsed.pulse_sampler as pulse_sampler
+from hardware.pulser_dummy import PulserDummy
+from logic.pulsed.pulse_objects import PulseBlock, PulseBlockElement, PulseBlockEnsemble, \
+    PulseSequence
+from logic.pulsed.sampling_function_defs.basic_sampling_functions import Sin
+from logic.pulsed.sampling_functions import SamplingFunctions
+from logic.pulsed.sequence_generator_logic import SequenceGeneratorLogic
+
+
+def failing_sample_chunk_worker(token, sampler_bytes, start, stop):
+    """ Replacement of pulse_sampler._sample_chunk_worker failing in the worker """
+    raise RuntimeError('Sampling worker failed')
+
+
+def broken_pool_sample_chunk_worker(token, sampler_bytes, start, stop):
+    """ Replacement of pulse_sampler._sample_chunk_worker killing the process pool """
+    raise BrokenProcessPool('Sampling worker died')
+
+
+class TestParallelSampling:
+    """
+    Test the error handling of sampling waveform chunks in worker processes
+    (ConfigOption sampling_processes of SequenceGeneratorLogic)
+    """
+    number_of_samples = 10000
+    chunk_samples = 1000
+
+    @pytest.fixture
+    def logic(self, tmp_path):
+        pulser = PulserDummy(manager=None, name='pulser', config={})
+        pulser.module_state.activate()
+        logic = SequenceGeneratorLogic(
+            manager=None,
+            name='sequencegenerator',
+            config={'assets_storage_path': str(tmp_path),
+                    'overhead_bytes': 4 * self.chunk_samples,
+                    'sampling_engine': 'vectorized',
+                    'sampling_processes': 2,
+                    'waveform_cache_memory_bytes': 0,
+                    'waveform_cache_disk_bytes': 0})
+        logic.connectors['pulsegenerator'].obj = pulser
+        logic.module_state.activate()
+        logic.set_pulse_generator_settings(activation_config='config6')
+        # Threads instead of processes share the patched worker function with the test
+        logic._sampling_executor = ThreadPoolExecutor(max_workers=2)
+        yield logic
+        logic.module_state.deactivate()
+        pulser.module_state.deactivate()
+
+    def sample_ensemble(self, logic):
+        sample_rate = logic.pulse_generator_settings['sample_rate']
+        element = PulseBlockElement(
+            init_length_s=self.number_of_samples / sample_rate,
+            pulse_function={'a_ch1': SamplingFunctions.Sin(amplitude=0.1, frequency=1e8)})
+        logic.save_block(PulseBlock('sin_block', element_list=[element]))
+        logic.save_ensemble(PulseBlockEnsemble('sin_ensemble', block_list=[('sin_block', 0)]))
+        complete = list()
+        logic.sigSampleEnsembleComplete.connect(complete.append)
+        result = logic.sample_pulse_block_ensemble('sin_ensemble')
+        logic.sigSampleEnsembleComplete.disconnect(complete.append)
+        return result, complete
+
+    def test_worker_error(self, logic, monkeypatch):
+        '''
+        Test if a failing worker unlocks the module and reports the failed upload
+        '''
+        monkeypatch.setattr(pulse_sampler, '_sample_chunk_worker', failing_sample_chunk_worker)
+        executor = logic._sampling_executor
+        (offset_bin, waveforms, info), complete = self.sample_ensemble(logic)
+        assert offset_bin == -1
+        assert waveforms == list()
+        assert complete == [None]
+        assert logic.module_state() == 'idle'
+        # The process pool is still usable
+        assert logic._sampling_executor is executor
+
+    def test_broken_process_pool(self, logic, monkeypatch):
+        '''
+        Test if a broken process pool is shut down and the upload reported as failed
+        '''
+        monkeypatch.setattr(pulse_sampler, '_sample_chunk_worker', broken_pool_sample_chunk_worker)
+        (offset_bin, waveforms, info), complete = self.sample_ensemble(logic)
+        assert offset_bin == -1
+        assert complete == [None]
+        assert logic.module_state() == 'idle'
+        assert logic._sampling_executor is None
+
+    def test_pickling_error(self, logic, monkeypatch):
+        '''
+        Test if errors pickling the sampler fall back to serial sampling
+        '''
+        def reduce_ex(self, protocol):
+            raise TypeError('Sampler can not be pickled')
+        monkeypatch.setattr(pulse_sampler.VectorizedEnsembleSampler, '__reduce_ex__', reduce_ex)
+        (offset_bin, waveforms, info), complete = self.sample_ensemble(logic)
+        assert offset_bin == self.number_of_samples
+        assert len(waveforms) > 0
+        assert complete[0] is not None
+        assert logic.module_state() == 'idle'
+
+
+class TestSamplingEngines:
+    """
+    Test that the vectorized sampling engine reproduces the samples of the default legacy engine
+    (ConfigOption sampling_engine of SequenceGeneratorLogic, logic.pulsed.pulse_sampler)
+    """
+    # Predefined dynamical decoupling methods
+    methods = ['xy8_tau', 'xy8_freq', 'HHphase_tau', 'HHphase_N', 'rot_echo_tau', 'rot_echo_N',
+               'HHamp', 'HHtau', 'HHpol']
+    chunk_samples = 100000
+
+    @pytest.fixture(scope='class')
+    def logic(self, tmp_path_factory):
+        pulser = PulserDummy(manager=None, name='pulser', config={})
+        pulser.module_state.activate()
+        logic = SequenceGeneratorLogic(
+            manager=None,
+            name='sequencegenerator',
+            config={'assets_storage_path': str(tmp_path_factory.mktemp('assets'))})
+        logic.connectors['pulsegenerator'].obj = pulser
+        logic.module_state.activate()
+        logic.set_pulse_generator_settings(
+            sample_rate=1.2e9,
+            activation_config=pulser.get_constraints().activation_config['config0'])
+        logic.set_generation_parameters(laser_channel='d_ch1',
+                                        sync_channel='d_ch2',
+                                        gate_channel='',
+                                        microwave_channel='a_ch1',
+                                        microwave_amplitude=0.25)
+        yield logic
+        logic.module_state.deactivate()
+        pulser.module_state.deactivate()
+
+    def sample(self, logic, engine, ensemble):
+        """ Sample an ensemble chunk by chunk with the given engine and join the chunks """
+        ensemble_info = logic.analyze_block_ensemble(ensemble)
+        if ensemble_info['number_of_samples'] == 0:
+            return dict(), dict()
+        array_length = min(self.chunk_samples, int(ensemble_info['number_of_samples']))
+        settings = logic.pulse_generator_settings
+        sampler = pulse_sampler.SAMPLING_ENGINES[engine](
+            ensemble=ensemble,
+            blocks={name: logic.get_block(name) for name, reps in ensemble.block_list},
+            ensemble_info=ensemble_info,
+            analog_amplitudes=settings['analog_levels'][0],
+            sample_rate=settings['sample_rate'])
+        analog_samples = {chnl: list() for chnl in ensemble_info['analog_channels']}
+        digital_samples = {chnl: list() for chnl in ensemble_info['digital_channels']}
+        analog_buffer = {chnl: np.empty(array_length, dtype='float32') for chnl in
+                         analog_samples}
+        digital_buffer = {chnl: np.empty(array_length, dtype=bool) for chnl in digital_samples}
+        for analog_chunk, digital_chunk in sampler.iter_chunks(array_length,
+                                                               analog_buffer,
+                                                               digital_buffer):
+            for chnl, samples in analog_chunk.items():
+                analog_samples[chnl].append(samples.copy())
+            for chnl, samples in digital_chunk.items():
+                digital_samples[chnl].append(samples.copy())
+        return ({chnl: np.concatenate(chunks) for chnl, chunks in analog_samples.items()},
+                {chnl: np.concatenate(chunks) for chnl, chunks in digital_samples.items()})
+
+    def test_default_engine(self, logic):
+        '''
+        Test if the legacy engine is used by default
+        '''
+        assert logic._sampling_engine == 'legacy'
+
+    @pytest.mark.parametrize('method', methods)
+    def test_vectorized_engine(self, logic, method):
+        '''
+        Test if the vectorized engine creates exactly the samples of the legacy engine
+        '''
+        kwargs = {'num_of_points': 5} if 'num_of_points' in logic.generate_method_params[method] \
+            else dict()
+        blocks, ensembles, sequences = logic.generate_methods[method](**kwargs)
+        for block in blocks:
+            logic.save_block(block)
+        assert len(ensembles) > 0
+        for ensemble in ensembles:
+            legacy_analog, legacy_digital = self.sample(logic, 'legacy', ensemble)
+            analog, digital = self.sample(logic, 'vectorized', ensemble)
+            assert legacy_analog.keys() == analog.keys()
+            assert legacy_digital.keys() == digital.keys()
+            for chnl, samples in legacy_analog.items():
+                assert np.array_equal(analog[chnl], samples)
+            for chnl, samples in legacy_digital.items():
+                assert np.array_equal(digital[chnl], samples)
+
+
+class TestSequenceStepReuse:
+    """
+    Test that sample_pulse_sequence only samples and writes the sequence steps that changed since
+    their waveforms have been written to the device
+    """
+
+    @pytest.fixture
+    def logic(self, tmp_path, monkeypatch):
+        # The dummy pulser waits a second for every written sequence
+        monkeypatch.setattr(pulser_dummy.time, 'sleep', lambda seconds: None)
+        pulser = PulserDummy(manager=None, name='pulser', config={})
+        pulser.module_state.activate()
+        logic = SequenceGeneratorLogic(manager=None,
+                                       name='sequencegenerator',
+                                       config={'assets_storage_path': str(tmp_path)})
+        logic.connectors['pulsegenerator'].obj = pulser
+        logic.module_state.activate()
+        logic.set_pulse_generator_settings(activation_config='config4')
+        self.save_ensemble(logic, 'ens_a', 1e8)
+        self.save_ensemble(logic, 'ens_b', 2e8)
+        # the names of all waveforms written to the pulser
+        logic.uploads = list()
+        write_waveform = pulser.write_waveform
+
+        def recording_write_waveform(name, **kwargs):
+            logic.uploads.append(name)
+            return write_waveform(name, **kwargs)
+        monkeypatch.setattr(pulser, 'write_waveform', recording_write_waveform)
+        yield logic
+        logic.module_state.deactivate()
+        pulser.module_state.deactivate()
+
+    @staticmethod
+    def save_ensemble(logic, name, frequency):
+        """ Save an ensemble of a single sine element on a_ch1 and its block """
+        element = PulseBlockElement(init_length_s=4e-7,
+                                    pulse_function={'a_ch1': Sin(amplitude=0.1,
+                                                                 frequency=frequency)},
+                                    digital_high={'d_ch1': True, 'd_ch2': False})
+        logic.save_block(PulseBlock(name + '_block', element_list=[element]))
+        logic.save_ensemble(PulseBlockEnsemble(name, block_list=[(name + '_block', 0)]))
+
+    @staticmethod
+    def sample(logic, rotating_frame):
+        """ Sample the sequence of the steps ens_a, ens_b, ens_a and return the written waveforms """
+        logic.uploads.clear()
+        logic.save_sequence(PulseSequence('sequence',
+                                          ensemble_list=[('ens_a', dict()),
+                                                         ('ens_b', dict()),
+                                                         ('ens_a', dict())],
+                                          rotating_frame=rotating_frame))
+        logic.sample_pulse_sequence('sequence')
+        assert 'sequence' in logic.sampled_sequences
+        return list(logic.uploads)
+
+    def test_unchanged_steps(self, logic):
+        '''
+        Test if only the changed ensemble is written again and all ensembles after a change of the
+        pulse generator settings
+        '''
+        assert self.sample(logic, False) == ['ens_a', 'ens_b']
+        step_waveforms = logic.get_sequence('sequence').sampling_information['step_waveform_list']
+        assert self.sample(logic, False) == list()
+        assert logic.get_sequence('sequence').sampling_information['step_waveform_list'] == \
+            step_waveforms
+
+        self.save_ensemble(logic, 'ens_b', 3e8)
+        assert self.sample(logic, False) == ['ens_b']
+
+        logic.set_pulse_generator_settings(
+            sample_rate=logic.pulse_generator_settings['sample_rate'] / 2)
+        assert self.sample(logic, False) == ['ens_a', 'ens_b']
+
+    def test_rotating_frame(self, logic):
+        '''
+        Test if steps in the rotating frame are reused at the same offset, also after the logic has
+        been restarted
+        '''
+        assert self.sample(logic, True) == ['ens_a_000', 'ens_b_001', 'ens_a_002']
+        assert self.sample(logic, True) == list()
+        # The steps after ens_b keep their offset
+        self.save_ensemble(logic, 'ens_b', 3e8)
+        assert self.sample(logic, True) == ['ens_b_001']
+
+        logic.module_state.deactivate()
+        logic.module_state.activate()
+        assert self.sample(logic, True) == list()
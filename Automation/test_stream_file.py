@@ -0,0 +1,55 @@
+# Test class using pytest
+
+import os, sys
+
+p = os.path.abspath('.')
+sys.path.insert(1, p)
+
+import numpy as np
+
+from core.util.stream_file import StreamFileReader, StreamFileWriter
+
+
+class TestStreamFile:
+    """
+    Test writing blocks of samples to a stream file and reading them back (core.util.stream_file)
+    """
+    channels = ['analog 1', 'analog 2', 'digital 1']
+
+    def test_round_trip(self, tmp_path):
+        '''
+        Test if blocks appended over several frames are read back in order with their index records
+        and the attributes given at creation and on close
+        '''
+        rng = np.random.default_rng(0)
+        path = str(tmp_path / 'trace')
+        writer = StreamFileWriter(path, self.channels, max_queued_blocks=2,
+                                  attributes={'Data rate (Hz)': 50.0})
+        blocks = [rng.normal(size=(len(self.channels), size)) for size in (1, 17, 300, 4, 1000)]
+        released = list()
+        for number, block in enumerate(blocks):
+            # every second block is passed without copy and released after writing
+            if number % 2:
+                assert writer.write(block, timeout=10, release=lambda n=number: released.append(n))
+            else:
+                assert writer.write(block, timeout=10)
+        assert writer.number_of_samples == sum(block.shape[1] for block in blocks)
+        assert writer.close(attributes={'Number of samples': writer.number_of_samples})
+        assert released == [1, 3]
+        assert writer.samples_written == writer.number_of_samples
+
+        with StreamFileReader(path) as reader:
+            assert reader.channels == self.channels
+            assert reader.attributes == {'Data rate (Hz)': 50.0,
+                                         'Number of samples': writer.number_of_samples}
+            assert len(reader) == writer.number_of_samples
+            assert np.array_equal(reader.data, np.concatenate(blocks, axis=1).T)
+            assert np.array_equal(reader.channel('analog 2'),
+                                  np.concatenate([block[1] for block in blocks]))
+            sizes = [block.shape[1] for block in blocks]
+            assert np.array_equal(reader.index['number_of_samples'], sizes)
+            assert np.array_equal(reader.index['start_sample'], np.cumsum([0] + sizes[:-1]))
+            assert np.all(np.diff(reader.index['time']) >= 0)
+            downsampled, step = reader.downsampled(100)
+            assert np.array_equal(downsampled, reader.data[::step])
+            assert downsampled.shape[0] <= 100
@@ -0,0 +1,63 @@
+# Test class using pytest
+
+import os, sys
+
+p = os.path.abspath('.')
+sys.path.insert(1, p)
+
+import gc
+
+import numpy as np
+
+import core.util.tiled_image as tiled_image
+from core.util.tiled_image import TiledImage
+
+
+class TestTiledImage:
+    """
+    Test the copy-on-write tiles of TiledImage snapshots
+    """
+
+    def create_image(self):
+        image = TiledImage(np.zeros((8, 3)), np.zeros((4, 3)), 1, tile_lines=2)
+        image.write_lines(0, np.ones((8, 4, 1)))
+        return image
+
+    def count_tile_copies(self, monkeypatch):
+        """ Count the tiles copied for snapshots """
+        copies = list()
+        temporary_memmap = tiled_image.temporary_memmap
+
+        def counting_memmap(*args, **kwargs):
+            copies.append(args)
+            return temporary_memmap(*args, **kwargs)
+        monkeypatch.setattr(tiled_image, 'temporary_memmap', counting_memmap)
+        return copies
+
+    def test_snapshot_copy_on_write(self, monkeypatch):
+        '''
+        Test if a snapshot keeps the counts of the tiles written after it has been taken
+        '''
+        image = self.create_image()
+        snapshot = image.snapshot()
+        copies = self.count_tile_copies(monkeypatch)
+        image.write_lines(2, np.full((1, 4, 1), 2))
+        assert len(copies) == 1
+        assert snapshot.tiles_copied == 1
+        assert np.all(snapshot.channel(0) == 1)
+        assert np.all(image.channel(0)[2] == 2)
+
+    def test_released_snapshot(self, monkeypatch):
+        '''
+        Test if tiles are not copied anymore once the snapshots sharing them are released
+        '''
+        image = self.create_image()
+        snapshot = image.snapshot()
+        del snapshot
+        gc.collect()
+        copies = self.count_tile_copies(monkeypatch)
+        image.write_lines(0, np.full((8, 4, 1), 2))
+        image.write_lines(0, np.full((8, 4, 1), 3))
+        assert len(copies) == 0
+        assert not image._shared_tiles.any()
+        assert np.all(image.channel(0) == 3)
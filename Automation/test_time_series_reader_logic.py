@@ -0,0 +1,158 @@
+# Test class using pytest
+
+import os, sys
+
+p = os.path.abspath('.')
+sys.path.insert(1, p)
+
+import numpy as np
+import pytest
+
+from core.util.stream_file import StreamFileReader
+from hardware.data_instream_dummy import InStreamDummy
+from logic.time_series_reader_logic import TimeSeriesReaderLogic
+
+
+class SaveLogicStub:
+    """ Provides the data directory TimeSeriesReaderLogic records to """
+
+    def __init__(self, path):
+        self.path = path
+
+    def get_path_for_module(self, module_name):
+        return self.path
+
+
+@pytest.fixture
+def logic(tmp_path):
+    streamer = InStreamDummy(manager=None,
+                             name='instreamer',
+                             config={'analog_channels': ['analog 1', 'analog 2', 'analog 3']})
+    streamer.module_state.activate()
+    logic = TimeSeriesReaderLogic(manager=None, name='timeseriesreader', config={})
+    logic.connectors['_streamer_con'].obj = streamer
+    logic.connectors['_savelogic_con'].obj = SaveLogicStub(str(tmp_path))
+    logic.module_state.activate()
+    yield logic
+    logic.module_state.deactivate()
+    streamer.module_state.deactivate()
+
+
+def process_frames(logic, frame_sizes, seed=0):
+    """ Process random data frames of the given sizes. Yields all samples processed so far,
+    starting with the zeros the traces are initialized with (samples x channels). """
+    rng = np.random.default_rng(seed)
+    samples = np.zeros((logic._trace_buffer.capacity, logic.number_of_active_channels))
+    for frame_size in frame_sizes:
+        data = rng.normal(100, 10, (logic.number_of_active_channels, frame_size))
+        samples = np.concatenate((samples, data.T))
+        logic._process_trace_data(data)
+        yield samples
+
+
+class TestMovingAverage:
+    """
+    Test the moving average of TimeSeriesReaderLogic updated from running window sums
+    """
+    # Small frames, frames larger than the averaging window and frames larger than the trace
+    frame_sizes = [1, 5, 17, 3, 120, 9, 700, 2, 250, 31, 13, 400, 7] * 3
+
+    def test_moving_average(self, logic):
+        '''
+        Test if the averaged trace matches numpy.convolve of all samples after every data frame
+        while the ring buffers wrap around several times
+        '''
+        width = logic.moving_average_width
+        assert width > 1
+        for samples in process_frames(logic, self.frame_sizes):
+            averaged = logic._average_buffer.latest()
+            for index in range(logic.number_of_active_channels):
+                expected = np.convolve(samples[:, index], np.ones(width) / width, mode='valid')
+                assert np.allclose(averaged[:, index], expected[-averaged.shape[0]:],
+                                   rtol=1e-12, atol=0)
+            # The raw trace holds the newest samples
+            assert np.array_equal(logic._trace_buffer.latest(),
+                                  samples[-logic._trace_buffer.capacity:])
+        assert samples.shape[0] > 5 * logic._trace_buffer.capacity
+
+
+class TestDecimation:
+    """
+    Test the display traces of TimeSeriesReaderLogic decimated with min/max pyramids
+    (TimeSeriesReaderLogic.set_display_width, core.util.min_max_pyramid)
+    """
+    display_width = 20
+    frame_sizes = [1, 5, 17, 3, 120, 9, 700, 2, 250, 31, 13, 400, 7] * 2
+
+    @staticmethod
+    def check_decimated(logic, pyramid, trace, start, offset, times, decimated):
+        """ Compare a decimated trace with the brute force minimum and maximum of each bin """
+        number_of_samples = trace.shape[0]
+        level = pyramid.select_level(number_of_samples, 2 * TestDecimation.display_width)
+        assert level >= 0
+        bin_size = pyramid.bin_sizes[level]
+        # bins are aligned to the stream, the bins at both ends only hold displayed samples
+        edges = np.arange(-(-start // bin_size) * bin_size, start + number_of_samples, bin_size)
+        edges = np.unique(np.concatenate(([start], edges, [start + number_of_samples]))) - start
+        assert decimated.shape[0] == 2 * (edges.size - 1) + 1
+        for index, (first, stop) in enumerate(zip(edges[:-1], edges[1:])):
+            assert np.array_equal(decimated[2 * index], trace[first:stop].min(axis=0))
+            assert np.array_equal(decimated[2 * index + 1], trace[first:stop].max(axis=0))
+            center = (offset + (first + stop - 1) / 2) / logic.data_rate
+            assert np.isclose(times[2 * index], center)
+            assert np.isclose(times[2 * index + 1], center)
+        assert np.array_equal(decimated[-1], trace[-1])
+        assert np.isclose(times[-1], (offset + number_of_samples - 1) / logic.data_rate)
+        return start % bin_size != 0, (start + number_of_samples) % bin_size != 0
+
+    def test_display_traces(self, logic):
+        '''
+        Test if the display traces hold the minimum and maximum of the samples of each bin,
+        including the partial bins at both ends of the trace
+        '''
+        logic.set_display_width(self.display_width)
+        partial_head = partial_tail = False
+        for samples in process_frames(logic, self.frame_sizes):
+            trace = logic._trace_buffer.latest()[:logic._trace_times.size]
+            start = logic._trace_pyramid.number_of_samples - logic._trace_buffer.capacity
+            times, data = logic.display_trace_data
+            decimated = np.column_stack([data[ch] for ch in logic.active_channel_names])
+            head, tail = self.check_decimated(
+                logic, logic._trace_pyramid, trace, start, 0, times, decimated)
+            partial_head |= head
+            partial_tail |= tail
+
+            averaged = logic._average_buffer.latest()
+            start = logic._average_pyramid.number_of_samples - averaged.shape[0]
+            times, data = logic.display_averaged_trace_data
+            decimated = np.column_stack([data[ch] for ch in logic.averaged_channel_names])
+            self.check_decimated(logic, logic._average_pyramid, averaged, start,
+                                 logic._trace_times.size - averaged.shape[0], times, decimated)
+        assert partial_head and partial_tail
+
+
+class TestRecording:
+    """
+    Test recording the data frames of TimeSeriesReaderLogic to a stream file
+    """
+
+    def test_recording(self, logic, tmp_path):
+        '''
+        Test if the recorded frames are read back from the stream file with the recording header
+        '''
+        logic._data_recording_active = True
+        assert logic._start_recording_file() == 0
+        frame_sizes = [1, 20, 500, 3]
+        samples = list(process_frames(logic, frame_sizes))[-1]
+        path, parameters = logic._save_recorded_data(to_file=False)
+
+        assert os.path.dirname(path) == str(tmp_path)
+        assert parameters['Number of samples'] == sum(frame_sizes)
+        with StreamFileReader(path) as reader:
+            assert reader.channels == list(logic.active_channel_names)
+            assert np.array_equal(reader.data, samples[-sum(frame_sizes):])
+            assert len(reader.index) == len(frame_sizes)
+            start_time = logic._record_start_time.strftime('%d.%m.%Y, %H:%M:%S.%f')
+            assert reader.attributes['Start recording time'] == start_time
+            assert 'Stop recording time' in reader.attributes
+            assert reader.attributes['Data rate (Hz)'] == logic.data_rate
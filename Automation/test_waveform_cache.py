@@ -0,0 +1,173 @@
+# Test class using pytest
+
+import os, sys
+
+p = os.path.abspath('.')
+sys.path.insert(1, p)
+
+import numpy as np
+import pytest
+
+import logic.pulsed.sequence_generator_logic as sequence_generator_logic
+from hardware.pulser_dummy import PulserDummy
+from logic.pulsed.pulse_objects import PulseBlock, PulseBlockElement, PulseBlockEnsemble
+from logic.pulsed.sampling_function_defs.basic_sampling_functions import Sin
+from logic.pulsed.sequence_generator_logic import SequenceGeneratorLogic
+from logic.pulsed.waveform_cache import WaveformCache
+
+
+def create_ensemble(name='ensemble', frequency=1e8, amplitude=0.1, length=4e-7):
+    """ Ensemble of a single sine element on a_ch1 with its block """
+    element = PulseBlockElement(init_length_s=length,
+                                pulse_function={'a_ch1': Sin(amplitude=amplitude,
+                                                             frequency=frequency)},
+                                digital_high={'d_ch1': True, 'd_ch2': False})
+    block = PulseBlock(name + '_block', element_list=[element])
+    ensemble = PulseBlockEnsemble(name, block_list=[(block.name, 0)])
+    return ensemble, {block.name: block}
+
+
+def waveform_key(name='ensemble', frequency=1e8, amplitude=0.1, sample_rate=25e9, pp_amplitude=0.5,
+                 offset_bin=0):
+    ensemble, blocks = create_ensemble(name, frequency, amplitude)
+    return WaveformCache.waveform_key(ensemble=ensemble,
+                                      blocks=blocks,
+                                      sample_rate=sample_rate,
+                                      analog_amplitudes={'a_ch1': pp_amplitude},
+                                      channels={'a_ch1', 'd_ch1'},
+                                      offset_bin=offset_bin,
+                                      sampling_engine='vectorized')
+
+
+def add_waveform(cache, key, number_of_samples=1000, seed=0):
+    """ Add a random waveform to the cache and return its samples """
+    rng = np.random.default_rng(seed)
+    analog_samples = {'a_ch1': rng.random(number_of_samples, dtype='float32')}
+    digital_samples = {'d_ch1': rng.random(number_of_samples) > 0.5}
+    writer = cache.writer(key, ['a_ch1'], ['d_ch1'], number_of_samples)
+    for start in range(0, number_of_samples, 300):
+        writer.write({chnl: samples[start:start + 300] for chnl, samples in analog_samples.items()},
+                     {chnl: samples[start:start + 300] for chnl, samples in digital_samples.items()})
+    writer.commit()
+    return analog_samples, digital_samples
+
+
+class TestWaveformCache:
+    """
+    Test the waveform cache of SequenceGeneratorLogic (logic.pulsed.waveform_cache)
+    """
+
+    def test_key(self):
+        '''
+        Test if any change of the samples changes the key while the names are ignored
+        '''
+        key = waveform_key()
+        assert waveform_key(name='other_name') == key
+        assert waveform_key(frequency=1.01e8) != key
+        assert waveform_key(amplitude=0.2) != key
+        assert waveform_key(sample_rate=12.5e9) != key
+        assert waveform_key(pp_amplitude=1.0) != key
+        assert waveform_key(offset_bin=10) != key
+
+    def test_hit(self, tmp_path):
+        '''
+        Test if a hit returns the identical samples and nothing is written to disk
+        '''
+        cache = WaveformCache(str(tmp_path), max_memory_bytes=10 ** 6, max_disk_bytes=10 ** 6)
+        assert cache.get('key') is None
+        analog_samples, digital_samples = add_waveform(cache, 'key')
+        cached_analog, cached_digital = cache.get('key')
+        assert np.array_equal(cached_analog['a_ch1'], analog_samples['a_ch1'])
+        assert np.array_equal(cached_digital['d_ch1'], digital_samples['d_ch1'])
+        assert (cache.hits, cache.misses) == (1, 1)
+        assert os.listdir(str(tmp_path)) == list()
+
+    def test_evict_to_disk(self, tmp_path):
+        '''
+        Test if entries evicted from memory are written to disk and loaded again
+        '''
+        # 5000 bytes per waveform, only one fits in memory
+        cache = WaveformCache(str(tmp_path), max_memory_bytes=6000, max_disk_bytes=10 ** 6)
+        first_samples = add_waveform(cache, 'first', seed=1)
+        assert os.listdir(str(tmp_path)) == list()
+        add_waveform(cache, 'second', seed=2)
+        assert os.listdir(str(tmp_path)) == ['first']
+        analog_samples, digital_samples = cache.get('first')
+        assert np.array_equal(analog_samples['a_ch1'], first_samples[0]['a_ch1'])
+        assert np.array_equal(digital_samples['d_ch1'], first_samples[1]['d_ch1'])
+
+    def test_no_disk_tier(self, tmp_path):
+        '''
+        Test if evicted entries are dropped without disk cache
+        '''
+        cache = WaveformCache(str(tmp_path), max_memory_bytes=6000)
+        add_waveform(cache, 'first', seed=1)
+        add_waveform(cache, 'second', seed=2)
+        assert cache.get('first') is None
+        assert cache.get('second') is not None
+        assert os.listdir(str(tmp_path)) == list()
+
+
+class TestWaveformUpload:
+    """
+    Test skipping sampling and upload of cached waveforms in SequenceGeneratorLogic
+    """
+
+    @pytest.fixture
+    def logic(self, tmp_path):
+        pulser = PulserDummy(manager=None, name='pulser', config={})
+        pulser.module_state.activate()
+        logic = SequenceGeneratorLogic(manager=None,
+                                       name='sequencegenerator',
+                                       config={'assets_storage_path': str(tmp_path)})
+        logic.connectors['pulsegenerator'].obj = pulser
+        logic.module_state.activate()
+        logic.set_pulse_generator_settings(activation_config='config4')
+        ensemble, blocks = create_ensemble()
+        for block in blocks.values():
+            logic.save_block(block)
+        logic.save_ensemble(ensemble)
+        yield logic
+        logic.module_state.deactivate()
+        pulser.module_state.deactivate()
+
+    @staticmethod
+    def record_uploads(pulser, monkeypatch):
+        """ Record copies of all samples written to the pulser """
+        uploads = list()
+        write_waveform = pulser.write_waveform
+
+        def recording_write_waveform(name, analog_samples, digital_samples, **kwargs):
+            uploads.append(({chnl: np.array(samples) for chnl, samples in analog_samples.items()},
+                            {chnl: np.array(samples) for chnl, samples in digital_samples.items()}))
+            return write_waveform(name, analog_samples, digital_samples, **kwargs)
+        monkeypatch.setattr(pulser, 'write_waveform', recording_write_waveform)
+        return uploads
+
+    def test_upload_skipped(self, logic, monkeypatch):
+        '''
+        Test if a waveform still present on the device is not uploaded again
+        '''
+        uploads = self.record_uploads(logic.pulsegenerator.obj, monkeypatch)
+        offset_bin, waveforms, info = logic.sample_pulse_block_ensemble('ensemble')
+        assert len(uploads) == 1
+        assert logic.sample_pulse_block_ensemble('ensemble')[:2] == (offset_bin, waveforms)
+        assert len(uploads) == 1
+
+    def test_cache_hit_upload(self, logic, monkeypatch):
+        '''
+        Test if a cached waveform deleted on the device is uploaded again without sampling
+        '''
+        uploads = self.record_uploads(logic.pulsegenerator.obj, monkeypatch)
+        offset_bin, waveforms, info = logic.sample_pulse_block_ensemble('ensemble')
+        logic.pulsegenerator.obj.delete_waveform(waveforms)
+
+        def fail(*args, **kwargs):
+            raise AssertionError('Cached waveform sampled again')
+        monkeypatch.setitem(sequence_generator_logic.SAMPLING_ENGINES, logic._sampling_engine, fail)
+        assert logic.sample_pulse_block_ensemble('ensemble')[:2] == (offset_bin, waveforms)
+        assert len(uploads) == 2
+        for chnl, samples in uploads[0][0].items():
+            assert np.array_equal(uploads[1][0][chnl], samples)
+        for chnl, samples in uploads[0][1].items():
+            assert np.array_equal(uploads[1][1][chnl], samples)
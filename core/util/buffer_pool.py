@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains a pool of preallocated numpy arrays for reuse between threads.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import queue
+import numpy as np
+
+
+class BufferPool:
+    """
+    Fixed number of preallocated, equally shaped numpy arrays. A buffer is taken from the pool with
+    acquire and given back with release (from any thread) once its data is not needed anymore.
+
+    If all buffers are in use, acquire blocks until one is released. This limits the memory used
+    when a consumer (e.g. a file writer thread) lags behind and slows down the producer instead.
+    """
+
+    def __init__(self, number_of_buffers, shape, dtype=np.float64):
+        """
+        @param int number_of_buffers: Number of buffers in the pool
+        @param tuple shape: Shape of each buffer
+        @param dtype: numpy data type of the buffers
+        """
+        self.number_of_buffers = max(1, int(number_of_buffers))
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        # Last in, first out: the most recently used buffer is most likely still in the CPU cache
+        self._free = queue.LifoQueue()
+        for _ in range(self.number_of_buffers):
+            self._free.put(np.empty(self.shape, dtype=self.dtype))
+
+    @property
+    def available(self):
+        """ Number of buffers not in use """
+        return self._free.qsize()
+
+    def acquire(self, timeout=None):
+        """
+        Take a free buffer from the pool. Its content is undefined.
+
+        @param float timeout: maximum time in seconds to wait for a free buffer (None waits forever)
+
+        @return numpy.ndarray: the buffer or None if no buffer has been released within timeout
+        """
+        try:
+            return self._free.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def release(self, buffer):
+        """ Give a buffer obtained from acquire back to the pool """
+        self._free.put(buffer)
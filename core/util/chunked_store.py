@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains an append-only, chunked and compressed on-disk array for measurement data
+recorded row by row.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import os
+import json
+import glob
+import shutil
+import numpy as np
+
+try:
+    import h5py
+except ImportError:
+    h5py = None
+
+
+class ChunkedArrayStore:
+    """
+    Append-only on-disk array of equally shaped rows, stored in compressed chunks of chunk_rows
+    rows. Every appended row is written to disk immediately, so all rows appended before a crash
+    can be read again.
+
+    Two file formats are supported:
+        - 'hdf5': a single HDF5 file (requires h5py) containing the dataset 'data' with the
+                  attributes stored as dataset attributes.
+        - 'npz': a directory containing one compressed numpy file per chunk and a JSON file with
+                 the attributes. The incomplete last chunk is replaced on every append.
+    The format 'auto' uses HDF5 if h5py is available and the npz directory otherwise.
+    Use ChunkedArrayStore.open to read an existing store.
+    """
+    hdf5_extension = '.h5'
+    npz_extension = '.chunks'
+    _metadata_file = 'metadata.json'
+
+    def __init__(self, path, row_shape=(), dtype=float, chunk_rows=64, file_format='auto',
+                 _mode='w'):
+        """
+        @param str path: file path without extension. The extension of the format is appended.
+        @param tuple row_shape: Shape of a single row
+        @param dtype: numpy data type of the rows
+        @param int chunk_rows: Number of rows per compressed chunk
+        @param str file_format: 'auto', 'hdf5' or 'npz'
+        """
+        if file_format == 'auto':
+            file_format = 'npz' if h5py is None else 'hdf5'
+        if file_format == 'hdf5' and h5py is None:
+            raise ImportError('h5py module not found. Please install it by typing command '
+                              '"pip install h5py" or use the "npz" format.')
+        if file_format not in ('hdf5', 'npz'):
+            raise ValueError('Unknown file format "{0}" of ChunkedArrayStore. Valid formats are '
+                             '"auto", "hdf5" and "npz".'.format(file_format))
+        self.file_format = file_format
+        self.row_shape = tuple(row_shape)
+        self.dtype = np.dtype(dtype)
+        self.chunk_rows = max(1, int(chunk_rows))
+        self.attributes = dict()
+        self._length = 0
+        self._file = None
+        self._dataset = None
+        self._chunk = None  # rows of the incomplete last chunk (npz format)
+
+        extension = self.hdf5_extension if file_format == 'hdf5' else self.npz_extension
+        self.path = path if path.endswith(extension) else path + extension
+        if _mode == 'w':
+            self._create()
+        else:
+            self._open_existing()
+
+    @classmethod
+    def open(cls, path):
+        """
+        Open an existing store for reading. Rows may be appended as well.
+
+        @param str path: path of the .h5 file or .chunks directory
+
+        @return ChunkedArrayStore: the opened store
+        """
+        file_format = 'npz' if os.path.isdir(path) else 'hdf5'
+        return cls(path, file_format=file_format, _mode='r+')
+
+    def __len__(self):
+        return self._length
+
+    def _create(self):
+        if self.file_format == 'hdf5':
+            self._file = h5py.File(self.path, 'w')
+            self._dataset = self._file.create_dataset(
+                'data',
+                shape=(0, *self.row_shape),
+                maxshape=(None, *self.row_shape),
+                chunks=(self.chunk_rows, *self.row_shape),
+                dtype=self.dtype,
+                compression='gzip',
+                compression_opts=4)
+            self._file.flush()
+        else:
+            os.makedirs(self.path)
+            self._chunk = np.empty((self.chunk_rows, *self.row_shape), dtype=self.dtype)
+            self._write_metadata()
+
+    def _open_existing(self):
+        if self.file_format == 'hdf5':
+            self._file = h5py.File(self.path, 'r+')
+            self._dataset = self._file['data']
+            self.row_shape = self._dataset.shape[1:]
+            self.dtype = self._dataset.dtype
+            self.chunk_rows = self._dataset.chunks[0]
+            self.attributes = {key: value for key, value in self._dataset.attrs.items()}
+            self._length = self._dataset.shape[0]
+        else:
+            with open(os.path.join(self.path, self._metadata_file), 'r') as file:
+                metadata = json.load(file)
+            self.row_shape = tuple(metadata['row_shape'])
+            self.dtype = np.dtype(metadata['dtype'])
+            self.chunk_rows = metadata['chunk_rows']
+            self.attributes = metadata['attributes']
+            self._chunk = np.empty((self.chunk_rows, *self.row_shape), dtype=self.dtype)
+            chunk_files = self._chunk_files()
+            if chunk_files:
+                last_chunk = self._load_chunk(chunk_files[-1])
+                self._chunk[:last_chunk.shape[0]] = last_chunk
+                self._length = (len(chunk_files) - 1) * self.chunk_rows + last_chunk.shape[0]
+
+    def append(self, row):
+        """ Append a single row and write it to disk """
+        if self.file_format == 'hdf5':
+            self._dataset.resize(self._length + 1, axis=0)
+            self._dataset[self._length] = row
+            self._file.flush()
+            self._length += 1
+        else:
+            chunk_index, row_index = divmod(self._length, self.chunk_rows)
+            self._chunk[row_index] = row
+            self._length += 1
+            self._write_chunk(chunk_index, self._chunk[:row_index + 1])
+
+    def extend(self, rows):
+        """ Append several rows (first axis of rows) and write them to disk """
+        rows = np.asarray(rows, dtype=self.dtype)
+        number_of_rows = rows.shape[0]
+        if number_of_rows == 0:
+            return
+        if self.file_format == 'hdf5':
+            self._dataset.resize(self._length + number_of_rows, axis=0)
+            self._dataset[self._length:] = rows
+            self._file.flush()
+            self._length += number_of_rows
+            return
+        start = 0
+        while start < number_of_rows:
+            chunk_index, row_index = divmod(self._length, self.chunk_rows)
+            count = min(number_of_rows - start, self.chunk_rows - row_index)
+            self._chunk[row_index:row_index + count] = rows[start:start + count]
+            self._length += count
+            start += count
+            self._write_chunk(chunk_index, self._chunk[:row_index + count])
+
+    def read(self, start=0, stop=None):
+        """
+        Read consecutive rows from disk.
+
+        @param int start: index of the first row
+        @param int stop: index after the last row (None for all rows)
+
+        @return numpy.ndarray: the rows in chronological order
+        """
+        start, stop, _ = slice(start, stop).indices(self._length)
+        if stop <= start:
+            return np.empty((0, *self.row_shape), dtype=self.dtype)
+        if self.file_format == 'hdf5':
+            return self._dataset[start:stop]
+        first_chunk = start // self.chunk_rows
+        last_chunk = (stop - 1) // self.chunk_rows
+        chunk_files = self._chunk_files()
+        rows = np.concatenate([self._load_chunk(chunk_files[index]) for index in
+                               range(first_chunk, last_chunk + 1)])
+        offset = first_chunk * self.chunk_rows
+        return rows[start - offset:stop - offset]
+
+    def set_attributes(self, attributes):
+        """
+        Store metadata along with the data. Values that can not be stored directly are converted
+        to strings.
+
+        @param dict attributes: metadata to add or update
+        """
+        self.attributes.update(attributes)
+        if self.file_format == 'hdf5':
+            for key, value in attributes.items():
+                try:
+                    self._dataset.attrs[key] = value
+                except (TypeError, ValueError):
+                    self._dataset.attrs[key] = str(value)
+            self._file.flush()
+        else:
+            self._write_metadata()
+
+    def close(self):
+        """ Close the store. It can not be used afterwards. """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._dataset = None
+
+    def delete(self):
+        """ Close the store and delete its files from disk """
+        self.close()
+        if os.path.isdir(self.path):
+            shutil.rmtree(self.path, ignore_errors=True)
+        elif os.path.isfile(self.path):
+            os.remove(self.path)
+
+    def _write_metadata(self):
+        metadata = {'row_shape': list(self.row_shape),
+                    'dtype': self.dtype.str,
+                    'chunk_rows': self.chunk_rows,
+                    'attributes': self.attributes}
+        self._replace_file(self._metadata_file,
+                           lambda file: file.write(
+                               json.dumps(metadata, indent=2, default=self._json_default).encode()))
+
+    def _write_chunk(self, chunk_index, rows):
+        self._replace_file('chunk_{0:06d}.npz'.format(chunk_index),
+                           lambda file: np.savez_compressed(file, data=rows))
+
+    def _replace_file(self, file_name, write_func):
+        """ Write a file of the npz store atomically to not lose data if interrupted """
+        tmp_path = os.path.join(self.path, file_name + '.tmp')
+        with open(tmp_path, 'wb') as file:
+            write_func(file)
+        os.replace(tmp_path, os.path.join(self.path, file_name))
+
+    def _chunk_files(self):
+        return sorted(glob.glob(os.path.join(self.path, 'chunk_*.npz')))
+
+    @staticmethod
+    def _load_chunk(path):
+        with np.load(path) as npz_file:
+            return npz_file['data']
+
+    @staticmethod
+    def _json_default(obj):
+        if isinstance(obj, np.ndarray):
+            return obj.tolist()
+        if isinstance(obj, np.generic):
+            return obj.item()
+        return str(obj)
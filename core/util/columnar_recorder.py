@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains a growable columnar buffer for data recorded row by row over a long time.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import numpy as np
+
+
+class ColumnarRecorder:
+    """
+    Growable buffer of rows with a fixed number of columns (e.g. timestamp and one value per
+    channel), stored column by column in a single preallocated array.
+
+    The storage is allocated in multiples of chunk_rows rows and its capacity is doubled when
+    full, so appending a row costs amortized O(1). The recorded rows are returned as views of the
+    storage without copying. Views stay valid when the storage grows (the old storage is kept alive
+    by the view), they just do not show rows appended afterwards.
+
+    If a store (e.g. core.util.chunked_store.ChunkedArrayStore) is given, every completed chunk of
+    chunk_rows rows is appended to it right away. close writes the remaining rows, attach continues
+    with another store.
+    """
+
+    def __init__(self, number_of_columns, chunk_rows=4096, dtype=np.float64, store=None):
+        """
+        @param int number_of_columns: Number of values per row
+        @param int chunk_rows: Number of rows allocated (and streamed to store) at once
+        @param dtype: numpy data type of the values
+        @param store: optional object with an extend(rows) method receiving all full chunks
+        """
+        self.chunk_rows = max(1, int(chunk_rows))
+        self.store = store
+        self._data = np.empty((int(number_of_columns), self.chunk_rows), dtype=dtype)
+        self._length = 0
+        self._stored_rows = 0
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    @property
+    def number_of_columns(self):
+        return self._data.shape[0]
+
+    @property
+    def capacity(self):
+        return self._data.shape[1]
+
+    @property
+    def data(self):
+        """ View of all recorded rows (rows x columns) """
+        return self._data[:, :self._length].T
+
+    def column(self, index):
+        """ Contiguous view of a single column of all recorded rows """
+        return self._data[index, :self._length]
+
+    def append(self, row):
+        """ Append a single row of number_of_columns values """
+        self._reserve(self._length + 1)
+        self._data[:, self._length] = row
+        self._length += 1
+        self._stream_chunks()
+
+    def extend(self, rows):
+        """ Append several rows (rows x columns) at once """
+        rows = np.asarray(rows)
+        number_of_rows = rows.shape[0]
+        self._reserve(self._length + number_of_rows)
+        self._data[:, self._length:self._length + number_of_rows] = rows.T
+        self._length += number_of_rows
+        self._stream_chunks()
+
+    def clear(self):
+        """ Remove all rows and release the storage. The store is kept. """
+        self._data = np.empty((self.number_of_columns, self.chunk_rows), dtype=self._data.dtype)
+        self._length = 0
+        self._stored_rows = 0
+
+    def attach(self, store):
+        """ Stream all recorded rows and the rows appended from now on to store. A store attached
+        before is closed first (see close).
+
+        @param store: object with an extend(rows) method or None
+        """
+        self.close()
+        self.store = store
+        self._stored_rows = 0
+        self._stream_chunks()
+
+    def close(self):
+        """ Write the rows not yet streamed to the store and detach the store """
+        if self.store is not None:
+            self.store.extend(self.data[self._stored_rows:])
+            self._stored_rows = self._length
+            self.store = None
+
+    def _reserve(self, number_of_rows):
+        if number_of_rows <= self.capacity:
+            return
+        chunks = -(-max(number_of_rows, 2 * self.capacity) // self.chunk_rows)
+        data = np.empty((self.number_of_columns, chunks * self.chunk_rows), dtype=self._data.dtype)
+        data[:, :self._length] = self._data[:, :self._length]
+        self._data = data
+
+    def _stream_chunks(self):
+        if self.store is None:
+            return
+        full_rows = self._length - self._length % self.chunk_rows
+        if full_rows > self._stored_rows:
+            self.store.extend(self.data[self._stored_rows:full_rows])
+            self._stored_rows = full_rows
@@ -19,6 +19,7 @@ Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
 top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
 """
 
+import bisect
 import numpy as np
 from scipy.ndimage import minimum_filter1d, maximum_filter1d
 
@@ -62,3 +63,51 @@ def scan_blink_correction(image, axis=1):
         np.flip(filt_img, axis), size=2, axis=axis, mode='constant', cval=median)
     # Flip back the image to obtain original orientation and return result.
     return np.flip(filt_img, axis)
+
+
+class RunningMedian:
+    """
+    Median of the last window_length values of several channels, updated value by value.
+
+    The window of each channel is kept as sorted list. Each update removes the oldest value and
+    inserts the new one by bisection instead of sorting the whole window again. The result is
+    identical to numpy.median of the window (mean of the two middle values for even lengths).
+    """
+
+    def __init__(self, number_of_channels, window_length, initial_value=0.0):
+        """
+        @param int number_of_channels: number of independent channels
+        @param int window_length: number of values per channel to take the median of
+        @param float initial_value: value the windows are filled with initially
+        """
+        self.window_length = max(1, int(window_length))
+        self._history = np.full((self.window_length, number_of_channels), initial_value,
+                                dtype=float)
+        self._index = 0
+        self._sorted = [[float(initial_value)] * self.window_length for _ in
+                        range(number_of_channels)]
+
+    def update(self, values):
+        """
+        Add one new value per channel, dropping the oldest ones.
+
+        @param numpy.ndarray values: new value of each channel
+
+        @return numpy.ndarray: current median of each channel
+        """
+        old_values = self._history[self._index].tolist()
+        self._history[self._index] = values
+        self._index = (self._index + 1) % self.window_length
+        for window, old_value, value in zip(self._sorted, old_values,
+                                            self._history[self._index - 1].tolist()):
+            del window[bisect.bisect_left(window, old_value)]
+            bisect.insort(window, value)
+        return self.median
+
+    @property
+    def median(self):
+        """ Current median of each channel as numpy.ndarray """
+        middle = self.window_length // 2
+        if self.window_length % 2:
+            return np.array([window[middle] for window in self._sorted])
+        return np.array([(window[middle - 1] + window[middle]) / 2 for window in self._sorted])
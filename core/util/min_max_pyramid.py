@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains an incrementally updated min/max decimation pyramid of streamed multi-channel
+data for the display of long traces.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import numpy as np
+from core.util.ring_buffer import RingBuffer
+
+
+class MinMaxPyramid:
+    """
+    Minimum and maximum of each channel in bins of factor, factor**2, factor**3, ... samples of a
+    stream of samples, covering at least the most recent capacity samples.
+
+    Level 0 holds bins of factor samples, every further level bins of factor bins of the level
+    below. The bins are aligned to the sample count of the stream, so appending samples only
+    completes new bins: each level keeps the values of its incomplete bin and passes its completed
+    bins to the next level. Appending n samples therefore costs O(n) for all levels together.
+
+    Plotting the minimum and maximum of every bin instead of every sample keeps all peaks visible,
+    while the number of points only depends on the number of bins requested (e.g. the plot width
+    in pixels) and not on the number of samples.
+    """
+
+    def __init__(self, capacity, number_of_channels, factor=4, min_bins=16, dtype=np.float64):
+        """
+        @param int capacity: Number of most recent samples covered by all levels
+        @param int number_of_channels: Number of values per sample
+        @param int factor: Number of bins (samples for level 0) combined into a bin of the next
+                           level
+        @param int min_bins: Levels are added while they have at least min_bins bins for capacity
+                             samples
+        @param dtype: numpy data type of the samples
+        """
+        self.capacity = max(1, int(capacity))
+        self.number_of_channels = int(number_of_channels)
+        self.factor = max(2, int(factor))
+        self.bin_sizes = list()
+        # Completed bins of each level (bins x 2 x channels, minimum and maximum)
+        self._levels = list()
+        # Minima and maxima of the incomplete bin of each level (factor x 2 x channels)
+        self._pending = list()
+        self._pending_counts = list()
+        self._completed_bins = list()
+        # Reused arrays for the bins completed by a single extend call of each level
+        self._scratch = list()
+        bin_size = self.factor
+        while self.capacity // bin_size >= max(1, int(min_bins)):
+            self.bin_sizes.append(bin_size)
+            self._levels.append(RingBuffer(self.capacity // bin_size + 2,
+                                           (2, self.number_of_channels),
+                                           dtype=dtype,
+                                           mirrored=True))
+            self._pending.append(np.empty((self.factor, 2, self.number_of_channels), dtype=dtype))
+            self._pending_counts.append(0)
+            self._completed_bins.append(0)
+            self._scratch.append(np.empty((0, 2, self.number_of_channels), dtype=dtype))
+            bin_size *= self.factor
+        self._number_of_samples = 0
+
+    @property
+    def number_of_levels(self):
+        return len(self.bin_sizes)
+
+    @property
+    def number_of_samples(self):
+        """ Number of samples appended since creation or the last clear """
+        return self._number_of_samples
+
+    def clear(self):
+        """ Remove all samples """
+        for level in self._levels:
+            level.clear()
+        self._pending_counts = [0] * self.number_of_levels
+        self._completed_bins = [0] * self.number_of_levels
+        self._number_of_samples = 0
+
+    def extend(self, samples):
+        """
+        Append samples and update the bins of all levels.
+
+        @param numpy.ndarray samples: new samples (samples x channels)
+        """
+        samples = np.asarray(samples)
+        self._number_of_samples += samples.shape[0]
+        minima = maxima = samples
+        for level in range(self.number_of_levels):
+            minima, maxima = self._extend_level(level, minima, maxima)
+            if minima.shape[0] == 0:
+                break
+
+    def select_level(self, number_of_samples, max_bins):
+        """
+        Finest level showing number_of_samples samples with at most max_bins bins.
+
+        @param int number_of_samples: Number of samples to show
+        @param int max_bins: Maximum number of bins
+
+        @return int: level index or -1 if the samples themselves do not exceed max_bins
+        """
+        if number_of_samples <= max_bins:
+            return -1
+        for level, bin_size in enumerate(self.bin_sizes):
+            if -(-number_of_samples // bin_size) + 1 <= max_bins:
+                return level
+        return self.number_of_levels - 1
+
+    def bins(self, level, start, stop):
+        """
+        Completed bins of a level overlapping the samples start to stop (stream sample indices).
+        Samples after the last completed bin are not covered.
+
+        @param int level: level index
+        @param int start: index of the first sample
+        @param int stop: index after the last sample
+
+        @return (int, numpy.ndarray, numpy.ndarray): sample index of the first bin, minima and
+                                                     maxima (bins x channels, views)
+        """
+        bin_size = self.bin_sizes[level]
+        completed = self._completed_bins[level]
+        stored = len(self._levels[level])
+        first = min(max(start // bin_size, completed - stored), completed)
+        last = min(max(-(-stop // bin_size), first), completed)
+        rows = self._levels[level].latest(completed - first)[:last - first]
+        return first * bin_size, rows[:, 0], rows[:, 1]
+
+    def _get_scratch(self, level, number_of_bins):
+        """ Reused array for number_of_bins completed bins of a level (only valid until the next
+        extend call) """
+        scratch = self._scratch[level]
+        if scratch.shape[0] < number_of_bins:
+            scratch = np.empty((max(number_of_bins, 2 * scratch.shape[0]), *scratch.shape[1:]),
+                               dtype=scratch.dtype)
+            self._scratch[level] = scratch
+        return scratch[:number_of_bins]
+
+    def _extend_level(self, level, minima, maxima):
+        """ Add minima and maxima of bins of the level below and return those of completed bins """
+        factor = self.factor
+        pending = self._pending[level]
+        count = self._pending_counts[level]
+        number_of_values = minima.shape[0]
+        # Complete the pending bin first
+        offset = 0
+        head = 0
+        if count > 0:
+            offset = min(factor - count, number_of_values)
+            pending[count:count + offset, 0] = minima[:offset]
+            pending[count:count + offset, 1] = maxima[:offset]
+            count += offset
+            if count == factor:
+                head = 1
+                count = 0
+        complete = (number_of_values - offset) // factor
+        stop = offset + complete * factor
+        bins = self._get_scratch(level, head + complete)
+        if head:
+            np.min(pending[:, 0], axis=0, out=bins[0, 0])
+            np.max(pending[:, 1], axis=0, out=bins[0, 1])
+        if complete:
+            shape = (complete, factor, self.number_of_channels)
+            np.min(minima[offset:stop].reshape(shape), axis=1, out=bins[head:, 0])
+            np.max(maxima[offset:stop].reshape(shape), axis=1, out=bins[head:, 1])
+        # Keep the remaining values in the pending bin
+        remaining = number_of_values - stop
+        if remaining:
+            pending[count:count + remaining, 0] = minima[stop:]
+            pending[count:count + remaining, 1] = maxima[stop:]
+            count += remaining
+        self._pending_counts[level] = count
+        if bins.shape[0]:
+            self._levels[level].extend(bins)
+            self._completed_bins[level] += bins.shape[0]
+        return bins[:, 0], bins[:, 1]
@@ -30,3 +30,9 @@ def netobtain(obj):
         return rpyc.utils.classic.obtain(obj)
     else:
         return obj
+
+
+def is_netref(obj):
+    """ Check if obj is a reference to an object of a remote qudi instance.
+    """
+    return isinstance(obj, rpyc.core.netref.BaseNetref)
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains a preallocated circular buffer for numpy data.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import numpy as np
+
+
+class RingBuffer:
+    """
+    Preallocated circular buffer of equally shaped rows.
+
+    New rows are written at a write index wrapping around at the end of the storage array. Once the
+    buffer is full, each new row overwrites the oldest one. Appending never moves stored data.
+    The rows can be read in logical (chronological) order. Views of the storage are returned
+    whenever the requested rows do not wrap around the end of the storage, copies otherwise.
+    Views are only valid until the rows are overwritten.
+
+    A mirrored buffer writes every row twice into a storage of twice the capacity. In return the
+    most recent rows are always available as a view (e.g. for a plot that is updated continuously).
+    """
+
+    def __init__(self, capacity, row_shape=(), dtype=float, mirrored=False):
+        """
+        @param int capacity: Maximum number of rows held by the buffer
+        @param tuple row_shape: Shape of a single row
+        @param dtype: numpy data type of the rows
+        @param bool mirrored: Keep a second copy of the rows to always return views
+        """
+        if capacity < 1:
+            raise ValueError('RingBuffer capacity must be >= 1.')
+        self._capacity = int(capacity)
+        self._mirrored = bool(mirrored)
+        storage_rows = 2 * self._capacity if self._mirrored else self._capacity
+        self._data = np.zeros((storage_rows, *row_shape), dtype=dtype)
+        self._write_index = 0
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+    @property
+    def row_shape(self):
+        return self._data.shape[1:]
+
+    @property
+    def dtype(self):
+        return self._data.dtype
+
+    @property
+    def is_full(self):
+        return self._size == self.capacity
+
+    def append(self, row):
+        """ Write a single row, overwriting the oldest row if the buffer is full """
+        self._data[self._write_index] = row
+        if self._mirrored:
+            self._data[self._write_index + self._capacity] = row
+        self._write_index = (self._write_index + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+
+    def extend(self, rows):
+        """ Write several rows at once (first axis of rows), overwriting the oldest rows if needed """
+        rows = np.asarray(rows)
+        if rows.shape[0] >= self.capacity:
+            self._data[:self._capacity] = rows[-self.capacity:]
+            if self._mirrored:
+                self._data[self._capacity:] = rows[-self.capacity:]
+            self._write_index = 0
+            self._size = self.capacity
+            return
+        first_length = min(rows.shape[0], self.capacity - self._write_index)
+        self._data[self._write_index:self._write_index + first_length] = rows[:first_length]
+        self._data[:rows.shape[0] - first_length] = rows[first_length:]
+        if self._mirrored:
+            upper_index = self._write_index + self._capacity
+            self._data[upper_index:upper_index + first_length] = rows[:first_length]
+            self._data[self._capacity:self._capacity + rows.shape[0] - first_length] = \
+                rows[first_length:]
+        self._write_index = (self._write_index + rows.shape[0]) % self.capacity
+        self._size = min(self._size + rows.shape[0], self.capacity)
+
+    def get(self, age=0):
+        """
+        Return a single stored row.
+
+        @param int age: 0 for the newest row, 1 for the one before and so on
+
+        @return numpy.ndarray: view of the row
+        """
+        if not 0 <= age < self._size:
+            raise IndexError('RingBuffer row age {0} out of range for {1:d} stored rows.'
+                             ''.format(age, self._size))
+        return self._data[(self._write_index - 1 - age) % self.capacity]
+
+    def latest(self, number_of_rows=None, newest_first=False):
+        """
+        Return the most recent rows in logical order.
+
+        @param int number_of_rows: number of rows to return (clipped to the number of stored rows).
+                                   None returns all stored rows.
+        @param bool newest_first: Return the newest row first instead of chronological order
+
+        @return numpy.ndarray: the rows (view if possible)
+        """
+        if number_of_rows is None or number_of_rows > self._size:
+            number_of_rows = self._size
+        number_of_rows = max(0, int(number_of_rows))
+        if self._mirrored:
+            stop = self._write_index + self._capacity
+            rows = self._data[stop - number_of_rows:stop]
+            return rows[::-1] if newest_first else rows
+        start = self._write_index - number_of_rows
+        if start >= 0:
+            rows = self._data[start:self._write_index]
+        else:
+            rows = np.concatenate((self._data[start:], self._data[:self._write_index]))
+        return rows[::-1] if newest_first else rows
+
+    def fill_latest(self, number_of_rows, value):
+        """
+        Overwrite the most recent rows with a value.
+
+        @param int number_of_rows: number of rows to overwrite (clipped to the number of stored rows)
+        @param value: value or row to write
+        """
+        number_of_rows = min(int(number_of_rows), self._size)
+        if number_of_rows <= 0:
+            return
+        start = self._write_index - number_of_rows
+        if start >= 0:
+            self._data[start:self._write_index] = value
+        else:
+            self._data[start % self._capacity:self._capacity] = value
+            self._data[:self._write_index] = value
+        if self._mirrored:
+            start += self._capacity
+            self._data[start:self._write_index + self._capacity] = value
+            if start < self._capacity:
+                self._data[start + self._capacity:] = value
+        return
+
+    def clear(self):
+        """ Remove all rows """
+        self._write_index = 0
+        self._size = 0
+
+    def resize(self, capacity):
+        """
+        Change the capacity of the buffer. Keeps the most recent rows that fit.
+
+        @param int capacity: New maximum number of rows
+        """
+        if capacity < 1:
+            raise ValueError('RingBuffer capacity must be >= 1.')
+        rows = self.latest(min(self._size, capacity))
+        self._capacity = int(capacity)
+        storage_rows = 2 * self._capacity if self._mirrored else self._capacity
+        data = np.zeros((storage_rows, *self.row_shape), dtype=self.dtype)
+        data[:rows.shape[0]] = rows
+        if self._mirrored:
+            data[self._capacity:self._capacity + rows.shape[0]] = rows
+        self._data = data
+        self._size = rows.shape[0]
+        self._write_index = self._size % self.capacity
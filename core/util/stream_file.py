@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains an append-only binary file for streamed multi-channel data, written by a
+background thread, and a memory mapped reader for it.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import os
+import json
+import time
+import queue
+import threading
+import numpy as np
+
+# Record of the index file written for every block of samples
+INDEX_DTYPE = np.dtype([('start_sample', '<i8'), ('number_of_samples', '<i8'), ('time', '<f8')])
+
+
+def stream_file_paths(path):
+    """
+    File names of a stream file.
+
+    @param str path: path of the stream file without extension
+
+    @return (str, str, str): paths of the raw data file (.raw), the block index file (.idx) and
+                             the JSON metadata file (.json)
+    """
+    return path + '.raw', path + '.idx', path + '.json'
+
+
+class StreamFileWriter:
+    """
+    Writes blocks of multi-channel samples to an append-only binary file in a background thread.
+
+    The samples are stored as raw little endian values in sample major order, so the raw data file
+    (.raw) is a (samples x channels) array that can be memory mapped (see StreamFileReader). For
+    every block, the index file (.idx) receives a record with the index of its first sample, its
+    number of samples and the time it was passed to write. The metadata file (.json) holds the
+    channel names, data type and optional attributes.
+
+    Blocks are passed to the writer thread through a queue holding at most max_queued_blocks
+    blocks. If the queue is full, write blocks the caller until the writer thread has caught up
+    (backpressure) or the timeout has expired. Blocks passed with a release callback are not
+    copied, so the caller can recycle its buffers once they have been written.
+    """
+
+    def __init__(self, path, channels, dtype=np.float64, max_queued_blocks=64, attributes=None):
+        """
+        @param str path: path of the stream file without extension
+        @param list channels: names of the channels
+        @param dtype: numpy data type the samples are stored in
+        @param int max_queued_blocks: maximum number of blocks waiting to be written
+        @param dict attributes: optional metadata to store in the metadata file
+        """
+        self.path = path
+        self.channels = [str(ch) for ch in channels]
+        self.dtype = np.dtype(dtype).newbyteorder('<')
+        self.attributes = dict() if attributes is None else dict(attributes)
+        self.error = None
+        self._number_of_samples = 0
+        self._samples_written = 0
+        # Reused array to transpose blocks into sample major order
+        self._scratch = np.empty(0, dtype=self.dtype)
+        self._queue = queue.Queue(maxsize=max(1, int(max_queued_blocks)))
+
+        self.raw_path, self.index_path, self.metadata_path = stream_file_paths(path)
+        self._write_metadata()
+        self._raw_file = open(self.raw_path, 'wb')
+        self._index_file = open(self.index_path, 'wb')
+        self._thread = threading.Thread(target=self._write_loop,
+                                        name='StreamFileWriter',
+                                        daemon=True)
+        self._thread.start()
+
+    @property
+    def number_of_samples(self):
+        """ Number of samples per channel passed to write """
+        return self._number_of_samples
+
+    @property
+    def samples_written(self):
+        """ Number of samples per channel written to disk so far """
+        return self._samples_written
+
+    def write(self, data, timeout=None, release=None):
+        """
+        Queue a block of samples for writing.
+
+        @param numpy.ndarray data: samples of each channel (channels x samples)
+        @param float timeout: maximum time in seconds to wait for space in the queue (None waits
+                              forever)
+        @param callable release: optional, called without arguments by the writer thread after
+                                 data has been written. data is not copied in this case and must
+                                 not be changed until then. Without release, data is copied.
+
+        @return bool: True if the block has been queued (release will be called), False if the
+                      writer failed or timed out (release will not be called)
+        """
+        if self.error is not None or not self._thread.is_alive():
+            return False
+        data = np.asarray(data)
+        if data.shape[0] != len(self.channels):
+            raise ValueError('StreamFileWriter expects data of {0:d} channels but {1:d} were given.'
+                             ''.format(len(self.channels), data.shape[0]))
+        if release is None:
+            data = data.copy()
+        try:
+            self._queue.put((self._number_of_samples, data, time.time(), release),
+                            timeout=timeout)
+        except queue.Full:
+            return False
+        self._number_of_samples += data.shape[1]
+        return True
+
+    def close(self, attributes=None):
+        """
+        Write all queued blocks, stop the writer thread and close the files.
+
+        @param dict attributes: optional metadata to add to the metadata file
+
+        @return bool: True if all blocks have been written without error
+        """
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        self._raw_file.close()
+        self._index_file.close()
+        if attributes:
+            self.attributes.update(attributes)
+        self._write_metadata()
+        return self.error is None
+
+    def _write_loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            start_sample, data, timestamp, release = item
+            # Discard the remaining blocks after an error
+            if self.error is None:
+                try:
+                    self._write_block(start_sample, data, timestamp)
+                except (OSError, ValueError) as err:
+                    self.error = err
+            if release is not None:
+                release()
+
+    def _write_block(self, start_sample, data, timestamp):
+        number_of_samples = data.shape[1]
+        if self._scratch.size < data.size:
+            self._scratch = np.empty(data.size, dtype=self.dtype)
+        block = self._scratch[:data.size].reshape((number_of_samples, data.shape[0]))
+        np.copyto(block, data.T)
+        record = np.array((start_sample, number_of_samples, timestamp), dtype=INDEX_DTYPE)
+        self._raw_file.write(memoryview(block).cast('B'))
+        self._index_file.write(record.tobytes())
+        self._raw_file.flush()
+        self._index_file.flush()
+        self._samples_written = start_sample + number_of_samples
+
+    def _write_metadata(self):
+        metadata = {'channels': self.channels,
+                    'dtype': self.dtype.str,
+                    'number_of_samples': self._samples_written,
+                    'attributes': self.attributes}
+        with open(self.metadata_path, 'w') as file:
+            json.dump(metadata, file, indent=2, default=str)
+
+
+class StreamFileReader:
+    """
+    Read access to a stream file written by StreamFileWriter. The samples are memory mapped, so
+    they are only read from disk when accessed. The file may still be written while it is read;
+    the reader covers the samples on disk when it was opened.
+    """
+
+    def __init__(self, path):
+        """
+        @param str path: path of the stream file without extension
+        """
+        self.path = path
+        self.raw_path, self.index_path, self.metadata_path = stream_file_paths(path)
+        with open(self.metadata_path, 'r') as file:
+            metadata = json.load(file)
+        self.channels = metadata['channels']
+        self.dtype = np.dtype(metadata['dtype'])
+        self.attributes = metadata['attributes']
+        self.index = np.fromfile(self.index_path, dtype=INDEX_DTYPE)
+        row_bytes = self.dtype.itemsize * len(self.channels)
+        number_of_samples = os.path.getsize(self.raw_path) // row_bytes
+        if number_of_samples > 0:
+            self.data = np.memmap(self.raw_path, dtype=self.dtype, mode='r',
+                                  shape=(number_of_samples, len(self.channels)))
+        else:
+            self.data = np.empty((0, len(self.channels)), dtype=self.dtype)
+
+    def __len__(self):
+        return self.data.shape[0]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def channel(self, name):
+        """ (Strided) view of all samples of a single channel """
+        return self.data[:, self.channels.index(name)]
+
+    def downsampled(self, max_samples):
+        """
+        Every n-th sample of all channels, so that at most max_samples samples are returned.
+
+        @param int max_samples: maximum number of samples to return
+
+        @return (numpy.ndarray, int): samples (samples x channels) and the step n between them
+        """
+        step = max(1, -(-len(self) // max(1, int(max_samples))))
+        return np.array(self.data[::step]), step
+
+    def close(self):
+        """ Release the memory map of the raw data file. Views on data returned before keep it
+        open until they are released as well.
+        """
+        self.data = np.empty((0, len(self.channels)), dtype=self.dtype)
@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains a memory mapped scan image with copy-on-write snapshots of its lines.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import weakref
+import tempfile
+import threading
+import numpy as np
+
+
+def temporary_memmap(shape, dtype=np.float64, directory=None):
+    """
+    Zero initialized array memory mapped to an anonymous temporary file. The file is removed when
+    the array is garbage collected.
+
+    @param tuple shape: shape of the array
+    @param dtype: numpy data type of the array
+    @param str directory: directory of the temporary file (None: default temporary directory)
+
+    @return numpy.memmap: the array
+    """
+    if int(np.prod(shape)) == 0:
+        return np.zeros(shape, dtype=dtype)
+    with tempfile.TemporaryFile(dir=directory) as file:
+        # the memory map keeps its own handle of the file
+        return np.memmap(file, dtype=dtype, mode='w+', shape=tuple(shape))
+
+
+class _ScanImageBase:
+    """
+    Read access to a scan image as (lines x pixels x (3 + channels)) array like the former dense
+    confocal images: the x, y and z position of each pixel followed by its counts of each channel.
+
+    The positions are not stored per pixel. The position of a pixel is the sum of the position of
+    its line (line_positions, lines x 3) and of its pixel in the line (pixel_positions,
+    pixels x 3). Indexing returns new arrays for positions and, if possible, views for counts.
+    """
+
+    line_positions = None
+    pixel_positions = None
+    number_of_channels = 0
+
+    @property
+    def shape(self):
+        return (self.line_positions.shape[0],
+                self.pixel_positions.shape[0],
+                3 + self.number_of_channels)
+
+    @property
+    def ndim(self):
+        return 3
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __array__(self, dtype=None, copy=None):
+        return self[:, :, :] if dtype is None else self[:, :, :].astype(dtype)
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key,)
+        if len(key) > 3:
+            raise IndexError('Too many indices for scan image.')
+        lines, pixels, components = key + (slice(None),) * (3 - len(key))
+        indices = np.arange(self.shape[2])[components]
+        if np.ndim(indices) == 0:
+            return self._component(int(indices), lines, pixels)
+        return np.stack([self._component(int(i), lines, pixels) for i in indices], axis=-1)
+
+    def channel(self, index):
+        """ Counts of a single channel (lines x pixels) """
+        raise NotImplementedError
+
+    def _component(self, index, lines, pixels):
+        if index < 3:
+            return np.add.outer(self.line_positions[lines, index],
+                                self.pixel_positions[pixels, index])
+        return self.channel(index - 3)[lines, pixels]
+
+
+class TiledImage(_ScanImageBase):
+    """
+    Scan image with the counts of all channels in a memory mapped temporary file
+    (channels x lines x pixels, so each channel image is a contiguous view).
+
+    snapshot returns an immutable TiledImageSnapshot of the current image without copying it. The
+    counts are divided into tiles of tile_lines lines. A tile is only copied (to a memory mapped
+    file again) when it is written for the first time after a snapshot, and the copy is shared by
+    all snapshots taken since. Snapshots of an image that is not written anymore never copy.
+
+    Snapshots may be read in another thread than the one writing the image.
+    """
+
+    def __init__(self, line_positions, pixel_positions, number_of_channels, tile_lines=32,
+                 directory=None, dtype=np.float64):
+        """
+        @param numpy.ndarray line_positions: x, y and z offset of each line (lines x 3)
+        @param numpy.ndarray pixel_positions: x, y and z offset of each pixel in a line (pixels x 3)
+        @param int number_of_channels: number of count channels
+        @param int tile_lines: number of lines per copy-on-write tile
+        @param str directory: directory of the memory mapped files (None: temporary directory)
+        @param dtype: numpy data type of the counts
+        """
+        self.line_positions = np.array(line_positions, dtype=np.float64).reshape((-1, 3))
+        self.pixel_positions = np.array(pixel_positions, dtype=np.float64).reshape((-1, 3))
+        self.number_of_channels = int(number_of_channels)
+        self.tile_lines = max(1, int(tile_lines))
+        self.directory = directory
+        number_of_lines, number_of_pixels = self.shape[:2]
+        self._counts = temporary_memmap((self.number_of_channels, number_of_lines, number_of_pixels),
+                                        dtype=dtype,
+                                        directory=directory)
+        number_of_tiles = -(-number_of_lines // self.tile_lines)
+        # tiles possibly still referenced by snapshots and the live snapshots of this image
+        self._shared_tiles = np.zeros(number_of_tiles, dtype=bool)
+        self._snapshots = weakref.WeakSet()
+        # serializes writing the image with reading snapshots sharing its tiles
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_array(cls, image, **kwargs):
+        """
+        Scan image with the positions and counts of a (lines x pixels x (3 + channels)) array
+        or another scan image.
+
+        @param image: array or scan image to copy
+        @param kwargs: further arguments of TiledImage (tile_lines, directory, dtype)
+
+        @return TiledImage: the new image
+        """
+        number_of_lines, number_of_pixels, number_of_components = image.shape
+        tiled_image = cls(np.zeros((number_of_lines, 3)),
+                          np.zeros((number_of_pixels, 3)),
+                          number_of_components - 3,
+                          **kwargs)
+        tiled_image.load(image)
+        return tiled_image
+
+    @property
+    def number_of_tiles(self):
+        return self._shared_tiles.size
+
+    def channel(self, index):
+        """ Counts of a single channel (lines x pixels), read only view """
+        counts = self._counts[index]
+        counts.flags.writeable = False
+        return counts
+
+    def tile(self, index):
+        """ Counts of all channels of a tile (channels x tile lines x pixels), read only view """
+        tile = self._counts[:, index * self.tile_lines:(index + 1) * self.tile_lines]
+        tile.flags.writeable = False
+        return tile
+
+    def write_lines(self, first_line, counts):
+        """
+        Write the counts of consecutive lines.
+
+        @param int first_line: index of the first line
+        @param numpy.ndarray counts: counts of each line, pixel and channel (lines x pixels x
+                                     channels, as returned by a scanner)
+        """
+        self.write_block(first_line, 0, counts)
+
+    def write_block(self, first_line, first_pixel, counts):
+        """
+        Write the counts of a rectangular block of consecutive lines and pixels.
+
+        @param int first_line: index of the first line
+        @param int first_pixel: index of the first pixel in each line
+        @param numpy.ndarray counts: counts of each line, pixel and channel (lines x pixels x
+                                     channels)
+        """
+        counts = np.asarray(counts)
+        last_line = first_line + counts.shape[0]
+        last_pixel = first_pixel + counts.shape[1]
+        with self.lock:
+            self._detach_tiles(first_line // self.tile_lines, -(-last_line // self.tile_lines))
+            self._counts[:, first_line:last_line, first_pixel:last_pixel] = counts.transpose(2, 0, 1)
+
+    def load(self, image):
+        """
+        Copy the positions and counts of another scan image of the same shape.
+
+        @param image: TiledImage, TiledImageSnapshot or (lines x pixels x (3 + channels)) array
+        """
+        if tuple(image.shape) != self.shape:
+            raise ValueError('Scan image of shape {0} can not be loaded into shape {1}.'
+                             ''.format(tuple(image.shape), self.shape))
+        if isinstance(image, _ScanImageBase):
+            line_positions = image.line_positions
+            pixel_positions = image.pixel_positions
+            counts = [image.channel(index) for index in range(self.number_of_channels)]
+        else:
+            image = np.asarray(image)
+            line_positions = image[:, 0, :3]
+            pixel_positions = image[0, :, :3] - image[0, 0, :3]
+            counts = image[:, :, 3:].transpose(2, 0, 1)
+        with self.lock:
+            self._detach_tiles(0, self.number_of_tiles)
+            self.line_positions[:] = line_positions
+            self.pixel_positions[:] = pixel_positions
+            for index in range(self.number_of_channels):
+                self._counts[index] = counts[index]
+
+    def snapshot(self):
+        """ Immutable copy-on-write copy of the image
+
+        @return TiledImageSnapshot: the snapshot
+        """
+        with self.lock:
+            snapshot = TiledImageSnapshot(self)
+            self._snapshots.add(snapshot)
+            self._shared_tiles[:] = True
+        return snapshot
+
+    def _detach_tiles(self, first_tile, last_tile):
+        """ Give the snapshots still referencing tiles about to be written their own copy. Tiles
+        only shared with snapshots released in the meantime are not copied.
+        """
+        for index in range(first_tile, min(last_tile, self.number_of_tiles)):
+            if not self._shared_tiles[index]:
+                continue
+            # released snapshots are removed from the WeakSet
+            snapshots = [snapshot for snapshot in self._snapshots if snapshot._shares_tile(index)]
+            if snapshots:
+                tile = self._counts[:, index * self.tile_lines:(index + 1) * self.tile_lines]
+                copy = temporary_memmap(tile.shape, dtype=tile.dtype, directory=self.directory)
+                copy[:] = tile
+                copy.flags.writeable = False
+                for snapshot in snapshots:
+                    snapshot._detach_tile(index, copy)
+            self._shared_tiles[index] = False
+
+
+class TiledImageSnapshot(_ScanImageBase):
+    """
+    Immutable state of a TiledImage at the time of TiledImage.snapshot. Tiles that have not been
+    written since are read from the image itself.
+    """
+
+    def __init__(self, image):
+        """
+        @param TiledImage image: the image to take the snapshot of
+        """
+        self.line_positions = image.line_positions.copy()
+        self.pixel_positions = image.pixel_positions.copy()
+        self.number_of_channels = image.number_of_channels
+        self._image = image
+        # own copies of the tiles written in the image after the snapshot, None while shared
+        self._tiles = [None] * image.number_of_tiles
+
+    @property
+    def tiles_copied(self):
+        """ Number of tiles copied since the snapshot has been taken """
+        return sum(tile is not None for tile in self._tiles)
+
+    def channel(self, index):
+        """ Counts of a single channel (lines x pixels), new array """
+        with self._image.lock:
+            return np.concatenate([self._tile(i)[index] for i in range(len(self._tiles))], axis=0)
+
+    def tile(self, index):
+        """ Counts of all channels of a tile (channels x tile lines x pixels), read only """
+        with self._image.lock:
+            tile = self._tiles[index]
+            return self._image.tile(index).copy() if tile is None else tile
+
+    def _tile(self, index):
+        tile = self._tiles[index]
+        return self._image.tile(index) if tile is None else tile
+
+    def _shares_tile(self, index):
+        return self._tiles[index] is None
+
+    def _detach_tile(self, index, copy):
+        if self._tiles[index] is None:
+            self._tiles[index] = copy
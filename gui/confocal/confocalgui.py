@@ -879,6 +879,7 @@ class ConfocalGui(GUIBase):
         self._scanning_logic.set_clock_frequency(self._sd.clock_frequency_InputWidget.value())
         self._scanning_logic.return_slowness = self._sd.return_slowness_InputWidget.value()
         self._scanning_logic.permanent_scan = self._sd.loop_scan_CheckBox.isChecked()
+        self._scanning_logic.adaptive_scan = self._sd.adaptive_scan_CheckBox.isChecked()
         self._scanning_logic.depth_scan_dir_is_xz = self._sd.depth_dir_x_radioButton.isChecked()
         self.fixed_aspect_ratio_xy = self._sd.fixed_aspect_xy_checkBox.isChecked()
         self.fixed_aspect_ratio_depth = self._sd.fixed_aspect_depth_checkBox.isChecked()
@@ -897,6 +898,7 @@ class ConfocalGui(GUIBase):
         self._sd.clock_frequency_InputWidget.setValue(int(self._scanning_logic._clock_frequency))
         self._sd.return_slowness_InputWidget.setValue(int(self._scanning_logic.return_slowness))
         self._sd.loop_scan_CheckBox.setChecked(self._scanning_logic.permanent_scan)
+        self._sd.adaptive_scan_CheckBox.setChecked(self._scanning_logic.adaptive_scan)
         if self._scanning_logic.depth_scan_dir_is_xz:
             self._sd.depth_dir_x_radioButton.setChecked(True)
         else:
@@ -923,6 +925,7 @@ class ConfocalGui(GUIBase):
         self._optimizer_logic.return_slowness = self._osd.return_slow_SpinBox.value()
         self._optimizer_logic.hw_settle_time = self._osd.hw_settle_time_SpinBox.value() / 1000
         self._optimizer_logic.do_surface_subtraction = self._osd.do_surface_subtraction_CheckBox.isChecked()
+        self._optimizer_logic.fast_refocus = self._osd.fast_refocus_CheckBox.isChecked()
         index = self._osd.opt_channel_ComboBox.currentIndex()
         self._optimizer_logic.opt_channel = int(self._osd.opt_channel_ComboBox.itemData(index, QtCore.Qt.UserRole))
 
@@ -945,6 +948,7 @@ class ConfocalGui(GUIBase):
         self._osd.return_slow_SpinBox.setValue(self._optimizer_logic.return_slowness)
         self._osd.hw_settle_time_SpinBox.setValue(self._optimizer_logic.hw_settle_time * 1000)
         self._osd.do_surface_subtraction_CheckBox.setChecked(self._optimizer_logic.do_surface_subtraction)
+        self._osd.fast_refocus_CheckBox.setChecked(self._optimizer_logic.fast_refocus)
 
         old_ch = self._optimizer_logic.opt_channel
         index = self._osd.opt_channel_ComboBox.findData(old_ch)
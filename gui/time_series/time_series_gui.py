@@ -88,6 +88,7 @@ class TimeSeriesGui(GUIBase):
     sigStartRecording = QtCore.Signal()
     sigStopRecording = QtCore.Signal()
     sigSettingsChanged = QtCore.Signal(dict)
+    sigDisplayWidthChanged = QtCore.Signal(int)
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -236,6 +237,8 @@ class TimeSeriesGui(GUIBase):
             self._time_series_logic.stop_recording, QtCore.Qt.QueuedConnection)
         self.sigSettingsChanged.connect(
             self._time_series_logic.configure_settings, QtCore.Qt.QueuedConnection)
+        self.sigDisplayWidthChanged.connect(
+            self._time_series_logic.set_display_width, QtCore.Qt.QueuedConnection)
 
         ##################
         # Handling signals from the logic
@@ -281,6 +284,7 @@ class TimeSeriesGui(GUIBase):
         self.sigStartRecording.disconnect()
         self.sigStopRecording.disconnect()
         self.sigSettingsChanged.disconnect()
+        self.sigDisplayWidthChanged.disconnect()
         self._time_series_logic.sigDataChanged.disconnect()
         self._time_series_logic.sigSettingsChanged.disconnect()
         self._time_series_logic.sigStatusChanged.disconnect()
@@ -350,6 +354,8 @@ class TimeSeriesGui(GUIBase):
         """
         self._vb.setGeometry(self._pw.plotItem.vb.sceneBoundingRect())
         self._vb.linkedViewChanged(self._pw.plotItem.vb, self._vb.XAxis)
+        # The logic decimates the traces to the plot width in pixels
+        self.sigDisplayWidthChanged.emit(int(self._pw.plotItem.vb.sceneBoundingRect().width()))
         return
 
     @QtCore.Slot()
@@ -453,8 +459,8 @@ class TimeSeriesGui(GUIBase):
         """ The function that grabs the data and sends it to the plot.
         """
         if data_time is None and data is None and smooth_data is None and smooth_time is None:
-            data_time, data = self._time_series_logic.trace_data
-            smooth_time, smooth_data = self._time_series_logic.averaged_trace_data
+            data_time, data = self._time_series_logic.display_trace_data
+            smooth_time, smooth_data = self._time_series_logic.display_averaged_trace_data
         elif (data_time is None) ^ (data is None) or (smooth_time is None) ^ (smooth_data is None):
             self.log.error('Must provide a full data set of x and y values. update_data failed.')
             return
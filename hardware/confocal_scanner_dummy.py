@@ -36,6 +36,7 @@ class ConfocalScannerDummy(Base, ConfocalScannerInterface):
     confocal_scanner_dummy:
         module.Class: 'confocal_scanner_dummy.ConfocalScannerDummy'
         clock_frequency: 100 # in Hz
+        realistic_timing: False # optional, True takes as long as real hardware for scans and moves
         fitlogic: 'fitlogic' # name of the fitlogic module, see default config
 
     """
@@ -45,6 +46,14 @@ class ConfocalScannerDummy(Base, ConfocalScannerInterface):
 
     # config
     _clock_frequency = ConfigOption('clock_frequency', 100, missing='warn')
+    # Take as long as real hardware for scans, clock and scanner setup and moves. Without it, the
+    # dummy returns scans as fast as their counts are computed.
+    _realistic_timing = ConfigOption('realistic_timing', False, missing='nothing')
+
+    # Emitters further away from a position than this number of (the largest) sigma are left out
+    _cutoff_sigmas = 6
+    # Number of positions of a line evaluated at once
+    _chunk_size = 1024
 
     def __init__(self, config, **kwargs):
         super().__init__(config=config, **kwargs)
@@ -120,6 +129,104 @@ class ConfocalScannerDummy(Base, ConfocalScannerInterface):
         # offset
         self._points_z[:, 3] = 0
 
+        self._build_emitter_index()
+
+    def _build_emitter_index(self):
+        """ Sort the emitters into a grid of square xy cells with the cutoff radius as edge length,
+        so the emitters near a position are found in its cell and the 8 neighbouring cells.
+        """
+        sigma_x = self._points[:, 3]
+        sigma_y = self._points[:, 4]
+        theta = self._points[:, 5]
+        # coefficients of the exponent of twoD_gaussian_function for all emitters
+        self._emitter_a = (np.cos(theta)**2) / (2 * sigma_x**2) + (np.sin(theta)**2) / (2 * sigma_y**2)
+        self._emitter_b = -(np.sin(2 * theta)) / (4 * sigma_x**2) + (np.sin(2 * theta)) / (4 * sigma_y**2)
+        self._emitter_c = (np.sin(theta)**2) / (2 * sigma_x**2) + (np.cos(theta)**2) / (2 * sigma_y**2)
+
+        self._cutoff_radius = self._cutoff_sigmas * np.max(np.abs(self._points[:, 3:5]))
+        self._cutoff_radius_z = self._cutoff_sigmas * np.max(np.abs(self._points_z[:, 2]))
+        self._grid_origin = np.min(self._points[:, 1:3], axis=0)
+        cells = np.floor((self._points[:, 1:3] - self._grid_origin) / self._cutoff_radius).astype(int)
+        self._grid_shape = np.max(cells, axis=0) + 1
+        cell_ids = cells[:, 0] * self._grid_shape[1] + cells[:, 1]
+        # emitter indices sorted by cell and the start of each cell in them
+        self._emitter_order = np.argsort(cell_ids, kind='stable')
+        self._cell_start = np.searchsorted(cell_ids[self._emitter_order],
+                                           np.arange(np.prod(self._grid_shape) + 1))
+
+    def _emitter_pairs(self, x, y, z):
+        """ Pairs of positions and the emitters in the cell of the position and its neighbouring
+        cells, i.e. all emitters within the cutoff radius (and some more further away).
+
+        @param numpy.ndarray x: x positions
+        @param numpy.ndarray y: y positions
+        @param numpy.ndarray z: z positions
+
+        @return (numpy.ndarray, numpy.ndarray): position indices and emitter indices of the pairs
+        """
+        cells = np.floor((np.stack((x, y), axis=1) - self._grid_origin) / self._cutoff_radius)
+        cells, position_cell = np.unique(cells.astype(int), axis=0, return_inverse=True)
+        position_cell = position_cell.reshape(-1)
+        # index ranges of the emitters in the 3x3 cells around each cell of the positions
+        neighbours = np.array([(i, j) for i in (-1, 0, 1) for j in (-1, 0, 1)])
+        cells = cells[:, None, :] + neighbours[None, :, :]
+        in_grid = np.all((cells >= 0) & (cells < self._grid_shape), axis=2)
+        cell_ids = np.where(in_grid, cells[..., 0] * self._grid_shape[1] + cells[..., 1], 0)
+        starts = self._cell_start[cell_ids].reshape(-1)
+        lengths = np.where(in_grid, self._cell_start[cell_ids + 1] - self._cell_start[cell_ids],
+                           0).reshape(-1)
+        cell_emitters = self._emitter_order[self._concatenated_ranges(starts, lengths)]
+        emitters_per_cell = np.sum(lengths.reshape((-1, 9)), axis=1)
+        first_emitter = np.cumsum(emitters_per_cell) - emitters_per_cell
+
+        # all emitters of the cell of each position
+        pair_lengths = emitters_per_cell[position_cell]
+        pair_positions = np.repeat(np.arange(x.size), pair_lengths)
+        pair_emitters = cell_emitters[
+            self._concatenated_ranges(first_emitter[position_cell], pair_lengths)]
+        # the z profile of the emitters further away in z vanishes
+        near_z = np.abs(z[pair_positions] - self._points_z[pair_emitters, 1]) < self._cutoff_radius_z
+        return pair_positions[near_z], pair_emitters[near_z]
+
+    @staticmethod
+    def _concatenated_ranges(starts, lengths):
+        """ Concatenation of the index ranges start to start + length """
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        return offsets + np.arange(np.sum(lengths))
+
+    def _emitter_counts(self, x, y, z):
+        """ Sum of the fluorescence of all emitters at the positions, like twoD_gaussian_function
+        times gaussian_function summed over all emitters, but only for the pairs of positions and
+        emitters near them (see _emitter_pairs). The emitter offsets are 0, so leaving out emitters
+        far away changes the counts by less than exp(-cutoff_sigmas**2 / 2) of their amplitude.
+
+        @param numpy.ndarray x: x positions
+        @param numpy.ndarray y: y positions
+        @param numpy.ndarray z: z positions
+
+        @return numpy.ndarray: counts per second at the positions
+        """
+        counts = np.zeros(x.size)
+        for start in range(0, x.size, self._chunk_size):
+            chunk = slice(start, start + self._chunk_size)
+            positions, emitters = self._emitter_pairs(x[chunk], y[chunk], z[chunk])
+            if emitters.size == 0:
+                continue
+            points = self._points[emitters]
+            points_z = self._points_z[emitters]
+            dx = x[chunk][positions] - points[:, 1]
+            dy = y[chunk][positions] - points[:, 2]
+            exponent = (self._emitter_a[emitters] * dx**2
+                        + 2 * self._emitter_b[emitters] * dx * dy
+                        + self._emitter_c[emitters] * dy**2)
+            xy_profile = points[:, 6] + points[:, 0] * np.exp(-exponent)
+            z_profile = points_z[:, 3] + points_z[:, 0] * np.exp(
+                -(z[chunk][positions] - points_z[:, 1])**2 / (2 * points_z[:, 2]**2))
+            counts[chunk] = np.bincount(positions,
+                                        weights=xy_profile * z_profile,
+                                        minlength=counts[chunk].size)
+        return counts
+
     def on_deactivate(self):
         """ Deactivate properly the confocal scanner dummy.
         """
@@ -235,7 +342,8 @@ class ConfocalScannerDummy(Base, ConfocalScannerInterface):
             self._clock_frequency = float(clock_frequency)
 
         self.log.debug('ConfocalScannerDummy>set_up_scanner_clock')
-        time.sleep(0.2)
+        if self._realistic_timing:
+            time.sleep(0.2)
         return 0
 
 
@@ -256,7 +364,8 @@ class ConfocalScannerDummy(Base, ConfocalScannerInterface):
         """
 
         self.log.debug('ConfocalScannerDummy>set_up_scanner')
-        time.sleep(0.2)
+        if self._realistic_timing:
+            time.sleep(0.2)
         return 0
 
 
@@ -275,7 +384,8 @@ class ConfocalScannerDummy(Base, ConfocalScannerInterface):
             self.log.error('A Scanner is already running, close this one first.')
             return -1
 
-        time.sleep(0.01)
+        if self._realistic_timing:
+            time.sleep(0.01)
 
         self._current_position = [x, y, z, a][0:len(self.get_scanner_axes())]
         return 0
@@ -316,19 +426,19 @@ class ConfocalScannerDummy(Base, ConfocalScannerInterface):
         if np.shape(line_path)[1] != self._line_length:
             self._set_up_line(np.shape(line_path)[1])
 
+        start_time = time.perf_counter()
         count_data = np.random.uniform(0, 2e4, self._line_length)
-        z_data = line_path[2, :]
-
-        #TODO: Change the gaussian function here to the one from fitlogic and delete the local modules to calculate
-        #the gaussian functions
-        x_data = np.array(line_path[0, :])
-        y_data = np.array(line_path[1, :])
-        for i in range(self._num_points):
-            count_data += self.twoD_gaussian_function((x_data, y_data), *(self._points[i])
-                ) * self.gaussian_function(np.array(z_data), *(self._points_z[i]))
-
-        time.sleep(self._line_length * 1. / self._clock_frequency)
-        time.sleep(self._line_length * 1. / self._clock_frequency)
+        x_data = np.asarray(line_path[0, :], dtype=float)
+        y_data = np.asarray(line_path[1, :], dtype=float)
+        z_data = np.asarray(line_path[2, :], dtype=float)
+        count_data += self._emitter_counts(x_data, y_data, z_data)
+
+        # a real scanner takes the line duration at the clock frequency
+        if self._realistic_timing:
+            remaining_time = (self._line_length / self._clock_frequency
+                              - (time.perf_counter() - start_time))
+            if remaining_time > 0:
+                time.sleep(remaining_time)
 
         # update the scanner position instance variable
         self._current_position = list(line_path[:, -1])
@@ -339,6 +449,25 @@ class ConfocalScannerDummy(Base, ConfocalScannerInterface):
                 np.ones(count_data.shape) * line_path[1, 0] * 100
             ]).transpose()
 
+    def scan_lines(self, line_paths, number_of_pixels, pixel_clock=False):
+        """ Scans several lines back to back in a single acquisition.
+
+        @param float[l][k][n] line_paths: l consecutive paths of n positions on k axes. The first
+                                          number_of_pixels positions of each path are the pixels.
+        @param int number_of_pixels: number of pixels of each scan line
+        @param bool pixel_clock: whether we need to output a pixel clock for the scan line pixels
+
+        @return float[l][number_of_pixels][m]: the photon counts per second of the pixels
+        """
+        line_paths = np.asarray(line_paths)
+        number_of_lines, number_of_axes, path_length = line_paths.shape
+        # all paths in a row as one long line
+        path = line_paths.transpose(1, 0, 2).reshape((number_of_axes, -1))
+        counts = self.scan_line(path, pixel_clock=pixel_clock)
+        if np.ndim(counts) != 2 or np.shape(counts)[0] != path.shape[1]:
+            return counts
+        return counts.reshape((number_of_lines, path_length, -1))[:, :number_of_pixels]
+
     def close_scanner(self):
         """ Closes the scanner and cleans up afterwards.
 
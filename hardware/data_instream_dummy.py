@@ -507,7 +507,7 @@ class InStreamDummy(Base, DataInStreamInterface):
                                ''.format(self.number_of_channels, buffer.shape[0]))
                 return -1
             number_of_samples = buffer.shape[1] if number_of_samples is None else number_of_samples
-            buffer = buffer.flatten()
+            buffer = buffer.reshape(-1)
         elif buffer.ndim == 1:
             number_of_samples = (buffer.size // self.number_of_channels) if number_of_samples is None else number_of_samples
         else:
@@ -230,6 +230,21 @@ class FastCounterDummy(Base, FastCounterInterface):
         info_dict = {'elapsed_sweeps': None, 'elapsed_time': None}
         return self._count_data, info_dict
 
+    def get_data_trace_into(self, buffer):
+        """ Polls the current timetrace data from the fast counter and writes it into buffer.
+
+        @param numpy.ndarray buffer: int64 array with the shape of the timetrace
+
+        @return dict|None: info_dict (see get_data_trace) or None if the buffer does not match
+        """
+        if buffer.shape != self._count_data.shape or buffer.dtype != np.int64:
+            return None
+        # include an artificial waiting time
+        time.sleep(0.5)
+        np.copyto(buffer, self._count_data)
+        info_dict = {'elapsed_sweeps': None, 'elapsed_time': None}
+        return info_dict
+
     def get_frequency(self):
         freq = 950.
         time.sleep(0.5)
@@ -181,6 +181,8 @@ class FastComtec(Base, FastCounterInterface):
         #in the fastcomtec it can be on "stopped" or "halt"
         self.stopped_or_halt = "stopped"
         self.timetrace_tmp = []
+        # reusable buffer for reading the time trace from the device
+        self._data_buffer = None
 
     def on_activate(self):
         """ Initialisation performed during activation of the module.
@@ -342,7 +344,7 @@ class FastComtec(Base, FastCounterInterface):
             time.sleep(0.05)
 
         if self.gated:
-            self.timetrace_tmp = self.get_data_trace()
+            self.timetrace_tmp = self.get_data_trace()[0]
         return status
 
     def stop_measure(self):
@@ -395,6 +397,40 @@ class FastComtec(Base, FastCounterInterface):
 
           @return arrray: Time trace.
         """
+        time_trace = np.empty(self._get_data_trace_shape(), dtype='int64')
+        info_dict = self.get_data_trace_into(time_trace)
+        return time_trace, info_dict
+
+    def get_data_trace_into(self, buffer):
+        """
+        Polls the current timetrace data from the fast counter and writes it into buffer without
+        allocating new arrays. The data is read into an internal uint32 buffer that is reused as
+        long as the shape of the timetrace does not change.
+
+          @param numpy.ndarray buffer: int64 array with the shape of the time trace
+
+          @return dict|None: info_dict (see get_data_trace) or None if the buffer does not match
+        """
+        shape = self._get_data_trace_shape()
+        if buffer.shape != shape or buffer.dtype != np.int64:
+            return None
+        if self._data_buffer is None or self._data_buffer.shape != shape:
+            self._data_buffer = np.empty(shape, dtype=np.uint32)
+
+        p_type_ulong = ctypes.POINTER(ctypes.c_uint32)
+        ptr = self._data_buffer.ctypes.data_as(p_type_ulong)
+        self.dll.LVGetDat(ptr, 0)
+        np.copyto(buffer, self._data_buffer)
+
+        if self.gated and len(self.timetrace_tmp) > 0:
+            buffer += self.timetrace_tmp
+
+        info_dict = {'elapsed_sweeps': self.get_current_sweeps(),
+                     'elapsed_time': None} 
+        return info_dict
+
+    def _get_data_trace_shape(self):
+        """ Shape of the time trace according to the current settings of the device """
         setting = AcqSettings()
         self.dll.GetSettingData(ctypes.byref(setting), 0)
         N = setting.range
@@ -403,22 +439,11 @@ class FastComtec(Base, FastCounterInterface):
             bsetting=AcqSettings()
             self.dll.GetSettingData(ctypes.byref(bsetting), 0)
             H = bsetting.cycles
-            data = np.empty((H, int(N / H)), dtype=np.uint32)
+            shape = (H, int(N / H))
 
         else:
-            data = np.empty((N,), dtype=np.uint32)
-
-        p_type_ulong = ctypes.POINTER(ctypes.c_uint32)
-        ptr = data.ctypes.data_as(p_type_ulong)
-        self.dll.LVGetDat(ptr, 0)
-        time_trace = np.int64(data)
-
-        if self.gated and self.timetrace_tmp != []:
-            time_trace = time_trace + self.timetrace_tmp
-
-        info_dict = {'elapsed_sweeps': self.get_current_sweeps(),
-                     'elapsed_time': None} 
-        return time_trace, info_dict
+            shape = (N,)
+        return shape
 
 
     def get_data_testfile(self):
@@ -1405,6 +1405,29 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
         # return values is a rate of counts/s
         return all_data.transpose()
 
+    def scan_lines(self, line_paths, number_of_pixels, pixel_clock=False):
+        """ Scans several lines back to back in a single acquisition.
+
+        @param float[l][c][m] line_paths: l consecutive paths of m positions on c axes. The first
+                                          number_of_pixels positions of each path are the pixels.
+        @param int number_of_pixels: number of pixels of each scan line
+        @param bool pixel_clock: whether we need to output a pixel clock for the scan line pixels
+
+        @return float[l][number_of_pixels][n]: n-channel photon counts per second of the pixels
+                                               or None if a pixel clock is requested
+        """
+        # The pixel clock would also be output during the return paths
+        if pixel_clock and self._pixel_clock_channel is not None:
+            return None
+        line_paths = np.asarray(line_paths)
+        number_of_lines, number_of_axes, path_length = line_paths.shape
+        # all paths in a row as one long line with a single hardware timed acquisition
+        path = line_paths.transpose(1, 0, 2).reshape((number_of_axes, -1))
+        counts = self.scan_line(path, pixel_clock=False)
+        if np.ndim(counts) != 2 or np.shape(counts)[0] != path.shape[1]:
+            return counts
+        return counts.reshape((number_of_lines, path_length, -1))[:, :number_of_pixels]
+
     def close_scanner(self):
         """ Closes the scanner and cleans up afterwards.
 
@@ -218,6 +218,24 @@ class TimeTaggerFastCounter(Base, FastCounterInterface):
                      'elapsed_time': None}  # TODO : implement that according to hardware capabilities
         return np.array(self.pulsed.getData(), dtype='int64'), info_dict
 
+    def get_data_trace_into(self, buffer):
+        """ Polls the current timetrace data from the fast counter and writes it into buffer
+        instead of converting it into a newly allocated int64 array.
+
+        @param numpy.ndarray buffer: int64 array of shape (number_of_gates, number_of_bins)
+
+        @return dict|None: info_dict (see get_data_trace) or None if the buffer does not match
+        """
+        if buffer.dtype != np.int64:
+            return None
+        data = self.pulsed.getData()
+        if buffer.shape != data.shape:
+            return None
+        np.copyto(buffer, data)
+        info_dict = {'elapsed_sweeps': None,
+                     'elapsed_time': None}  # TODO : implement that according to hardware capabilities
+        return info_dict
+
 
     def get_status(self):
         """ Receives the current status of the Fast Counter and outputs it as
@@ -200,3 +200,24 @@ class ConfocalScannerInterface(metaclass=InterfaceMetaclass):
         """
         pass
 
+
+    def scan_lines(self, line_paths, number_of_pixels, pixel_clock=False):
+        """ Scans several lines back to back in a single acquisition and returns the counts of the
+        pixels of each line.
+
+        @param float[l][k][n] line_paths: l consecutive paths of n positions on k axes. The first
+                                          number_of_pixels positions of each path are the pixels
+                                          of a scan line, the remaining positions move the scanner
+                                          to the start of the next path (return path).
+        @param int number_of_pixels: number of pixels of each scan line
+        @param bool pixel_clock: whether we need to output a pixel clock for the scan line pixels
+
+        @return float[l][number_of_pixels][m]: the photon counts per second of the scan line pixels
+                                               (the counts of the return paths are discarded) or
+                                               None if the lines can not be scanned in one
+                                               acquisition.
+
+        This function is not abstract - Thus it is optional and if a hardware do not implement it,
+        the answer is None and each line and return path has to be scanned with scan_line.
+        """
+        return None
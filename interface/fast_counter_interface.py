@@ -175,3 +175,21 @@ class FastCounterInterface(metaclass=InterfaceMetaclass):
         If the hardware does not support these features, the values should be None
         """
         pass
+
+    def get_data_trace_into(self, buffer):
+        """ Polls the current timetrace data from the fast counter and writes it into a
+        preallocated numpy array instead of returning a new array (see get_data_trace).
+
+        All elements of buffer are overwritten. The caller is free to modify buffer between calls.
+
+        @param numpy.ndarray buffer: int64 array with the shape of the timetrace returned by
+                                     get_data_trace, i.e. buffer[timebin_index] for not gated and
+                                     buffer[gate_index, timebin_index] for gated counters.
+
+        @return dict|None: info_dict (see get_data_trace) or None if the timetrace could not be
+                           written into buffer (e.g. mismatching shape or dtype)
+
+        This function is not abstract - Thus it is optional and if a hardware do not implement it,
+        the answer is None and get_data_trace has to be used.
+        """
+        return None
@@ -21,17 +21,25 @@ top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi
 
 from qtpy import QtCore
 from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from copy import copy
+import os
+import sys
 import time
 import datetime
+import threading
 import numpy as np
-import matplotlib as mpl
-import matplotlib.pyplot as plt
+from collections import deque
+from scipy import ndimage
 
 from logic.generic_logic import GenericLogic
+from logic.confocal_save import draw_scan_image_figure, init_figure_worker, save_scan_image
 from core.util.mutex import Mutex
 from core.connector import Connector
+from core.configoption import ConfigOption
 from core.statusvariable import StatusVar
+from core.util.tiled_image import TiledImage
 
 
 class OldConfigFileError(Exception):
@@ -102,6 +110,11 @@ class ConfocalHistoryEntry(QtCore.QObject):
         self.tilt_slope_y = 0
         self.tilt_reference_x = 0
         self.tilt_reference_y = 0
+        self.xy_tile_resolution = None
+        self.depth_tile_resolution = None
+
+        # deserialized images are moved to the image store of the confocal logic
+        self._image_store_kwargs = confocal._image_store_kwargs()
 
     def restore(self, confocal):
         """ Write data back into confocal logic and pull all the necessary strings """
@@ -133,19 +146,23 @@ class ConfocalHistoryEntry(QtCore.QObject):
         confocal.initialize_image()
         try:
             if confocal.xy_image.shape == self.xy_image.shape:
-                confocal.xy_image = np.copy(self.xy_image)
+                confocal.xy_image.load(self.xy_image)
         except AttributeError:
-            self.xy_image = np.copy(confocal.xy_image)
+            self.xy_image = confocal.xy_image.snapshot()
 
         confocal._zscan = True
         confocal.initialize_image()
         try:
             if confocal.depth_image.shape == self.depth_image.shape:
-                confocal.depth_image = np.copy(self.depth_image)
+                confocal.depth_image.load(self.depth_image)
         except AttributeError:
-            self.depth_image = np.copy(confocal.depth_image)
+            self.depth_image = confocal.depth_image.snapshot()
         confocal._zscan = False
 
+        # initialize_image resets the tile resolutions of the adaptive scan
+        confocal.xy_tile_resolution = self._copy_tile_resolution(self.xy_tile_resolution)
+        confocal.depth_tile_resolution = self._copy_tile_resolution(self.depth_tile_resolution)
+
     def snapshot(self, confocal):
         """ Extract all necessary data from a confocal logic and keep it for later use """
         self.current_x = confocal._current_x
@@ -164,6 +181,8 @@ class ConfocalHistoryEntry(QtCore.QObject):
         self.xy_scan_continuable = confocal._xyscan_continuable
         self.depth_scan_continuable = confocal._zscan_continuable
         self.scan_counter = confocal._scan_counter
+        self.xy_tile_resolution = self._copy_tile_resolution(confocal.xy_tile_resolution)
+        self.depth_tile_resolution = self._copy_tile_resolution(confocal.depth_tile_resolution)
         self.tilt_correction = confocal._scanning_device.tiltcorrection
         self.tilt_slope_x = confocal._scanning_device.tilt_variable_ax
         self.tilt_slope_y = confocal._scanning_device.tilt_variable_ay
@@ -172,8 +191,9 @@ class ConfocalHistoryEntry(QtCore.QObject):
         self.point1 = np.copy(confocal.point1)
         self.point2 = np.copy(confocal.point2)
         self.point3 = np.copy(confocal.point3)
-        self.xy_image = np.copy(confocal.xy_image)
-        self.depth_image = np.copy(confocal.depth_image)
+        # the snapshots share the image tiles with the confocal logic until they are rescanned
+        self.xy_image = confocal.xy_image.snapshot()
+        self.depth_image = confocal.depth_image.snapshot()
 
     def serialize(self):
         """ Give out a dictionary that can be saved via the usual means """
@@ -197,8 +217,10 @@ class ConfocalHistoryEntry(QtCore.QObject):
         serialized['tilt_point3'] = list(self.point3)
         serialized['tilt_reference'] = [self.tilt_reference_x, self.tilt_reference_y]
         serialized['tilt_slope'] = [self.tilt_slope_x, self.tilt_slope_y]
-        serialized['xy_image'] = self.xy_image
-        serialized['depth_image'] = self.depth_image
+        serialized['xy_image'] = np.asarray(self.xy_image)
+        serialized['depth_image'] = np.asarray(self.depth_image)
+        serialized['xy_tile_resolution'] = self.xy_tile_resolution
+        serialized['depth_tile_resolution'] = self.depth_tile_resolution
         return serialized
 
     def deserialize(self, serialized):
@@ -238,14 +260,28 @@ class ConfocalHistoryEntry(QtCore.QObject):
             self.point3 = np.array(serialized['tilt_point3'])
         if 'xy_image' in serialized:
             if isinstance(serialized['xy_image'], np.ndarray):
-                self.xy_image = serialized['xy_image']
+                self.xy_image = TiledImage.from_array(serialized['xy_image'],
+                                                      **self._image_store_kwargs)
             else:
                 raise OldConfigFileError()
         if 'depth_image' in serialized:
             if isinstance(serialized['depth_image'], np.ndarray):
-                self.depth_image = serialized['depth_image'].copy()
+                self.depth_image = TiledImage.from_array(serialized['depth_image'],
+                                                         **self._image_store_kwargs)
             else:
                 raise OldConfigFileError()
+        if 'xy_tile_resolution' in serialized:
+            self.xy_tile_resolution = self._copy_tile_resolution(serialized['xy_tile_resolution'])
+        if 'depth_tile_resolution' in serialized:
+            self.depth_tile_resolution = self._copy_tile_resolution(
+                serialized['depth_tile_resolution'])
+
+    @staticmethod
+    def _copy_tile_resolution(tile_resolution):
+        """ Copy of the pixel steps of an adaptive scan, the tiles are refined in place """
+        if tile_resolution is None:
+            return None
+        return np.array(tile_resolution, dtype=int)
 
 
 class ConfocalLogic(GenericLogic):
@@ -257,10 +293,34 @@ class ConfocalLogic(GenericLogic):
     confocalscanner1 = Connector(interface='ConfocalScannerInterface')
     savelogic = Connector(interface='SaveLogic')
 
+    # config options
+    # Number of lines (with their return paths) scanned by a single call to the scanner, if the
+    # hardware supports it (see ConfocalScannerInterface.scan_lines). 0 scans as many lines as
+    # take about _max_call_duration at the clock frequency.
+    _scan_lines_per_call = ConfigOption('scan_lines_per_call', 1, missing='nothing')
+    # Directory of the memory mapped files holding the counts of the images and their history
+    # (None: temporary directory of the system) and number of lines per copy-on-write tile.
+    _image_store_path = ConfigOption('image_store_path', None, missing='nothing')
+    _image_tile_lines = ConfigOption('image_tile_lines', 32, missing='nothing')
+    # Format of saved images: 'binary' (counts as .npy file with JSON metadata, see
+    # logic.confocal_save) or 'text' (count matrix and per pixel rows as text files). Figures of
+    # binary images are rendered in a separate process if save_figures_in_process is True.
+    _save_format = ConfigOption('save_format', 'text', missing='nothing')
+    _save_figures_in_process = ConfigOption('save_figures_in_process', True, missing='nothing')
+
+    # Duration of a scanner call (s) with scan_lines_per_call 0, a stop waits for the lines queued
+    _max_call_duration = 1
+
     # status vars
     _clock_frequency = StatusVar('clock_frequency', 500)
     return_slowness = StatusVar(default=50)
     max_history_length = StatusVar(default=10)
+    # Adaptive scans (see adaptive_scan): side length of the tiles in pixels, each sampled by a
+    # single pixel in the coarse pass, and count threshold (0: automatic) and count difference
+    # to neighbouring tiles (0: not used) above which tiles are scanned at full resolution.
+    adaptive_coarse_factor = StatusVar(default=4)
+    adaptive_threshold = StatusVar(default=0)
+    adaptive_gradient_threshold = StatusVar(default=0)
 
     # signals
     signal_start_scanning = QtCore.Signal(str)
@@ -280,6 +340,8 @@ class ConfocalLogic(GenericLogic):
 
     _signal_save_xy = QtCore.Signal(object, object)
     _signal_save_depth = QtCore.Signal(object, object)
+    _sigScanLines = QtCore.Signal(dict)
+    _sigSaveScanImage = QtCore.Signal(dict)
 
     sigImageXYInitialized = QtCore.Signal()
     sigImageDepthInitialized = QtCore.Signal()
@@ -299,6 +361,28 @@ class ConfocalLogic(GenericLogic):
         self.depth_scan_dir_is_xz = True
         self.depth_img_is_xz = True
         self.permanent_scan = False
+        # Scan a coarse image first and only the bright tiles of it at full resolution
+        self.adaptive_scan = False
+        # Pixel step of each tile (adaptive_coarse_factor x adaptive_coarse_factor pixels) of an
+        # adaptively scanned image, 1 for tiles scanned at full resolution (None: full scan)
+        self.xy_tile_resolution = None
+        self.depth_tile_resolution = None
+
+        # Precomputed positions of all scan lines and return paths (lines x axes x positions)
+        self._scan_path = None
+        self._scan_path_pixels = 0
+        # next line to queue to the scan worker and number of queued requests
+        self._next_scan_line = 0
+        self._scan_requests_in_flight = 0
+        # remaining requests and pass ('coarse', 'fine' or None) of an adaptive scan and position
+        # of the scanner after the last of its requests
+        self._adaptive_requests = deque()
+        self._adaptive_pass = None
+        self._adaptive_position = None
+        self._scan_thread = None
+        self._scan_worker = None
+        self._save_thread = None
+        self._save_worker = None
 
     def on_activate(self):
         """ Initialisation performed during activation of the module.
@@ -347,6 +431,34 @@ class ConfocalLogic(GenericLogic):
         self._signal_save_xy.connect(self._save_xy_data, QtCore.Qt.QueuedConnection)
         self._signal_save_depth.connect(self._save_depth_data, QtCore.Qt.QueuedConnection)
 
+        # The lines are scanned in a separate thread (see _scan_line)
+        self._scan_requests_in_flight = 0
+        self._scan_thread = QtCore.QThread()
+        self._scan_worker = ConfocalScanWorker(self._scanning_device, self.log)
+        self._scan_worker.moveToThread(self._scan_thread)
+        self._sigScanLines.connect(self._scan_worker.scan_lines, QtCore.Qt.QueuedConnection)
+        self._scan_worker.sigLinesScanned.connect(self._lines_scanned, QtCore.Qt.QueuedConnection)
+        self._scan_thread.start()
+
+        if self._save_format not in ('binary', 'text'):
+            self.log.error('ConfigOption save_format "{0}" is invalid. Valid formats are '
+                           '"binary" and "text". Falling back to "text".'
+                           ''.format(self._save_format))
+            self._save_format = 'text'
+
+        # Binary images are saved in a separate thread (see save_xy_data)
+        self._save_thread = QtCore.QThread()
+        self._save_worker = ConfocalSaveWorker(self._scanning_device,
+                                               self._save_logic,
+                                               self.log,
+                                               self._save_figures_in_process)
+        self._save_worker.moveToThread(self._save_thread)
+        self._sigSaveScanImage.connect(self._save_worker.save_scan_image,
+                                       QtCore.Qt.QueuedConnection)
+        self._save_worker.sigScanImageSaved.connect(self._scan_image_saved,
+                                                    QtCore.Qt.QueuedConnection)
+        self._save_thread.start()
+
         self._change_position('activation')
 
     def on_deactivate(self):
@@ -361,6 +473,19 @@ class ConfocalLogic(GenericLogic):
         for state in reversed(self.history):
             self._statusVariables['history_{0}'.format(histindex)] = state.serialize()
             histindex += 1
+
+        self._sigScanLines.disconnect()
+        self._scan_worker.sigLinesScanned.disconnect()
+        self._scan_thread.quit()
+        self._scan_thread.wait()
+
+        # finish pending saves before stopping the save thread
+        self._save_worker.wait_until_idle()
+        self._sigSaveScanImage.disconnect()
+        self._save_worker.sigScanImageSaved.disconnect()
+        self._save_thread.quit()
+        self._save_thread.wait()
+        self._save_worker.shutdown()
         return 0
 
     def switch_hardware(self, to_on=False):
@@ -501,39 +626,23 @@ class ConfocalLogic(GenericLogic):
             if self.depth_img_is_xz:
                 #self._image_horz_axis = self._X
                 # creates an image where each pixel will be [x,y,z,counts]
-                self.depth_image = np.zeros((
-                        len(self._image_vert_axis),
-                        len(self._X),
-                        3 + len(self.get_scanner_count_channels())
-                    ))
-
-                self.depth_image[:, :, 0] = np.full(
-                    (len(self._image_vert_axis), len(self._X)), self._XL)
-
-                self.depth_image[:, :, 1] = self._current_y * np.ones(
-                    (len(self._image_vert_axis), len(self._X)))
-
-                z_value_matrix = np.full((len(self._X), len(self._image_vert_axis)), self._Z)
-                self.depth_image[:, :, 2] = z_value_matrix.transpose()
+                pixel_positions = np.zeros((len(self._X), 3))
+                pixel_positions[:, 0] = self._XL
+                line_positions = np.zeros((len(self._image_vert_axis), 3))
+                line_positions[:, 1] = self._current_y
+                line_positions[:, 2] = self._Z
+                self.depth_image = self._create_image(line_positions, pixel_positions)
 
             # depth scan is yz plane instead of xz plane
             else:
                 #self._image_horz_axis = self._Y
                 # creats an image where each pixel will be [x,y,z,counts]
-                self.depth_image = np.zeros((
-                        len(self._image_vert_axis),
-                        len(self._Y),
-                        3 + len(self.get_scanner_count_channels())
-                    ))
-
-                self.depth_image[:, :, 0] = self._current_x * np.ones(
-                    (len(self._image_vert_axis), len(self._Y)))
-
-                self.depth_image[:, :, 1] = np.full(
-                    (len(self._image_vert_axis), len(self._Y)), self._YL)
-
-                z_value_matrix = np.full((len(self._Y), len(self._image_vert_axis)), self._Z)
-                self.depth_image[:, :, 2] = z_value_matrix.transpose()
+                pixel_positions = np.zeros((len(self._Y), 3))
+                pixel_positions[:, 1] = self._YL
+                line_positions = np.zeros((len(self._image_vert_axis), 3))
+                line_positions[:, 0] = self._current_x
+                line_positions[:, 2] = self._Z
+                self.depth_image = self._create_image(line_positions, pixel_positions)
 
                 # now we are scanning along the y-axis, so we need a new return line along Y:
                 self._return_YL = np.linspace(self._YL[-1], self._YL[0], self.return_slowness)
@@ -546,24 +655,68 @@ class ConfocalLogic(GenericLogic):
             #self._image_horz_axis = self._X
             self._image_vert_axis = self._Y
             # creats an image where each pixel will be [x,y,z,counts]
-            self.xy_image = np.zeros((
-                    len(self._image_vert_axis),
-                    len(self._X),
-                    3 + len(self.get_scanner_count_channels())
-                ))
-
-            self.xy_image[:, :, 0] = np.full(
-                (len(self._image_vert_axis), len(self._X)), self._XL)
+            pixel_positions = np.zeros((len(self._X), 3))
+            pixel_positions[:, 0] = self._XL
+            line_positions = np.zeros((len(self._image_vert_axis), 3))
+            line_positions[:, 1] = self._Y
+            line_positions[:, 2] = self._current_z
+            self.xy_image = self._create_image(line_positions, pixel_positions)
 
-            y_value_matrix = np.full((len(self._X), len(self._image_vert_axis)), self._Y)
-            self.xy_image[:, :, 1] = y_value_matrix.transpose()
+            self.sigImageXYInitialized.emit()
 
-            self.xy_image[:, :, 2] = self._current_z * np.ones(
-                (len(self._image_vert_axis), len(self._X)))
+        # precompute the path of the whole scan
+        if self._zscan and not self.depth_img_is_xz:
+            self._init_scan_path(self.depth_image, 1, self._return_YL)
+        else:
+            self._init_scan_path(self.depth_image if self._zscan else self.xy_image,
+                                 0,
+                                 self._return_XL)
 
-            self.sigImageXYInitialized.emit()
+        # the image is scanned at full resolution unless an adaptive scan is started
+        if self._zscan:
+            self.depth_tile_resolution = None
+        else:
+            self.xy_tile_resolution = None
         return 0
 
+    def _image_store_kwargs(self):
+        """ Arguments of TiledImage for the images of this logic (see config options) """
+        return {'tile_lines': self._image_tile_lines, 'directory': self._image_store_path}
+
+    def _create_image(self, line_positions, pixel_positions):
+        """ Create an empty image with the counts of all scanner count channels.
+
+        @param numpy.ndarray line_positions: x, y and z position of each line (lines x 3)
+        @param numpy.ndarray pixel_positions: x, y and z offset of each pixel in a line (pixels x 3)
+
+        @return TiledImage: the image
+        """
+        return TiledImage(line_positions,
+                          pixel_positions,
+                          len(self.get_scanner_count_channels()),
+                          **self._image_store_kwargs())
+
+    def _init_scan_path(self, image, return_axis, return_line):
+        """ Precompute the positions of all scan lines of image, each followed by its return path
+        to the start of the line, as one contiguous array.
+
+        @param TiledImage image: xy or depth image holding the pixel positions
+        @param int return_axis: index of the axis moved along by the return path
+        @param numpy.ndarray return_line: positions of the return path on return_axis
+        """
+        n_ch = len(self.get_scanner_axes())
+        number_of_lines, number_of_pixels = image.shape[:2]
+        self._scan_path = np.empty((number_of_lines, n_ch, number_of_pixels + return_line.size))
+        self._scan_path_pixels = number_of_pixels
+        for axis in range(min(n_ch, 3)):
+            self._scan_path[:, axis, :number_of_pixels] = image[:, :, axis]
+            # the return path stays at the position of the line on the other axes
+            self._scan_path[:, axis, number_of_pixels:] = image[:, :1, axis]
+        self._scan_path[:, return_axis, number_of_pixels:] = return_line
+        if n_ch > 3:
+            self._scan_path[:, 3] = self._current_a
+        return
+
     def start_scanner(self):
         """Setting up the scanner device and starts the scanning procedure
 
@@ -595,6 +748,16 @@ class ConfocalLogic(GenericLogic):
             self.set_position('scanner')
             return -1
 
+        self._next_scan_line = self._scan_counter
+        self._adaptive_pass = None
+        if self.adaptive_scan:
+            self._start_adaptive_frame((self._current_x, self._current_y, self._current_z,
+                                        self._current_a))
+            # the tiles are not scanned line by line, so an adaptive scan can not be continued
+            if self._zscan:
+                self._zscan_continuable = False
+            else:
+                self._xyscan_continuable = False
         self.signal_scan_lines_next.emit()
         return 0
 
@@ -624,6 +787,8 @@ class ConfocalLogic(GenericLogic):
             self.set_position('scanner')
             return -1
 
+        self._next_scan_line = self._scan_counter
+        self._adaptive_pass = None
         self.signal_scan_lines_next.emit()
         return 0
 
@@ -715,9 +880,15 @@ class ConfocalLogic(GenericLogic):
     def _scan_line(self):
         """scanning an image in either depth or xy
 
+        The lines are scanned by a ConfocalScanWorker in its own thread. Up to two requests are
+        queued, so the scanner continues with the next lines while the counts of the previous
+        ones are written into the image (see _lines_scanned).
         """
         # stops scanning
         if self.stopRequested:
+            # wait for the lines already queued, _lines_scanned calls this method again
+            if self._scan_requests_in_flight > 0:
+                return
             with self.threadlock:
                 self.kill_scanner()
                 self.stopRequested = False
@@ -738,105 +909,327 @@ class ConfocalLogic(GenericLogic):
                 self.history_index = len(self.history) - 1
                 return
 
+        try:
+            self._queue_scan_lines()
+        except:
+            self.log.exception('The scan went wrong, killing the scanner.')
+            self.stop_scanning()
+            self.signal_scan_lines_next.emit()
+
+    def _queue_scan_lines(self):
+        """ Queue the next lines of the precomputed scan path to the scan worker until two requests
+        are in flight. Each request holds a copy of scan_lines_per_call lines (see
+        _get_lines_per_call), so the scan worker does not read lines updated for the next frame.
+        """
+        if self._adaptive_pass is not None:
+            self._queue_adaptive_scan_lines()
+            return
+
         image = self.depth_image if self._zscan else self.xy_image
-        n_ch = len(self.get_scanner_axes())
-        s_ch = len(self.get_scanner_count_channels())
+        number_of_lines = self._scan_path.shape[0]
+        lines_per_call = self._get_lines_per_call(self._scan_path.shape[2])
 
-        try:
-            if self._scan_counter == 0:
-                # make a line from the current cursor position to
-                # the starting position of the first scan line of the scan
-                rs = self.return_slowness
-                lsx = np.linspace(self._current_x, image[self._scan_counter, 0, 0], rs)
-                lsy = np.linspace(self._current_y, image[self._scan_counter, 0, 1], rs)
-                lsz = np.linspace(self._current_z, image[self._scan_counter, 0, 2], rs)
-                if n_ch <= 3:
-                    start_line = np.vstack([lsx, lsy, lsz][0:n_ch])
-                else:
-                    start_line = np.vstack(
-                        [lsx, lsy, lsz, np.ones(lsx.shape) * self._current_a])
-                # move to the start position of the scan, counts are thrown away
-                start_line_counts = self._scanning_device.scan_line(start_line)
-                if np.any(start_line_counts == -1):
-                    self.stopRequested = True
-                    self.signal_scan_lines_next.emit()
+        while self._scan_requests_in_flight < 2:
+            if self._next_scan_line >= number_of_lines:
+                if not self.permanent_scan:
                     return
+                self._next_scan_line = 0
+            first = self._next_scan_line
+            last = min(first + lines_per_call, number_of_lines)
+
+            if first == 0:
+                # move from the current cursor position to the starting position of the first
+                # scan line of the scan, counts are thrown away
+                self._request_scan_lines(self._get_start_line(image), 0, 0)
 
-            # adjust z of line in image to current z before building the line
+            # adjust z of the lines in image and scan path to current z
             if not self._zscan:
-                z_shape = image[self._scan_counter, :, 2].shape
-                image[self._scan_counter, :, 2] = self._current_z * np.ones(z_shape)
-
-            # make a line in the scan, _scan_counter says which one it is
-            lsx = image[self._scan_counter, :, 0]
-            lsy = image[self._scan_counter, :, 1]
-            lsz = image[self._scan_counter, :, 2]
-            if n_ch <= 3:
-                line = np.vstack([lsx, lsy, lsz][0:n_ch])
-            else:
-                line = np.vstack(
-                    [lsx, lsy, lsz, np.ones(lsx.shape) * self._current_a])
+                image.line_positions[first:last, 2] = self._current_z
+                self._scan_path[first:last, 2] = self._current_z
+            if self._scan_path.shape[1] > 3:
+                self._scan_path[first:last, 3] = self._current_a
 
-            # scan the line in the scan
-            line_counts = self._scanning_device.scan_line(line, pixel_clock=True)
-            if np.any(line_counts == -1):
-                self.stopRequested = True
-                self.signal_scan_lines_next.emit()
-                return
+            self._request_scan_lines(self._scan_path[first:last].copy(), first, last - first)
+            self._next_scan_line = last
+        return
 
-            # make a line to go to the starting position of the next scan line
-            if self.depth_img_is_xz or not self._zscan:
-                if n_ch <= 3:
-                    return_line = np.vstack([
-                        self._return_XL,
-                        image[self._scan_counter, 0, 1] * np.ones(self._return_XL.shape),
-                        image[self._scan_counter, 0, 2] * np.ones(self._return_XL.shape)
-                    ][0:n_ch])
-                else:
-                    return_line = np.vstack([
-                            self._return_XL,
-                            image[self._scan_counter, 0, 1] * np.ones(self._return_XL.shape),
-                            image[self._scan_counter, 0, 2] * np.ones(self._return_XL.shape),
-                            np.ones(self._return_XL.shape) * self._current_a
-                        ])
-            else:
-                if n_ch <= 3:
-                    return_line = np.vstack([
-                            image[self._scan_counter, 0, 1] * np.ones(self._return_YL.shape),
-                            self._return_YL,
-                            image[self._scan_counter, 0, 2] * np.ones(self._return_YL.shape)
-                        ][0:n_ch])
-                else:
-                    return_line = np.vstack([
-                            image[self._scan_counter, 0, 1] * np.ones(self._return_YL.shape),
-                            self._return_YL,
-                            image[self._scan_counter, 0, 2] * np.ones(self._return_YL.shape),
-                            np.ones(self._return_YL.shape) * self._current_a
-                        ])
+    def _get_lines_per_call(self, path_length):
+        """ Number of paths sent to the scanner in a single request (scan_lines_per_call). With
+        scan_lines_per_call 0, as many paths as are scanned in about _max_call_duration at the
+        clock frequency, so a stop does not wait for the rest of the frame.
 
-            # return the scanner to the start of next line, counts are thrown away
-            return_line_counts = self._scanning_device.scan_line(return_line)
-            if np.any(return_line_counts == -1):
-                self.stopRequested = True
-                self.signal_scan_lines_next.emit()
-                return
+        @param int path_length: number of positions of each path
 
-            # update image with counts from the line we just scanned
-            if self._zscan:
-                if self.depth_img_is_xz:
-                    self.depth_image[self._scan_counter, :, 3:3 + s_ch] = line_counts
+        @return int: number of paths per request
+        """
+        if self._scan_lines_per_call >= 1:
+            return int(self._scan_lines_per_call)
+        return max(1, int(self._max_call_duration * self._clock_frequency / path_length))
+
+    def _request_scan_lines(self, line_paths, first_line, number_of_lines, number_of_pixels=None,
+                            first_pixel=0, pixel_step=1, refined_tiles=None):
+        """ Send a scan request to the scan worker.
+
+        @param numpy.ndarray line_paths: paths to scan (paths x axes x positions)
+        @param int first_line: image line of the first path
+        @param int number_of_lines: number of image lines scanned (0 for a path without pixels)
+        @param int number_of_pixels: number of pixels of each path (None: whole image lines)
+        @param int first_pixel: image pixel of the first pixel of each path
+        @param int pixel_step: number of image lines and pixels covered by each scanned line and
+                               pixel (for the coarse pass of adaptive scans)
+        @param tuple refined_tiles: (row, first, last) tiles of the tile resolution completed at
+                                    full resolution by this request (for the fine pass of adaptive
+                                    scans)
+        """
+        self._scan_requests_in_flight += 1
+        if number_of_lines == 0:
+            number_of_pixels = 0
+        elif number_of_pixels is None:
+            number_of_pixels = self._scan_path_pixels
+        self._sigScanLines.emit({'line_paths': line_paths,
+                                 'number_of_pixels': number_of_pixels,
+                                 'first_line': first_line,
+                                 'number_of_lines': number_of_lines,
+                                 'first_pixel': first_pixel,
+                                 'pixel_step': pixel_step,
+                                 'refined_tiles': refined_tiles,
+                                 'zscan': self._zscan})
+
+    def _get_start_line(self, image):
+        """ Path from the current cursor position to the start of the first line of image
+
+        @param TiledImage image: xy or depth image
+
+        @return numpy.ndarray: path (1 x axes x return_slowness)
+        """
+        rs = self.return_slowness
+        n_ch = self._scan_path.shape[1]
+        start_line = np.empty((1, n_ch, rs))
+        current = (self._current_x, self._current_y, self._current_z)
+        for axis in range(min(n_ch, 3)):
+            start_line[0, axis] = np.linspace(current[axis], image[0, 0, axis], rs)
+        if n_ch > 3:
+            start_line[0, 3] = self._current_a
+        return start_line
+
+    def _get_move_path(self, start, stop):
+        """ Path moving the scanner from start to stop
+
+        @param numpy.ndarray start: position of each scanner axis
+        @param numpy.ndarray stop: position of each scanner axis
+
+        @return numpy.ndarray: path (1 x axes x return_slowness)
+        """
+        return np.linspace(start, stop, self.return_slowness, axis=-1)[np.newaxis]
+
+    def _get_line_paths(self, lines, pixels):
+        """ Paths of some pixels of some lines of the precomputed scan path, each followed by a
+        return path to its first pixel. The return path is shortened like the line, so the
+        scanner returns at the speed of full lines.
+
+        @param numpy.ndarray lines: indices of the lines
+        @param numpy.ndarray pixels: indices of the pixels in each line
+
+        @return numpy.ndarray: paths (lines x axes x (pixels + return steps))
+        """
+        paths = self._scan_path[lines][:, :, pixels]
+        return_steps = max(2, -(-self.return_slowness * (pixels[-1] - pixels[0] + 1)
+                                // self._scan_path_pixels))
+        return_paths = np.linspace(paths[:, :, -1], paths[:, :, 0], return_steps, axis=-1)
+        return np.concatenate((paths, return_paths), axis=-1)
+
+    def _add_adaptive_requests(self, lines, pixels, first_line, number_of_lines, first_pixel=0,
+                               pixel_step=1, refined_tiles=None):
+        """ Queue some pixels of some lines of an adaptive scan in requests of
+        scan_lines_per_call lines, preceded by a move from the last queued position.
+
+        @param numpy.ndarray lines: indices of the lines in the scan path
+        @param numpy.ndarray pixels: indices of the pixels in each line
+        @param int first_line: image line of the first line
+        @param int number_of_lines: number of image lines covered by the lines
+        @param int first_pixel: image pixel of the first pixel of each line
+        @param int pixel_step: number of image lines and pixels covered by each line and pixel
+        @param tuple refined_tiles: (row, first, last) tiles scanned at full resolution by the
+                                    lines, marked in the tile resolution when the last request
+                                    has been scanned
+        """
+        line_paths = self._get_line_paths(lines, pixels)
+        number_of_paths = line_paths.shape[0]
+        paths_per_call = self._get_lines_per_call(line_paths.shape[2])
+
+        self._adaptive_requests.append(
+            {'line_paths': self._get_move_path(self._adaptive_position, line_paths[0, :, 0]),
+             'first_line': 0,
+             'number_of_lines': 0})
+        for first in range(0, number_of_paths, paths_per_call):
+            last = min(first + paths_per_call, number_of_paths)
+            # image lines covered by the paths, relative to first_line
+            first_covered = first * pixel_step
+            last_covered = min(last * pixel_step, number_of_lines)
+            self._adaptive_requests.append(
+                {'line_paths': line_paths[first:last],
+                 'first_line': first_line + first_covered,
+                 'number_of_lines': last_covered - first_covered,
+                 'number_of_pixels': pixels.size,
+                 'first_pixel': first_pixel,
+                 'pixel_step': pixel_step,
+                 'refined_tiles': refined_tiles if last == number_of_paths else None})
+        # each path returns to its first pixel
+        self._adaptive_position = line_paths[-1, :, 0]
+
+    def _start_adaptive_frame(self, position):
+        """ Queue the coarse pass of an adaptive scan. The image is divided into tiles of
+        adaptive_coarse_factor x adaptive_coarse_factor pixels, and only the center pixel of each
+        tile is scanned.
+
+        @param position: current position of each scanner axis (x, y, z, a)
+        """
+        image = self.depth_image if self._zscan else self.xy_image
+        number_of_lines, number_of_pixels = image.shape[:2]
+        step = max(1, int(self.adaptive_coarse_factor))
+
+        # adjust z of the lines in image and scan path to current z
+        if not self._zscan:
+            image.line_positions[:, 2] = self._current_z
+            self._scan_path[:, 2] = self._current_z
+        if self._scan_path.shape[1] > 3:
+            self._scan_path[:, 3] = self._current_a
+
+        tile_resolution = np.full((-(-number_of_lines // step), -(-number_of_pixels // step)),
+                                  step)
+        if self._zscan:
+            self.depth_tile_resolution = tile_resolution
+        else:
+            self.xy_tile_resolution = tile_resolution
+
+        lines = np.minimum(np.arange(0, number_of_lines, step) + step // 2, number_of_lines - 1)
+        pixels = np.minimum(np.arange(0, number_of_pixels, step) + step // 2, number_of_pixels - 1)
+        self._adaptive_requests.clear()
+        self._adaptive_position = np.asarray(position[:self._scan_path.shape[1]], dtype=float)
+        self._add_adaptive_requests(lines, pixels, 0, number_of_lines, pixel_step=step)
+        self._adaptive_pass = 'coarse'
+
+    def _get_refined_tiles(self, image, step):
+        """ Tiles of the coarse pass of an adaptive scan to scan at full resolution: tiles with
+        counts above adaptive_threshold (0: median plus five robust standard deviations of all
+        tiles) or differing by more than adaptive_gradient_threshold from a neighbouring tile,
+        and the tiles around them.
+
+        @param TiledImage image: image after the coarse pass
+        @param int step: side length of the tiles in pixels
+
+        @return numpy.ndarray: mask of the tiles to refine (tile rows x tile columns)
+        """
+        counts = np.asarray(image.channel(0)[::step, ::step], dtype=float)
+        threshold = self.adaptive_threshold
+        if threshold <= 0:
+            median = np.median(counts)
+            threshold = median + 5 * 1.4826 * np.median(np.abs(counts - median))
+        refine = counts > threshold
+        if self.adaptive_gradient_threshold > 0:
+            padded = np.pad(counts, 1, mode='edge')
+            neighbours = (padded[:-2, 1:-1], padded[2:, 1:-1], padded[1:-1, :-2], padded[1:-1, 2:])
+            gradient = np.max([np.abs(counts - neighbour) for neighbour in neighbours], axis=0)
+            refine |= gradient > self.adaptive_gradient_threshold
+        # the tiles around a spot catch its tails
+        return ndimage.binary_dilation(refine, structure=np.ones((3, 3), dtype=bool))
+
+    def _start_adaptive_refinement(self):
+        """ Queue the fine pass of an adaptive scan: the refined tiles of each row of tiles at full
+        resolution. Runs of refined tiles separated by a gap shorter than the moves needed to skip
+        it are scanned together.
+
+        @return bool: True if any tile is refined
+        """
+        image = self.depth_image if self._zscan else self.xy_image
+        number_of_lines, number_of_pixels = image.shape[:2]
+        step = max(1, int(self.adaptive_coarse_factor))
+        if step == 1:
+            return False
+
+        refine = self._get_refined_tiles(image, step)
+        # scanning a gap costs step lines of its pixels, skipping it a move to the next run
+        max_gap = self.return_slowness // step ** 2
+        self._adaptive_pass = 'fine'
+        for row in np.flatnonzero(refine.any(axis=1)):
+            columns = np.flatnonzero(refine[row])
+            breaks = np.flatnonzero(np.diff(columns) > max_gap + 1)
+            first_line = row * step
+            last_line = min(first_line + step, number_of_lines)
+            for first, last in zip(columns[np.r_[0, breaks + 1]], columns[np.r_[breaks, -1]] + 1):
+                pixels = np.arange(first * step, min(last * step, number_of_pixels))
+                self._add_adaptive_requests(np.arange(first_line, last_line),
+                                            pixels,
+                                            first_line,
+                                            last_line - first_line,
+                                            first_pixel=pixels[0],
+                                            refined_tiles=(row, first, last))
+        return len(self._adaptive_requests) > 0
+
+    def _queue_adaptive_scan_lines(self):
+        """ Queue the requests of the current pass of an adaptive scan until two requests are in
+        flight, and start the next pass or finish the scan when all of them have been scanned.
+        """
+        while self._scan_requests_in_flight < 2 and self._adaptive_requests:
+            self._request_scan_lines(**self._adaptive_requests.popleft())
+        if self._adaptive_requests or self._scan_requests_in_flight > 0:
+            return
+
+        if self._adaptive_pass == 'coarse' and self._start_adaptive_refinement():
+            self._queue_adaptive_scan_lines()
+        elif self.permanent_scan:
+            self._start_adaptive_frame(self._adaptive_position)
+            self._queue_adaptive_scan_lines()
+        else:
+            self.stop_scanning()
+            self.signal_scan_lines_next.emit()
+
+    @QtCore.Slot(dict)
+    def _lines_scanned(self, request):
+        """ Write the counts of lines scanned by the scan worker into the image and queue the next
+        lines.
+
+        @param dict request: the scan request with the counts of the lines ('counts')
+        """
+        self._scan_requests_in_flight -= 1
+        counts = request['counts']
+        if counts is None or np.any(counts == -1):
+            if counts is None:
+                self.log.error('The scan went wrong, killing the scanner.')
+            self.stopRequested = True
+            self.signal_scan_lines_next.emit()
+            return
+
+        number_of_lines = request['number_of_lines']
+        if number_of_lines > 0:
+            first = request['first_line']
+            image = self.depth_image if request['zscan'] else self.xy_image
+            # each pixel of a coarse pass fills a whole tile
+            step = request['pixel_step']
+            if step > 1:
+                counts = np.repeat(np.repeat(counts, step, axis=0), step, axis=1)
+                counts = counts[:number_of_lines, :image.shape[1] - request['first_pixel']]
+            # update image with counts from the lines we just scanned
+            image.write_block(first, request['first_pixel'], counts)
+            # the tiles of a fine pass hold full resolution data once all their lines are written
+            if request['refined_tiles'] is not None:
+                row, first_tile, last_tile = request['refined_tiles']
+                if request['zscan']:
+                    self.depth_tile_resolution[row, first_tile:last_tile] = 1
                 else:
-                    self.depth_image[self._scan_counter, :, 3:3 + s_ch] = line_counts
+                    self.xy_tile_resolution[row, first_tile:last_tile] = 1
+            if request['zscan']:
                 self.signal_depth_image_updated.emit()
             else:
-                self.xy_image[self._scan_counter, :, 3:3 + s_ch] = line_counts
                 self.signal_xy_image_updated.emit()
 
             # next line in scan
-            self._scan_counter += 1
+            self._scan_counter = first + number_of_lines
 
-            # stop scanning when last line scan was performed and makes scan not continuable
-            if self._scan_counter >= np.size(self._image_vert_axis):
+            # stop scanning when last line scan was performed and makes scan not continuable,
+            # adaptive scans are finished by _queue_adaptive_scan_lines
+            if (self._adaptive_pass is None
+                    and self._scan_counter >= np.size(self._image_vert_axis)):
                 if not self.permanent_scan:
                     self.stop_scanning()
                     if self._zscan:
@@ -846,19 +1239,19 @@ class ConfocalLogic(GenericLogic):
                 else:
                     self._scan_counter = 0
 
-            self.signal_scan_lines_next.emit()
-        except:
-            self.log.exception('The scan went wrong, killing the scanner.')
-            self.stop_scanning()
-            self.signal_scan_lines_next.emit()
+        self.signal_scan_lines_next.emit()
 
     def save_xy_data(self, colorscale_range=None, percentile_range=None, block=True):
         """ Save the current confocal xy data to file.
 
-        Two files are created.  The first is the imagedata, which has a text-matrix of count values
-        corresponding to the pixel matrix of the image.  Only count-values are saved here.
+        With the ConfigOption save_format 'binary', the counts of all channels are saved as
+        (channels x lines x pixels) array in a numpy .npy file and the pixel positions and
+        parameters in a JSON file of the same name (see logic.confocal_save.read_scan_image).
 
-        The second file saves the full raw data with x, y, z, and counts at every pixel.
+        With save_format 'text' (default), two files are created.  The first is the imagedata, which has a
+        text-matrix of count values corresponding to the pixel matrix of the image.  Only
+        count-values are saved here.  The second file saves the full raw data with x, y, z, and
+        counts at every pixel.
 
         A figure is also saved.
 
@@ -866,21 +1259,20 @@ class ConfocalLogic(GenericLogic):
 
         @param: list percentile_range (optional) The percentile range [min, max] of the color scale 
         
-        @param: bool block (optional) If False, return immediately; if True, block until save completes."""
-
-        if block:
+        @param: bool block (optional) If False, return immediately; if True, block until save completes.
+                                      Binary images are saved in a separate thread from a snapshot
+                                      of the image, so scanning can continue right away.
+                                      signal_xy_data_saved is emitted when saving has finished."""
+
+        if self._save_format == 'binary':
+            self._save_scan_image(False, colorscale_range, percentile_range, block)
+        elif block:
             self._save_xy_data(colorscale_range, percentile_range)
         else:
             self._signal_save_xy.emit(colorscale_range, percentile_range)
 
-    @QtCore.Slot(object, object)
-    def _save_xy_data(self, colorscale_range=None, percentile_range=None):
-        """ Execute save operation. Slot for _signal_save_xy.
-        """
-        self.signal_save_started.emit()
-        filepath = self._save_logic.get_path_for_module('Confocal')
-        timestamp = datetime.datetime.now()
-        # Prepare the metadata parameters (common to both saved files):
+    def _get_xy_save_parameters(self):
+        """ Metadata parameters of a saved xy image """
         parameters = OrderedDict()
 
         parameters['X image min (m)'] = self.image_x_range[0]
@@ -896,15 +1288,34 @@ class ConfocalLogic(GenericLogic):
 
         parameters['Clock frequency of scanner (Hz)'] = self._clock_frequency
         parameters['Return Slowness (Steps during retrace line)'] = self.return_slowness
+        self._add_tile_resolution_parameters(parameters, self.xy_tile_resolution)
+        return parameters
 
-        # Prepare a figure to be saved
-        figure_data = self.xy_image[:, :, 3]
+    def _get_xy_figure_settings(self):
+        """ Image extent, axes names and indices of the scanner position axes of the crosshair of
+        xy image figures """
         image_extent = [self.image_x_range[0],
                         self.image_x_range[1],
                         self.image_y_range[0],
                         self.image_y_range[1]]
         axes = ['X', 'Y']
-        crosshair_pos = [self.get_position()[0], self.get_position()[1]]
+        crosshair_axes = [0, 1]
+        return image_extent, axes, crosshair_axes
+
+    @QtCore.Slot(object, object)
+    def _save_xy_data(self, colorscale_range=None, percentile_range=None):
+        """ Execute save operation. Slot for _signal_save_xy.
+        """
+        self.signal_save_started.emit()
+        filepath = self._save_logic.get_path_for_module('Confocal')
+        timestamp = datetime.datetime.now()
+        # Prepare the metadata parameters (common to both saved files):
+        parameters = self._get_xy_save_parameters()
+
+        # Prepare a figure to be saved
+        image_extent, axes, crosshair_axes = self._get_xy_figure_settings()
+        position = self.get_position()
+        crosshair_pos = [position[axis] for axis in crosshair_axes]
 
         figs = {ch: self.draw_figure(data=self.xy_image[:, :, 3 + n],
                                      image_extent=image_extent,
@@ -959,10 +1370,7 @@ class ConfocalLogic(GenericLogic):
     def save_depth_data(self, colorscale_range=None, percentile_range=None, block=True):
         """ Save the current confocal depth data to file.
 
-        Two files are created.  The first is the imagedata, which has a text-matrix of count values
-        corresponding to the pixel matrix of the image.  Only count-values are saved here.
-
-        The second file saves the full raw data with x, y, z, and counts at every pixel.
+        The files are saved like the xy data, see save_xy_data.
 
         A figure is also saved.
 
@@ -970,19 +1378,17 @@ class ConfocalLogic(GenericLogic):
 
         @param: list percentile_range (optional) The percentile range [min, max] of the color scale 
         
-        @param: bool block (optional) If False, return immediately; if True, block until save completes."""
-        if block:
+        @param: bool block (optional) If False, return immediately; if True, block until save completes.
+                                      signal_depth_data_saved is emitted when saving has finished."""
+        if self._save_format == 'binary':
+            self._save_scan_image(True, colorscale_range, percentile_range, block)
+        elif block:
             self._save_depth_data(colorscale_range, percentile_range)
         else:
             self._signal_save_depth.emit(colorscale_range, percentile_range)
 
-    @QtCore.Slot(object, object)
-    def _save_depth_data(self, colorscale_range=None, percentile_range=None):
-        """ Execute save operation. Slot for _signal_save_depth. """
-        self.signal_save_started.emit()
-        filepath = self._save_logic.get_path_for_module('Confocal')
-        timestamp = datetime.datetime.now()
-        # Prepare the metadata parameters (common to both saved files):
+    def _get_depth_save_parameters(self):
+        """ Metadata parameters of a saved depth image """
         parameters = OrderedDict()
 
         # TODO: This needs to check whether the scan was XZ or YZ direction
@@ -1000,20 +1406,50 @@ class ConfocalLogic(GenericLogic):
 
         parameters['Clock frequency of scanner (Hz)'] = self._clock_frequency
         parameters['Return Slowness (Steps during retrace line)'] = self.return_slowness
+        self._add_tile_resolution_parameters(parameters, self.depth_tile_resolution)
+        return parameters
+
+    def _add_tile_resolution_parameters(self, parameters, tile_resolution):
+        """ Add the tile resolution mask of an adaptively scanned image to its metadata parameters
 
+        @param OrderedDict parameters: metadata parameters of the image
+        @param numpy.ndarray tile_resolution: pixel step of each tile (None: full scan)
+        """
+        if tile_resolution is None:
+            return
+        parameters['Adaptive scan tile size (pixels)'] = self.adaptive_coarse_factor
+        parameters['Adaptive scan tile resolution (pixel step)'] = tile_resolution.tolist()
+
+    def _get_depth_figure_settings(self):
+        """ Image extent, axes names and indices of the scanner position axes of the crosshair of
+        depth image figures """
         if self.depth_img_is_xz:
             horizontal_range = [self.image_x_range[0], self.image_x_range[1]]
             axes = ['X', 'Z']
-            crosshair_pos = [self.get_position()[0], self.get_position()[2]]
+            crosshair_axes = [0, 2]
         else:
             horizontal_range = [self.image_y_range[0], self.image_y_range[1]]
             axes = ['Y', 'Z']
-            crosshair_pos = [self.get_position()[1], self.get_position()[2]]
+            crosshair_axes = [1, 2]
 
         image_extent = [horizontal_range[0],
                         horizontal_range[1],
                         self.image_z_range[0],
                         self.image_z_range[1]]
+        return image_extent, axes, crosshair_axes
+
+    @QtCore.Slot(object, object)
+    def _save_depth_data(self, colorscale_range=None, percentile_range=None):
+        """ Execute save operation. Slot for _signal_save_depth. """
+        self.signal_save_started.emit()
+        filepath = self._save_logic.get_path_for_module('Confocal')
+        timestamp = datetime.datetime.now()
+        # Prepare the metadata parameters (common to both saved files):
+        parameters = self._get_depth_save_parameters()
+
+        image_extent, axes, crosshair_axes = self._get_depth_figure_settings()
+        position = self.get_position()
+        crosshair_pos = [position[axis] for axis in crosshair_axes]
 
         figs = {ch: self.draw_figure(data=self.depth_image[:, :, 3 + n],
                                      image_extent=image_extent,
@@ -1065,6 +1501,65 @@ class ConfocalLogic(GenericLogic):
         self.signal_depth_data_saved.emit()
         return
 
+    def _save_scan_image(self, zscan, colorscale_range=None, percentile_range=None, block=True):
+        """ Save the xy or depth image in binary format with a figure of each channel.
+
+        Only a snapshot of the image (see TiledImage.snapshot) and the scan settings are taken in
+        the calling thread. The image can be rescanned while the request waits for or is processed
+        by the save worker, which also queries the crosshair position and builds the files
+        (see ConfocalSaveWorker.save).
+
+        @param bool zscan: save the depth image instead of the xy image
+        @param list colorscale_range: (optional) color scale range [min, max] of the figures
+        @param list percentile_range: (optional) percentile range [min, max] of the color scale
+        @param bool block: save in the calling thread instead of the save worker thread
+        """
+        self.signal_save_started.emit()
+        if zscan:
+            image = self.depth_image
+            parameters = self._get_depth_save_parameters()
+            image_extent, axes, crosshair_axes = self._get_depth_figure_settings()
+        else:
+            image = self.xy_image
+            parameters = self._get_xy_save_parameters()
+            image_extent, axes, crosshair_axes = self._get_xy_figure_settings()
+
+        request = {'image': image.snapshot(),
+                   'label': 'depth' if zscan else 'xy',
+                   'channels': list(self.get_scanner_count_channels()),
+                   'parameters': parameters,
+                   'figure_settings': {'image_extent': image_extent,
+                                       'scan_axis': axes,
+                                       'cbar_range': colorscale_range,
+                                       'percentile_range': percentile_range},
+                   'crosshair_axes': crosshair_axes,
+                   'zscan': zscan}
+
+        if block:
+            try:
+                self._save_worker.save(request)
+                request['error'] = False
+            except Exception:
+                self.log.exception('Saving the confocal image failed.')
+                request['error'] = True
+            self._scan_image_saved(request)
+        else:
+            self._save_worker.add_pending()
+            self._sigSaveScanImage.emit(request)
+
+    @QtCore.Slot(dict)
+    def _scan_image_saved(self, request):
+        """ Report a finished save request.
+
+        @param dict request: the save request (see _save_scan_image)
+        """
+        if not request['error']:
+            self.log.debug('Confocal Image saved.')
+        if request['zscan']:
+            self.signal_depth_data_saved.emit()
+        else:
+            self.signal_xy_data_saved.emit()
+
     def draw_figure(self, data, image_extent, scan_axis=None, cbar_range=None, percentile_range=None,  crosshair_pos=None):
         """ Create a 2-D color map figure of the scan image.
 
@@ -1083,122 +1578,13 @@ class ConfocalLogic(GenericLogic):
 
         @return: fig fig: a matplotlib figure object to be saved to file.
         """
-        if scan_axis is None:
-            scan_axis = ['X', 'Y']
-
-        # If no colorbar range was given, take full range of data
-        if cbar_range is None:
-            cbar_range = [np.min(data), np.max(data)]
-
-        # Scale color values using SI prefix
-        prefix = ['', 'k', 'M', 'G']
-        prefix_count = 0
-        image_data = data
-        draw_cb_range = np.array(cbar_range)
-        image_dimension = image_extent.copy()
-
-        while draw_cb_range[1] > 1000:
-            image_data = image_data/1000
-            draw_cb_range = draw_cb_range/1000
-            prefix_count = prefix_count + 1
-
-        c_prefix = prefix[prefix_count]
-
-
-        # Scale axes values using SI prefix
-        axes_prefix = ['', 'm', r'$\mathrm{\mu}$', 'n']
-        x_prefix_count = 0
-        y_prefix_count = 0
-
-        while np.abs(image_dimension[1]-image_dimension[0]) < 1:
-            image_dimension[0] = image_dimension[0] * 1000.
-            image_dimension[1] = image_dimension[1] * 1000.
-            x_prefix_count = x_prefix_count + 1
-
-        while np.abs(image_dimension[3] - image_dimension[2]) < 1:
-            image_dimension[2] = image_dimension[2] * 1000.
-            image_dimension[3] = image_dimension[3] * 1000.
-            y_prefix_count = y_prefix_count + 1
-
-        x_prefix = axes_prefix[x_prefix_count]
-        y_prefix = axes_prefix[y_prefix_count]
-
-        # Use qudi style
-        plt.style.use(self._save_logic.mpl_qd_style)
-
-        # Create figure
-        fig, ax = plt.subplots()
-
-        # Create image plot
-        cfimage = ax.imshow(image_data,
-                            cmap=plt.get_cmap('inferno'), # reference the right place in qd
-                            origin="lower",
-                            vmin=draw_cb_range[0],
-                            vmax=draw_cb_range[1],
-                            interpolation='none',
-                            extent=image_dimension
-                            )
-
-        ax.set_aspect(1)
-        ax.set_xlabel(scan_axis[0] + ' position (' + x_prefix + 'm)')
-        ax.set_ylabel(scan_axis[1] + ' position (' + y_prefix + 'm)')
-        ax.spines['bottom'].set_position(('outward', 10))
-        ax.spines['left'].set_position(('outward', 10))
-        ax.spines['top'].set_visible(False)
-        ax.spines['right'].set_visible(False)
-        ax.get_xaxis().tick_bottom()
-        ax.get_yaxis().tick_left()
-
-        # draw the crosshair position if defined
-        if crosshair_pos is not None:
-            trans_xmark = mpl.transforms.blended_transform_factory(
-                ax.transData,
-                ax.transAxes)
-
-            trans_ymark = mpl.transforms.blended_transform_factory(
-                ax.transAxes,
-                ax.transData)
-
-            ax.annotate('', xy=(crosshair_pos[0]*np.power(1000,x_prefix_count), 0),
-                        xytext=(crosshair_pos[0]*np.power(1000,x_prefix_count), -0.01), xycoords=trans_xmark,
-                        arrowprops=dict(facecolor='#17becf', shrink=0.05),
-                        )
-
-            ax.annotate('', xy=(0, crosshair_pos[1]*np.power(1000,y_prefix_count)),
-                        xytext=(-0.01, crosshair_pos[1]*np.power(1000,y_prefix_count)), xycoords=trans_ymark,
-                        arrowprops=dict(facecolor='#17becf', shrink=0.05),
-                        )
-
-        # Draw the colorbar
-        cbar = plt.colorbar(cfimage, shrink=0.8)#, fraction=0.046, pad=0.08, shrink=0.75)
-        cbar.set_label('Fluorescence (' + c_prefix + 'c/s)')
-
-        # remove ticks from colorbar for cleaner image
-        cbar.ax.tick_params(which=u'both', length=0)
-
-        # If we have percentile information, draw that to the figure
-        if percentile_range is not None:
-            cbar.ax.annotate(str(percentile_range[0]),
-                             xy=(-0.3, 0.0),
-                             xycoords='axes fraction',
-                             horizontalalignment='right',
-                             verticalalignment='center',
-                             rotation=90
-                             )
-            cbar.ax.annotate(str(percentile_range[1]),
-                             xy=(-0.3, 1.0),
-                             xycoords='axes fraction',
-                             horizontalalignment='right',
-                             verticalalignment='center',
-                             rotation=90
-                             )
-            cbar.ax.annotate('(percentile)',
-                             xy=(-0.3, 0.5),
-                             xycoords='axes fraction',
-                             horizontalalignment='right',
-                             verticalalignment='center',
-                             rotation=90
-                             )
+        fig = draw_scan_image_figure(data,
+                                     image_extent,
+                                     scan_axis=scan_axis,
+                                     cbar_range=cbar_range,
+                                     percentile_range=percentile_range,
+                                     crosshair_pos=crosshair_pos,
+                                     style=self._save_logic.mpl_qd_style)
         self.signal_draw_figure_completed.emit()
         return fig
 
@@ -1269,3 +1655,183 @@ class ConfocalLogic(GenericLogic):
             self._change_position('history')
             self.signal_change_position.emit('history')
             self.signal_history_event.emit()
+
+
+class ConfocalScanWorker(QtCore.QObject):
+    """ Scans the lines requested by ConfocalLogic (see ConfocalLogic._scan_line) in its own thread,
+    so the scanner does not wait for the logic to process the counts of the previous lines.
+    """
+    sigLinesScanned = QtCore.Signal(dict)
+
+    def __init__(self, scanning_device, log):
+        super().__init__()
+        self._scanning_device = scanning_device
+        self._log = log
+        # set to False once the scanner does not support scan_lines
+        self._multi_line_supported = True
+
+    @QtCore.Slot(dict)
+    def scan_lines(self, request):
+        """
+        Scan the paths of a scan request and send back the counts of their pixels.
+
+        @param dict request: paths ('line_paths', paths x axes x positions) and the number of
+                             pixels of each path ('number_of_pixels'). The remaining positions of
+                             each path are the return path. Paths without pixels only move the
+                             scanner, their counts are thrown away.
+        """
+        try:
+            request['counts'] = self._scan(request['line_paths'], request['number_of_pixels'])
+        except Exception:
+            self._log.exception('Error while scanning lines.')
+            request['counts'] = None
+        self.sigLinesScanned.emit(request)
+
+    def _scan(self, line_paths, number_of_pixels):
+        if number_of_pixels == 0:
+            for path in line_paths:
+                counts = self._scanning_device.scan_line(path)
+                if np.any(counts == -1):
+                    return counts
+            return np.empty(0)
+
+        # all lines with their return paths in a single acquisition if supported
+        if self._multi_line_supported:
+            counts = self._scanning_device.scan_lines(line_paths, number_of_pixels,
+                                                      pixel_clock=True)
+            if counts is not None:
+                return counts
+            self._multi_line_supported = False
+
+        line_counts = list()
+        for path in line_paths:
+            counts = self._scanning_device.scan_line(path[:, :number_of_pixels], pixel_clock=True)
+            if np.any(counts == -1):
+                return counts
+            # return the scanner to the start of next line, counts are thrown away
+            return_counts = self._scanning_device.scan_line(path[:, number_of_pixels:])
+            if np.any(return_counts == -1):
+                return return_counts
+            line_counts.append(counts)
+        return np.array(line_counts)
+
+
+class ConfocalSaveWorker(QtCore.QObject):
+    """ Saves the scan images requested by ConfocalLogic (see ConfocalLogic._save_scan_image) in
+    its own thread. The figures are rendered in a worker process, so matplotlib does not hold the
+    interpreter lock of the logic and GUI threads.
+    """
+    sigScanImageSaved = QtCore.Signal(dict)
+
+    def __init__(self, scanning_device, save_logic, log, figures_in_process=True):
+        super().__init__()
+        self._scanning_device = scanning_device
+        self._save_logic = save_logic
+        self._log = log
+        self._figures_in_process = figures_in_process
+        self._executor = None
+        # number of requests emitted to the worker and not finished yet
+        self._pending = 0
+        self._idle = threading.Condition()
+
+    def add_pending(self):
+        """ Count a request about to be sent to save_scan_image (see wait_until_idle) """
+        with self._idle:
+            self._pending += 1
+
+    def wait_until_idle(self, timeout=None):
+        """ Wait until all pending requests have been saved.
+
+        @param float timeout: (optional) maximum time to wait in seconds
+
+        @return bool: True if no request is pending
+        """
+        with self._idle:
+            return self._idle.wait_for(lambda: self._pending == 0, timeout)
+
+    def shutdown(self):
+        """ Stop the figure worker process. Call after the worker thread has finished. """
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    @QtCore.Slot(dict)
+    def save_scan_image(self, request):
+        """
+        Save a scan image and send back the request with the entry 'error'.
+
+        @param dict request: save request (see logic.confocal_save.save_scan_image)
+        """
+        try:
+            self.save(request, executor=self._get_executor())
+            request['error'] = False
+        except Exception as e:
+            self._log.exception('Saving the confocal image failed.')
+            request['error'] = True
+            if isinstance(e, BrokenProcessPool):
+                self._executor = None
+        with self._idle:
+            self._pending -= 1
+            self._idle.notify_all()
+        self.sigScanImageSaved.emit(request)
+
+    def save(self, request, executor=None):
+        """
+        Complete a save request of ConfocalLogic with the file paths, the crosshair position and
+        the metadata of the save logic and save the image (see logic.confocal_save.save_scan_image).
+
+        @param dict request: save request of ConfocalLogic._save_scan_image
+        @param concurrent.futures.Executor executor: optional process pool to render the figures in
+        """
+        filepath = self._save_logic.get_path_for_module('Confocal')
+        timestamp = datetime.datetime.now()
+        prefix = timestamp.strftime('%Y%m%d-%H%M-%S') + '_'
+        if self._save_logic.active_poi_name != '':
+            prefix += self._save_logic.active_poi_name.replace(' ', '_') + '_'
+            parameters = OrderedDict([('Measured at POI', self._save_logic.active_poi_name)])
+        else:
+            parameters = OrderedDict()
+        parameters.update(self._save_logic.get_additional_parameters())
+        parameters.update(request['parameters'])
+
+        position = self._scanning_device.get_scanner_position()
+        figure_settings = dict(request['figure_settings'])
+        figure_settings['crosshair_pos'] = [position[axis] for axis in request['crosshair_axes']]
+        label = request['label']
+        figures = [(n,
+                    os.path.join(filepath,
+                                 prefix + 'confocal_{0}_image_{1}'.format(label, ch.replace('/', ''))),
+                    figure_settings)
+                   for n, ch in enumerate(request['channels'])]
+        figure_metadata = {
+            'Title': 'Image produced by qudi: confocal_logic',
+            'Author': 'qudi - Software Suite',
+            'Subject': 'Find more information on: https://github.com/Ulm-IQO/qudi',
+            'Keywords': 'Python 3, Qt, experiment control, automation, measurement, software, '
+                        'framework, modular',
+            'Producer': 'qudi - Software Suite',
+            'CreationDate': timestamp,
+            'ModDate': timestamp}
+
+        request['path'] = os.path.join(filepath, prefix + 'confocal_{0}_data'.format(label))
+        request['parameters'] = parameters
+        request['figures'] = figures
+        request['figure_options'] = {'style': self._save_logic.mpl_qd_style,
+                                     'metadata': figure_metadata,
+                                     'save_pdf': self._save_logic.save_pdf,
+                                     'save_png': self._save_logic.save_png}
+        save_scan_image(request, executor=executor)
+
+    def _get_executor(self):
+        if not self._figures_in_process:
+            return None
+        if self._executor is None:
+            try:
+                self._executor = ProcessPoolExecutor(max_workers=1,
+                                                     initializer=init_figure_worker,
+                                                     initargs=(list(sys.path),))
+            except Exception:
+                self._log.exception('Unable to start the figure worker process. Rendering the '
+                                    'figures in the save thread.')
+                self._figures_in_process = False
+        return self._executor
@@ -0,0 +1,322 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains the functions to save confocal scan images as binary files and to render their
+figures, in a worker process if requested.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import os
+import sys
+import json
+import datetime
+import numpy as np
+import matplotlib as mpl
+import matplotlib.pyplot as plt
+from matplotlib.backends.backend_pdf import PdfPages
+from PIL import Image
+from PIL import PngImagePlugin
+
+
+def scan_image_file_paths(path):
+    """
+    File names of a binary scan image.
+
+    @param str path: path of the scan image without extension
+
+    @return (str, str): paths of the counts file (.npy) and the JSON metadata file (.json)
+    """
+    return path + '.npy', path + '.json'
+
+
+def write_scan_image(path, image, channels, parameters=None):
+    """
+    Write the counts of a scan image as (channels x lines x pixels) float64 array in numpy .npy
+    format and the positions, channels and parameters to a JSON metadata file.
+
+    The position of pixel j in line i is line_positions[i] + pixel_positions[j] (x, y and z in m),
+    see core.util.tiled_image.TiledImage. Use read_scan_image to load the files.
+
+    @param str path: path of the scan image without extension
+    @param image: TiledImage or TiledImageSnapshot to write
+    @param list channels: names of the count channels
+    @param dict parameters: optional parameters of the scan
+    """
+    counts_path, metadata_path = scan_image_file_paths(path)
+    number_of_lines, number_of_pixels = image.shape[:2]
+    counts = np.lib.format.open_memmap(counts_path,
+                                       mode='w+',
+                                       dtype=np.float64,
+                                       shape=(len(channels), number_of_lines, number_of_pixels))
+    for index in range(len(channels)):
+        counts[index] = image.channel(index)
+    counts.flush()
+    del counts
+    metadata = {'channels': [str(ch) for ch in channels],
+                'counts_file': os.path.basename(counts_path),
+                'counts_unit': 'counts/s',
+                'line_positions': image.line_positions.tolist(),
+                'pixel_positions': image.pixel_positions.tolist(),
+                'parameters': dict() if parameters is None else dict(parameters)}
+    with open(metadata_path, 'w') as file:
+        json.dump(metadata, file, indent=2, default=str)
+
+
+def read_scan_image(path):
+    """
+    Read a scan image written by write_scan_image.
+
+    @param str path: path of the scan image without extension
+
+    @return (numpy.ndarray, dict): memory mapped counts (channels x lines x pixels, read only) and
+                                   metadata with the positions as arrays
+    """
+    counts_path, metadata_path = scan_image_file_paths(path)
+    with open(metadata_path, 'r') as file:
+        metadata = json.load(file)
+    metadata['line_positions'] = np.array(metadata['line_positions']).reshape((-1, 3))
+    metadata['pixel_positions'] = np.array(metadata['pixel_positions']).reshape((-1, 3))
+    return np.load(counts_path, mmap_mode='r'), metadata
+
+
+def draw_scan_image_figure(data, image_extent, scan_axis=None, cbar_range=None,
+                           percentile_range=None, crosshair_pos=None, style=None):
+    """ Create a 2-D color map figure of the scan image.
+
+    @param: array data: The NxM array of count values from a scan with NxM pixels.
+
+    @param: list image_extent: The scan range in the form [hor_min, hor_max, ver_min, ver_max]
+
+    @param: list axes: Names of the horizontal and vertical axes in the image
+
+    @param: list cbar_range: (optional) [color_scale_min, color_scale_max].  If not supplied then a default of
+                             data_min to data_max will be used.
+
+    @param: list percentile_range: (optional) Percentile range of the chosen cbar_range.
+
+    @param: list crosshair_pos: (optional) crosshair position as [hor, vert] in the chosen image axes.
+
+    @param: dict style: (optional) matplotlib style of the figure, e.g. SaveLogic.mpl_qd_style
+
+    @return: fig fig: a matplotlib figure object to be saved to file.
+    """
+    if scan_axis is None:
+        scan_axis = ['X', 'Y']
+
+    # If no colorbar range was given, take full range of data
+    if cbar_range is None:
+        cbar_range = [np.min(data), np.max(data)]
+
+    # Scale color values using SI prefix
+    prefix = ['', 'k', 'M', 'G']
+    prefix_count = 0
+    image_data = data
+    draw_cb_range = np.array(cbar_range)
+    image_dimension = image_extent.copy()
+
+    while draw_cb_range[1] > 1000:
+        image_data = image_data/1000
+        draw_cb_range = draw_cb_range/1000
+        prefix_count = prefix_count + 1
+
+    c_prefix = prefix[prefix_count]
+
+
+    # Scale axes values using SI prefix
+    axes_prefix = ['', 'm', r'$\mathrm{\mu}$', 'n']
+    x_prefix_count = 0
+    y_prefix_count = 0
+
+    while np.abs(image_dimension[1]-image_dimension[0]) < 1:
+        image_dimension[0] = image_dimension[0] * 1000.
+        image_dimension[1] = image_dimension[1] * 1000.
+        x_prefix_count = x_prefix_count + 1
+
+    while np.abs(image_dimension[3] - image_dimension[2]) < 1:
+        image_dimension[2] = image_dimension[2] * 1000.
+        image_dimension[3] = image_dimension[3] * 1000.
+        y_prefix_count = y_prefix_count + 1
+
+    x_prefix = axes_prefix[x_prefix_count]
+    y_prefix = axes_prefix[y_prefix_count]
+
+    # Use qudi style
+    if style is not None:
+        plt.style.use(style)
+
+    # Create figure
+    fig, ax = plt.subplots()
+
+    # Create image plot
+    cfimage = ax.imshow(image_data,
+                        cmap=plt.get_cmap('inferno'), # reference the right place in qd
+                        origin="lower",
+                        vmin=draw_cb_range[0],
+                        vmax=draw_cb_range[1],
+                        interpolation='none',
+                        extent=image_dimension
+                        )
+
+    ax.set_aspect(1)
+    ax.set_xlabel(scan_axis[0] + ' position (' + x_prefix + 'm)')
+    ax.set_ylabel(scan_axis[1] + ' position (' + y_prefix + 'm)')
+    ax.spines['bottom'].set_position(('outward', 10))
+    ax.spines['left'].set_position(('outward', 10))
+    ax.spines['top'].set_visible(False)
+    ax.spines['right'].set_visible(False)
+    ax.get_xaxis().tick_bottom()
+    ax.get_yaxis().tick_left()
+
+    # draw the crosshair position if defined
+    if crosshair_pos is not None:
+        trans_xmark = mpl.transforms.blended_transform_factory(
+            ax.transData,
+            ax.transAxes)
+
+        trans_ymark = mpl.transforms.blended_transform_factory(
+            ax.transAxes,
+            ax.transData)
+
+        ax.annotate('', xy=(crosshair_pos[0]*np.power(1000,x_prefix_count), 0),
+                    xytext=(crosshair_pos[0]*np.power(1000,x_prefix_count), -0.01), xycoords=trans_xmark,
+                    arrowprops=dict(facecolor='#17becf', shrink=0.05),
+                    )
+
+        ax.annotate('', xy=(0, crosshair_pos[1]*np.power(1000,y_prefix_count)),
+                    xytext=(-0.01, crosshair_pos[1]*np.power(1000,y_prefix_count)), xycoords=trans_ymark,
+                    arrowprops=dict(facecolor='#17becf', shrink=0.05),
+                    )
+
+    # Draw the colorbar
+    cbar = plt.colorbar(cfimage, shrink=0.8)#, fraction=0.046, pad=0.08, shrink=0.75)
+    cbar.set_label('Fluorescence (' + c_prefix + 'c/s)')
+
+    # remove ticks from colorbar for cleaner image
+    cbar.ax.tick_params(which=u'both', length=0)
+
+    # If we have percentile information, draw that to the figure
+    if percentile_range is not None:
+        cbar.ax.annotate(str(percentile_range[0]),
+                         xy=(-0.3, 0.0),
+                         xycoords='axes fraction',
+                         horizontalalignment='right',
+                         verticalalignment='center',
+                         rotation=90
+                         )
+        cbar.ax.annotate(str(percentile_range[1]),
+                         xy=(-0.3, 1.0),
+                         xycoords='axes fraction',
+                         horizontalalignment='right',
+                         verticalalignment='center',
+                         rotation=90
+                         )
+        cbar.ax.annotate('(percentile)',
+                         xy=(-0.3, 0.5),
+                         xycoords='axes fraction',
+                         horizontalalignment='right',
+                         verticalalignment='center',
+                         rotation=90
+                         )
+    return fig
+
+
+def save_figure(fig, path, metadata=None, save_pdf=False, save_png=True):
+    """
+    Save a figure as PDF and/or PNG with metadata like SaveLogic.save_data and close it.
+
+    @param fig: matplotlib figure to save
+    @param str path: path of the figure files without the suffix "_fig.pdf" or "_fig.png"
+    @param dict metadata: optional metadata of the files (str or datetime values)
+    @param bool save_pdf: save the figure as PDF
+    @param bool save_png: save the figure as PNG
+    """
+    metadata = dict() if metadata is None else dict(metadata)
+    if save_pdf:
+        with PdfPages(path + '_fig.pdf') as pdf:
+            pdf.savefig(fig, bbox_inches='tight', pad_inches=0.05)
+            pdf_metadata = pdf.infodict()
+            for key, value in metadata.items():
+                pdf_metadata[key] = value
+
+    if save_png:
+        fig.savefig(path + '_fig.png', bbox_inches='tight', pad_inches=0.05)
+        # Use Pillow to attach the metadata to the PNG
+        png_image = Image.open(path + '_fig.png')
+        png_metadata = PngImagePlugin.PngInfo()
+        for key, value in metadata.items():
+            if isinstance(value, datetime.datetime):
+                value = value.strftime('%Y%m%d-%H%M-%S')
+            png_metadata.add_text(key, str(value))
+        png_image.save(path + '_fig.png', 'png', pnginfo=png_metadata)
+    plt.close(fig)
+
+
+def render_scan_image_figures(path, figures, style=None, metadata=None, save_pdf=False,
+                              save_png=True):
+    """
+    Draw and save the figures of the channels of a scan image written by write_scan_image.
+    Only reads the memory mapped counts file, so it can be called in a worker process.
+
+    @param str path: path of the scan image without extension
+    @param list figures: tuples (channel index, path of the figure files, keyword arguments of
+                         draw_scan_image_figure except data and style)
+    @param dict style: matplotlib style of the figures
+    @param dict metadata: metadata of the figure files
+    @param bool save_pdf: save the figures as PDF
+    @param bool save_png: save the figures as PNG
+    """
+    counts = np.load(scan_image_file_paths(path)[0], mmap_mode='r')
+    for index, figure_path, kwargs in figures:
+        fig = draw_scan_image_figure(np.asarray(counts[index]), style=style, **kwargs)
+        save_figure(fig, figure_path, metadata=metadata, save_pdf=save_pdf, save_png=save_png)
+
+
+def save_scan_image(request, executor=None):
+    """
+    Write a scan image and render its figures as requested by ConfocalLogic.
+
+    @param dict request: save request with the entries 'path', 'image', 'channels' and
+                         'parameters' (see write_scan_image), 'figures' (see
+                         render_scan_image_figures) and 'figure_options' (further keyword
+                         arguments of render_scan_image_figures). The image is removed from the
+                         request once it has been written.
+    @param concurrent.futures.Executor executor: optional process pool to render the figures in
+    """
+    write_scan_image(request['path'],
+                     request.pop('image'),
+                     request['channels'],
+                     parameters=request['parameters'])
+    if executor is None:
+        render_scan_image_figures(request['path'], request['figures'], **request['figure_options'])
+    else:
+        executor.submit(render_scan_image_figures,
+                        request['path'],
+                        request['figures'],
+                        **request['figure_options']).result()
+
+
+def init_figure_worker(path_list):
+    """
+    Initializer for figure worker processes: use the same module paths as the main process and a
+    non-interactive matplotlib backend.
+
+    @param list path_list: sys.path of the main process
+    """
+    for path in path_list:
+        if path not in sys.path:
+            sys.path.append(path)
+    plt.switch_backend('agg')
@@ -21,15 +21,22 @@ top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi
 
 from qtpy import QtCore
 from collections import OrderedDict
+import datetime
 import numpy as np
+import os
 import time
 import matplotlib.pyplot as plt
 
 from core.connector import Connector
+from core.configoption import ConfigOption
 from core.statusvariable import StatusVar
 from logic.generic_logic import GenericLogic
 from interface.slow_counter_interface import CountingMode
 from core.util.mutex import Mutex
+from core.util.ring_buffer import RingBuffer
+from core.util.filters import RunningMedian
+from core.util.columnar_recorder import ColumnarRecorder
+from core.util.chunked_store import ChunkedArrayStore
 
 
 class CounterLogic(GenericLogic):
@@ -59,6 +66,11 @@ class CounterLogic(GenericLogic):
     counter1 = Connector(interface='SlowCounterInterface')
     savelogic = Connector(interface='SaveLogic')
 
+    # config options
+    # Write the recorded count trace to a raw data file in the counter data directory while saving
+    _stream_count_trace = ConfigOption('stream_count_trace', False, missing='nothing')
+    _stream_file_format = ConfigOption('stream_file_format', 'auto', missing='nothing')
+
     # status vars
     _count_length = StatusVar('count_length', 300)
     _smooth_window_length = StatusVar('smooth_window_length', 10)
@@ -112,11 +124,10 @@ class CounterLogic(GenericLogic):
         number_of_detectors = constraints.max_detectors
 
         # initialize data arrays
-        self.countdata = np.zeros([len(self.get_channels()), self._count_length])
-        self.countdata_smoothed = np.zeros([len(self.get_channels()), self._count_length])
+        self._initialize_count_buffers()
         self.rawdata = np.zeros([len(self.get_channels()), self._counting_samples])
         self._already_counted_samples = 0  # For gated counting
-        self._data_to_save = []
+        self._count_recorder = ColumnarRecorder(len(self.get_channels()) + 1)
 
         # Flag to stop the loop
         self.stopRequested = False
@@ -136,10 +147,78 @@ class CounterLogic(GenericLogic):
         # Stop measurement
         if self.module_state() == 'locked':
             self._stopCount_wait()
+        self._close_count_trace_store()
 
         self.sigCountDataNext.disconnect()
         return
 
+    @property
+    def countdata(self):
+        """ Count trace of all channels (channels x count_length), the newest value is last.
+
+        This is a read-only copy of the ring buffer, which is overwritten in place by the counting
+        loop. The copy is only made once per counter update.
+        """
+        return self._get_trace_copy('countdata', self._countdata_buffer)
+
+    @property
+    def countdata_smoothed(self):
+        """ Median smoothed count trace of all channels (channels x count_length), the newest
+        value is last. This is a read-only copy of the ring buffer made once per counter update.
+        """
+        return self._get_trace_copy('countdata_smoothed', self._smoothed_buffer)
+
+    def _get_trace_copy(self, name, buffer):
+        """ Return the cached copy of a count trace buffer, copying it again if it was updated.
+
+        @param str name: name of the trace in the cache
+        @param RingBuffer buffer: ring buffer of the trace
+
+        @return numpy.ndarray: read-only trace (channels x count_length)
+        """
+        # the update count is read before copying, an update during the copy is copied next time
+        updates = self._count_updates
+        cached_updates, trace = self._trace_copies.get(name, (-1, None))
+        if cached_updates != updates:
+            trace = buffer.latest().T.copy()
+            trace.flags.writeable = False
+            self._trace_copies[name] = (updates, trace)
+        return trace
+
+    def _initialize_count_buffers(self):
+        """ Create the zero filled ring buffers of the count traces and the running median.
+
+        The buffers are mirrored so that the traces are always available as views in chronological
+        order without rolling the arrays on every new value.
+        """
+        number_of_channels = len(self.get_channels())
+        self._countdata_buffer = RingBuffer(self._count_length, (number_of_channels,),
+                                            mirrored=True)
+        self._countdata_buffer.extend(np.zeros((self._count_length, number_of_channels)))
+        self._smoothed_buffer = RingBuffer(self._count_length, (number_of_channels,),
+                                           mirrored=True)
+        self._smoothed_buffer.extend(np.zeros((self._count_length, number_of_channels)))
+        self._running_median = RunningMedian(
+            number_of_channels, min(self._smooth_window_length, self._count_length))
+        self._count_updates = 0
+        self._trace_copies = dict()
+        return
+
+    def _add_count_values(self, new_counts):
+        """ Append one averaged count value per channel and update the smoothed trace.
+
+        The last smooth_window_length / 2 + 1 values of the smoothed trace are set to the median of
+        the last smooth_window_length count values.
+
+        @param numpy.ndarray new_counts: new count value of each channel
+        """
+        self._countdata_buffer.append(new_counts)
+        median = self._running_median.update(new_counts)
+        self._smoothed_buffer.append(median)
+        self._smoothed_buffer.fill_latest(int(self._smooth_window_length / 2) + 1, median)
+        self._count_updates += 1
+        return
+
     def get_hardware_constraints(self):
         """
         Retrieve the hardware constrains from the counter device.
@@ -263,8 +342,14 @@ class CounterLogic(GenericLogic):
         @return bool: saving state
         """
         if not resume:
-            self._data_to_save = []
             self._saving_start_time = time.time()
+            self._close_count_trace_store()
+            self._count_recorder = ColumnarRecorder(len(self.get_channels()) + 1,
+                                                    store=self._create_count_trace_store())
+        elif self._count_recorder.store is None:
+            # save_data has closed the raw data file of the recording. Continue in a new one
+            # holding the whole recording.
+            self._count_recorder.attach(self._create_count_trace_store())
 
         self._saving = True
 
@@ -312,16 +397,76 @@ class CounterLogic(GenericLogic):
             filepath = self._save_logic.get_path_for_module(module_name='Counter')
 
             if save_figure:
-                fig = self.draw_figure(data=np.array(self._data_to_save))
+                fig = self.draw_figure(data=self._data_to_save)
             else:
                 fig = None
             self._save_logic.save_data(data, filepath=filepath, parameters=parameters,
                                        filelabel=filelabel, plotfig=fig, delimiter='\t')
             self.log.info('Counter Trace saved to:\n{0}'.format(filepath))
+        self._close_count_trace_store(parameters)
 
         self.sigSavingStatusChanged.emit(self._saving)
         return self._data_to_save, parameters
 
+    @property
+    def _data_to_save(self):
+        """ Recorded count trace (rows of timestamp and counts of each channel) as view of the
+        recorder storage
+        """
+        return self._count_recorder.data
+
+    def _create_count_trace_store(self):
+        """ Create a raw data file in the counter data directory the recorded count trace is
+        streamed to (if stream_count_trace is set).
+
+        @return ChunkedArrayStore: the new raw data file or None
+        """
+        if not self._stream_count_trace:
+            return None
+        timestamp = datetime.datetime.fromtimestamp(self._saving_start_time)
+        filepath = self._save_logic.get_path_for_module(module_name='Counter')
+        # a resumed recording gets a new file, do not overwrite one saved in the same second
+        filename = datetime.datetime.now().strftime('%Y%m%d-%H%M-%S') + '_count_trace_raw_data'
+        path = os.path.join(filepath, filename)
+        suffix = 0
+        while any(os.path.exists(path + ext) for ext in (ChunkedArrayStore.hdf5_extension,
+                                                         ChunkedArrayStore.npz_extension)):
+            suffix += 1
+            path = os.path.join(filepath, '{0}_{1:d}'.format(filename, suffix))
+        try:
+            store = ChunkedArrayStore(path,
+                                      row_shape=(len(self.get_channels()) + 1,),
+                                      dtype=np.float64,
+                                      chunk_rows=1024,
+                                      file_format=self._stream_file_format)
+            store.set_attributes({'Channels': [str(ch) for ch in self.get_channels()],
+                                  'Start time': timestamp.strftime('%d.%m.%Y at %Hh%Mm%Ss')})
+        except (ImportError, ValueError, OSError):
+            self.log.exception('Unable to create count trace raw data file. Keeping the count '
+                               'trace in memory only.')
+            return None
+        self.log.debug('Writing count trace to "{0}".'.format(store.path))
+        return store
+
+    def _close_count_trace_store(self, parameters=None):
+        """ Write the remaining rows of the count trace to the raw data file (if present) and
+        close it.
+
+        @param dict parameters: optional measurement parameters to add to the file
+        """
+        store = self._count_recorder.store
+        if store is None:
+            return
+        try:
+            self._count_recorder.close()
+            if parameters:
+                store.set_attributes(parameters)
+            self.log.info('Count trace raw data saved to:\n{0}'.format(store.path))
+        except (ValueError, OSError):
+            self.log.exception('Unable to write the count trace raw data file.')
+        finally:
+            store.close()
+
     def draw_figure(self, data):
         """ Draw figure to save with data file.
 
@@ -426,8 +571,7 @@ class CounterLogic(GenericLogic):
 
             # initialising the data arrays
             self.rawdata = np.zeros([len(self.get_channels()), self._counting_samples])
-            self.countdata = np.zeros([len(self.get_channels()), self._count_length])
-            self.countdata_smoothed = np.zeros([len(self.get_channels()), self._count_length])
+            self._initialize_count_buffers()
             self._sampling_data = np.empty([len(self.get_channels()), self._counting_samples])
 
             # the sample index for gated counting
@@ -509,8 +653,9 @@ class CounterLogic(GenericLogic):
         else:
             filelabel = 'snapshot_count_trace_' + name_tag
 
+        countdata = self.countdata
         stop_time = self._count_length / self._count_frequency
-        time_step_size = stop_time / len(self.countdata)
+        time_step_size = stop_time / countdata.shape[1]
         x_axis = np.arange(0, stop_time, time_step_size)
 
         # prepare the data in a dict or in an OrderedDict:
@@ -521,7 +666,7 @@ class CounterLogic(GenericLogic):
         datastr = 'Time (s)'
 
         for i, ch in enumerate(chans):
-            savearr[i+1] = self.countdata[i]
+            savearr[i+1] = countdata[i]
             datastr += ',Signal {0} (counts/s)'.format(i)
 
         data[datastr] = savearr.transpose()
@@ -553,39 +698,13 @@ class CounterLogic(GenericLogic):
         Processes the raw data from the counting device
         @return:
         """
-        for i, ch in enumerate(self.get_channels()):
-            # remember the new count data in circular array
-            self.countdata[i, 0] = np.average(self.rawdata[i])
-        # move the array to the left to make space for the new data
-        self.countdata = np.roll(self.countdata, -1, axis=1)
-        # also move the smoothing array
-        self.countdata_smoothed = np.roll(self.countdata_smoothed, -1, axis=1)
-        # calculate the median and save it
-        window = -int(self._smooth_window_length / 2) - 1
-        for i, ch in enumerate(self.get_channels()):
-            self.countdata_smoothed[i, window:] = np.median(self.countdata[i,
-                                                            -self._smooth_window_length:])
+        # average the oversampled values of all channels and remember them in the ring buffer
+        new_counts = np.mean(self.rawdata, axis=1)
+        self._add_count_values(new_counts)
 
         # save the data if necessary
         if self._saving:
-             # if oversampling is necessary
-            if self._counting_samples > 1:
-                chans = self.get_channels()
-                self._sampling_data = np.empty([len(chans) + 1, self._counting_samples])
-                self._sampling_data[0, :] = time.time() - self._saving_start_time
-                for i, ch in enumerate(chans):
-                    self._sampling_data[i+1, 0] = self.rawdata[i]
-
-                self._data_to_save.extend(list(self._sampling_data))
-            # if we don't want to use oversampling
-            else:
-                # append tuple to data stream (timestamp, average counts)
-                chans = self.get_channels()
-                newdata = np.empty((len(chans) + 1, ))
-                newdata[0] = time.time() - self._saving_start_time
-                for i, ch in enumerate(chans):
-                    newdata[i+1] = self.countdata[i, -1]
-                self._data_to_save.append(newdata)
+            self._record_counts(new_counts)
         return
 
     def _process_data_gated(self):
@@ -593,29 +712,33 @@ class CounterLogic(GenericLogic):
         Processes the raw data from the counting device
         @return:
         """
-        # remember the new count data in circular array
-        self.countdata[0] = np.average(self.rawdata[0])
-        # move the array to the left to make space for the new data
-        self.countdata = np.roll(self.countdata, -1)
-        # also move the smoothing array
-        self.countdata_smoothed = np.roll(self.countdata_smoothed, -1)
-        # calculate the median and save it
-        self.countdata_smoothed[-int(self._smooth_window_length / 2) - 1:] = np.median(
-            self.countdata[-self._smooth_window_length:])
+        # average the gated values of all channels and remember them in the ring buffer
+        new_counts = np.mean(self.rawdata, axis=1)
+        self._add_count_values(new_counts)
 
         # save the data if necessary
         if self._saving:
-            # if oversampling is necessary
-            if self._counting_samples > 1:
-                self._sampling_data = np.empty((self._counting_samples, 2))
-                self._sampling_data[:, 0] = time.time() - self._saving_start_time
-                self._sampling_data[:, 1] = self.rawdata[0]
-                self._data_to_save.extend(list(self._sampling_data))
-            # if we don't want to use oversampling
-            else:
-                # append tuple to data stream (timestamp, average counts)
-                self._data_to_save.append(np.array((time.time() - self._saving_start_time,
-                                                    self.countdata[-1])))
+            self._record_counts(new_counts)
+        return
+
+    def _record_counts(self, new_counts):
+        """
+        Append the new counts with the time since the start of saving to the recorded count trace.
+        With oversampling every single sample is recorded.
+
+        @param numpy.ndarray new_counts: averaged new count value of each channel
+        """
+        timestamp = time.time() - self._saving_start_time
+        # if oversampling is necessary
+        if self._counting_samples > 1:
+            self._sampling_data = np.empty((self.rawdata.shape[1], self.rawdata.shape[0] + 1))
+            self._sampling_data[:, 0] = timestamp
+            self._sampling_data[:, 1:] = self.rawdata.T
+            self._count_recorder.extend(self._sampling_data)
+        # if we don't want to use oversampling
+        else:
+            # append row to data stream (timestamp, average counts)
+            self._count_recorder.append((timestamp, *new_counts))
         return
 
     def _process_data_finite_gated(self):
@@ -623,19 +746,19 @@ class CounterLogic(GenericLogic):
         Processes the raw data from the counting device
         @return:
         """
-        if self._already_counted_samples+len(self.rawdata[0]) >= len(self.countdata):
-            needed_counts = len(self.countdata) - self._already_counted_samples
-            self.countdata[0:needed_counts] = self.rawdata[0][0:needed_counts]
-            self.countdata = np.roll(self.countdata, -needed_counts)
+        number_of_samples = self.rawdata.shape[1]
+        if self._already_counted_samples + number_of_samples >= self._countdata_buffer.capacity:
+            needed_counts = self._countdata_buffer.capacity - self._already_counted_samples
+            # append the missing samples of all channels to the ring buffer
+            self._countdata_buffer.extend(self.rawdata[:, :needed_counts].T)
             self._already_counted_samples = 0
             self.stopRequested = True
         else:
-            # replace the first part of the array with the new data:
-            self.countdata[0:len(self.rawdata[0])] = self.rawdata[0]
-            # roll the array by the amount of data it had been inserted:
-            self.countdata = np.roll(self.countdata, -len(self.rawdata[0]))
+            # append the new samples of all channels to the ring buffer
+            self._countdata_buffer.extend(self.rawdata.T)
             # increment the index counter:
-            self._already_counted_samples += len(self.rawdata[0])
+            self._already_counted_samples += number_of_samples
+        self._count_updates += 1
         return
 
     def _stopCount_wait(self, timeout=5.0):
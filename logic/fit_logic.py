@@ -20,6 +20,7 @@ Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
 top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
 """
 
+import copy
 import importlib
 import inspect
 import lmfit
@@ -462,3 +463,49 @@ class FitContainer(QtCore.QObject):
         self.sigFitUpdated.emit()
 
         return fit_x, fit_y, result
+
+    def compute_fit(self, x_data, y_data, fit_name, use_settings=None, initial_params=None):
+        """ Performs a configured fit without changing the state of this container.
+        Can be used to fit in a separate thread. Use set_fit_result to apply the result.
+
+        @param array x_data: 1D np.array or 1D list with the x values.
+        @param array y_data: 1D np.array or 1D list with the y values.
+        @param str fit_name: name of the configured fit to use
+        @param lmfit.parameter.Parameters use_settings: optional, user fit parameter settings
+                                                        (see set_current_fit)
+        @param lmfit.parameter.Parameters initial_params: optional, start values e.g. from a
+                    previous fit result of the same fit. The estimator is skipped if given.
+
+        @return: tuple (fit_x, fit_y, fit_result), see do_fit
+        """
+        fit = self.fit_list[fit_name]
+        model, params = fit['make_model']()
+        if initial_params is None or set(initial_params) != set(params):
+            estimator = fit['estimator']
+        else:
+            # Start from the given values including their bounds and constraints
+            def estimator(x_axis, data, params):
+                return 0, copy.deepcopy(initial_params)
+
+        result = fit['make_fit'](x_axis=x_data,
+                                 data=y_data,
+                                 estimator=estimator,
+                                 units=self.units,
+                                 add_params=use_settings)
+        fit_x = np.linspace(
+            start=x_data[0],
+            stop=x_data[-1],
+            num=int(len(x_data) * self.fit_granularity_fact))
+        fit_y = model.eval(x=fit_x, params=result.params)
+        return fit_x, fit_y, result
+
+    def set_fit_result(self, result):
+        """ Apply a fit result computed by compute_fit for the current fit.
+
+        @param lmfit.model.ModelResult result: the result object of lmfit
+        """
+        self.current_fit_param = result.params
+        self.current_fit_result = result
+        self.sigNewFitParameters.emit(self.current_fit, result.params)
+        self.sigNewFitResult.emit(self.current_fit, result)
+        self.sigFitUpdated.emit()
@@ -187,6 +187,21 @@ class ScannerLateralPolyCorrectInterfuse(GenericLogic, ConfocalScannerInterface)
         transformed[1, :] = points_y
         return self.scanner().scan_line(transformed, pixel_clock)
 
+    def scan_lines(self, line_paths, number_of_pixels, pixel_clock=False):
+        """ Scans several lines back to back in a single acquisition.
+
+        @param float[l][k][n] line_paths: l consecutive paths of n positions on k axes
+        @param int number_of_pixels: number of pixels of each scan line
+        @param bool pixel_clock: whether we need to output a pixel clock for the scan line pixels
+
+        @return float[l][number_of_pixels][m]: the photon counts per second or None if not supported
+        """
+        transformed = np.array(line_paths, dtype=float)
+        points_x, points_y = self._convert_point(transformed[:, 0], transformed[:, 1])
+        transformed[:, 0] = points_x
+        transformed[:, 1] = points_y
+        return self.scanner().scan_lines(transformed, number_of_pixels, pixel_clock)
+
     def close_scanner(self):
         """ Closes the scanner and cleans up afterwards """
         return self.scanner().close_scanner()
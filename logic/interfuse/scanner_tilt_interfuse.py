@@ -19,6 +19,7 @@ top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi
 """
 
 import copy
+import numpy as np
 
 from core.connector import Connector
 from logic.generic_logic import GenericLogic
@@ -183,9 +184,25 @@ class ScannerTiltInterfuse(GenericLogic, ConfocalScannerInterface):
         @return float[]: the photon counts per second
         """
         if self.tiltcorrection:
-            line_path[:][2] += self._calc_dz(line_path[:][0], line_path[:][1])
+            # correct a copy, the caller may reuse line_path
+            line_path = np.array(line_path, dtype=float)
+            line_path[2] += self._calc_dz(line_path[0], line_path[1])
         return self._scanning_device.scan_line(line_path, pixel_clock)
 
+    def scan_lines(self, line_paths, number_of_pixels, pixel_clock=False):
+        """ Scans several lines back to back in a single acquisition.
+
+        @param float[l][k][n] line_paths: l consecutive paths of n positions on k axes
+        @param int number_of_pixels: number of pixels of each scan line
+        @param bool pixel_clock: whether we need to output a pixel clock for the scan line pixels
+
+        @return float[l][number_of_pixels][m]: the photon counts per second or None if not supported
+        """
+        if self.tiltcorrection:
+            line_paths = np.array(line_paths, dtype=float)
+            line_paths[:, 2] += self._calc_dz(line_paths[:, 0], line_paths[:, 1])
+        return self._scanning_device.scan_lines(line_paths, number_of_pixels, pixel_clock)
+
     def close_scanner(self):
         """ Closes the scanner and cleans up afterwards.
 
@@ -24,7 +24,9 @@ from qtpy import QtCore
 from collections import OrderedDict
 from interface.microwave_interface import MicrowaveMode
 from interface.microwave_interface import TriggerEdge
+import copy
 import numpy as np
+import os
 import time
 import datetime
 import matplotlib.pyplot as plt
@@ -34,6 +36,8 @@ from core.util.mutex import Mutex
 from core.connector import Connector
 from core.configoption import ConfigOption
 from core.statusvariable import StatusVar
+from core.util.ring_buffer import RingBuffer
+from core.util.chunked_store import ChunkedArrayStore
 
 
 class ODMRLogic(GenericLogic):
@@ -52,6 +56,11 @@ class ODMRLogic(GenericLogic):
         'LIST',
         missing='warn',
         converter=lambda x: MicrowaveMode[x.upper()])
+    # Write every sweep to a chunked and compressed raw data file in the ODMR data directory while
+    # scanning and keep only the most recent sweeps in memory. File format of the raw data file:
+    # 'auto' (HDF5 if h5py is installed, npz chunk directory otherwise), 'hdf5' or 'npz'
+    _spill_raw_data = ConfigOption('spill_raw_data', False, missing='nothing')
+    _spill_file_format = ConfigOption('spill_file_format', 'auto', missing='nothing')
 
     clock_frequency = StatusVar('clock_frequency', 200)
     cw_mw_frequency = StatusVar('cw_mw_frequency', 2870e6)
@@ -68,9 +77,11 @@ class ODMRLogic(GenericLogic):
     lines_to_average = StatusVar('lines_to_average', 0)
     _oversampling = StatusVar('oversampling', default=10)
     _lock_in_active = StatusVar('lock_in_active', default=False)
+    auto_fit_sweeps = StatusVar('auto_fit_sweeps', 0)
 
     # Internal signals
     sigNextLine = QtCore.Signal()
+    sigDoAutoFit = QtCore.Signal(dict)
 
     # Update signals, e.g. for GUI module
     sigParameterUpdated = QtCore.Signal(dict)
@@ -78,6 +89,7 @@ class ODMRLogic(GenericLogic):
     sigOdmrPlotsUpdated = QtCore.Signal(np.ndarray, np.ndarray, np.ndarray)
     sigOdmrFitUpdated = QtCore.Signal(np.ndarray, np.ndarray, dict, str)
     sigOdmrElapsedTimeUpdated = QtCore.Signal(float, int)
+    sigAutoFitStatisticsUpdated = QtCore.Signal(dict)
 
     def __init__(self, config, **kwargs):
         super().__init__(config=config, **kwargs)
@@ -128,19 +140,31 @@ class ODMRLogic(GenericLogic):
 
         # Initalize the ODMR data arrays (mean signal and sweep matrix)
         self._initialize_odmr_plots()
-        # Raw data array
-        self.odmr_raw_data = np.zeros(
-            [self.number_of_lines,
-             len(self._odmr_counter.get_odmr_channels()),
-             self.odmr_plot_x.size]
-        )
+        # Raw data ring buffer and raw data file (if spill_raw_data is set)
+        self._odmr_raw_store = None
+        self._initialize_odmr_raw_data(self.number_of_lines)
 
         # Switch off microwave and set CW frequency and power
         self.mw_off()
         self.set_cw_parameters(self.cw_mw_frequency, self.cw_mw_power)
 
+        # Automatic fits during the scan (see set_auto_fit) performed by a worker in its own thread
+        self._auto_fit_channel = 0
+        self._auto_fit_range = 0
+        self._auto_fit_previous = None
+        self._auto_fit_in_flight = False
+        self._auto_fit_stats = {'fits': 0, 'warm_started': 0, 'dropped': 0, 'last_latency': 0.0,
+                                'total_latency': 0.0}
+        self._auto_fit_thread = QtCore.QThread()
+        self._auto_fit_worker = ODMRAutoFitWorker(self.fc)
+        self._auto_fit_worker.moveToThread(self._auto_fit_thread)
+
         # Connect signals
         self.sigNextLine.connect(self._scan_odmr_line, QtCore.Qt.QueuedConnection)
+        self.sigDoAutoFit.connect(self._auto_fit_worker.do_fit, QtCore.Qt.QueuedConnection)
+        self._auto_fit_worker.sigFitFinished.connect(self._auto_fit_finished,
+                                                     QtCore.Qt.QueuedConnection)
+        self._auto_fit_thread.start()
         return
 
     def on_deactivate(self):
@@ -160,8 +184,13 @@ class ODMRLogic(GenericLogic):
                 break
         # Switch off microwave source for sure (also if CW mode is active or module is still locked)
         self._mw_device.off()
+        self._close_odmr_raw_store()
         # Disconnect signals
         self.sigNextLine.disconnect()
+        self.sigDoAutoFit.disconnect()
+        self._auto_fit_worker.sigFitFinished.disconnect()
+        self._auto_fit_thread.quit()
+        self._auto_fit_thread.wait()
 
     @fc.constructor
     def sv_set_fits(self, val):
@@ -268,18 +297,10 @@ class ODMRLogic(GenericLogic):
         """
         self.lines_to_average = int(lines_to_average)
 
-        if self.lines_to_average <= 0:
-            self.odmr_plot_y = np.mean(
-                self.odmr_raw_data[:max(1, self.elapsed_sweeps), :, :],
-                axis=0,
-                dtype=np.float64
-            )
-        else:
-            self.odmr_plot_y = np.mean(
-                self.odmr_raw_data[:max(1, min(self.lines_to_average, self.elapsed_sweeps)), :, :],
-                axis=0,
-                dtype=np.float64
-            )
+        with self.threadlock:
+            self._ensure_odmr_raw_data_capacity()
+            self._reset_odmr_window_sum()
+            self._update_odmr_plot_y()
 
         self.sigOdmrPlotsUpdated.emit(self.odmr_plot_x, self.odmr_plot_y, self.odmr_plot_xy)
         self.sigParameterUpdated.emit({'average_length': self.lines_to_average})
@@ -365,6 +386,8 @@ class ODMRLogic(GenericLogic):
         """
         if isinstance(number_of_lines, int):
             self.number_of_lines = number_of_lines
+            with self.threadlock:
+                self._ensure_odmr_raw_data_capacity()
         else:
             self.log.warning('set_matrix_line_number failed. '
                              'Input parameter number_of_lines is no integer.')
@@ -663,18 +686,20 @@ class ODMRLogic(GenericLogic):
                 return -1
 
             self._initialize_odmr_plots()
-            # initialize raw_data array
+            # initialize raw_data array. Only the recent sweeps are kept in memory if all sweeps
+            # are written to the raw data file.
+            if self._spill_raw_data and self._create_odmr_raw_store():
+                self._initialize_odmr_raw_data(
+                    max(self.number_of_lines, self.lines_to_average + 1))
+                self.sigNextLine.emit()
+                return 0
             estimated_number_of_lines = self.run_time * self.clock_frequency / self.odmr_plot_x.size
             estimated_number_of_lines = int(1.5 * estimated_number_of_lines)  # Safety
             if estimated_number_of_lines < self.number_of_lines:
                 estimated_number_of_lines = self.number_of_lines
             self.log.debug('Estimated number of raw data lines: {0:d}'
                            ''.format(estimated_number_of_lines))
-            self.odmr_raw_data = np.zeros(
-                [estimated_number_of_lines,
-                 len(self._odmr_counter.get_odmr_channels()),
-                 self.odmr_plot_x.size]
-            )
+            self._initialize_odmr_raw_data(estimated_number_of_lines)
             self.sigNextLine.emit()
             return 0
 
@@ -767,45 +792,23 @@ class ODMRLogic(GenericLogic):
                 self.sigNextLine.emit()
                 return
 
-            # Add new count data to raw_data array and append if array is too small
+            # Add new count data to raw data ring buffer and update the mean signal
             if self._clearOdmrData:
-                self.odmr_raw_data[:, :, :] = 0
+                self._odmr_raw_data.clear()
+                self._reset_odmr_sums()
+                if self._odmr_raw_store is not None:
+                    self._odmr_raw_store.delete()
+                    self._create_odmr_raw_store()
                 self._clearOdmrData = False
-            if self.elapsed_sweeps == (self.odmr_raw_data.shape[0] - 1):
-                expanded_array = np.zeros(self.odmr_raw_data.shape)
-                self.odmr_raw_data = np.concatenate((self.odmr_raw_data, expanded_array), axis=0)
-                self.log.warning('raw data array in ODMRLogic was not big enough for the entire '
-                                 'measurement. Array will be expanded.\nOld array shape was '
-                                 '({0:d}, {1:d}), new shape is ({2:d}, {3:d}).'
-                                 ''.format(self.odmr_raw_data.shape[0] - self.number_of_lines,
-                                           self.odmr_raw_data.shape[1],
-                                           self.odmr_raw_data.shape[0],
-                                           self.odmr_raw_data.shape[1]))
-
-            # shift data in the array "up" and add new data at the "bottom"
-            self.odmr_raw_data = np.roll(self.odmr_raw_data, 1, axis=0)
-
-            self.odmr_raw_data[0] = new_counts
-
-            # Add new count data to mean signal
-            if self._clearOdmrData:
-                self.odmr_plot_y[:, :] = 0
-
-            if self.lines_to_average <= 0:
-                self.odmr_plot_y = np.mean(
-                    self.odmr_raw_data[:max(1, self.elapsed_sweeps), :, :],
-                    axis=0,
-                    dtype=np.float64
-                )
-            else:
-                self.odmr_plot_y = np.mean(
-                    self.odmr_raw_data[:max(1, min(self.lines_to_average, self.elapsed_sweeps)), :, :],
-                    axis=0,
-                    dtype=np.float64
-                )
+            self._add_odmr_line(new_counts)
+            self._update_odmr_plot_y()
 
             # Set plot slice of matrix
-            self.odmr_plot_xy = self.odmr_raw_data[:self.number_of_lines, :, :]
+            self.odmr_plot_xy = self._get_odmr_matrix()
+
+            # Fit the mean signal every auto_fit_sweeps sweeps
+            if self.auto_fit_sweeps > 0 and (self.elapsed_sweeps + 1) % self.auto_fit_sweeps == 0:
+                self._request_auto_fit()
 
             # Update elapsed time/sweeps
             self.elapsed_sweeps += 1
@@ -818,6 +821,188 @@ class ODMRLogic(GenericLogic):
             self.sigNextLine.emit()
             return
 
+    @property
+    def odmr_raw_data(self):
+        """
+        All sweeps held in memory (newest first) as array of shape (sweeps, channels, frequencies).
+        Only the most recent sweeps are held in memory if the sweeps are written to a raw data file
+        (see spill_raw_data).
+        """
+        return self._odmr_raw_data.latest(newest_first=True)
+
+    def _initialize_odmr_raw_data(self, number_of_lines):
+        """
+        Create the ring buffer for the raw data of all sweeps and reset the running sums.
+
+        @param int number_of_lines: initial capacity of the ring buffer
+        """
+        self._odmr_raw_data = RingBuffer(
+            capacity=max(1, number_of_lines),
+            row_shape=(len(self._odmr_counter.get_odmr_channels()), self.odmr_plot_x.size),
+            dtype=np.float64)
+        self._reset_odmr_sums()
+        return
+
+    def _ensure_odmr_raw_data_capacity(self):
+        """
+        Make sure the ring buffer can hold number_of_lines and lines_to_average + 1 sweeps if only
+        the recent sweeps are kept in memory. Missing sweeps are read back from the raw data file.
+        """
+        required_lines = max(self.number_of_lines, self.lines_to_average + 1)
+        if self._odmr_raw_store is None or self._odmr_raw_data.capacity >= required_lines:
+            return
+        stored_lines = len(self._odmr_raw_store)
+        self._odmr_raw_data.resize(required_lines)
+        self._odmr_raw_data.clear()
+        self._odmr_raw_data.extend(
+            self._odmr_raw_store.read(max(0, stored_lines - required_lines), stored_lines))
+        return
+
+    def _create_odmr_raw_store(self):
+        """
+        Create a new raw data file in the ODMR data directory for the sweeps of a new scan.
+
+        @return bool: True if the file has been created
+        """
+        self._close_odmr_raw_store()
+        timestamp = datetime.datetime.now()
+        filepath = self._save_logic.get_path_for_module(module_name='ODMR')
+        filename = timestamp.strftime('%Y%m%d-%H%M-%S') + '_ODMR_raw_data'
+        try:
+            self._odmr_raw_store = ChunkedArrayStore(
+                os.path.join(filepath, filename),
+                row_shape=(len(self.get_odmr_channels()), self.odmr_plot_x.size),
+                dtype=np.float64,
+                file_format=self._spill_file_format)
+            self._odmr_raw_store.set_attributes(
+                {'Channels': [str(channel) for channel in self.get_odmr_channels()],
+                 'Frequencies (Hz)': self.odmr_plot_x,
+                 'Start time': timestamp.strftime('%d.%m.%Y at %Hh%Mm%Ss')})
+        except (ImportError, ValueError, OSError):
+            self.log.exception('Unable to create ODMR raw data file. Keeping all sweeps in memory '
+                               'instead.')
+            self._odmr_raw_store = None
+            return False
+        self.log.debug('Writing ODMR raw data to "{0}".'.format(self._odmr_raw_store.path))
+        return True
+
+    def _finalize_odmr_raw_store(self, tag):
+        """
+        Add the measurement parameters to the raw data file (if present).
+
+        @param str tag: tag of the saved measurement
+
+        @return bool: True if all sweeps are saved in the raw data file
+        """
+        with self.threadlock:
+            if self._odmr_raw_store is None:
+                return False
+            try:
+                self._odmr_raw_store.set_attributes(
+                    {'Tag': tag,
+                     'Microwave CW Power (dBm)': self.cw_mw_power,
+                     'Microwave Sweep Power (dBm)': self.sweep_mw_power,
+                     'Run Time (s)': self.run_time,
+                     'Number of frequency sweeps (#)': self.elapsed_sweeps,
+                     'Start Frequencies (Hz)': self.mw_starts,
+                     'Stop Frequencies (Hz)': self.mw_stops,
+                     'Step sizes (Hz)': self.mw_steps,
+                     'Clock Frequencies (Hz)': self.clock_frequency})
+            except OSError:
+                self.log.exception('Unable to add the parameters to the ODMR raw data file. '
+                                   'Saving raw data as text instead.')
+                return False
+            self.log.info('ODMR raw data saved to:\n{0}'.format(self._odmr_raw_store.path))
+        return True
+
+    def _close_odmr_raw_store(self):
+        if self._odmr_raw_store is not None:
+            self._odmr_raw_store.close()
+            self._odmr_raw_store = None
+        return
+
+    def _reset_odmr_sums(self):
+        """ Reset the running sums of all sweeps and of the last lines_to_average sweeps """
+        self._odmr_sum_all = np.zeros(self._odmr_raw_data.row_shape, dtype=np.float64)
+        # number of sweeps in _odmr_sum_all, the ring buffer only holds the recent ones if the
+        # sweeps are spilled to the raw data file
+        self._odmr_sum_all_lines = 0
+        self._odmr_sum_window = np.zeros(self._odmr_raw_data.row_shape, dtype=np.float64)
+        self._window_sum_updates = 0
+        return
+
+    def _reset_odmr_window_sum(self):
+        """ Sum up the last lines_to_average sweeps stored in the ring buffer again """
+        if self.lines_to_average > 0 and len(self._odmr_raw_data) > 0:
+            self._odmr_sum_window = np.sum(self._odmr_raw_data.latest(self.lines_to_average),
+                                           axis=0,
+                                           dtype=np.float64)
+        else:
+            self._odmr_sum_window = np.zeros(self._odmr_raw_data.row_shape, dtype=np.float64)
+        self._window_sum_updates = 0
+        return
+
+    def _add_odmr_line(self, new_counts):
+        """
+        Store a new sweep in the raw data ring buffer and update the running sums.
+        The sweep is also appended to the raw data file (if present). Otherwise the ring buffer is
+        expanded if it is full since all sweeps are kept for saving.
+
+        @param numpy.ndarray new_counts: count data of shape (channels, frequencies)
+        """
+        if self._odmr_raw_store is not None:
+            try:
+                self._odmr_raw_store.append(new_counts)
+            except OSError:
+                self.log.exception('Writing to the ODMR raw data file failed. Keeping all further '
+                                   'sweeps in memory instead.')
+                self._close_odmr_raw_store()
+        elif self._odmr_raw_data.is_full:
+            old_capacity = self._odmr_raw_data.capacity
+            self._odmr_raw_data.resize(2 * old_capacity)
+            self.log.warning('raw data array in ODMRLogic was not big enough for the entire '
+                             'measurement. Array will be expanded.\nOld array shape was '
+                             '({0:d}, {1:d}), new shape is ({2:d}, {3:d}).'
+                             ''.format(old_capacity,
+                                       self._odmr_raw_data.row_shape[0],
+                                       self._odmr_raw_data.capacity,
+                                       self._odmr_raw_data.row_shape[0]))
+        self._odmr_raw_data.append(new_counts)
+        new_counts = self._odmr_raw_data.get(0)
+        self._odmr_sum_all += new_counts
+        self._odmr_sum_all_lines += 1
+
+        if self.lines_to_average > 0:
+            self._odmr_sum_window += new_counts
+            if len(self._odmr_raw_data) > self.lines_to_average:
+                self._odmr_sum_window -= self._odmr_raw_data.get(self.lines_to_average)
+            # Sum up the window again from time to time to avoid accumulating rounding errors.
+            # Amortized this costs as much as a single update.
+            self._window_sum_updates += 1
+            if self._window_sum_updates >= self.lines_to_average:
+                self._reset_odmr_window_sum()
+        return
+
+    def _update_odmr_plot_y(self):
+        """ Calculate the mean signal of all sweeps or of the last lines_to_average sweeps """
+        stored_lines = len(self._odmr_raw_data)
+        if stored_lines == 0:
+            self.odmr_plot_y = np.zeros(self._odmr_raw_data.row_shape, dtype=np.float64)
+        elif self.lines_to_average <= 0:
+            self.odmr_plot_y = self._odmr_sum_all / self._odmr_sum_all_lines
+        else:
+            self.odmr_plot_y = self._odmr_sum_window / min(self.lines_to_average, stored_lines)
+        return
+
+    def _get_odmr_matrix(self):
+        """ The last number_of_lines sweeps (newest first) padded with zeros if not yet measured """
+        matrix = self._odmr_raw_data.latest(self.number_of_lines, newest_first=True)
+        if matrix.shape[0] < self.number_of_lines:
+            padded_matrix = np.zeros((self.number_of_lines, *self._odmr_raw_data.row_shape))
+            padded_matrix[:matrix.shape[0]] = matrix
+            matrix = padded_matrix
+        return matrix
+
     def get_odmr_channels(self):
         return self._odmr_counter.get_odmr_channels()
 
@@ -839,17 +1024,7 @@ class ODMRLogic(GenericLogic):
         Execute the currently configured fit on the measurement data. Optionally on passed data
         """
         if (x_data is None) or (y_data is None):
-            if fit_range >= 0:
-                x_data = self.frequency_lists[fit_range]
-                x_data_full_length = np.zeros(len(self.final_freq_list))
-                # how to insert the data at the right position?
-                start_pos = np.where(np.isclose(self.final_freq_list, self.mw_starts[fit_range]))[0][0]
-                x_data_full_length[start_pos:(start_pos + len(x_data))] = x_data
-                y_args = np.array([ind_list[0] for ind_list in np.argwhere(x_data_full_length)])
-                y_data = self.odmr_plot_y[channel_index][y_args]
-            else:
-                x_data = self.final_freq_list
-                y_data = self.odmr_plot_y[channel_index]
+            x_data, y_data = self._get_fit_data(channel_index, fit_range)
         if fit_function is not None and isinstance(fit_function, str):
             if fit_function in self.get_fit_functions():
                 self.fc.set_current_fit(fit_function)
@@ -875,6 +1050,125 @@ class ODMRLogic(GenericLogic):
             self.odmr_fit_x, self.odmr_fit_y, result_str_dict, self.fc.current_fit)
         return
 
+    def _get_fit_data(self, channel_index=0, fit_range=0):
+        """
+        Select the mean signal of a channel and frequency range for fitting.
+
+        @param int channel_index: index of the ODMR channel
+        @param int fit_range: index of the frequency range (negative for all ranges)
+
+        @return (numpy.ndarray, numpy.ndarray): frequencies and mean signal
+        """
+        if fit_range >= 0:
+            x_data = self.frequency_lists[fit_range]
+            x_data_full_length = np.zeros(len(self.final_freq_list))
+            # how to insert the data at the right position?
+            start_pos = np.where(np.isclose(self.final_freq_list, self.mw_starts[fit_range]))[0][0]
+            x_data_full_length[start_pos:(start_pos + len(x_data))] = x_data
+            y_args = np.array([ind_list[0] for ind_list in np.argwhere(x_data_full_length)])
+            y_data = self.odmr_plot_y[channel_index][y_args]
+        else:
+            x_data = self.final_freq_list
+            y_data = self.odmr_plot_y[channel_index]
+        return x_data, y_data
+
+    def set_auto_fit(self, sweeps, channel_index=0, fit_range=0):
+        """
+        Fit the mean signal with the current fit function automatically during the scan.
+
+        The fits run in a separate thread and start from the parameters of the previous automatic
+        fit as long as its result is valid (same fit function and data range, fit succeeded).
+        The estimator of the fit is only used if no valid previous result exists or the fit
+        started from the previous parameters is considerably worse. Fit requests are dropped
+        while the previous fit is still running.
+
+        @param int sweeps: number of sweeps between two fits (0 disables the automatic fit)
+        @param int channel_index: index of the ODMR channel to fit
+        @param int fit_range: index of the frequency range to fit (negative for all ranges)
+
+        @return int: actually set number of sweeps between two fits
+        """
+        self.auto_fit_sweeps = max(0, int(sweeps))
+        self._auto_fit_channel = int(channel_index)
+        self._auto_fit_range = int(fit_range)
+        self._auto_fit_previous = None
+        self.sigParameterUpdated.emit({'auto_fit_sweeps': self.auto_fit_sweeps})
+        return self.auto_fit_sweeps
+
+    def get_auto_fit_statistics(self):
+        """
+        Statistics of the automatic fits since activation.
+
+        @return dict: number of fits ('fits'), fits started from the previous result
+                      ('warm_started'), dropped fit requests ('dropped') and the time in seconds
+                      between the request and the result of the last fit ('last_latency') and on
+                      average ('mean_latency')
+        """
+        stats = self._auto_fit_stats.copy()
+        stats['mean_latency'] = stats.pop('total_latency') / max(1, stats['fits'])
+        return stats
+
+    def _request_auto_fit(self):
+        """ Send the current mean signal to the fit worker thread unless it is still busy """
+        fit_name = self.fc.current_fit
+        if fit_name not in self.fc.fit_list:
+            return
+        if self._auto_fit_in_flight:
+            self._auto_fit_stats['dropped'] += 1
+            return
+        try:
+            x_data, y_data = self._get_fit_data(self._auto_fit_channel, self._auto_fit_range)
+        except IndexError:
+            self.log.error('Automatic ODMR fit of channel {0:d}, range {1:d} not possible.'
+                           ''.format(self._auto_fit_channel, self._auto_fit_range))
+            self.auto_fit_sweeps = 0
+            return
+
+        key = (fit_name, self._auto_fit_channel, self._auto_fit_range, len(x_data), x_data[0],
+               x_data[-1])
+        previous = self._auto_fit_previous
+        if previous is None or previous['key'] != key:
+            previous = None
+        request = {'key': key,
+                   'fit_name': fit_name,
+                   'x_data': np.array(x_data),
+                   'y_data': np.array(y_data),
+                   'use_settings': copy.deepcopy(self.fc.use_settings),
+                   'initial_params': None if previous is None else previous['params'],
+                   'previous_redchi': None if previous is None else previous['redchi'],
+                   'request_time': time.perf_counter()}
+        self._auto_fit_in_flight = True
+        self.sigDoAutoFit.emit(request)
+        return
+
+    @QtCore.Slot(dict)
+    def _auto_fit_finished(self, request):
+        """ Apply the result of an automatic fit (called in the logic thread) """
+        self._auto_fit_in_flight = False
+        result = request.get('result')
+        if result is None or request['fit_name'] != self.fc.current_fit:
+            return
+
+        self._auto_fit_stats['fits'] += 1
+        self._auto_fit_stats['warm_started'] += int(request['warm_started'])
+        self._auto_fit_stats['last_latency'] = request['latency']
+        self._auto_fit_stats['total_latency'] += request['latency']
+        if result.success:
+            self._auto_fit_previous = {'key': request['key'],
+                                       'params': result.params,
+                                       'redchi': result.redchi}
+        else:
+            self._auto_fit_previous = None
+
+        self.odmr_fit_x, self.odmr_fit_y = request['fit_x'], request['fit_y']
+        self.fc.set_fit_result(result)
+        key = 'channel: {0}, range: {1}'.format(request['key'][1], request['key'][2])
+        self.fits_performed[key] = (self.odmr_fit_x, self.odmr_fit_y, result, self.fc.current_fit)
+        self.sigOdmrFitUpdated.emit(
+            self.odmr_fit_x, self.odmr_fit_y, result.result_str_dict, self.fc.current_fit)
+        self.sigAutoFitStatisticsUpdated.emit(self.get_auto_fit_statistics())
+        return
+
     def save_odmr_data(self, tag=None, colorscale_range=None, percentile_range=None):
         """ Saves the current ODMR data to a file."""
         timestamp = datetime.datetime.now()
@@ -883,32 +1177,37 @@ class ODMRLogic(GenericLogic):
         if tag is None:
             tag = ''
 
+        # The raw data of all sweeps is already on disk if it has been written to a raw data file.
+        # Just add the measurement parameters.
+        raw_data_saved = self._finalize_odmr_raw_store(tag)
+
         for nch, channel in enumerate(self.get_odmr_channels()):
             # first save raw data for each channel
-            if len(tag) > 0:
-                filelabel_raw = '{0}_ODMR_data_ch{1}_raw'.format(tag, nch)
-            else:
-                filelabel_raw = 'ODMR_data_ch{0}_raw'.format(nch)
-
-            data_raw = OrderedDict()
-            data_raw['count data (counts/s)'] = self.odmr_raw_data[:self.elapsed_sweeps, nch, :]
-            parameters = OrderedDict()
-            parameters['Microwave CW Power (dBm)'] = self.cw_mw_power
-            parameters['Microwave Sweep Power (dBm)'] = self.sweep_mw_power
-            parameters['Run Time (s)'] = self.run_time
-            parameters['Number of frequency sweeps (#)'] = self.elapsed_sweeps
-            parameters['Start Frequencies (Hz)'] = self.mw_starts
-            parameters['Stop Frequencies (Hz)'] = self.mw_stops
-            parameters['Step sizes (Hz)'] = self.mw_steps
-            parameters['Clock Frequencies (Hz)'] = self.clock_frequency
-            parameters['Channel'] = '{0}: {1}'.format(nch, channel)
-            self._save_logic.save_data(data_raw,
-                                       filepath=filepath,
-                                       parameters=parameters,
-                                       filelabel=filelabel_raw,
-                                       fmt='%.6e',
-                                       delimiter='\t',
-                                       timestamp=timestamp)
+            if not raw_data_saved:
+                if len(tag) > 0:
+                    filelabel_raw = '{0}_ODMR_data_ch{1}_raw'.format(tag, nch)
+                else:
+                    filelabel_raw = 'ODMR_data_ch{0}_raw'.format(nch)
+
+                data_raw = OrderedDict()
+                data_raw['count data (counts/s)'] = self.odmr_raw_data[:self.elapsed_sweeps, nch, :]
+                parameters = OrderedDict()
+                parameters['Microwave CW Power (dBm)'] = self.cw_mw_power
+                parameters['Microwave Sweep Power (dBm)'] = self.sweep_mw_power
+                parameters['Run Time (s)'] = self.run_time
+                parameters['Number of frequency sweeps (#)'] = self.elapsed_sweeps
+                parameters['Start Frequencies (Hz)'] = self.mw_starts
+                parameters['Stop Frequencies (Hz)'] = self.mw_stops
+                parameters['Step sizes (Hz)'] = self.mw_steps
+                parameters['Clock Frequencies (Hz)'] = self.clock_frequency
+                parameters['Channel'] = '{0}: {1}'.format(nch, channel)
+                self._save_logic.save_data(data_raw,
+                                           filepath=filepath,
+                                           parameters=parameters,
+                                           filelabel=filelabel_raw,
+                                           fmt='%.6e',
+                                           delimiter='\t',
+                                           timestamp=timestamp)
 
             # now create a plot for each scan range
             data_start_ind = 0
@@ -1156,3 +1455,54 @@ class ODMRLogic(GenericLogic):
             self.save_odmr_data(tag=name_tag)
 
         return self.odmr_plot_x, self.odmr_plot_y, fit_params
+
+
+class ODMRAutoFitWorker(QtCore.QObject):
+    """ Performs the automatic fits of ODMRLogic (see ODMRLogic.set_auto_fit) in its own thread.
+    """
+    sigFitFinished = QtCore.Signal(dict)
+
+    # A fit started from the previous result is discarded if its reduced chi-square is worse than
+    # this factor times the previous one
+    warm_start_tolerance = 2.0
+
+    def __init__(self, fit_container):
+        super().__init__()
+        self._fit_container = fit_container
+
+    @QtCore.Slot(dict)
+    def do_fit(self, request):
+        """
+        Fit the data of a fit request from ODMRLogic._request_auto_fit and send back the result.
+
+        @param dict request: data and parameters of the fit
+        """
+        try:
+            warm_started = request['initial_params'] is not None
+            fit_x, fit_y, result = self._fit_container.compute_fit(
+                request['x_data'],
+                request['y_data'],
+                request['fit_name'],
+                use_settings=request['use_settings'],
+                initial_params=request['initial_params'])
+            if warm_started and not self._is_valid(result, request['previous_redchi']):
+                warm_started = False
+                fit_x, fit_y, result = self._fit_container.compute_fit(
+                    request['x_data'],
+                    request['y_data'],
+                    request['fit_name'],
+                    use_settings=request['use_settings'])
+            request.update({'fit_x': fit_x,
+                            'fit_y': fit_y,
+                            'result': result,
+                            'warm_started': warm_started})
+        except Exception:
+            self._fit_container.fit_logic.log.exception('Automatic ODMR fit failed.')
+            request['result'] = None
+        request['latency'] = time.perf_counter() - request['request_time']
+        self.sigFitFinished.emit(request)
+
+    def _is_valid(self, result, previous_redchi):
+        if not result.success or not np.isfinite(result.redchi):
+            return False
+        return previous_redchi is None or result.redchi <= self.warm_start_tolerance * previous_redchi
@@ -50,9 +50,15 @@ class OptimizerLogic(GenericLogic):
     do_surface_subtraction = StatusVar('surface_subtraction', False)
     surface_subtr_scan_offset = StatusVar('surface_subtraction_offset', 1e-6)
     opt_channel = StatusVar('optimization_channel', 0)
+    # Fast refocus: an x and a y line through the last optimum instead of the full xy image and
+    # fits seeded with the previous result. A line whose spot is found at its edge is scanned once
+    # more centered on the spot.
+    fast_refocus = StatusVar('fast_refocus', False)
+    fast_refocus_points = StatusVar('fast_refocus_points', 15)
 
     # "private" signals to keep track of activities here in the optimizer logic
     _sigScanNextXyLine = QtCore.Signal()
+    _sigScanXyCross = QtCore.Signal()
     _sigScanZLine = QtCore.Signal()
     _sigCompletedXyOptimizerScan = QtCore.Signal()
     _sigDoNextOptimizationStep = QtCore.Signal()
@@ -66,6 +72,7 @@ class OptimizerLogic(GenericLogic):
     sigRefocusFinished = QtCore.Signal(str, list)
     sigClockFrequencyChanged = QtCore.Signal(int)
     sigPositionChanged = QtCore.Signal(float, float, float)
+    sigRefocusTimingUpdated = QtCore.Signal(dict)
 
     def __init__(self, config, **kwargs):
         super().__init__(config=config, **kwargs)
@@ -79,6 +86,13 @@ class OptimizerLogic(GenericLogic):
         # Keep track of who called the refocus
         self._caller_tag = ''
 
+        # Duration of the last refocus and of all refocus procedures since the last reset
+        self.refocus_timing = dict()
+        self.reset_refocus_timing()
+        self._refocus_start_time = 0.
+        self._refocus_scan_time = 0.
+        self._refocus_fit_time = 0.
+
     def on_activate(self):
         """ Initialisation performed during activation of the module.
 
@@ -101,6 +115,8 @@ class OptimizerLogic(GenericLogic):
         self.optim_sigma_x = 0.
         self.optim_sigma_y = 0.
         self.optim_sigma_z = 0.
+        # widths of the last successful fits, start values of the fits of a fast refocus
+        self._last_sigma = {'x': 0., 'y': 0., 'z': 0.}
 
         self._max_offset = 3.
 
@@ -124,6 +140,7 @@ class OptimizerLogic(GenericLogic):
 
         # Sets connections between signals and functions
         self._sigScanNextXyLine.connect(self._refocus_xy_line, QtCore.Qt.QueuedConnection)
+        self._sigScanXyCross.connect(self._refocus_xy_cross, QtCore.Qt.QueuedConnection)
         self._sigScanZLine.connect(self.do_z_optimization, QtCore.Qt.QueuedConnection)
         self._sigCompletedXyOptimizerScan.connect(self._set_optimized_xy_from_fit, QtCore.Qt.QueuedConnection)
 
@@ -225,6 +242,10 @@ class OptimizerLogic(GenericLogic):
         self._optimization_step = 0
         self.check_optimization_sequence()
 
+        self._refocus_start_time = time.perf_counter()
+        self._refocus_scan_time = 0.
+        self._refocus_fit_time = 0.
+
         scanner_status = self.start_scanner()
         if scanner_status < 0:
             self.sigRefocusFinished.emit(
@@ -239,6 +260,17 @@ class OptimizerLogic(GenericLogic):
         with self.threadlock:
             self.stopRequested = True
 
+    def reset_refocus_timing(self):
+        """ Reset the duration statistics of the refocus procedures (refocus_timing). """
+        self.refocus_timing = {'number_of_refocus': 0,
+                               'total_duration': 0.,
+                               'mean_duration': 0.,
+                               'last_duration': 0.,
+                               'last_scan_time': 0.,
+                               'last_fit_time': 0.,
+                               'last_fast_refocus': False}
+        self.sigRefocusTimingUpdated.emit(dict(self.refocus_timing))
+
     def _initialize_xy_refocus_image(self):
         """Initialisation of the xy refocus image."""
         self._xy_scan_line_count = 0
@@ -281,8 +313,9 @@ class OptimizerLogic(GenericLogic):
         zmin = np.clip(z0 - 0.5 * self.refocus_Z_size, self.z_range[0], self.z_range[1])
         zmax = np.clip(z0 + 0.5 * self.refocus_Z_size, self.z_range[0], self.z_range[1])
 
-        self._zimage_Z_values = np.linspace(zmin, zmax, num=self.optimizer_Z_res)
-        self._fit_zimage_Z_values = np.linspace(zmin, zmax, num=self.optimizer_Z_res)
+        z_res = self.fast_refocus_points if self.fast_refocus else self.optimizer_Z_res
+        self._zimage_Z_values = np.linspace(zmin, zmax, num=z_res)
+        self._fit_zimage_Z_values = np.linspace(zmin, zmax, num=z_res)
         self._zimage_A_values = np.zeros(self._zimage_Z_values.shape)
         self.z_refocus_line = np.zeros((
             len(self._zimage_Z_values),
@@ -304,13 +337,26 @@ class OptimizerLogic(GenericLogic):
         else:
             move_to_start_line = np.vstack((lsx, lsy, lsz, np.ones(lsx.shape) * scanner_pos[3]))
 
-        counts = self._scanning_device.scan_line(move_to_start_line)
+        counts = self._timed_scan_line(move_to_start_line)
         if np.any(counts == -1):
             return -1
 
         time.sleep(self.hw_settle_time)
+        self._refocus_scan_time += self.hw_settle_time
         return 0
 
+    def _timed_scan_line(self, line):
+        """ Scan a line and add its duration to the scan time of the current refocus.
+
+        @param numpy.ndarray line: positions of the line (axes x positions)
+
+        @return numpy.ndarray: counts of the line
+        """
+        start_time = time.perf_counter()
+        counts = self._scanning_device.scan_line(line)
+        self._refocus_scan_time += time.perf_counter() - start_time
+        return counts
+
     def _refocus_xy_line(self):
         """Scanning a line of the xy optimization image.
         This method repeats itself using the _sigScanNextXyLine
@@ -349,7 +395,7 @@ class OptimizerLogic(GenericLogic):
         else:
             line = np.vstack((lsx, lsy, lsz, np.zeros(lsx.shape)))
 
-        line_counts = self._scanning_device.scan_line(line)
+        line_counts = self._timed_scan_line(line)
         if np.any(line_counts == -1):
             self.log.error('The scan went wrong, killing the scanner.')
             self.stop_refocus()
@@ -364,7 +410,7 @@ class OptimizerLogic(GenericLogic):
         else:
             return_line = np.vstack((lsx, lsy, lsz, np.zeros(lsx.shape)))
 
-        return_line_counts = self._scanning_device.scan_line(return_line)
+        return_line_counts = self._timed_scan_line(return_line)
         if np.any(return_line_counts == -1):
             self.log.error('The scan went wrong, killing the scanner.')
             self.stop_refocus()
@@ -382,17 +428,114 @@ class OptimizerLogic(GenericLogic):
         else:
             self._sigCompletedXyOptimizerScan.emit()
 
+    def _refocus_xy_cross(self):
+        """Scanning an x and a y line through the current optimum and fitting a gaussian to each of
+        them (fast refocus). The fits start from the previous result. A spot found at the edge of
+        its line is scanned once more with the line centered on it. If a fit does not find the
+        spot on its line, the full xy optimization image is scanned instead.
+        """
+        n_ch = len(self._scanning_device.get_scanner_axes())
+        # stop scanning if instructed
+        if self.stopRequested:
+            with self.threadlock:
+                self.stopRequested = False
+                self.finish_refocus()
+                self.sigImageUpdated.emit()
+                return
+
+        for axis, name in enumerate(('x', 'y')):
+            for scan in range(2):
+                values, result = self._scan_cross_line(axis, n_ch)
+                if result is None:
+                    self.stop_refocus()
+                    self._sigScanXyCross.emit()
+                    return
+
+                center = result.best_values['center']
+                if result.success is False or not values[0] <= center <= values[-1]:
+                    self.log.warning('Fast refocus did not find the spot along {0}, scanning the '
+                                     'full xy optimization image instead.'.format(name))
+                    self._initialize_xy_refocus_image()
+                    self._sigScanNextXyLine.emit()
+                    return
+                if axis == 0:
+                    self.optim_pos_x = center
+                    self.optim_sigma_x = result.best_values['sigma']
+                else:
+                    self.optim_pos_y = center
+                    self.optim_sigma_y = result.best_values['sigma']
+                if values[1] <= center <= values[-2]:
+                    break
+
+        self.sigImageUpdated.emit()
+        self._sigDoNextOptimizationStep.emit()
+
+    def _scan_cross_line(self, axis, n_ch):
+        """ Scan a line of the fast refocus cross through the current optimum and fit a gaussian.
+
+        @param int axis: index of the scanner axis along the line (0: x, 1: y)
+        @param int n_ch: number of scanner axes
+
+        @return (numpy.ndarray, lmfit.model.ModelResult): positions along the line and the fit
+                                                          result (None if the scan failed)
+        """
+        position = [self.optim_pos_x, self.optim_pos_y, self.optim_pos_z, 0.]
+        axis_range = self.x_range if axis == 0 else self.y_range
+        values = np.linspace(
+            np.clip(position[axis] - 0.5 * self.refocus_XY_size, axis_range[0], axis_range[1]),
+            np.clip(position[axis] + 0.5 * self.refocus_XY_size, axis_range[0], axis_range[1]),
+            num=self.fast_refocus_points)
+        line = np.outer(position[0:n_ch], np.ones(values.shape))
+        line[axis] = values
+
+        status = self._move_to_start_pos(line[0:3, 0])
+        if status < 0:
+            self.log.error('Error during move to starting point.')
+            return values, None
+
+        line_counts = self._timed_scan_line(line)
+        if np.any(line_counts == -1):
+            self.log.error('The scan went wrong, killing the scanner.')
+            return values, None
+
+        fit_start_time = time.perf_counter()
+        result = self._fit_logic.make_gaussian_fit(
+            x_axis=values,
+            data=line_counts[:, self.opt_channel],
+            estimator=self._fit_logic.estimate_gaussian_peak,
+            add_params=self._get_fit_seed('xy'[axis], position[axis]))
+        self._refocus_fit_time += time.perf_counter() - fit_start_time
+        return values, result
+
+    def _get_fit_seed(self, axis, center):
+        """ Start values of a gaussian fit along an axis of a fast refocus: the current optimum and
+        the width of the last successful fit.
+
+        @param str axis: 'x', 'y' or 'z'
+        @param float center: current optimum position along the axis
+
+        @return dict: parameters for add_params of the fit (None if not a fast refocus)
+        """
+        if not self.fast_refocus:
+            return None
+        seed = {'center': {'value': center}}
+        if self._last_sigma[axis] > 0:
+            seed['sigma'] = {'value': self._last_sigma[axis]}
+        return seed
+
     def _set_optimized_xy_from_fit(self):
         """Fit the completed xy optimizer scan and set the optimized xy position."""
         fit_x, fit_y = np.meshgrid(self._X_values, self._Y_values)
         xy_fit_data = self.xy_refocus_image[:, :, 3+self.opt_channel].ravel()
         axes = np.empty((len(self._X_values) * len(self._Y_values), 2))
         axes = (fit_x.flatten(), fit_y.flatten())
+        fit_start_time = time.perf_counter()
         result_2D_gaus = self._fit_logic.make_twoDgaussian_fit(
             xy_axes=axes,
             data=xy_fit_data,
             estimator=self._fit_logic.estimate_twoDgaussian_MLE
         )
+        self._refocus_fit_time += time.perf_counter() - fit_start_time
         # print(result_2D_gaus.fit_report())
 
         if result_2D_gaus.success is False:
@@ -427,6 +570,7 @@ class OptimizerLogic(GenericLogic):
         self._scan_z_line()
 
         # z-fit
+        fit_start_time = time.perf_counter()
         # If subtracting surface, then data can go negative and the gaussian fit offset constraints need to be adjusted
         if self.do_surface_subtraction:
             adjusted_param = {'offset': {
@@ -450,8 +594,10 @@ class OptimizerLogic(GenericLogic):
                     x_axis=self._zimage_Z_values,
                     data=self.z_refocus_line[:, self.opt_channel],
                     units='m',
-                    estimator=self._fit_logic.estimate_gaussianlinearoffset_peak
+                    estimator=self._fit_logic.estimate_gaussianlinearoffset_peak,
+                    add_params=self._get_fit_seed('z', self.optim_pos_z)
                     )
+        self._refocus_fit_time += time.perf_counter() - fit_start_time
         self.z_params = result.params
 
         if result.success is False:
@@ -493,15 +639,36 @@ class OptimizerLogic(GenericLogic):
         """ Finishes up and releases hardware after the optimizer scans."""
         self.kill_scanner()
 
+        # the widths found are the start values of the next fast refocus
+        for axis, sigma in zip(('x', 'y', 'z'),
+                               (self.optim_sigma_x, self.optim_sigma_y, self.optim_sigma_z)):
+            if sigma > 0:
+                self._last_sigma[axis] = sigma
+
+        duration = time.perf_counter() - self._refocus_start_time
+        timing = self.refocus_timing
+        timing['number_of_refocus'] += 1
+        timing['total_duration'] += duration
+        timing['mean_duration'] = timing['total_duration'] / timing['number_of_refocus']
+        timing['last_duration'] = duration
+        timing['last_scan_time'] = self._refocus_scan_time
+        timing['last_fit_time'] = self._refocus_fit_time
+        timing['last_fast_refocus'] = bool(self.fast_refocus)
+        self.sigRefocusTimingUpdated.emit(dict(timing))
+
         self.log.info(
                 'Optimised from ({0:.3e},{1:.3e},{2:.3e}) to local '
-                'maximum at ({3:.3e},{4:.3e},{5:.3e}).'.format(
+                'maximum at ({3:.3e},{4:.3e},{5:.3e}) in {6:.2f} s (scanning {7:.2f} s, fitting '
+                '{8:.2f} s).'.format(
                     self._initial_pos_x,
                     self._initial_pos_y,
                     self._initial_pos_z,
                     self.optim_pos_x,
                     self.optim_pos_y,
-                    self.optim_pos_z))
+                    self.optim_pos_z,
+                    duration,
+                    self._refocus_scan_time,
+                    self._refocus_fit_time))
 
         # Signal that the optimization has finished, and "return" the optimal position along with
         # caller_tag
@@ -533,7 +700,7 @@ class OptimizerLogic(GenericLogic):
             line = np.vstack((scan_x_line, scan_y_line, scan_z_line, np.zeros(scan_x_line.shape)))
 
         # Perform scan
-        line_counts = self._scanning_device.scan_line(line)
+        line_counts = self._timed_scan_line(line)
         if np.any(line_counts == -1):
             self.log.error('Z scan went wrong, killing the scanner.')
             self.stop_refocus()
@@ -565,7 +732,7 @@ class OptimizerLogic(GenericLogic):
                      scan_z_line,
                      np.zeros(scan_x_line.shape)))
 
-            line_bg_counts = self._scanning_device.scan_line(line_bg)
+            line_bg_counts = self._timed_scan_line(line_bg)
             if np.any(line_bg_counts[0] == -1):
                 self.log.error('The scan went wrong, killing the scanner.')
                 self.stop_refocus()
@@ -628,7 +795,9 @@ class OptimizerLogic(GenericLogic):
         self._optimization_step += 1
 
         # Launch the next step
-        if this_step == 'XY':
+        if this_step == 'XY' and self.fast_refocus:
+            self._sigScanXyCross.emit()
+        elif this_step == 'XY':
             self._initialize_xy_refocus_image()
             self._sigScanNextXyLine.emit()
         elif this_step == 'Z':
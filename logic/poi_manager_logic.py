@@ -388,6 +388,9 @@ class PoiManagerLogic(GenericLogic):
         self.__timer = None
         self._last_refocus = 0
         self._periodic_refocus_poi = None
+        # start of the periodic refocus and time spent refocusing since
+        self._periodic_refocus_start = 0
+        self._periodic_refocus_dead_time = 0.
 
         # threading
         self._threadlock = Mutex()
@@ -537,6 +540,14 @@ class PoiManagerLogic(GenericLogic):
             return -1
         return max(0., self._refocus_period - (time.time() - self._last_refocus))
 
+    @property
+    def periodic_refocus_dead_time(self):
+        """ Fraction of the time since the start of the periodic refocus spent refocusing """
+        if self._periodic_refocus_poi is None:
+            return 0.
+        elapsed = time.time() - self._periodic_refocus_start
+        return self._periodic_refocus_dead_time / elapsed if elapsed > 0 else 0.
+
     @property
     def scanner_position(self):
         return self.scannerlogic().get_position()[:3]
@@ -903,6 +914,8 @@ class PoiManagerLogic(GenericLogic):
                 return
             self.module_state.lock()
             self._periodic_refocus_poi = name
+            self._periodic_refocus_start = time.time()
+            self._periodic_refocus_dead_time = 0.
             self.optimise_poi_position(name=name)
             self._last_refocus = time.time()
             self.__timer.timeout.connect(self._periodic_refocus_loop)
@@ -996,6 +1009,12 @@ class PoiManagerLogic(GenericLogic):
         if caller_tag.startswith('poimanager_') or caller_tag.startswith('poimanagermoveroi_'):
             shift_roi = caller_tag.startswith('poimanagermoveroi_')
             poi_name = caller_tag.split('_', 1)[1]
+            if poi_name == self._periodic_refocus_poi:
+                duration = self.optimiserlogic().refocus_timing['last_duration']
+                self._periodic_refocus_dead_time += duration
+                self.log.info('Periodic refocus of POI "{0}" took {1:.2f} s, {2:.1%} of the time '
+                              'since the periodic refocus started.'
+                              ''.format(poi_name, duration, self.periodic_refocus_dead_time))
             if poi_name in self.poi_names:
                 # We only need x, y, z
                 optimal_pos = np.array(optimal_pos[:3], dtype=float)
@@ -36,6 +36,11 @@ class PulseAnalyzerBase:
 
     See BasicPulseAnalyzer class for an example usage.
     """
+    # Names of the analysis methods of this class that analyse each laser pulse independently of
+    # all others. Only those methods can be used by the incremental analysis of
+    # PulsedMeasurementLogic to analyse a subset of the laser pulses.
+    laserwise_methods = frozenset()
+
     def __init__(self, pulsedmeasurementlogic):
         self.__pulsedmeasurementlogic = pulsedmeasurementlogic
 
@@ -77,6 +82,8 @@ class PulseAnalyzer(PulseAnalyzerBase):
     7) Make sure that no two analysis methods in any module share a keyword argument of different
        default data type.
     8) The keyword "method" must not be used in the analysis method parameters
+    9) Analysis methods that analyse each laser pulse independently of all others should be listed
+       in the class attribute "laserwise_methods"
 
     See BasicPulseAnalyzer class for an example usage.
     """
@@ -89,6 +96,8 @@ class PulseAnalyzer(PulseAnalyzerBase):
         self._analysis_methods = dict()
         # dictionary containing all possible parameters that can be used by the analysis methods
         self._parameters = dict()
+        # Names of all analysis methods analysing each laser pulse independently
+        self._laserwise_analysis_methods = set()
         # Currently selected analysis method
         self._current_analysis_method = None
 
@@ -191,6 +200,16 @@ class PulseAnalyzer(PulseAnalyzerBase):
         settings_dict['method'] = self._current_analysis_method
         return settings_dict
 
+    @property
+    def is_laserwise(self):
+        """
+        Flag indicating if the currently selected analysis method analyses each laser pulse
+        independently of all others, i.e. if it can be applied to a subset of the laser pulses.
+
+        @return bool: True if the current method works laser by laser, False otherwise
+        """
+        return self._current_analysis_method in self._laserwise_analysis_methods
+
     def analyse_laser_pulses(self, laser_data):
         """
         Wrapper method to call the currently selected analysis method with laser_data and the
@@ -277,10 +296,13 @@ class PulseAnalyzer(PulseAnalyzerBase):
         @param list instance_list: List containing instances of analyzer classes
         """
         self._analysis_methods = dict()
+        self._laserwise_analysis_methods = set()
         for instance in instance_list:
             for method_name, method_ref in inspect.getmembers(instance, inspect.ismethod):
                 if method_name.startswith('analyse_'):
                     self._analysis_methods[method_name[8:]] = method_ref
+                    if method_name in instance.laserwise_methods:
+                        self._laserwise_analysis_methods.add(method_name[8:])
         return
 
     def __populate_parameter_dict(self):
@@ -31,6 +31,30 @@ class BasicPulseExtractor(PulseExtractorBase):
     """
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        # Flank indices found by the last full flank detection of the conv_deriv methods.
+        # Keys are the method names, values are tuples (cache key, rising indices, falling indices).
+        self._flank_cache = dict()
+        self.flank_cache_hits = 0
+        self.flank_cache_misses = 0
+
+    def get_flank_cache_statistics(self):
+        """
+        Statistics of the flank cache used by the conv_deriv extraction methods.
+
+        @return dict: number of extractions using cached flanks ("hits") and number of full flank
+                      detections ("misses")
+        """
+        return {'hits': self.flank_cache_hits, 'misses': self.flank_cache_misses}
+
+    def clear_flank_cache(self):
+        """ Forget all cached flank indices and reset the statistics. """
+        self._flank_cache = dict()
+        self.flank_cache_hits = 0
+        self.flank_cache_misses = 0
+
+    def clear_caches(self):
+        """ The cached flanks are only valid for the current measurement and sequence. """
+        self.clear_flank_cache()
 
     def gated_conv_deriv(self, count_data, conv_std_dev=20.0, flank_width=0):
         """
@@ -52,27 +76,45 @@ class BasicPulseExtractor(PulseExtractorBase):
                        'laser_indices_rising': -1,
                        'laser_indices_falling': -1}
 
-        # sum up all gated timetraces to ease flank detection
-        timetrace_sum = np.sum(count_data, 0)
-
-        # apply gaussian filter to remove noise and compute the gradient of the timetrace sum
-        try:
-            conv = ndimage.filters.gaussian_filter1d(timetrace_sum.astype(float), conv_std_dev)
-        except:
-            conv = np.zeros(timetrace_sum.size)
-        try:
-            conv_deriv = np.gradient(conv)
-        except:
-            conv_deriv = np.zeros(conv.size)
+        # Check if the flanks found in the previous call are still valid
+        cache_key = (np.shape(count_data), conv_std_dev)
+        cached_flanks = self._get_cached_flanks(
+            'gated_conv_deriv', cache_key, count_data, conv_std_dev, int(conv_std_dev))
+        if cached_flanks is not None:
+            trace_length = count_data.shape[1]
+            extraction_failed = False
+            flank_max, flank_min = cached_flanks[0][0], cached_flanks[1][0]
+        else:
+            # sum up all gated timetraces to ease flank detection
+            timetrace_sum = np.sum(count_data, 0)
+            trace_length = len(timetrace_sum)
+
+            # apply gaussian filter to remove noise and compute the gradient of the timetrace sum
+            try:
+                conv = ndimage.filters.gaussian_filter1d(timetrace_sum.astype(float), conv_std_dev)
+            except:
+                conv = np.zeros(timetrace_sum.size)
+            try:
+                conv_deriv = np.gradient(conv)
+            except:
+                conv_deriv = np.zeros(conv.size)
+
+            flank_max, flank_min = conv_deriv.argmax(), conv_deriv.argmin()
+            # If gaussian smoothing or derivative failed, the returned array only contains zeros.
+            extraction_failed = len(conv_deriv.nonzero()[0]) == 0
+            if not extraction_failed:
+                self._flank_cache['gated_conv_deriv'] = (cache_key,
+                                                         np.array([flank_max], dtype='int64'),
+                                                         np.array([flank_min], dtype='int64'))
 
         # get indices of rising and falling flank
-        rising_ind, falling_ind = sorted([int(np.clip(conv_deriv.argmax() - flank_width, 0, len(timetrace_sum))),
-                                          int(np.clip(conv_deriv.argmin() + flank_width, 0, len(timetrace_sum)))
+        rising_ind, falling_ind = sorted([int(np.clip(flank_max - flank_width, 0, trace_length)),
+                                          int(np.clip(flank_min + flank_width, 0, trace_length))
                                           ])
 
-        # If gaussian smoothing or derivative failed, the returned array only contains zeros.
-        # Check for that and return also only zeros to indicate a failed pulse extraction.
-        if len(conv_deriv.nonzero()[0]) == 0:
+        # Check for a failed flank detection and return also only zeros to indicate a failed pulse
+        # extraction.
+        if extraction_failed:
             laser_arr = np.zeros(count_data.shape, dtype='int64')
         else:
             # slice the data array to cut off anything but laser pulses
@@ -133,6 +175,55 @@ class BasicPulseExtractor(PulseExtractorBase):
         if not isinstance(number_of_lasers, int):
             return return_dict
 
+        # Check if the flanks found in the previous call are still valid. The refined flank
+        # positions are the extrema of the derivative smoothed with a standard deviation of 10 bins.
+        cache_key = (np.shape(count_data), conv_std_dev, number_of_lasers)
+        cached_flanks = self._get_cached_flanks(
+            'ungated_conv_deriv', cache_key, count_data, 10, int(conv_std_dev))
+        if cached_flanks is not None:
+            rising_ind, falling_ind = cached_flanks
+        else:
+            rising_ind, falling_ind = self._find_ungated_flanks(count_data, conv_std_dev,
+                                                                number_of_lasers)
+            # if gaussian smoothing or derivative failed, the returned array only contains zeros.
+            if rising_ind is None:
+                return_dict['laser_counts_arr'] = np.zeros((number_of_lasers, 10), dtype='int64')
+                return return_dict
+            # Only cache plausible flanks, i.e. rising and falling flanks alternate
+            if self._flanks_alternate(rising_ind, falling_ind):
+                self._flank_cache['ungated_conv_deriv'] = (cache_key, rising_ind.copy(),
+                                                           falling_ind.copy())
+
+        # find the maximum laser length to use as size for the laser array
+        laser_length = np.max(falling_ind - rising_ind)
+
+        # initialize the empty output array
+        laser_arr = np.zeros((number_of_lasers, laser_length), dtype='int64')
+        # slice the detected laser pulses of the timetrace and save them in the
+        # output array according to the found rising edge
+        for i in range(number_of_lasers):
+            if rising_ind[i] + laser_length > count_data.size:
+                lenarr = count_data[rising_ind[i]:].size
+                laser_arr[i, 0:lenarr] = count_data[rising_ind[i]:]
+            else:
+                laser_arr[i] = count_data[rising_ind[i]:rising_ind[i] + laser_length]
+
+        return_dict['laser_counts_arr'] = laser_arr.astype('int64')
+        return_dict['laser_indices_rising'] = rising_ind
+        return_dict['laser_indices_falling'] = falling_ind
+        return return_dict
+
+    def _find_ungated_flanks(self, count_data, conv_std_dev, number_of_lasers):
+        """
+        Full flank detection of ungated_conv_deriv (see there for a description of the procedure).
+
+        @param numpy.ndarray count_data: The raw timetrace data (1D) from an ungated fast counter
+        @param float conv_std_dev: The standard deviation of the gaussian used for smoothing
+        @param int number_of_lasers: The number of laser pulses to find
+
+        @return (numpy.ndarray, numpy.ndarray): sorted indices of the rising and falling flanks or
+                                                (None, None) if the flank detection failed.
+        """
         # apply gaussian filter to remove noise and compute the gradient of the timetrace sum
         try:
             conv = ndimage.filters.gaussian_filter1d(count_data.astype(float), conv_std_dev)
@@ -144,10 +235,9 @@ class BasicPulseExtractor(PulseExtractorBase):
             conv_deriv = np.zeros(conv.size)
 
         # if gaussian smoothing or derivative failed, the returned array only contains zeros.
-        # Check for that and return also only zeros to indicate a failed pulse extraction.
+        # Check for that and return None to indicate a failed flank detection.
         if len(conv_deriv.nonzero()[0]) == 0:
-            return_dict['laser_counts_arr'] = np.zeros((number_of_lasers, 10), dtype='int64')
-            return return_dict
+            return None, None
 
         # use a reference for array, because the exact position of the peaks or dips
         # (i.e. maxima or minima, which are the inflection points in the pulse) are distorted by
@@ -234,25 +324,100 @@ class BasicPulseExtractor(PulseExtractorBase):
         # sort all indices of rising and falling flanks
         rising_ind.sort()
         falling_ind.sort()
+        return rising_ind, falling_ind
 
-        # find the maximum laser length to use as size for the laser array
-        laser_length = np.max(falling_ind - rising_ind)
+    def _get_cached_flanks(self, method_name, cache_key, count_data, std_dev, search_width):
+        """
+        Validate the flanks cached for an extraction method by only evaluating small windows of
+        the count data around them. The flanks are still valid if the maximum (minimum) of the
+        smoothed derivative within +-search_width bins around each cached rising (falling) flank
+        does not lie on the border of this search window. The flanks are moved to these extrema.
+
+        @param str method_name: name of the extraction method the flanks were found by
+        @param tuple cache_key: parameters the flank detection depends on
+        @param numpy.ndarray count_data: the raw timetrace data (2D for gated, 1D for ungated)
+        @param float std_dev: standard deviation of the gaussian filter used for smoothing
+        @param int search_width: number of bins to search on each side of a flank
+
+        @return (numpy.ndarray, numpy.ndarray)|None: cached rising and falling flank indices or None
+                                                     if no valid flanks are cached.
+        """
+        cached = self._flank_cache.get(method_name)
+        if cached is None or cached[0] != cache_key:
+            self.flank_cache_misses += 1
+            return None
 
-        # initialize the empty output array
-        laser_arr = np.zeros((number_of_lasers, laser_length), dtype='int64')
-        # slice the detected laser pulses of the timetrace and save them in the
-        # output array according to the found rising edge
-        for i in range(number_of_lasers):
-            if rising_ind[i] + laser_length > count_data.size:
-                lenarr = count_data[rising_ind[i]:].size
-                laser_arr[i, 0:lenarr] = count_data[rising_ind[i]:]
-            else:
-                laser_arr[i] = count_data[rising_ind[i]:rising_ind[i] + laser_length]
+        rising_ind, falling_ind = cached[1], cached[2]
+        search_width = max(1, search_width)
+        try:
+            conv_deriv = self._windowed_conv_deriv(count_data,
+                                                   np.concatenate((rising_ind, falling_ind)),
+                                                   std_dev,
+                                                   search_width)
+        except:
+            conv_deriv = None
+        if conv_deriv is not None:
+            # Offsets of the extrema within the search windows
+            rising_offset = conv_deriv[:len(rising_ind)].argmax(axis=1)
+            falling_offset = conv_deriv[len(rising_ind):].argmin(axis=1)
+            offsets = np.concatenate((rising_offset, falling_offset))
+            # The flanks are valid if the extrema do not lie on the border of the search windows.
+            # Small shifts due to shot noise are tracked.
+            rising_ind = np.sort(rising_ind + rising_offset - search_width)
+            falling_ind = np.sort(falling_ind + falling_offset - search_width)
+            if np.all((offsets > 0) & (offsets < 2 * search_width)) and self._flanks_alternate(
+                    rising_ind, falling_ind):
+                self._flank_cache[method_name] = (cache_key, rising_ind, falling_ind)
+                self.flank_cache_hits += 1
+                return rising_ind.copy(), falling_ind.copy()
+
+        self.log.debug('Laser pulse flanks have moved. Performing full flank detection.')
+        self._flank_cache.pop(method_name, None)
+        self.flank_cache_misses += 1
+        return None
+
+    @staticmethod
+    def _flanks_alternate(rising_ind, falling_ind):
+        """
+        Check if each rising flank is followed by a falling flank before the next rising flank.
 
-        return_dict['laser_counts_arr'] = laser_arr.astype('int64')
-        return_dict['laser_indices_rising'] = rising_ind
-        return_dict['laser_indices_falling'] = falling_ind
-        return return_dict
+        @param numpy.ndarray rising_ind: sorted indices of the rising flanks
+        @param numpy.ndarray falling_ind: sorted indices of the falling flanks
+
+        @return bool: True if rising and falling flanks alternate, False otherwise
+        """
+        return len(rising_ind) == len(falling_ind) and bool(
+            np.all(rising_ind < falling_ind) and np.all(falling_ind[:-1] < rising_ind[1:]))
+
+    @staticmethod
+    def _windowed_conv_deriv(count_data, centers, std_dev, half_width):
+        """
+        Gradient of the gaussian smoothed timetrace in windows of +-half_width bins around the given
+        center indices. Gated timetraces are summed up first (only within the windows).
+        The result is identical to the corresponding part of the gradient of the whole smoothed
+        timetrace except for the first and last bin of the timetrace.
+
+        @param numpy.ndarray count_data: the raw timetrace data (2D for gated, 1D for ungated)
+        @param numpy.ndarray centers: center indices of the windows
+        @param float std_dev: standard deviation of the gaussian filter used for smoothing
+        @param int half_width: number of bins on each side of the window centers
+
+        @return 2D numpy.ndarray: gradient for each window (dim 0: window; dim 1: bin)
+        """
+        trace_length = count_data.shape[-1]
+        # additional bins needed for the truncated gaussian kernel and the gradient
+        margin = int(4.0 * std_dev + 0.5) + 1
+        bins = centers[:, np.newaxis] + np.arange(-half_width - margin, half_width + margin + 1)
+        # mirror at the timetrace boundaries like the default mode of gaussian_filter1d
+        bins = np.where(bins < 0, -bins - 1, bins)
+        bins = np.where(bins >= trace_length, 2 * trace_length - bins - 1, bins)
+        bins = np.clip(bins, 0, trace_length - 1)
+        if count_data.ndim == 2:
+            windows = count_data[:, bins].sum(axis=0)
+        else:
+            windows = count_data[bins]
+        conv = ndimage.filters.gaussian_filter1d(windows.astype(float), std_dev, axis=1)
+        return np.gradient(conv, axis=1)[:, margin:margin + 2 * half_width + 1]
 
     def ungated_threshold(self, count_data, count_threshold=10, min_laser_length=200e-9,
                           threshold_tolerance=20e-9):
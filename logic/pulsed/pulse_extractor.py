@@ -59,6 +59,14 @@ class PulseExtractorBase:
     def log(self):
         return self.__pulsedmeasurementlogic.log
 
+    def clear_caches(self):
+        """
+        Forget all results cached between extractions (e.g. flank positions). Called by
+        PulsedMeasurementLogic whenever a measurement is started or the sequence changes.
+        Extractor classes caching results must override this method.
+        """
+        pass
+
 
 class PulseExtractor(PulseExtractorBase):
     """
@@ -102,11 +110,11 @@ class PulseExtractor(PulseExtractorBase):
         # Import extraction modules and get a list of extractor classes
         extractor_classes = self.__import_external_extractors(paths=path_list)
 
-        # create an instance of each class and put them in a temporary list
-        extractor_instances = [cls(pulsedmeasurementlogic) for cls in extractor_classes]
+        # create an instance of each class and keep them to clear their caches
+        self._extractor_instances = [cls(pulsedmeasurementlogic) for cls in extractor_classes]
 
         # add references to all extraction methods in each instance to a dict
-        self.__populate_method_dicts(instance_list=extractor_instances)
+        self.__populate_method_dicts(instance_list=self._extractor_instances)
 
         # populate "_parameters" dictionary from extraction method signatures
         self.__populate_parameter_dict()
@@ -202,6 +210,13 @@ class PulseExtractor(PulseExtractorBase):
         settings_dict['method'] = self._current_extraction_method
         return settings_dict
 
+    def clear_caches(self):
+        """
+        Clear the caches of all extractor instances (see PulseExtractorBase.clear_caches).
+        """
+        for instance in self._extractor_instances:
+            instance.clear_caches()
+
     def extract_laser_pulses(self, count_data):
         """
         Wrapper method to call the currently selected extraction method with count_data and the
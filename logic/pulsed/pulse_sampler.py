@@ -0,0 +1,475 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains the Qudi helper classes to sample PulseBlockEnsembles into waveform chunks.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import sys
+import uuid
+import pickle
+import numpy as np
+from collections import deque
+from logic.pulsed.sampling_functions import SamplingFunctions
+
+
+class EnsembleSamplerBase:
+    """
+    Base class for all sampling engines used by SequenceGeneratorLogic.
+
+    A sampling engine translates a PulseBlockEnsemble into consecutive chunks of analog (float32)
+    and digital (bool) samples. The sample arrays to fill are preallocated by the caller and
+    handed over to iter_chunks, the engine fills them chunk by chunk and yields views on them.
+
+    All engines must produce exactly the same samples. The only exception is
+    LookupTableEnsembleSampler which trades exactness on the level of floating point rounding for
+    speed.
+    """
+    def __init__(self, ensemble, blocks, ensemble_info, analog_amplitudes, sample_rate,
+                 offset_bin=0):
+        """
+        @param PulseBlockEnsemble ensemble: The ensemble to sample
+        @param dict blocks: PulseBlock instances used in ensemble with their names as keys
+        @param dict ensemble_info: Information about the ensemble as returned by
+                                   SequenceGeneratorLogic.analyze_block_ensemble
+        @param dict analog_amplitudes: peak-to-peak amplitudes (V) of all analog channels
+        @param float sample_rate: The sample rate in Hz
+        @param int offset_bin: Offset of the first sample in the rotating frame
+        """
+        self.ensemble = ensemble
+        self.blocks = blocks
+        self.elements_length_bins = ensemble_info['elements_length_bins']
+        self.analog_channels = sorted(ensemble_info['analog_channels'])
+        self.digital_channels = sorted(ensemble_info['digital_channels'])
+        self.number_of_samples = int(ensemble_info['number_of_samples'])
+        self.analog_amplitudes = analog_amplitudes
+        self.sample_rate = sample_rate
+        self.offset_bin = offset_bin
+
+    @property
+    def final_offset_bin(self):
+        """ Offset bin to pass on to the next ensemble in order to maintain the rotating frame """
+        if self.ensemble.rotating_frame:
+            return self.offset_bin + self.number_of_samples
+        return self.offset_bin
+
+    def iter_chunks(self, array_length, analog_samples, digital_samples):
+        """
+        Generator filling the preallocated sample arrays chunk by chunk.
+
+        @param int array_length: Maximum number of samples per chunk
+        @param dict analog_samples: float32 arrays of at least array_length with channel keys
+        @param dict digital_samples: bool arrays of at least array_length with channel keys
+
+        @return (dict, dict): analog and digital sample arrays of the current chunk. The arrays
+                              are views on the passed buffers and only valid until the next chunk
+                              is requested.
+        """
+        raise NotImplementedError
+
+
+class LegacyEnsembleSampler(EnsembleSamplerBase):
+    """
+    Sampling engine iterating over every block, repetition and PulseBlockElement and calling the
+    sampling functions once per element and channel.
+    """
+    def iter_chunks(self, array_length, analog_samples, digital_samples):
+        number_of_samples = self.number_of_samples
+        offset_bin = self.offset_bin
+        # integer to keep track of the sampls already processed
+        processed_samples = 0
+        # Index to keep track of the samples written into the preallocated samples array
+        array_write_index = 0
+        # Keep track of the number of elements already written
+        element_count = 0
+        # Iterate over all blocks within the PulseBlockEnsemble object
+        for block_name, reps in self.ensemble.block_list:
+            block = self.blocks[block_name]
+            # Iterate over all repetitions of the current block
+            for rep_no in range(reps + 1):
+                # Iterate over the PulseBlockElement instances inside the current block
+                for element in block.element_list:
+                    digital_high = element.digital_high
+                    pulse_function = element.pulse_function
+                    element_length_bins = self.elements_length_bins[element_count]
+
+                    # Indicator on how many samples of this element have been written already
+                    element_samples_written = 0
+
+                    while element_samples_written != element_length_bins:
+                        samples_to_add = min(array_length - array_write_index,
+                                             element_length_bins - element_samples_written)
+                        # create floating point time array for the current element inside rotating
+                        # frame if analog samples are to be calculated.
+                        if pulse_function:
+                            time_arr = (offset_bin + np.arange(
+                                samples_to_add, dtype='float64')) / self.sample_rate
+
+                        # Calculate respective part of the sample arrays
+                        for chnl in digital_high:
+                            digital_samples[chnl][array_write_index:array_write_index + samples_to_add] = digital_high[
+                                chnl]
+                        for chnl in pulse_function:
+                            analog_samples[chnl][array_write_index:array_write_index + samples_to_add] = pulse_function[
+                                                                                                             chnl].get_samples(
+                                time_arr) / (self.analog_amplitudes[chnl] / 2)
+
+                        # Free memory
+                        if pulse_function:
+                            del time_arr
+
+                        element_samples_written += samples_to_add
+                        array_write_index += samples_to_add
+                        processed_samples += samples_to_add
+                        # if the rotating frame should be preserved (default) increment the offset
+                        # counter for the time array.
+                        if self.ensemble.rotating_frame:
+                            offset_bin += samples_to_add
+
+                        # Check if the temporary sample array is full and hand it over if so.
+                        if array_write_index == array_length:
+                            yield analog_samples, digital_samples
+
+                            # Reset array write start pointer
+                            array_write_index = 0
+
+                            # check if the temporary write array needs to be truncated for the next
+                            # part. (because it is the last part of the ensemble to write which can
+                            # be shorter than the previous chunks)
+                            if array_length > number_of_samples - processed_samples:
+                                array_length = number_of_samples - processed_samples
+                                analog_samples = {chnl: arr[:array_length] for chnl, arr in
+                                                  analog_samples.items()}
+                                digital_samples = {chnl: arr[:array_length] for chnl, arr in
+                                                   digital_samples.items()}
+
+                    # Increment element index
+                    element_count += 1
+
+
+class VectorizedEnsembleSampler(EnsembleSamplerBase):
+    """
+    Sampling engine compiling the ensemble into per-channel segment tables before sampling.
+
+    Each element (incl. repetitions) is described by its start bin, its length in bins, the digital
+    channel states and, for each analog channel, an index into the list of distinct sampling
+    functions used in this channel. Sampling a chunk then boils down to one np.repeat per digital
+    channel and, per analog channel, one batched get_samples call for all pieces of the chunk
+    sharing the same sampling function.
+
+    Batching requires the sampling function to be "elementwise" (see SamplingBase.elementwise),
+    i.e. each sample must only depend on its own point in time. All other sampling functions are
+    called piece by piece exactly like in LegacyEnsembleSampler. Constant sampling functions
+    (see SamplingBase.constant) are evaluated only once and expanded together with the digital
+    channel states.
+
+    All sampling functions are evaluated via SamplingFunctions.get_samples which reuses samples of
+    identical chirps etc. The samples are exactly the same as the ones of LegacyEnsembleSampler.
+    """
+    # Restrict SamplingFunctions.get_samples to the fast paths returning exact samples
+    exact_samples = True
+
+    # Maximum number of samples evaluated in a single batched get_samples call. Limits the memory
+    # overhead of the temporary index and time arrays.
+    max_batch_samples = 2 ** 22
+    # Pieces longer than this are sampled one by one since the per-call overhead is negligible
+    max_batched_piece_length = 4096
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.element_length_bins = np.asarray(self.elements_length_bins, dtype='int64')
+        self.element_end_bins = np.cumsum(self.element_length_bins)
+        self.element_start_bins = self.element_end_bins - self.element_length_bins
+        # Distinct sampling functions per analog channel and per-element indices into these lists
+        self.analog_functions = dict()
+        self.analog_function_index = dict()
+        self.analog_constant_values = dict()
+        # Per-element digital channel states
+        self.digital_states = dict()
+        self._compile()
+
+    @staticmethod
+    def function_key(sampling_function):
+        """ Hashable key identifying sampling functions with equal type and parameters """
+        return (type(sampling_function).__name__,
+                tuple(getattr(sampling_function, param) for param in sampling_function.params))
+
+    def _compile(self):
+        analog_keys = dict()
+        analog_index = dict()
+        digital_states = dict()
+        for block_name, reps in self.ensemble.block_list:
+            block = self.blocks[block_name]
+            if len(block.element_list) == 0:
+                continue
+            for chnl in block.analog_channels:
+                keys = analog_keys.setdefault(chnl, dict())
+                functions = self.analog_functions.setdefault(chnl, list())
+                block_index = np.empty(len(block.element_list), dtype='int64')
+                for ii, element in enumerate(block.element_list):
+                    func = element.pulse_function.get(chnl)
+                    if func is None:
+                        block_index[ii] = -1
+                        continue
+                    key = self.function_key(func)
+                    if key not in keys:
+                        keys[key] = len(functions)
+                        functions.append(func)
+                    block_index[ii] = keys[key]
+                analog_index.setdefault(chnl, list()).append(np.tile(block_index, reps + 1))
+            for chnl in block.digital_channels:
+                block_states = np.array([element.digital_high.get(chnl, False) for element in
+                                         block.element_list], dtype=bool)
+                digital_states.setdefault(chnl, list()).append(np.tile(block_states, reps + 1))
+
+        for chnl, index_list in analog_index.items():
+            self.analog_function_index[chnl] = np.concatenate(index_list)
+            # Normalized values of constant sampling functions. The last entry is used for elements
+            # without sampling function (index -1).
+            norm = self.analog_amplitudes[chnl] / 2
+            constant_values = np.zeros(len(self.analog_functions[chnl]) + 1, dtype='float32')
+            for func_index, func in enumerate(self.analog_functions[chnl]):
+                if func.constant:
+                    constant_values[func_index] = func.get_samples(np.zeros(1))[0] / norm
+            self.analog_constant_values[chnl] = constant_values
+        for chnl, state_list in digital_states.items():
+            self.digital_states[chnl] = np.concatenate(state_list)
+
+        for table in (*self.analog_function_index.values(), *self.digital_states.values()):
+            if len(table) != len(self.element_length_bins):
+                raise ValueError('Number of elements in PulseBlockEnsemble "{0}" does not match '
+                                 'the number of element lengths ({1:d}).'
+                                 ''.format(self.ensemble.name, len(self.element_length_bins)))
+
+    def iter_chunks(self, array_length, analog_samples, digital_samples):
+        for start in range(0, self.number_of_samples, array_length):
+            stop = min(start + array_length, self.number_of_samples)
+            chunk_length = stop - start
+            if chunk_length != array_length:
+                analog_samples = {chnl: arr[:chunk_length] for chnl, arr in analog_samples.items()}
+                digital_samples = {chnl: arr[:chunk_length] for chnl, arr in
+                                   digital_samples.items()}
+            self.sample_chunk(start, stop, analog_samples, digital_samples)
+            yield analog_samples, digital_samples
+
+    def iter_chunks_parallel(self, array_length, executor, chunks_in_flight):
+        """
+        Start sampling the chunks in worker processes and return a generator yielding them in
+        order.
+
+        While the caller processes (e.g. uploads) the current chunk, the next chunks are sampled in
+        parallel. The number of chunks submitted to the executor but not yet yielded is limited to
+        chunks_in_flight in order to bound memory usage.
+
+        The sampler is pickled and the first chunks are submitted before this method returns, so
+        errors setting up the parallel sampling (e.g. unpicklable sampling functions or a broken
+        process pool) are raised here. Errors of the worker processes are raised by the returned
+        generator.
+
+        @param int array_length: Maximum number of samples per chunk
+        @param concurrent.futures.Executor executor: process pool to sample the chunks in
+        @param int chunks_in_flight: Maximum number of chunks sampled ahead
+
+        @return generator: yields (dict, dict) analog and digital sample arrays of the current
+                           chunk. In contrast to iter_chunks new arrays are created for each chunk.
+        """
+        # Pickle the sampler only once instead of for every chunk
+        sampler_bytes = pickle.dumps(self, protocol=pickle.HIGHEST_PROTOCOL)
+        token = uuid.uuid4().hex
+        chunk_ranges = iter([(start, min(start + array_length, self.number_of_samples)) for start
+                             in range(0, self.number_of_samples, array_length)])
+        pending = deque()
+        try:
+            for chunk_range in chunk_ranges:
+                pending.append(executor.submit(_sample_chunk_worker, token, sampler_bytes,
+                                               *chunk_range))
+                if len(pending) >= max(chunks_in_flight, 1):
+                    break
+        except Exception:
+            for future in pending:
+                future.cancel()
+            raise
+        return self._iter_parallel_results(executor, token, sampler_bytes, chunk_ranges, pending)
+
+    @staticmethod
+    def _iter_parallel_results(executor, token, sampler_bytes, chunk_ranges, pending):
+        """
+        Generator yielding the results of the submitted chunks in order and submitting the
+        remaining chunk_ranges one by one. See iter_chunks_parallel.
+        """
+        try:
+            while pending:
+                result = pending.popleft().result()
+                for chunk_range in chunk_ranges:
+                    pending.append(executor.submit(_sample_chunk_worker, token, sampler_bytes,
+                                                   *chunk_range))
+                    break
+                yield result
+        finally:
+            # Do not leave queued chunks behind if the caller aborts
+            for future in pending:
+                future.cancel()
+
+    def sample_chunk(self, start, stop, analog_samples, digital_samples):
+        """
+        Fill the sample arrays with the samples start to stop (excluding) of the entire ensemble.
+
+        @param int start: Index of the first sample to create
+        @param int stop: Index of the last sample to create + 1
+        @param dict analog_samples: float32 arrays of length (stop - start) with channel keys
+        @param dict digital_samples: bool arrays of length (stop - start) with channel keys
+        """
+        # Get all elements overlapping with the chunk and clip them to the chunk boundaries.
+        first = np.searchsorted(self.element_end_bins, start, side='right')
+        last = np.searchsorted(self.element_start_bins, stop, side='left')
+        piece_starts = np.maximum(self.element_start_bins[first:last], start)
+        piece_lengths = np.minimum(self.element_end_bins[first:last], stop) - piece_starts
+        valid = piece_lengths > 0
+        element_index = np.arange(first, last)[valid]
+        piece_starts = piece_starts[valid]
+        piece_lengths = piece_lengths[valid]
+
+        for chnl, samples in digital_samples.items():
+            samples[:] = np.repeat(self.digital_states[chnl][element_index], piece_lengths)
+
+        for chnl, samples in analog_samples.items():
+            function_index = self.analog_function_index[chnl][element_index]
+            norm = self.analog_amplitudes[chnl] / 2
+            functions = self.analog_functions[chnl]
+            # Constant sampling functions (e.g. Idle) are expanded for the entire chunk at once.
+            # All other pieces get sampled on top of that.
+            piece_values = self.analog_constant_values[chnl][function_index]
+            samples[:] = np.repeat(piece_values, piece_lengths)
+            for func_index in np.unique(function_index):
+                if func_index < 0 or functions[func_index].constant:
+                    continue
+                mask = function_index == func_index
+                self._sample_function(func=self.analog_functions[chnl][func_index],
+                                      norm=norm,
+                                      samples=samples,
+                                      chunk_start=start,
+                                      piece_starts=piece_starts[mask],
+                                      piece_lengths=piece_lengths[mask])
+
+    def _sample_function(self, func, norm, samples, chunk_start, piece_starts, piece_lengths):
+        rotating_frame = self.ensemble.rotating_frame
+        # Long pieces and pieces of non-elementwise functions are sampled one by one. Only short
+        # pieces are worth the overhead of batching.
+        if getattr(func, 'elementwise', False):
+            batched = piece_lengths <= self.max_batched_piece_length
+        else:
+            batched = np.zeros(len(piece_lengths), dtype=bool)
+
+        for piece_start, piece_length in zip(piece_starts[~batched], piece_lengths[~batched]):
+            offset_bin = self.offset_bin + piece_start if rotating_frame else self.offset_bin
+            bins = offset_bin + np.arange(piece_length, dtype='int64')
+            samples[piece_start - chunk_start:piece_start - chunk_start + piece_length] = \
+                SamplingFunctions.get_samples(func, bins, self.sample_rate,
+                                              exact=self.exact_samples) / norm
+
+        if not batched.any():
+            return
+        piece_starts = piece_starts[batched] - chunk_start
+        piece_lengths = piece_lengths[batched]
+
+        if not rotating_frame:
+            # Without rotating frame each piece starts at offset_bin. Sample the longest piece once
+            # and distribute the samples to all pieces.
+            bins = self.offset_bin + np.arange(piece_lengths.max(), dtype='int64')
+            func_samples = SamplingFunctions.get_samples(func, bins, self.sample_rate,
+                                                         exact=self.exact_samples) / norm
+            for batch in self._iter_batches(piece_lengths):
+                positions = self._concatenated_ranges(piece_starts[batch], piece_lengths[batch])
+                local = self._concatenated_ranges(np.zeros_like(piece_lengths[batch]),
+                                                  piece_lengths[batch])
+                samples[positions] = func_samples[local]
+            return
+
+        for batch in self._iter_batches(piece_lengths):
+            positions = self._concatenated_ranges(piece_starts[batch], piece_lengths[batch])
+            bins = positions + (self.offset_bin + chunk_start)
+            samples[positions] = SamplingFunctions.get_samples(func, bins, self.sample_rate,
+                                                               exact=self.exact_samples) / norm
+
+    def _iter_batches(self, piece_lengths):
+        """ Yield slices of consecutive pieces holding at most max_batch_samples samples """
+        cumulative = np.cumsum(piece_lengths)
+        first = 0
+        while first < len(piece_lengths):
+            limit = cumulative[first] - piece_lengths[first] + self.max_batch_samples
+            last = max(first + 1, int(np.searchsorted(cumulative, limit, side='right')))
+            yield slice(first, last)
+            first = last
+
+    @staticmethod
+    def _concatenated_ranges(starts, lengths):
+        """ Concatenation of np.arange(start, start + length) for all start/length pairs """
+        ends = np.cumsum(lengths)
+        return np.arange(ends[-1], dtype='int64') + np.repeat(starts - (ends - lengths), lengths)
+
+
+class LookupTableEnsembleSampler(VectorizedEnsembleSampler):
+    """
+    Like VectorizedEnsembleSampler but uses all fast paths of SamplingFunctions.get_samples.
+
+    Periodic sampling functions are taken from single-period lookup tables and samples of shift
+    invariant sampling functions (e.g. AllenEberlyChirp) are reused for identical elements at any
+    point in time. The samples can deviate from LegacyEnsembleSampler on the level of floating
+    point rounding.
+    """
+    exact_samples = False
+
+
+# Sampler last used in this (worker) process as tuple (token, sampler)
+_worker_sampler = (None, None)
+
+
+def init_sampling_worker(path_list):
+    """
+    Initializer for sampling worker processes. Sampling function modules are imported by module
+    name from the paths appended to sys.path by SamplingFunctions.import_sampling_functions. Worker
+    processes not forked from the main process need the same paths to unpickle the samplers.
+
+    @param list path_list: sys.path of the main process
+    """
+    for path in path_list:
+        if path not in sys.path:
+            sys.path.append(path)
+
+
+def _sample_chunk_worker(token, sampler_bytes, start, stop):
+    """
+    Sample a single chunk in a worker process. See VectorizedEnsembleSampler.iter_chunks_parallel.
+    The unpickled sampler is kept for subsequent chunks of the same ensemble.
+    """
+    global _worker_sampler
+    if _worker_sampler[0] != token:
+        _worker_sampler = (token, pickle.loads(sampler_bytes))
+    sampler = _worker_sampler[1]
+    analog_samples = {chnl: np.empty(stop - start, dtype='float32') for chnl in
+                      sampler.analog_channels}
+    digital_samples = {chnl: np.empty(stop - start, dtype=bool) for chnl in
+                       sampler.digital_channels}
+    sampler.sample_chunk(start, stop, analog_samples, digital_samples)
+    return analog_samples, digital_samples
+
+
+# Available sampling engines. Selected by the "sampling_engine" ConfigOption of
+# SequenceGeneratorLogic.
+SAMPLING_ENGINES = {'legacy': LegacyEnsembleSampler,
+                    'vectorized': VectorizedEnsembleSampler,
+                    'vectorized_lut': LookupTableEnsembleSampler}
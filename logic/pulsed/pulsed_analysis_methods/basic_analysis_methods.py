@@ -28,9 +28,26 @@ class BasicPulseAnalyzer(PulseAnalyzerBase):
     """
 
     """
+    laserwise_methods = frozenset({'analyse_mean_norm', 'analyse_mean_reference', 'analyse_sum',
+                                   'analyse_mean'})
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
+    @staticmethod
+    def _window_sums(laser_data, start_bin, stop_bin):
+        """
+        Sum up the time bins start_bin:stop_bin of all laser pulses at once.
+
+        @param 2D numpy.ndarray laser_data: the laser pulses (dim 0: laser number; dim 1: time bin)
+        @param int start_bin: first bin of the window (python slice semantics)
+        @param int stop_bin: end of the window (python slice semantics)
+
+        @return numpy.ndarray, int: sum of the window for each laser pulse, length of the window
+        """
+        window = laser_data[:, start_bin:stop_bin]
+        return window.sum(axis=1), window.shape[1]
+
     def analyse_mean_norm(self, laser_data, signal_start=0.0, signal_end=200e-9, norm_start=300e-9,
                           norm_end=500e-9):
         """
@@ -56,34 +73,27 @@ class BasicPulseAnalyzer(PulseAnalyzerBase):
         norm_start_bin = round(norm_start / bin_width)
         norm_end_bin = round(norm_end / bin_width)
 
-        # initialize data arrays for signal and measurement error
-        signal_data = np.empty(num_of_lasers, dtype=float)
-        error_data = np.empty(num_of_lasers, dtype=float)
-
-        # loop over all laser pulses and analyze them
-        for ii, laser_arr in enumerate(laser_data):
-            # calculate the sum and mean of the data in the normalization window
-            tmp_data = laser_arr[norm_start_bin:norm_end_bin]
-            reference_sum = np.sum(tmp_data)
-            reference_mean = (reference_sum / len(tmp_data)) if len(tmp_data) != 0 else 0.0
-
-            # calculate the sum and mean of the data in the signal window
-            tmp_data = laser_arr[signal_start_bin:signal_end_bin]
-            signal_sum = np.sum(tmp_data)
-            signal_mean = (signal_sum / len(tmp_data)) if len(tmp_data) != 0 else 0.0
+        # calculate the sum and mean of the data in the normalization and signal window of all
+        # laser pulses at once
+        reference_sum, reference_length = self._window_sums(laser_data, norm_start_bin, norm_end_bin)
+        reference_mean = reference_sum / reference_length if reference_length != 0 else \
+            np.zeros(num_of_lasers)
+        signal_sum, signal_length = self._window_sums(laser_data, signal_start_bin, signal_end_bin)
+        signal_mean = signal_sum / signal_length if signal_length != 0 else np.zeros(num_of_lasers)
 
+        with np.errstate(divide='ignore', invalid='ignore'):
             # Calculate normalized signal while avoiding division by zero
-            if reference_mean > 0 and signal_mean >= 0:
-                signal_data[ii] = signal_mean / reference_mean
-            else:
-                signal_data[ii] = 0.0
+            valid = (reference_mean > 0) & (signal_mean >= 0)
+            signal_data = np.where(valid, signal_mean / np.where(valid, reference_mean, 1), 0.0)
 
             # Calculate measurement error while avoiding division by zero
-            if reference_sum > 0 and signal_sum > 0:
-                # calculate with respect to gaussian error 'evolution'
-                error_data[ii] = signal_data[ii] * np.sqrt(1 / signal_sum + 1 / reference_sum)
-            else:
-                error_data[ii] = 0.0
+            # (calculate with respect to gaussian error 'evolution')
+            valid = (reference_sum > 0) & (signal_sum > 0)
+            error_data = np.where(
+                valid,
+                signal_data * np.sqrt(1 / np.where(valid, signal_sum, 1) +
+                                      1 / np.where(valid, reference_sum, 1)),
+                0.0)
 
         return signal_data, error_data
 
@@ -106,23 +116,13 @@ class BasicPulseAnalyzer(PulseAnalyzerBase):
         signal_start_bin = round(signal_start / bin_width)
         signal_end_bin = round(signal_end / bin_width)
 
-        # initialize data arrays for signal and measurement error
-        signal_data = np.empty(num_of_lasers, dtype=float)
-        error_data = np.empty(num_of_lasers, dtype=float)
-
-        # loop over all laser pulses and analyze them
-        for ii, laser_arr in enumerate(laser_data):
-            # calculate the sum of the data in the signal window
-            signal = laser_arr[signal_start_bin:signal_end_bin].sum()
-            signal_error = np.sqrt(signal)
+        # calculate the sum of the data in the signal window of all laser pulses at once
+        signal, _ = self._window_sums(laser_data, signal_start_bin, signal_end_bin)
 
-            # Avoid numpy C type variables overflow and NaN values
-            if signal < 0 or signal != signal:
-                signal_data[ii] = 0.0
-                error_data[ii] = 0.0
-            else:
-                signal_data[ii] = signal
-                error_data[ii] = signal_error
+        # Avoid numpy C type variables overflow and NaN values
+        valid = ~(signal < 0) & (signal == signal)
+        signal_data = np.where(valid, signal, 0).astype(float)
+        error_data = np.sqrt(signal_data)
 
         return signal_data, error_data
 
@@ -146,24 +146,16 @@ class BasicPulseAnalyzer(PulseAnalyzerBase):
         signal_start_bin = round(signal_start / bin_width)
         signal_end_bin = round(signal_end / bin_width)
 
-        # initialize data arrays for signal and measurement error
-        signal_data = np.empty(num_of_lasers, dtype=float)
-        error_data = np.empty(num_of_lasers, dtype=float)
-
-        # loop over all laser pulses and analyze them
-        for ii, laser_arr in enumerate(laser_data):
-            # calculate the mean of the data in the signal window
-            signal = laser_arr[signal_start_bin:signal_end_bin].mean()
-            signal_sum = laser_arr[signal_start_bin:signal_end_bin].sum()
+        # calculate the mean of the data in the signal window of all laser pulses at once
+        with np.errstate(divide='ignore', invalid='ignore'):
+            signal = laser_data[:, signal_start_bin:signal_end_bin].mean(axis=1)
+            signal_sum, _ = self._window_sums(laser_data, signal_start_bin, signal_end_bin)
             signal_error = np.sqrt(signal_sum) / (signal_end_bin - signal_start_bin)
 
-            # Avoid numpy C type variables overflow and NaN values
-            if signal < 0 or signal != signal:
-                signal_data[ii] = 0.0
-                error_data[ii] = 0.0
-            else:
-                signal_data[ii] = signal
-                error_data[ii] = signal_error
+        # Avoid numpy C type variables overflow and NaN values
+        valid = ~(signal < 0) & (signal == signal)
+        signal_data = np.where(valid, signal, 0.0)
+        error_data = np.where(valid, signal_error, 0.0)
 
         return signal_data, error_data
 
@@ -214,25 +206,18 @@ class BasicPulseAnalyzer(PulseAnalyzerBase):
         norm_start_bin = round(norm_start / bin_width)
         norm_end_bin = round(norm_end / bin_width)
 
-        # initialize data arrays for signal and measurement error
-        signal_data = np.empty(num_of_lasers, dtype=float)
-        error_data = np.empty(num_of_lasers, dtype=float)
-
-        # loop over all laser pulses and analyze them
-        for ii, laser_arr in enumerate(laser_data):
-            # calculate the sum and mean of the data in the normalization window
-            tmp_data = laser_arr[norm_start_bin:norm_end_bin]
-            reference_sum = np.sum(tmp_data)
-            reference_mean = (reference_sum / len(tmp_data)) if len(tmp_data) != 0 else 0.0
-
-            # calculate the sum and mean of the data in the signal window
-            tmp_data = laser_arr[signal_start_bin:signal_end_bin]
-            signal_sum = np.sum(tmp_data)
-            signal_mean = (signal_sum / len(tmp_data)) if len(tmp_data) != 0 else 0.0
+        # calculate the sum and mean of the data in the normalization and signal window of all
+        # laser pulses at once
+        reference_sum, reference_length = self._window_sums(laser_data, norm_start_bin, norm_end_bin)
+        reference_mean = reference_sum / reference_length if reference_length != 0 else \
+            np.zeros(num_of_lasers)
+        signal_sum, signal_length = self._window_sums(laser_data, signal_start_bin, signal_end_bin)
+        signal_mean = signal_sum / signal_length if signal_length != 0 else np.zeros(num_of_lasers)
 
-            signal_data[ii] = signal_mean - reference_mean
+        signal_data = signal_mean - reference_mean
 
-            # calculate with respect to gaussian error 'evolution'
-            error_data[ii] = signal_data[ii] * np.sqrt(1 / abs(signal_sum) + 1 / abs(reference_sum))
+        # calculate with respect to gaussian error 'evolution'
+        with np.errstate(divide='ignore', invalid='ignore'):
+            error_data = signal_data * np.sqrt(1 / np.abs(signal_sum) + 1 / np.abs(reference_sum))
 
         return signal_data, error_data
@@ -373,7 +373,7 @@ class PulsedMasterLogic(GenericLogic):
 
     @property
     def raw_data(self):
-        return self.pulsedmeasurementlogic().raw_data
+        return self.pulsedmeasurementlogic().get_raw_data_copy()
 
     @property
     def laser_data(self):
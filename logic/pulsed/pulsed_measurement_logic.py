@@ -20,6 +20,7 @@ top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi
 """
 
 from qtpy import QtCore
+import os
 from collections import OrderedDict
 import numpy as np
 import copy
@@ -31,12 +32,13 @@ from core.connector import Connector
 from core.configoption import ConfigOption
 from core.statusvariable import StatusVar
 from core.util.mutex import Mutex
-from core.util.network import netobtain
+from core.util.network import netobtain, is_netref
 from core.util import units
 from core.util.math import compute_ft
 from logic.generic_logic import GenericLogic
 from logic.pulsed.pulse_extractor import PulseExtractor
 from logic.pulsed.pulse_analyzer import PulseAnalyzer
+from logic.pulsed.raw_data_stash import RawDataStash
 
 
 class PulsedMeasurementLogic(GenericLogic):
@@ -57,6 +59,18 @@ class PulsedMeasurementLogic(GenericLogic):
     analysis_import_path = ConfigOption(name='additional_analysis_path', default=None)
     # Optional file type descriptor for saving raw data to file
     _raw_data_save_type = ConfigOption(name='raw_data_save_type', default='text')
+    # Only process the bins of the fast counter trace that changed since the last analysis run.
+    # Assumes that the laser pulse positions found by the extraction stay constant as long as the
+    # extraction settings are not changed.
+    _incremental_analysis = ConfigOption(name='incremental_analysis', default=False)
+    # Directory for the memory mapped files of stashed raw data
+    # (default: <data directory of SaveLogic>/raw_data_stash) and size limit of all stashed raw
+    # data in bytes. The least recently used stashes are deleted if the limit is exceeded.
+    _raw_data_stash_dir = ConfigOption(name='raw_data_stash_path', default=None,
+                                       missing='nothing')
+    _raw_data_stash_max_bytes = ConfigOption(name='raw_data_stash_max_bytes',
+                                             default=4 * 1024 ** 3,
+                                             missing='nothing')
 
     # status variables
     # ext. microwave settings
@@ -136,10 +150,22 @@ class PulsedMeasurementLogic(GenericLogic):
         self.measurement_error = np.empty((2, 0), dtype=float)
         self.laser_data = np.zeros((10, 20), dtype='int64')
         self.raw_data = np.zeros((10, 20), dtype='int64')
+        self._raw_data_copy = None  # read-only copy for other threads (see get_raw_data_copy)
 
-        self._saved_raw_data = OrderedDict()  # temporary saved raw data
+        self._saved_raw_data = None  # temporary saved raw data (RawDataStash instance)
         self._recalled_raw_data_tag = None  # the currently recalled raw data dict key
 
+        # State of the incremental analysis (see _incremental_analysis)
+        self._reset_incremental_analysis()
+
+        # Reused buffers for the fast counter data if the hardware can fill them in place
+        # (see FastCounterInterface.get_data_trace_into). The hardware always fills
+        # _fc_data_buffer while _fc_data_spare may be published as raw_data and read by other
+        # threads. Both are swapped after publishing (see _publish_raw_data).
+        self._fc_data_buffer = None
+        self._fc_data_spare = None
+        self._use_fc_data_buffer = True
+
         # Paused measurement flag
         self.__is_paused = False
         self._time_of_pause = None
@@ -206,6 +232,12 @@ class PulsedMeasurementLogic(GenericLogic):
 
         # recalled saved raw data dict key
         self._recalled_raw_data_tag = None
+        # Stashed raw data from previous sessions is lost. Delete left over files.
+        if not self._raw_data_stash_dir:
+            self._raw_data_stash_dir = os.path.join(self.savelogic().data_dir, 'raw_data_stash')
+        self._saved_raw_data = RawDataStash(stash_dir=self._raw_data_stash_dir,
+                                            max_bytes=self._raw_data_stash_max_bytes)
+        self._saved_raw_data.clear()
 
         # Connect internal signals
         self.sigStartTimer.connect(self.__analysis_timer.start, QtCore.Qt.QueuedConnection)
@@ -228,6 +260,8 @@ class PulsedMeasurementLogic(GenericLogic):
         self.__analysis_timer.timeout.disconnect()
         self.sigStartTimer.disconnect()
         self.sigStopTimer.disconnect()
+
+        self._saved_raw_data.clear()
         return
 
     ############################################################################
@@ -541,6 +575,8 @@ class PulsedMeasurementLogic(GenericLogic):
 
     @measurement_information.setter
     def measurement_information(self, info_dict):
+        # Laser pulses cached by the extraction methods belong to the previous sequence
+        self._pulseextractor.clear_caches()
         # Check if mandatory params to invoke settings are missing and set empty dict in that case.
         mand_params = ('number_of_lasers',
                        'controlled_variable',
@@ -572,6 +608,7 @@ class PulsedMeasurementLogic(GenericLogic):
             self._sampling_information = info_dict
         else:
             self._sampling_information = dict()
+        self._pulseextractor.clear_caches()
         return
 
     @property
@@ -777,6 +814,10 @@ class PulsedMeasurementLogic(GenericLogic):
 
                 # initialize data arrays
                 self._initialize_data_arrays()
+                self._reset_incremental_analysis()
+                self._pulseextractor.clear_caches()
+                self._fc_data_buffer = None
+                self._fc_data_spare = None
 
                 # recall stashed raw data
                 if stashed_raw_data_tag in self._saved_raw_data:
@@ -836,9 +877,10 @@ class PulsedMeasurementLogic(GenericLogic):
 
                 # stash raw data if requested
                 if stash_raw_data_tag:
-                    self._saved_raw_data[stash_raw_data_tag] = (self.raw_data.copy(),
-                                                                {'elapsed_sweeps': self.__elapsed_sweeps,
-                                                                 'elapsed_time': self.__elapsed_time})
+                    self._saved_raw_data.stash(stash_raw_data_tag,
+                                               self.raw_data,
+                                               {'elapsed_sweeps': self.__elapsed_sweeps,
+                                                'elapsed_time': self.__elapsed_time})
                 self._recalled_raw_data_tag = None
 
                 # Set measurement paused flag
@@ -1105,9 +1147,11 @@ class PulsedMeasurementLogic(GenericLogic):
             if self.module_state() == 'locked':
                 # Update elapsed time
 
-                self._extract_laser_pulses()
-
-                tmp_signal, tmp_error = self._analyze_laser_pulses()
+                if self._incremental_analysis:
+                    tmp_signal, tmp_error = self._analyze_incrementally()
+                else:
+                    self._extract_laser_pulses()
+                    tmp_signal, tmp_error = self._analyze_laser_pulses()
 
                 # exclude laser pulses to ignore
                 if len(self._laser_ignore_list) > 0:
@@ -1150,7 +1194,7 @@ class PulsedMeasurementLogic(GenericLogic):
     def _extract_laser_pulses(self):
         # Get counter raw data (including recalled raw data from previous measurement)
         fc_data, info_dict = self._get_raw_data()
-        self.raw_data = fc_data
+        self._publish_raw_data(fc_data)
         self.__elapsed_sweeps = info_dict['elapsed_sweeps']
         self.__elapsed_time = info_dict['elapsed_time']
 
@@ -1170,6 +1214,36 @@ class PulsedMeasurementLogic(GenericLogic):
             tmp_error = np.zeros(self.laser_data.shape[0])
         return tmp_signal, tmp_error
 
+    def _publish_raw_data(self, raw_data):
+        """
+        Replace raw_data by a new array. Must be called with _threadlock held.
+
+        The published array is refilled by later updates. Other threads (e.g. the GUI) must
+        therefore use get_raw_data_copy instead of raw_data. If the new array is one of the fast
+        counter buffers, the hardware fills the other buffer next time.
+
+        @param numpy.ndarray raw_data: The new raw data
+        """
+        self.raw_data = raw_data
+        self._raw_data_copy = None
+        if raw_data is self._fc_data_buffer:
+            self._fc_data_buffer, self._fc_data_spare = self._fc_data_spare, self._fc_data_buffer
+        return
+
+    def get_raw_data_copy(self):
+        """
+        Get a read-only copy of raw_data that is not altered by the running measurement.
+        The copy is only made once per update of raw_data.
+
+        @return numpy.ndarray: The current raw data
+        """
+        with self._threadlock:
+            if self._raw_data_copy is None:
+                raw_data_copy = self.raw_data.copy()
+                raw_data_copy.flags.writeable = False
+                self._raw_data_copy = raw_data_copy
+            return self._raw_data_copy
+
     def _get_raw_data(self):
         """
         Get the raw count data from the fast counting hardware and perform sanity checks.
@@ -1177,13 +1251,30 @@ class PulsedMeasurementLogic(GenericLogic):
         @return tuple(numpy.ndarray, info_dict): The count data (1D for ungated, 2D for gated counter) and
                                                  info_dict with keys 'elapsed_sweeps' and 'elapsed_time'
         """
-        # get raw data from fast counter
-        fc_data = self.fastcounter().get_data_trace()
-        if type(fc_data) == tuple and len(fc_data) == 2:  # if the hardware implement the new version of the interface
-            fc_data, info_dict = fc_data
-        else:
-            info_dict = {'elapsed_sweeps': None, 'elapsed_time': None}
-        fc_data = netobtain(fc_data)
+        fc_data, info_dict = self._get_fast_counter_data()
+        return self._add_recalled_raw_data(fc_data, info_dict)
+
+    def _get_fast_counter_data(self):
+        """
+        Get the raw count data from the fast counting hardware.
+        @return tuple(numpy.ndarray, info_dict): The count data (1D for ungated, 2D for gated counter) and
+                                                 info_dict with keys 'elapsed_sweeps' and 'elapsed_time'
+        """
+        # get raw data from fast counter. Let the hardware fill the buffer of the last call if
+        # possible to avoid allocating large arrays on every call.
+        fc_data = None
+        if self._fc_data_buffer is not None:
+            info_dict = self.fastcounter().get_data_trace_into(self._fc_data_buffer)
+            if info_dict is not None:
+                fc_data = self._fc_data_buffer
+        if fc_data is None:
+            fc_data = self.fastcounter().get_data_trace()
+            if type(fc_data) == tuple and len(fc_data) == 2:  # if the hardware implement the new version of the interface
+                fc_data, info_dict = fc_data
+            else:
+                info_dict = {'elapsed_sweeps': None, 'elapsed_time': None}
+            fc_data = netobtain(fc_data)
+            self._update_fc_data_buffer(fc_data)
 
         if isinstance(info_dict, dict) and info_dict.get('elapsed_sweeps') is not None:
             elapsed_sweeps = info_dict['elapsed_sweeps']
@@ -1195,19 +1286,62 @@ class PulsedMeasurementLogic(GenericLogic):
         else:
             elapsed_time = time.time() - self.__start_time
 
+        return fc_data, {'elapsed_sweeps': elapsed_sweeps, 'elapsed_time': elapsed_time}
+
+    def _update_fc_data_buffer(self, fc_data):
+        """
+        Prepare a buffer for the next call of get_data_trace_into after get_data_trace had to be
+        used. Stop trying if the hardware does not fill a buffer of the right shape.
+
+        @param numpy.ndarray fc_data: The count data returned by get_data_trace
+        """
+        if not self._use_fc_data_buffer:
+            return
+        if self._fc_data_buffer is not None and self._fc_data_buffer.shape == fc_data.shape:
+            self.log.debug('Fast counter hardware does not support get_data_trace_into. Using '
+                           'get_data_trace instead.')
+            self._use_fc_data_buffer = False
+            self._fc_data_buffer = None
+            self._fc_data_spare = None
+        elif is_netref(getattr(self.fastcounter(), 'get_data_trace_into', None)):
+            # Filling a buffer of a remote module in place is not efficient
+            self._use_fc_data_buffer = False
+        else:
+            self._fc_data_buffer = np.empty(fc_data.shape, dtype='int64')
+            self._fc_data_spare = np.empty(fc_data.shape, dtype='int64')
+        return
+
+    def _add_recalled_raw_data(self, fc_data, info_dict):
+        """
+        Add recalled raw data from a previous measurement to the count data of the fast counter.
+        @param numpy.ndarray fc_data: The count data from the fast counter
+        @param dict info_dict: elapsed sweeps and time of fc_data (keys 'elapsed_sweeps' and
+                               'elapsed_time')
+        @return tuple(numpy.ndarray, info_dict): The summed count data and info_dict with keys
+                                                 'elapsed_sweeps' and 'elapsed_time'
+        """
+        elapsed_sweeps = info_dict['elapsed_sweeps']
+        elapsed_time = info_dict['elapsed_time']
+
         # add old raw data from previous measurements if necessary
-        if self._saved_raw_data.get(self._recalled_raw_data_tag) is not None:
+        recalled = self._saved_raw_data.get(self._recalled_raw_data_tag)
+        if recalled is not None:
             # self.log.info('Found old saved raw data with tag "{0}".'
             #               ''.format(self._recalled_raw_data_tag))
-            elapsed_sweeps += self._saved_raw_data[self._recalled_raw_data_tag][1]['elapsed_sweeps']
-            elapsed_time += self._saved_raw_data[self._recalled_raw_data_tag][1]['elapsed_time']
+            elapsed_sweeps += recalled[1]['elapsed_sweeps']
+            elapsed_time += recalled[1]['elapsed_time']
             if not fc_data.any():
                 self.log.warning('Only zeros received from fast counter!\n'
                                  'Using recalled raw data only.')
-                fc_data = self._saved_raw_data[self._recalled_raw_data_tag][0]
-            elif self._saved_raw_data[self._recalled_raw_data_tag][0].shape == fc_data.shape:
+                # Read-only memory map of the stash file
+                fc_data = recalled[0]
+            elif recalled[0].shape == fc_data.shape:
                 self.log.debug('Recalled raw data has the same shape as current data.')
-                fc_data = self._saved_raw_data[self._recalled_raw_data_tag][0] + fc_data
+                # The buffer is overwritten by the hardware on the next call anyway. Otherwise add
+                # the recalled raw data to a copy.
+                if fc_data is not self._fc_data_buffer:
+                    fc_data = np.array(fc_data, dtype=np.result_type(recalled[0], fc_data))
+                self._saved_raw_data.add_to(self._recalled_raw_data_tag, fc_data)
             else:
                 self.log.warning('Recalled raw data has not the same shape as current data.'
                                  '\nDid NOT add recalled raw data to current time trace.')
@@ -1217,6 +1351,211 @@ class PulsedMeasurementLogic(GenericLogic):
 
         return fc_data, {'elapsed_sweeps': elapsed_sweeps, 'elapsed_time': elapsed_time}
 
+    def _analyze_incrementally(self):
+        """
+        Incremental version of _extract_laser_pulses followed by _analyze_laser_pulses.
+
+        Only the range of bins of the fast counter trace that changed since the last call is added
+        to raw_data and laser_data. Finding this range is the only operation on the whole trace.
+        If the current analysis method works laser by laser, only the laser pulses containing
+        changed bins are analysed again. Recalled raw data is only added once.
+        The full pulse extraction is performed if the extraction settings or the trace shape
+        changed or if the extracted laser pulses could not be located in the raw data.
+
+        @return (numpy.ndarray, numpy.ndarray): signal and error for each laser pulse
+        """
+        fc_data, info_dict = self._get_fast_counter_data()
+
+        if self._previous_fc_data is None or self._previous_fc_data.shape != fc_data.shape:
+            dtype = 'int64' if np.asarray(fc_data).dtype.kind in 'iub' else float
+            self._previous_fc_data = np.array(fc_data, dtype=dtype)
+            self._changed_bins = np.empty(self._previous_fc_data.size, dtype=bool)
+            raw_data, info_dict = self._add_recalled_raw_data(fc_data, info_dict)
+            # Copy to neither share memory with the fast counter data nor with the stashed raw data
+            self._publish_raw_data(np.array(raw_data, dtype=dtype))
+            self._raw_data_spare = np.empty_like(self.raw_data)
+            self._spare_outdated_range = (0, self.raw_data.size)
+            changed_range = None
+        else:
+            info_dict = self._add_recalled_info(info_dict)
+            fc_data = np.ravel(fc_data)
+            previous_data = self._previous_fc_data.reshape(-1)
+            changed_bins = np.not_equal(fc_data, previous_data, out=self._changed_bins)
+            first = int(changed_bins.argmax())
+            if changed_bins[first]:
+                stop = changed_bins.size - int(changed_bins[::-1].argmax())
+                changed_range = (first, stop)
+                # Add the new counts to the raw data (including the recalled raw data) in the spare
+                # buffer and swap it with raw_data. raw_data itself is never altered in place.
+                # The spare buffer is outdated in the range changed by the previous call.
+                raw_data = self.raw_data.reshape(-1)
+                new_raw_data = self._raw_data_spare.reshape(-1)
+                start = min(first, self._spare_outdated_range[0])
+                end = max(stop, self._spare_outdated_range[1])
+                new_raw_data[start:end] = raw_data[start:end]
+                np.add(new_raw_data[first:stop], fc_data[first:stop],
+                       out=new_raw_data[first:stop], casting='unsafe')
+                new_raw_data[first:stop] -= previous_data[first:stop]
+                np.copyto(previous_data[first:stop], fc_data[first:stop], casting='unsafe')
+                self._raw_data_spare = self.raw_data
+                self._spare_outdated_range = changed_range
+                self._publish_raw_data(new_raw_data.reshape(self._raw_data_spare.shape))
+            else:
+                changed_range = ()
+        self.__elapsed_sweeps = info_dict['elapsed_sweeps']
+        self.__elapsed_time = info_dict['elapsed_time']
+
+        # Extract laser pulses only if necessary. Otherwise just update the changed laser pulses.
+        extraction_key = (self._pulseextractor.extraction_settings, self.raw_data.shape)
+        if changed_range is None or self._laser_bin_ranges is None or \
+                extraction_key != self._extraction_key:
+            return_dict = self._pulseextractor.extract_laser_pulses(self.raw_data)
+            self.laser_data = return_dict['laser_counts_arr']
+            self._laser_bin_ranges = self._get_laser_bin_ranges(return_dict)
+            self._extraction_key = extraction_key
+            changed_lasers = None
+        else:
+            changed_lasers = self._get_changed_lasers(changed_range)
+            self.laser_data[changed_lasers] = self._gather_laser_pulses(
+                changed_lasers, *self._laser_bin_ranges, self.laser_data.shape[1])
+
+        # Analyse all laser pulses or just the changed ones
+        analysis_key = self._pulseanalyzer.analysis_settings
+        if changed_lasers is None or self._laser_signal is None or \
+                analysis_key != self._analysis_key or not self._pulseanalyzer.is_laserwise:
+            tmp_signal, tmp_error = self._analyze_laser_pulses()
+            self._laser_signal = np.array(tmp_signal, dtype=float)
+            self._laser_error = np.array(tmp_error, dtype=float)
+            self._analysis_key = analysis_key
+        elif changed_lasers.size == self._laser_signal.size:
+            tmp_signal, tmp_error = self._pulseanalyzer.analyse_laser_pulses(self.laser_data)
+            self._laser_signal[:] = tmp_signal
+            self._laser_error[:] = tmp_error
+        elif changed_lasers.size > 0:
+            tmp_signal, tmp_error = self._pulseanalyzer.analyse_laser_pulses(
+                self.laser_data[changed_lasers])
+            self._laser_signal[changed_lasers] = tmp_signal
+            self._laser_error[changed_lasers] = tmp_error
+        return self._laser_signal.copy(), self._laser_error.copy()
+
+    def _add_recalled_info(self, info_dict):
+        """
+        Add elapsed sweeps and time of recalled raw data to the info_dict of the fast counter data.
+        """
+        recalled = self._saved_raw_data.get(self._recalled_raw_data_tag)
+        if recalled is None:
+            return info_dict
+        return {'elapsed_sweeps': info_dict['elapsed_sweeps'] + recalled[1]['elapsed_sweeps'],
+                'elapsed_time': info_dict['elapsed_time'] + recalled[1]['elapsed_time']}
+
+    def _get_laser_bin_ranges(self, return_dict):
+        """
+        Locate the extracted laser pulses in the flattened raw data array.
+
+        The laser pulses are assumed to be contiguous and non-overlapping slices of the raw data
+        starting at the rising flank indices returned by the extraction method (zero padded at the
+        end of the trace or gate). The result is checked against the extracted laser pulses.
+
+        @param dict return_dict: result dictionary of the extraction method
+        @return (numpy.ndarray, numpy.ndarray)|None: first and last+1 flat index of each laser pulse
+                                                     or None if the laser pulses can not be located.
+        """
+        laser_data = return_dict.get('laser_counts_arr')
+        rising_ind = np.atleast_1d(return_dict.get('laser_indices_rising', -1)).astype('int64')
+        if laser_data is None or laser_data.ndim != 2 or laser_data.size == 0 or \
+                not laser_data.any() or np.any(rising_ind < 0):
+            return None
+
+        number_of_lasers, laser_length = laser_data.shape
+        if self.raw_data.ndim == 2:
+            # Gated raw data: the same slice of each gate
+            if rising_ind.size != 1 or number_of_lasers != self.raw_data.shape[0]:
+                return None
+            row_length = self.raw_data.shape[1]
+            row_starts = row_length * np.arange(number_of_lasers, dtype='int64')
+            starts = row_starts + rising_ind[0]
+            stops = np.minimum(starts + laser_length, row_starts + row_length)
+        elif self.raw_data.ndim == 1:
+            if rising_ind.size != number_of_lasers:
+                return None
+            starts = rising_ind
+            stops = np.minimum(starts + laser_length, self.raw_data.size)
+        else:
+            return None
+
+        if np.any(starts[1:] < stops[:-1]):
+            self.log.debug('Overlapping laser pulses. Incremental analysis is not possible.')
+            return None
+        laser_indices = np.arange(number_of_lasers)
+        if not np.array_equal(
+                self._gather_laser_pulses(laser_indices, starts, stops, laser_length), laser_data):
+            self.log.debug('Extracted laser pulses are no slices of the raw data. Incremental '
+                           'analysis is not possible.')
+            return None
+        return starts, stops
+
+    def _gather_laser_pulses(self, laser_indices, starts, stops, laser_length):
+        """
+        Slice the laser pulses with the given indices from raw_data (zero padded).
+
+        @param numpy.ndarray laser_indices: indices of the laser pulses to get
+        @param numpy.ndarray starts: first flat raw data index of each laser pulse
+        @param numpy.ndarray stops: last+1 flat raw data index of each laser pulse
+        @param int laser_length: number of bins of the returned laser pulses
+        @return numpy.ndarray: 2D int64 array of the laser pulses
+        """
+        raw_data = self.raw_data.reshape(-1)
+        starts = starts[laser_indices]
+        lengths = stops[laser_indices] - starts
+        laser_data = np.zeros((len(laser_indices), laser_length), dtype='int64')
+        # Laser pulses truncated by the end of the trace or gate are zero padded
+        complete = lengths == laser_length
+        if laser_length <= raw_data.size:
+            windows = np.lib.stride_tricks.sliding_window_view(raw_data, laser_length)
+            laser_data[complete] = windows[starts[complete]]
+        for index in np.flatnonzero(~complete):
+            laser_data[index, :lengths[index]] = raw_data[starts[index]:starts[index] + lengths[index]]
+        return laser_data
+
+    def _get_changed_lasers(self, changed_range):
+        """
+        Get the indices of all laser pulses containing at least one changed raw data bin.
+
+        @param tuple changed_range: first and last+1 flat index of the changed raw data bins or an
+                                    empty tuple if no bin changed. The bins changed within this
+                                    range are marked in _changed_bins.
+        @return numpy.ndarray: sorted indices of the laser pulses
+        """
+        if not changed_range:
+            return np.empty(0, dtype='int64')
+        first, stop = changed_range
+        starts, stops = self._laser_bin_ranges
+        lasers = np.flatnonzero((starts < stop) & (stops > first))
+        if lasers.size == 0:
+            return lasers
+        # Reduce over each laser pulse and the gap to the next one within the changed range. Only
+        # keep the former.
+        boundaries = np.column_stack((starts[lasers], stops[lasers])).ravel()
+        boundaries = np.clip(boundaries - first, 0, stop - first)
+        changed = np.logical_or.reduceat(np.append(self._changed_bins[first:stop], False),
+                                         boundaries)[::2]
+        return lasers[changed]
+
+    def _reset_incremental_analysis(self):
+        """
+        Discard all intermediate results of the incremental analysis.
+        """
+        self._previous_fc_data = None
+        self._raw_data_spare = None
+        self._spare_outdated_range = None
+        self._changed_bins = None
+        self._laser_bin_ranges = None
+        self._extraction_key = None
+        self._analysis_key = None
+        self._laser_signal = None
+        self._laser_error = None
+        return
+
     def _initialize_data_arrays(self):
         """
         Initializing the signal, error, laser and raw data arrays.
@@ -1241,6 +1580,7 @@ class PulsedMeasurementLogic(GenericLogic):
             self.raw_data = np.zeros((self._number_of_lasers, number_of_bins), dtype='int64')
         else:
             self.raw_data = np.zeros(number_of_bins, dtype='int64')
+        self._raw_data_copy = None
 
         self.sigMeasurementDataUpdated.emit()
         return
@@ -1571,7 +1911,10 @@ class PulsedMeasurementLogic(GenericLogic):
 
         # prepare the data in a dict or in an OrderedDict:
         data = OrderedDict()
-        raw_trace = self.raw_data.astype('int64')
+        # Copy a consistent snapshot. The analysis loop replaces raw_data and eventually refills
+        # the array while the file is written.
+        with self._threadlock:
+            raw_trace = np.array(self.raw_data, dtype='int64')
         data['Signal(counts)'] = raw_trace.transpose()
         # write the parameters:
         parameters = OrderedDict()
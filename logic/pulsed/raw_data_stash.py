@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains the Qudi helper class to stash pulsed raw data in memory mapped files.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import os
+import re
+import uuid
+import logging
+import numpy as np
+from collections import OrderedDict
+
+
+class RawDataStash:
+    """
+    Out-of-core storage for the raw data stashed by PulsedMeasurementLogic under a tag.
+
+    Each stashed raw data array is written to its own .npy file in stash_dir. Only the file name,
+    the elapsed sweeps/time and a read-only memory map of the file are held in RAM, so the raw data
+    is read from disk on demand by the operating system.
+    The total size of all stash files is limited to max_bytes. If a new stash exceeds the limit,
+    the least recently used stashes are deleted (the new one is always kept). A limit of 0 disables
+    the eviction.
+
+    Stash files are named "raw_data_stash_<uuid>.npy". Files of this pattern left over in
+    stash_dir (e.g. after a crash) are deleted by clear. Other files in stash_dir are never touched.
+    """
+    log = logging.getLogger(__name__)
+    _file_prefix = 'raw_data_stash_'
+    _file_name_regex = re.compile(r'^{0}[0-9a-f]{{32}}\.npy$'.format(_file_prefix))
+
+    def __init__(self, stash_dir, max_bytes=0, chunk_bytes=64 * 1024 ** 2):
+        self.stash_dir = stash_dir
+        self.max_bytes = int(max_bytes)
+        self.chunk_bytes = max(1, int(chunk_bytes))
+        # tag: (file path, read-only memory map, info dict with elapsed sweeps and time)
+        self._entries = OrderedDict()
+        # Files that could not be deleted yet because they were still mapped (Windows)
+        self._stale_files = list()
+
+    def __contains__(self, tag):
+        return tag in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def keys(self):
+        return list(self._entries)
+
+    @property
+    def total_bytes(self):
+        """ Size of all stashed raw data arrays in bytes """
+        return sum(entry[1].nbytes for entry in self._entries.values())
+
+    def get(self, tag, default=None):
+        """
+        Get the stashed raw data for a tag.
+
+        @param str tag: The stash tag
+        @param default: Returned if there is no raw data stashed under tag
+
+        @return (numpy.memmap, dict): read-only memory map of the raw data and dict with keys
+                                      'elapsed_sweeps' and 'elapsed_time'
+        """
+        entry = self._entries.get(tag)
+        if entry is None:
+            return default
+        self._entries.move_to_end(tag)
+        return entry[1], entry[2]
+
+    def stash(self, tag, raw_data, info_dict):
+        """
+        Write raw data to a new stash file chunk by chunk. Replaces any raw data stashed under the
+        same tag. raw_data may itself be a memory map of a stash file (e.g. of the same tag).
+
+        @param str tag: The stash tag
+        @param numpy.ndarray raw_data: The raw data to stash
+        @param dict info_dict: elapsed sweeps and time of raw_data (keys 'elapsed_sweeps' and
+                               'elapsed_time')
+        """
+        self._remove_stale_files()
+        os.makedirs(self.stash_dir, exist_ok=True)
+        path = os.path.join(self.stash_dir,
+                            '{0}{1}.npy'.format(self._file_prefix, uuid.uuid4().hex))
+        try:
+            stash_map = np.lib.format.open_memmap(path, mode='w+', dtype=raw_data.dtype,
+                                                  shape=raw_data.shape)
+            for chunk in self._iter_chunk_slices(raw_data):
+                stash_map.reshape(-1)[chunk] = raw_data.reshape(-1)[chunk]
+            stash_map.flush()
+            del stash_map
+            stash_map = np.load(path, mmap_mode='r')
+        except (OSError, ValueError):
+            self.log.exception('Unable to stash raw data with tag "{0}" in "{1}".'
+                               ''.format(tag, self.stash_dir))
+            self._remove_file(path)
+            return
+        self.remove(tag)
+        self._entries[tag] = (path, stash_map, dict(info_dict))
+        self._evict()
+
+    def add_to(self, tag, data):
+        """
+        Add the raw data stashed under tag to data in place, chunk by chunk, without loading the
+        whole stash into memory. The caller must check the shape of the stashed raw data.
+
+        @param str tag: The stash tag
+        @param numpy.ndarray data: The writeable array to add the stashed raw data to
+
+        @return numpy.ndarray: data
+        """
+        stash_map = self._entries[tag][1]
+        data_flat = data.reshape(-1)
+        stash_flat = stash_map.reshape(-1)
+        for chunk in self._iter_chunk_slices(stash_map):
+            np.add(data_flat[chunk], stash_flat[chunk], out=data_flat[chunk], casting='unsafe')
+        return data
+
+    def remove(self, tag):
+        """ Delete the raw data stashed under tag (if present) """
+        entry = self._entries.pop(tag, None)
+        if entry is not None:
+            self._remove_file(entry[0])
+
+    def clear(self):
+        """ Delete all stashed raw data including stash files left over in the stash directory """
+        self._entries.clear()
+        if os.path.isdir(self.stash_dir):
+            for file_name in os.listdir(self.stash_dir):
+                if self._file_name_regex.match(file_name):
+                    self._remove_file(os.path.join(self.stash_dir, file_name))
+
+    def _evict(self):
+        """ Delete least recently used stashes until the size limit is met """
+        if self.max_bytes <= 0:
+            return
+        total_bytes = self.total_bytes
+        while total_bytes > self.max_bytes and len(self._entries) > 1:
+            tag = next(iter(self._entries))
+            total_bytes -= self._entries[tag][1].nbytes
+            self.log.warning('Size limit of raw data stash exceeded. Deleting stashed raw data "{0}".'
+                             ''.format(tag))
+            self.remove(tag)
+
+    def _iter_chunk_slices(self, data):
+        """ Slices of the flattened array data of at most chunk_bytes each """
+        chunk_length = max(1, self.chunk_bytes // max(1, data.itemsize))
+        for start in range(0, data.size, chunk_length):
+            yield slice(start, start + chunk_length)
+
+    def _remove_file(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError:
+            # Still memory mapped somewhere (not allowed on Windows). Try again later.
+            self._stale_files.append(path)
+
+    def _remove_stale_files(self):
+        stale_files = self._stale_files
+        self._stale_files = list()
+        for path in stale_files:
+            self._remove_file(path)
@@ -29,6 +29,9 @@ class Idle(SamplingBase):
     """
     Object representing an idle element (zero voltage)
     """
+    elementwise = True
+    constant = True
+
     def __init__(self):
         pass
 
@@ -42,6 +45,8 @@ class DC(SamplingBase):
     """
     Object representing an DC element (constant voltage)
     """
+    elementwise = True
+    constant = True
     params = OrderedDict()
     params['voltage'] = {'unit': 'V', 'init': 0.0, 'min': -np.inf, 'max': +np.inf, 'type': float}
 
@@ -66,6 +71,7 @@ class Sin(SamplingBase):
     """
     Object representing a sine wave element
     """
+    elementwise = True
     params = OrderedDict()
     params['amplitude'] = {'unit': 'V', 'init': 0.0, 'min': 0.0, 'max': np.inf, 'type': float}
     params['frequency'] = {'unit': 'Hz', 'init': 2.87e9, 'min': 0.0, 'max': np.inf, 'type': float}
@@ -91,6 +97,9 @@ class Sin(SamplingBase):
         samples_arr = amplitude * np.sin(2 * np.pi * frequency * time_array + phase)
         return samples_arr
 
+    def get_period_bins(self, sample_rate, max_period_bins):
+        return self._get_common_period_bins((self.frequency,), sample_rate, max_period_bins)
+
     def get_samples(self, time_array):
         phase_rad = np.pi * self.phase / 180
         samples_arr = self._get_sine(time_array, self.amplitude, self.frequency, phase_rad)
@@ -101,6 +110,7 @@ class DoubleSinSum(SamplingBase):
     """
     Object representing a double sine wave element (Superposition of two sine waves; NOT normalized)
     """
+    elementwise = True
     params = OrderedDict()
     params['amplitude_1'] = {'unit': 'V', 'init': 0.0, 'min': 0.0, 'max': np.inf, 'type': float}
     params['frequency_1'] = {'unit': 'Hz', 'init': 2.87e9, 'min': 0.0, 'max': np.inf, 'type': float}
@@ -144,6 +154,11 @@ class DoubleSinSum(SamplingBase):
         samples_arr = amplitude * np.sin(2 * np.pi * frequency * time_array + phase)
         return samples_arr
 
+    def get_period_bins(self, sample_rate, max_period_bins):
+        return self._get_common_period_bins((self.frequency_1, self.frequency_2),
+                                            sample_rate,
+                                            max_period_bins)
+
     def get_samples(self, time_array):
         # First sine wave
         phase_rad = np.pi * self.phase_1 / 180
@@ -159,6 +174,7 @@ class DoubleSinProduct(SamplingBase):
     """
     Object representing a double sine wave element (Product of two sine waves; NOT normalized)
     """
+    elementwise = True
     params = OrderedDict()
     params['amplitude_1'] = {'unit': 'V', 'init': 0.0, 'min': 0.0, 'max': np.inf, 'type': float}
     params['frequency_1'] = {'unit': 'Hz', 'init': 2.87e9, 'min': 0.0, 'max': np.inf, 'type': float}
@@ -202,6 +218,11 @@ class DoubleSinProduct(SamplingBase):
         samples_arr = amplitude * np.sin(2 * np.pi * frequency * time_array + phase)
         return samples_arr
 
+    def get_period_bins(self, sample_rate, max_period_bins):
+        return self._get_common_period_bins((self.frequency_1, self.frequency_2),
+                                            sample_rate,
+                                            max_period_bins)
+
     def get_samples(self, time_array):
         # First sine wave
         phase_rad = np.pi * self.phase_1 / 180
@@ -218,6 +239,7 @@ class TripleSinSum(SamplingBase):
     Object representing a linear combination of three sines
     (Superposition of three sine waves; NOT normalized)
     """
+    elementwise = True
     params = OrderedDict()
     params['amplitude_1'] = {'unit': 'V', 'init': 0.0, 'min': 0.0, 'max': np.inf, 'type': float}
     params['frequency_1'] = {'unit': 'Hz', 'init': 2.87e9, 'min': 0.0, 'max': np.inf, 'type': float}
@@ -278,6 +300,11 @@ class TripleSinSum(SamplingBase):
         samples_arr = amplitude * np.sin(2 * np.pi * frequency * time_array + phase)
         return samples_arr
 
+    def get_period_bins(self, sample_rate, max_period_bins):
+        return self._get_common_period_bins((self.frequency_1, self.frequency_2, self.frequency_3),
+                                            sample_rate,
+                                            max_period_bins)
+
     def get_samples(self, time_array):
         # First sine wave
         phase_rad = np.pi * self.phase_1 / 180
@@ -298,6 +325,7 @@ class TripleSinProduct(SamplingBase):
     Object representing a wave element composed of the product of three sines
     (Product of three sine waves; NOT normalized)
     """
+    elementwise = True
     params = OrderedDict()
     params['amplitude_1'] = {'unit': 'V', 'init': 0.0, 'min': 0.0, 'max': np.inf, 'type': float}
     params['frequency_1'] = {'unit': 'Hz', 'init': 2.87e9, 'min': 0.0, 'max': np.inf, 'type': float}
@@ -358,6 +386,11 @@ class TripleSinProduct(SamplingBase):
         samples_arr = amplitude * np.sin(2 * np.pi * frequency * time_array + phase)
         return samples_arr
 
+    def get_period_bins(self, sample_rate, max_period_bins):
+        return self._get_common_period_bins((self.frequency_1, self.frequency_2, self.frequency_3),
+                                            sample_rate,
+                                            max_period_bins)
+
     def get_samples(self, time_array):
         # First sine wave
         phase_rad = np.pi * self.phase_1 / 180
@@ -424,6 +457,8 @@ class AllenEberlyChirp(SamplingBase):
     L. Allen and J. H. Eberly, Optical Resonance and Two-Level Atoms Dover, New York, 1987,
     Analytical solution is given in: F. T. Hioe, Phys. Rev. A 30, 2100 (1984).
     """
+    # Samples only depend on the time relative to the start of the pulse
+    shift_invariant = True
     params = OrderedDict()
     params['amplitude'] = {'unit': 'V', 'init': 0.0, 'min': 0.0, 'max': np.inf, 'type': float}
     params['phase'] = {'unit': '°', 'init': 0.0, 'min': -360, 'max': 360, 'type': float}
@@ -27,6 +27,8 @@ import inspect
 import copy
 import logging
 import numpy as np
+from math import gcd
+from fractions import Fraction
 from collections import OrderedDict
 from enum import Enum
 
@@ -104,6 +106,58 @@ class SamplingBase:
     """
     params = OrderedDict()
     log = logging.getLogger(__name__)
+    # Set to True in subclasses whose samples only depend on the respective point in time and not
+    # on the other values in the time array (e.g. its first or last entry). This allows the
+    # sampling engine to evaluate many elements with a single get_samples call.
+    elementwise = False
+    # Set to True in subclasses returning the same value for every point in time (e.g. Idle, DC).
+    constant = False
+    # Set to True in subclasses whose samples only depend on the time relative to the first entry
+    # of the time array (e.g. pulse envelopes). Allows reusing the samples of identical elements at
+    # different points in time.
+    shift_invariant = False
+    # Number of samples the period returned by get_period_bins must stay exact for (see
+    # _get_common_period_bins)
+    max_phase_samples = 10 ** 9
+
+    def get_period_bins(self, sample_rate, max_period_bins):
+        """
+        Optional fast path for periodic sampling functions. Reimplement in subclasses if the
+        samples repeat after an integer number of sample bins.
+
+        @param float sample_rate: The sample rate in Hz
+        @param int max_period_bins: The maximum period in bins of interest
+
+        @return int|None: Period in sample bins or None if the samples are not periodic with a
+                          period of at most max_period_bins.
+        """
+        return None
+
+    @classmethod
+    def _get_common_period_bins(cls, frequencies, sample_rate, max_period_bins):
+        """
+        Helper to calculate the common period in sample bins of (a product or sum of) sine waves.
+
+        The period is only returned if the phase error of each sine wave accumulated over
+        max_phase_samples samples stays below the float32 resolution of the samples.
+
+        @param iterable frequencies: frequencies in Hz of all sine waves
+        @param float sample_rate: The sample rate in Hz
+        @param int max_period_bins: The maximum period in bins of interest
+
+        @return int|None: common period in bins or None if it is larger than max_period_bins
+        """
+        period = 1
+        for freq in frequencies:
+            ratio = Fraction(freq) / Fraction(sample_rate)
+            fraction = ratio.limit_denominator(max_period_bins)
+            phase_error = 2 * np.pi * abs(float(ratio - fraction)) * cls.max_phase_samples
+            if phase_error >= np.finfo(np.float32).eps:
+                return None
+            period = period * fraction.denominator // gcd(period, fraction.denominator)
+            if period > max_period_bins:
+                return None
+        return period
 
     def __repr__(self):
         kwargs = []
@@ -147,10 +201,35 @@ class SamplingBase:
 
 class SamplingFunctions:
     """
-
+    Collection of all available sampling function classes.
+
+    Also provides fast paths used by the sampling engines to evaluate sampling functions on
+    integer sample bins (see get_samples):
+        - samples of non-elementwise sampling functions (e.g. chirps) are reused if the same
+          function is sampled again at the same bins
+    Only if exact samples are not required (exact=False):
+        - periodic sampling functions (see SamplingBase.get_period_bins) are evaluated only once
+          for a single period and the samples are taken from this lookup table
+        - samples of shift invariant sampling functions are reused at any bins
+    These two fast paths deviate from a direct evaluation on the level of floating point rounding.
+    The number of calls served by a fast path is counted per sampling function class (see
+    get_fast_path_statistics).
     """
     parameters = dict()
 
+    # Maximum period in samples for lookup tables of periodic sampling functions
+    max_period_bins = 2 ** 16
+    # Maximum number of lookup tables to keep
+    max_lookup_tables = 64
+    # Maximum total number of samples of reusable pieces to keep
+    max_piece_cache_samples = 2 ** 22
+
+    _lookup_tables = OrderedDict()
+    _piece_cache = OrderedDict()
+    _piece_cache_samples = 0
+    # Keys are sampling function class names, values are lists [fast_path_calls, total_calls]
+    _fast_path_statistics = dict()
+
     @classmethod
     def import_sampling_functions(cls, path_list):
         param_dict = dict()
@@ -188,6 +267,104 @@ class SamplingFunctions:
         cls.parameters = param_dict
         return
 
+    @classmethod
+    def get_samples(cls, sampling_function, bins, sample_rate, exact=True):
+        """
+        Evaluate a sampling function at the time bins / sample_rate using a fast path if possible.
+
+        @param SamplingBase sampling_function: The sampling function instance to evaluate
+        @param numpy.ndarray bins: integer sample bins (absolute time in units of 1/sample_rate).
+                                   For non-elementwise sampling functions the bins of a single
+                                   element must be consecutive.
+        @param float sample_rate: The sample rate in Hz
+        @param bool exact: Only use fast paths returning exactly the samples of a direct evaluation.
+                           If False, lookup tables of periodic functions are used and samples of
+                           shift invariant functions are reused at different bins.
+
+        @return numpy.ndarray: The samples (float64). Must not be altered in place.
+        """
+        name = type(sampling_function).__name__
+        stats = cls._fast_path_statistics.setdefault(name, [0, 0])
+        stats[1] += 1
+        if len(bins) == 0:
+            return np.zeros(0)
+
+        if sampling_function.elementwise:
+            if exact:
+                return sampling_function.get_samples(bins.astype('float64') / sample_rate)
+            table = cls._get_lookup_table(sampling_function, sample_rate)
+            if table is None:
+                return sampling_function.get_samples(bins.astype('float64') / sample_rate)
+            stats[0] += 1
+            start = int(bins[0])
+            if bins[-1] - start == len(bins) - 1:
+                # Consecutive bins: repeat the table rotated to the first bin
+                return np.resize(np.roll(table, -(start % len(table))), len(bins))
+            return table[bins % len(table)]
+
+        key = (cls._get_function_key(sampling_function),
+               sample_rate,
+               None if sampling_function.shift_invariant and not exact else int(bins[0]),
+               len(bins))
+        samples = cls._piece_cache.get(key)
+        if samples is not None:
+            cls._piece_cache.move_to_end(key)
+            stats[0] += 1
+            return samples
+        samples = sampling_function.get_samples(bins.astype('float64') / sample_rate)
+        if len(samples) <= cls.max_piece_cache_samples:
+            samples.setflags(write=False)
+            cls._piece_cache[key] = samples
+            cls._piece_cache_samples += len(samples)
+            while cls._piece_cache_samples > cls.max_piece_cache_samples:
+                cls._piece_cache_samples -= len(cls._piece_cache.popitem(last=False)[1])
+        return samples
+
+    @classmethod
+    def get_fast_path_statistics(cls):
+        """
+        Get the number of get_samples calls served by a fast path.
+
+        @return dict: sampling function class names as keys and tuples
+                      (<fast path calls>, <total calls>) as values
+        """
+        return {name: tuple(stats) for name, stats in cls._fast_path_statistics.items()}
+
+    @classmethod
+    def reset_fast_path_statistics(cls):
+        """ Reset the fast path counters """
+        cls._fast_path_statistics = dict()
+
+    @classmethod
+    def clear_fast_path_cache(cls):
+        """ Free the memory used by lookup tables and reusable samples """
+        cls._lookup_tables.clear()
+        cls._piece_cache.clear()
+        cls._piece_cache_samples = 0
+
+    @classmethod
+    def _get_lookup_table(cls, sampling_function, sample_rate):
+        """ Samples of a single period of a periodic sampling function (or None) """
+        key = (cls._get_function_key(sampling_function), sample_rate)
+        if key in cls._lookup_tables:
+            cls._lookup_tables.move_to_end(key)
+            return cls._lookup_tables[key]
+        period = sampling_function.get_period_bins(sample_rate, cls.max_period_bins)
+        if period is None:
+            table = None
+        else:
+            table = sampling_function.get_samples(np.arange(period, dtype='float64') / sample_rate)
+        cls._lookup_tables[key] = table
+        if len(cls._lookup_tables) > cls.max_lookup_tables:
+            cls._lookup_tables.popitem(last=False)
+        return table
+
+    @staticmethod
+    def _get_function_key(sampling_function):
+        """ Hashable key identifying sampling functions with equal type and parameters """
+        return (type(sampling_function).__name__,
+                tuple(getattr(sampling_function, param) for param in sampling_function.params))
+
     @staticmethod
     def __get_sf_method(sf_ref):
         return lambda *args, **kwargs: sf_ref(*args, **kwargs)
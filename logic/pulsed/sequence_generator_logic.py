@@ -22,11 +22,14 @@ top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi
 
 import numpy as np
 import os
+import sys
 import pickle
 import time
 import copy
 import traceback
 import datetime
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
 from qtpy import QtCore
 from collections import OrderedDict
@@ -41,6 +44,8 @@ from logic.generic_logic import GenericLogic
 from logic.pulsed.pulse_objects import PulseBlock, PulseBlockEnsemble, PulseSequence
 from logic.pulsed.pulse_objects import PulseObjectGenerator, PulseBlockElement
 from logic.pulsed.sampling_functions import SamplingFunctions
+from logic.pulsed.pulse_sampler import SAMPLING_ENGINES, init_sampling_worker
+from logic.pulsed.waveform_cache import WaveformCache
 from interface.pulser_interface import SequenceOption
 
 
@@ -76,6 +81,27 @@ class SequenceGeneratorLogic(GenericLogic):
                                                    missing='nothing')
     _info_on_estimated_upload_time = ConfigOption(name='info_on_estimated_upload_time', default=60, missing='nothing')
     _disable_bench_prompt = ConfigOption(name='disable_benchmark_prompt', default=False, missing='nothing')
+    # Sampling engine to use, see logic.pulsed.pulse_sampler.SAMPLING_ENGINES
+    _sampling_engine = ConfigOption(name='sampling_engine', default='legacy', missing='nothing')
+    # Number of worker processes sampling the next waveform chunks while the current chunk is
+    # written to the device (only in chunkwise write mode, see overhead_bytes, and with the
+    # "vectorized" or "vectorized_lut" sampling engine). 0 disables this.
+    # The number of chunks sampled ahead (and thus held in memory) is limited by
+    # sampling_chunks_in_flight.
+    _sampling_processes = ConfigOption(name='sampling_processes', default=0, missing='nothing')
+    _sampling_chunks_in_flight = ConfigOption(name='sampling_chunks_in_flight',
+                                              default=2,
+                                              missing='nothing')
+    # Waveform cache directory (default: <assets_storage_path>/waveform_cache) and size limits in
+    # bytes for the in-memory and on-disk cache. Waveforms evicted from memory are only kept on
+    # disk if waveform_cache_disk_bytes is set. Setting both limits to 0 disables the cache.
+    _waveform_cache_dir = ConfigOption(name='waveform_cache_path', default=None, missing='nothing')
+    _waveform_cache_memory_bytes = ConfigOption(name='waveform_cache_memory_bytes',
+                                                default=256 * 1024**2,
+                                                missing='nothing')
+    _waveform_cache_disk_bytes = ConfigOption(name='waveform_cache_disk_bytes',
+                                              default=0,
+                                              missing='nothing')
 
     # status vars
     # Global parameters describing the channel usage and common parameters used during pulsed object
@@ -145,6 +171,14 @@ class SequenceGeneratorLogic(GenericLogic):
         # Get instance of PulseObjectGenerator which takes care of collecting all predefined methods
         self._pog = None
 
+        # Cache for sampled waveforms (WaveformCache instance) and the cache keys of waveforms
+        # written to the device. Keys are waveform names (nametags), values are tuples of the
+        # waveform cache key and the list of created waveforms on the device.
+        self._waveform_cache = None
+        self._written_waveform_keys = dict()
+        # Process pool for parallel sampling of waveform chunks. Created on first use.
+        self._sampling_executor = None
+
         # The created pulse objects (PulseBlock, PulseBlockEnsemble, PulseSequence) are saved in
         # these dictionaries. The keys are the names.
         self._saved_pulse_blocks = OrderedDict()
@@ -196,6 +230,18 @@ class SequenceGeneratorLogic(GenericLogic):
                                'a list of strings.')
         SamplingFunctions.import_sampling_functions(sf_path_list)
 
+        if self._sampling_engine not in SAMPLING_ENGINES:
+            self.log.error('ConfigOption sampling_engine "{0}" is invalid. Valid engines are {1}. '
+                           'Falling back to "legacy".'
+                           ''.format(self._sampling_engine, list(SAMPLING_ENGINES)))
+            self._sampling_engine = 'legacy'
+
+        if not self._waveform_cache_dir:
+            self._waveform_cache_dir = os.path.join(self._assets_storage_dir, 'waveform_cache')
+        self._waveform_cache = WaveformCache(cache_dir=self._waveform_cache_dir,
+                                             max_memory_bytes=self._waveform_cache_memory_bytes,
+                                             max_disk_bytes=self._waveform_cache_disk_bytes)
+
         # Read back settings from device and update instance variables accordingly
         self._read_settings_from_device()
 
@@ -206,6 +252,18 @@ class SequenceGeneratorLogic(GenericLogic):
         self._update_blocks_from_file()
         self._update_ensembles_from_file()
         self._update_sequences_from_file()
+        # Restore the cache keys of waveforms still present on the device
+        self._written_waveform_keys = dict()
+        for sequence in self._saved_pulse_sequences.values():
+            for name_tag, info in sequence.sampling_information.get('ensemble_info', dict()).items():
+                if info.get('waveform_cache_key'):
+                    self._written_waveform_keys[name_tag] = (info['waveform_cache_key'],
+                                                             info['waveforms'])
+        for name, ensemble in self._saved_pulse_block_ensembles.items():
+            if ensemble.sampling_information.get('waveform_cache_key'):
+                self._written_waveform_keys[name] = (
+                    ensemble.sampling_information['waveform_cache_key'],
+                    ensemble.sampling_information['waveforms'])
 
         # Get instance of PulseObjectGenerator which takes care of collecting all predefined methods
         self._pog = PulseObjectGenerator(sequencegeneratorlogic=self)
@@ -217,6 +275,7 @@ class SequenceGeneratorLogic(GenericLogic):
     def on_deactivate(self):
         """ Deinitialisation performed during deactivation of the module.
         """
+        self._shutdown_sampling_executor()
         return
 
     # @_saved_pulse_blocks.constructor
@@ -1678,6 +1737,18 @@ class SequenceGeneratorLogic(GenericLogic):
         samples are later on stored inside a float32 array.
         So each element is calculated with high precision (float64) and then down-converted to
         float32 to be stored.
+        The actual sample creation is done by the sampling engine selected with the ConfigOption
+        "sampling_engine" (see logic.pulsed.pulse_sampler). The default "legacy" engine samples
+        element by element. The "vectorized" engine compiles the ensemble into per-channel segment
+        tables and evaluates all elements sharing the same sampling function at once. It creates
+        the same samples and is required for parallel sampling (see "sampling_processes"). The
+        "vectorized_lut" engine additionally takes periodic sampling functions from lookup tables
+        at the cost of floating point rounding differences.
+
+        Sampled waveforms are stored in a content-addressed cache (see
+        logic.pulsed.waveform_cache). If the same ensemble is sampled again with the same pulse
+        generator settings and offset_bin, the samples are taken from the cache instead. If the
+        waveform is still present on the device, even the upload is skipped.
 
         To preserve the rotating frame, an offset counter is used to indicate the absolute time
         within the ensemble. All calculations are done with time bins (dtype=int) to avoid rounding
@@ -1687,6 +1758,9 @@ class SequenceGeneratorLogic(GenericLogic):
         The chunkwise write mode is used to save memory usage at the expense of time.
         In other words: The whole sample arrays are never created at any time. This results in more
         function calls and general overhead causing much longer time to complete.
+        If the ConfigOption "sampling_processes" is set, the next chunks are sampled by a pool of
+        worker processes while the current chunk is written to the device. The chunks are still
+        written in order and at most "sampling_chunks_in_flight" chunks are sampled ahead.
 
         In addition the pulse_block_ensemble gets analyzed and important parameters used during
         sampling get stored in the ensemble object "sampling_information" attribute.
@@ -1716,9 +1790,6 @@ class SequenceGeneratorLogic(GenericLogic):
         # Set the waveform name (excluding the device specific channel naming suffix, i.e. '_ch1')
         waveform_name = name_tag if name_tag else ensemble.name
 
-        # check for old waveforms associated with the ensemble and delete them from pulse generator.
-        self._delete_waveform_by_nametag(waveform_name)
-
         # Take current time
         start_time = time.time()
 
@@ -1764,20 +1835,8 @@ class SequenceGeneratorLogic(GenericLogic):
                 self.log.warn('Extending waveform {0} by {2} bins. New length {1}.'.format(
                     ensemble.name, ensemble_info['number_of_samples'], extension_samples))
 
-        # Calculate the byte size per sample.
-        # One analog sample per channel is 4 bytes (np.float32) and one digital sample per channel
-        # is 1 byte (np.bool).
-        bytes_per_sample = len(ensemble_info['analog_channels']) * 4 + len(
-            ensemble_info['digital_channels'])
-
-        # Calculate the bytes estimate for the entire ensemble
-        bytes_per_ensemble = bytes_per_sample * ensemble_info['number_of_samples']
-
         # Determine the size of the sample arrays to be written as a whole.
-        if bytes_per_ensemble <= self._overhead_bytes or self._overhead_bytes == 0:
-            array_length = ensemble_info['number_of_samples']
-        else:
-            array_length = self._overhead_bytes // bytes_per_sample
+        array_length = self._get_sample_array_length(ensemble_info)
 
         n_max_samples = self.pulsegenerator().get_constraints().waveform_length.max
         if n_max_samples > 0. and ensemble_info['number_of_samples'] > n_max_samples:
@@ -1789,14 +1848,56 @@ class SequenceGeneratorLogic(GenericLogic):
             self.sigSampleEnsembleComplete.emit(None)
             return -1, list(), dict()
 
+        # Check if the exact same waveform has already been written to the device or is available
+        # from the waveform cache.
+        cache_key = self._get_waveform_cache_key(ensemble, ensemble_info, offset_bin)
+        written_waveforms = self._get_written_waveforms(waveform_name, cache_key)
+        if written_waveforms:
+            self.log.debug('Waveform "{0}" is already present on the device. Upload skipped.'
+                           ''.format(waveform_name))
+            if ensemble.rotating_frame:
+                offset_bin += ensemble_info['number_of_samples']
+            if waveform_name == ensemble.name:
+                ensemble.sampling_information = dict()
+                ensemble.sampling_information.update(ensemble_info)
+                ensemble.sampling_information['pulse_generator_settings'] = self.pulse_generator_settings
+                ensemble.sampling_information['waveforms'] = natural_sort(written_waveforms)
+                ensemble.sampling_information['waveform_cache_key'] = cache_key
+                self.save_ensemble(ensemble)
+            if not self.__sequence_generation_in_progress:
+                self.module_state.unlock()
+            self.sigAvailableWaveformsUpdated.emit(self.sampled_waveforms)
+            self.sigSampleEnsembleComplete.emit(ensemble)
+            return offset_bin, natural_sort(written_waveforms), ensemble_info
+
+        # check for old waveforms associated with the ensemble and delete them from pulse generator.
+        self._delete_waveform_by_nametag(waveform_name)
+        cached_samples = self._waveform_cache.get(cache_key) if self._waveform_cache.enabled else None
+
+        if cached_samples is None:
+            # Set up the sampling engine
+            sampler = SAMPLING_ENGINES[self._sampling_engine](
+                ensemble=ensemble,
+                blocks={name: self.get_block(name) for name, reps in ensemble.block_list},
+                ensemble_info=ensemble_info,
+                analog_amplitudes=self.__analog_levels[0],
+                sample_rate=self.__sample_rate,
+                offset_bin=offset_bin)
+            # Sample chunks in worker processes while uploading if configured
+            chunk_iterator = self._get_parallel_chunk_iterator(sampler, array_length)
+        else:
+            sampler = None
+            chunk_iterator = None
+
         # Allocate the sample arrays that are used for a single write command
         analog_samples = dict()
         digital_samples = dict()
         try:
-            for chnl in ensemble_info['analog_channels']:
-                analog_samples[chnl] = np.empty(array_length, dtype='float32')
-            for chnl in ensemble_info['digital_channels']:
-                digital_samples[chnl] = np.empty(array_length, dtype=bool)
+            if cached_samples is None and chunk_iterator is None:
+                for chnl in ensemble_info['analog_channels']:
+                    analog_samples[chnl] = np.empty(array_length, dtype='float32')
+                for chnl in ensemble_info['digital_channels']:
+                    digital_samples[chnl] = np.empty(array_length, dtype=bool)
         except MemoryError:
             self.log.error('Sampling of PulseBlockEnsemble "{0}" failed due to a MemoryError.\n'
                            'The sample array needed is too large to allocate in memory.\n'
@@ -1814,105 +1915,90 @@ class SequenceGeneratorLogic(GenericLogic):
                           " {0:%Y-%m-%d %H:%M:%S} ({1:d} s)".format(
                 (now + datetime.timedelta(0, t_est_upload)), int(t_est_upload)))
 
+        if sampler is not None:
+            SamplingFunctions.reset_fast_path_statistics()
+            if chunk_iterator is None:
+                chunk_iterator = sampler.iter_chunks(array_length, analog_samples, digital_samples)
+            final_offset_bin = sampler.final_offset_bin
+            cache_writer = self._waveform_cache.writer(
+                key=cache_key,
+                analog_channels=ensemble_info['analog_channels'],
+                digital_channels=ensemble_info['digital_channels'],
+                number_of_samples=ensemble_info['number_of_samples'])
+        else:
+            self.log.debug('Samples for waveform "{0}" taken from waveform cache.'
+                           ''.format(waveform_name))
+            chunk_iterator = self._iter_cached_chunks(cached_samples, array_length)
+            final_offset_bin = offset_bin
+            if ensemble.rotating_frame:
+                final_offset_bin += ensemble_info['number_of_samples']
+            cache_writer = None
+
         # integer to keep track of the sampls already processed
         processed_samples = 0
-        # Index to keep track of the samples written into the preallocated samples array
-        array_write_index = 0
-        # Keep track of the number of elements already written
-        element_count = 0
         # set of written waveform names on the device
         written_waveforms = set()
-        # Iterate over all blocks within the PulseBlockEnsemble object
-        for block_name, reps in ensemble.block_list:
-            block = self.get_block(block_name)
-            # Iterate over all repetitions of the current block
-            for rep_no in range(reps + 1):
-                # Iterate over the PulseBlockElement instances inside the current block
-                for element in block.element_list:
-                    digital_high = element.digital_high
-                    pulse_function = element.pulse_function
-                    element_length_bins = ensemble_info['elements_length_bins'][element_count]
-
-                    # Indicator on how many samples of this element have been written already
-                    element_samples_written = 0
-
-                    while element_samples_written != element_length_bins:
-                        samples_to_add = min(array_length - array_write_index,
-                                             element_length_bins - element_samples_written)
-                        # create floating point time array for the current element inside rotating
-                        # frame if analog samples are to be calculated.
-                        if pulse_function:
-                            time_arr = (offset_bin + np.arange(
-                                samples_to_add, dtype='float64')) / self.__sample_rate
-
-                        # Calculate respective part of the sample arrays
-                        for chnl in digital_high:
-                            digital_samples[chnl][array_write_index:array_write_index + samples_to_add] = digital_high[
-                                chnl]
-                        for chnl in pulse_function:
-                            analog_samples[chnl][array_write_index:array_write_index + samples_to_add] = pulse_function[
-                                                                                                             chnl].get_samples(
-                                time_arr) / (self.__analog_levels[0][chnl] / 2)
-
-                        # Free memory
-                        if pulse_function:
-                            del time_arr
-
-                        element_samples_written += samples_to_add
-                        array_write_index += samples_to_add
-                        processed_samples += samples_to_add
-                        # if the rotating frame should be preserved (default) increment the offset
-                        # counter for the time array.
-                        if ensemble.rotating_frame:
-                            offset_bin += samples_to_add
-
-                        # Check if the temporary sample array is full and write to the device if so.
-                        if array_write_index == array_length:
-                            # Set first/last chunk flags
-                            is_first_chunk = array_write_index == processed_samples
-                            is_last_chunk = processed_samples == ensemble_info['number_of_samples']
-                            written_samples, wfm_list = self.pulsegenerator().write_waveform(
-                                name=waveform_name,
-                                analog_samples=analog_samples,
-                                digital_samples=digital_samples,
-                                is_first_chunk=is_first_chunk,
-                                is_last_chunk=is_last_chunk,
-                                total_number_of_samples=ensemble_info['number_of_samples'])
-
-                            # Update written waveforms set
-                            written_waveforms.update(wfm_list)
-
-                            # check if write process was successful
-                            if written_samples != array_length:
-                                self.log.error('Sampling of block "{0}" in ensemble "{1}" failed. '
-                                               'Write to device was unsuccessful.\nThe number of '
-                                               'actually written samples ({2:d}) does not match '
-                                               'the number of samples staged to write ({3:d}).'
-                                               ''.format(block_name, ensemble.name, written_samples,
-                                                         array_length))
-                                if not self.__sequence_generation_in_progress:
-                                    self.module_state.unlock()
-                                self.sigAvailableWaveformsUpdated.emit(self.sampled_waveforms)
-                                self.sigSampleEnsembleComplete.emit(None)
-                                return -1, list(), dict()
-
-                            # Reset array write start pointer
-                            array_write_index = 0
-
-                            # check if the temporary write array needs to be truncated for the next
-                            # part. (because it is the last part of the ensemble to write which can
-                            # be shorter than the previous chunks)
-                            if array_length > ensemble_info['number_of_samples'] - processed_samples:
-                                array_length = ensemble_info['number_of_samples'] - processed_samples
-                                analog_samples = dict()
-                                digital_samples = dict()
-                                for chnl in ensemble_info['analog_channels']:
-                                    analog_samples[chnl] = np.empty(array_length, dtype='float32')
-                                for chnl in ensemble_info['digital_channels']:
-                                    digital_samples[chnl] = np.empty(array_length, dtype=bool)
-
-                    # Increment element index
-                    element_count += 1
+        # Iterate over all chunks created by the sampling engine (or taken from cache) and write
+        # them to the device
+        try:
+            for chunk_analog_samples, chunk_digital_samples in chunk_iterator:
+                chunk_length = min(array_length,
+                                   ensemble_info['number_of_samples'] - processed_samples)
+                processed_samples += chunk_length
+                if cache_writer is not None:
+                    cache_writer.write(chunk_analog_samples, chunk_digital_samples)
+                # Set first/last chunk flags
+                is_first_chunk = chunk_length == processed_samples
+                is_last_chunk = processed_samples == ensemble_info['number_of_samples']
+                written_samples, wfm_list = self.pulsegenerator().write_waveform(
+                    name=waveform_name,
+                    analog_samples=chunk_analog_samples,
+                    digital_samples=chunk_digital_samples,
+                    is_first_chunk=is_first_chunk,
+                    is_last_chunk=is_last_chunk,
+                    total_number_of_samples=ensemble_info['number_of_samples'])
+
+                # Update written waveforms set
+                written_waveforms.update(wfm_list)
+
+                # check if write process was successful
+                if written_samples != chunk_length:
+                    self.log.error('Sampling of ensemble "{0}" failed. Write to device was '
+                                   'unsuccessful.\nThe number of actually written samples ({1:d}) '
+                                   'does not match the number of samples staged to write ({2:d}).'
+                                   ''.format(ensemble.name, written_samples, chunk_length))
+                    if cache_writer is not None:
+                        cache_writer.discard()
+                    if not self.__sequence_generation_in_progress:
+                        self.module_state.unlock()
+                    self.sigAvailableWaveformsUpdated.emit(self.sampled_waveforms)
+                    self.sigSampleEnsembleComplete.emit(None)
+                    return -1, list(), dict()
+        except Exception as err:
+            self.log.exception('Sampling of ensemble "{0}" failed.'.format(ensemble.name))
+            # Cancel chunks still queued in the worker processes
+            chunk_iterator.close()
+            if isinstance(err, BrokenProcessPool):
+                # A broken process pool can not sample any further waveforms. Create a new one for
+                # the next upload.
+                self._shutdown_sampling_executor()
+            if cache_writer is not None:
+                cache_writer.discard()
+            if not self.__sequence_generation_in_progress:
+                self.module_state.unlock()
+            self.sigAvailableWaveformsUpdated.emit(self.sampled_waveforms)
+            self.sigSampleEnsembleComplete.emit(None)
+            return -1, list(), dict()
+        offset_bin = final_offset_bin
+        if cache_writer is not None:
+            cache_writer.commit()
+        if sampler is not None:
+            fast_path_stats = SamplingFunctions.get_fast_path_statistics()
+            if fast_path_stats:
+                self.log.debug('Sampling function fast paths used for waveform "{0}": {1}'.format(
+                    waveform_name, ', '.join('{0} {1:d}/{2:d}'.format(name, *stats) for name, stats
+                                             in sorted(fast_path_stats.items()))))
+        self._written_waveform_keys[waveform_name] = (cache_key, natural_sort(written_waveforms))
 
         # Save sampling related parameters to the sampling_information container within the
         # PulseBlockEnsemble.
@@ -1923,6 +2009,7 @@ class SequenceGeneratorLogic(GenericLogic):
             ensemble.sampling_information.update(ensemble_info)
             ensemble.sampling_information['pulse_generator_settings'] = self.pulse_generator_settings
             ensemble.sampling_information['waveforms'] = natural_sort(written_waveforms)
+            ensemble.sampling_information['waveform_cache_key'] = cache_key
             self.save_ensemble(ensemble)
 
         self.log.info('Time needed for sampling and writing PulseBlockEnsemble {0} to device: {1} sec'
@@ -1933,7 +2020,9 @@ class SequenceGeneratorLogic(GenericLogic):
             self._benchmark_write.estimate_speed() / 1e6,
             self._benchmark_write.n_benchmarks))
 
-        self._benchmark_write.add_benchmark(time.time() - start_time, ensemble_info['number_of_samples'])
+        if cached_samples is None:
+            self._benchmark_write.add_benchmark(time.time() - start_time,
+                                                ensemble_info['number_of_samples'])
 
         if ensemble_info['number_of_samples'] == 0:
             self.log.warning('Empty waveform (0 samples) created from PulseBlockEnsemble "{0}".'
@@ -1944,6 +2033,118 @@ class SequenceGeneratorLogic(GenericLogic):
         self.sigSampleEnsembleComplete.emit(ensemble)
         return offset_bin, natural_sort(written_waveforms), ensemble_info
 
+    def _get_sample_array_length(self, ensemble_info):
+        """ Determine the number of samples per chunk used to sample and write an ensemble.
+
+        @param dict ensemble_info: information about the ensemble returned by
+                                   analyze_block_ensemble
+
+        @return int: number of samples to be written as a whole
+        """
+        # Calculate the byte size per sample.
+        # One analog sample per channel is 4 bytes (np.float32) and one digital sample per channel
+        # is 1 byte (np.bool).
+        bytes_per_sample = len(ensemble_info['analog_channels']) * 4 + len(
+            ensemble_info['digital_channels'])
+
+        # Calculate the bytes estimate for the entire ensemble
+        bytes_per_ensemble = bytes_per_sample * ensemble_info['number_of_samples']
+
+        if bytes_per_ensemble <= self._overhead_bytes or self._overhead_bytes == 0:
+            return ensemble_info['number_of_samples']
+        return self._overhead_bytes // bytes_per_sample
+
+    def _get_parallel_chunk_iterator(self, sampler, array_length):
+        """ Set up sampling of waveform chunks in worker processes (see ConfigOption
+        "sampling_processes"). Parallel sampling is only used in chunkwise write mode and if the
+        sampling engine supports it.
+
+        @param EnsembleSamplerBase sampler: The sampling engine instance
+        @param int array_length: Number of samples per chunk
+
+        @return generator|None: Generator yielding the chunks in order, None if the chunks must be
+                                sampled serially. Errors of the worker processes are raised while
+                                iterating.
+        """
+        if self._sampling_processes < 1 or array_length >= sampler.number_of_samples:
+            return None
+        if not hasattr(sampler, 'iter_chunks_parallel'):
+            return None
+        try:
+            if self._sampling_executor is None:
+                self._sampling_executor = ProcessPoolExecutor(
+                    max_workers=self._sampling_processes,
+                    initializer=init_sampling_worker,
+                    initargs=(list(sys.path),))
+            return sampler.iter_chunks_parallel(array_length=array_length,
+                                                executor=self._sampling_executor,
+                                                chunks_in_flight=self._sampling_chunks_in_flight)
+        except Exception as err:
+            self.log.exception('Unable to sample waveform chunks in parallel. Falling back to '
+                               'serial sampling.')
+            if isinstance(err, BrokenProcessPool):
+                self._shutdown_sampling_executor()
+            return None
+
+    def _shutdown_sampling_executor(self):
+        """ Shut down the worker processes used for parallel sampling (if any). A new process pool
+        is created on demand by _get_parallel_chunk_iterator.
+        """
+        if self._sampling_executor is not None:
+            self._sampling_executor.shutdown(wait=True)
+            self._sampling_executor = None
+        return
+
+    def _get_waveform_cache_key(self, ensemble, ensemble_info, offset_bin):
+        """ Waveform cache key for sampling an ensemble with the current pulse generator settings.
+        See logic.pulsed.waveform_cache.WaveformCache.waveform_key
+
+        @param PulseBlockEnsemble ensemble: The ensemble to sample
+        @param dict ensemble_info: information about the ensemble returned by
+                                   analyze_block_ensemble
+        @param int offset_bin: Offset of the first sample in the rotating frame
+
+        @return str: waveform cache key
+        """
+        return self._waveform_cache.waveform_key(
+            ensemble=ensemble,
+            blocks={name: self.get_block(name) for name, reps in ensemble.block_list},
+            sample_rate=self.__sample_rate,
+            analog_amplitudes=self.__analog_levels[0],
+            channels=self.__activation_config[1],
+            offset_bin=offset_bin,
+            sampling_engine=self._sampling_engine,
+            chunk_length=self._get_sample_array_length(ensemble_info))
+
+    def _get_written_waveforms(self, waveform_name, cache_key):
+        """ Get the waveforms on the device that have been written for waveform_name with the
+        exact same samples as described by cache_key.
+
+        @param str waveform_name: waveform name (nametag) excluding the channel suffix
+        @param str cache_key: waveform cache key of the samples
+
+        @return list: names of the waveforms on the device. Empty list if waveforms have to be
+                      (re-)written.
+        """
+        written_key, written_waveforms = self._written_waveform_keys.get(waveform_name,
+                                                                         (None, list()))
+        if written_key != cache_key or not written_waveforms:
+            return list()
+        if not set(written_waveforms).issubset(self.sampled_waveforms):
+            return list()
+        return list(written_waveforms)
+
+    @staticmethod
+    def _iter_cached_chunks(cached_samples, array_length):
+        """ Generator yielding chunks of at most array_length samples of a cached waveform """
+        analog_samples, digital_samples = cached_samples
+        number_of_samples = len(next(iter((*analog_samples.values(),
+                                           *digital_samples.values()))))
+        for start in range(0, number_of_samples, max(array_length, 1)):
+            stop = start + array_length
+            yield ({chnl: arr[start:stop] for chnl, arr in analog_samples.items()},
+                   {chnl: arr[start:stop] for chnl, arr in digital_samples.items()})
+
     @QtCore.Slot(str)
     def sample_pulse_sequence(self, sequence):
         """ Samples the PulseSequence object, which serves as the construction plan.
@@ -1960,6 +2161,10 @@ class SequenceGeneratorLogic(GenericLogic):
         ATTENTION: The phase preservation within a single PulseBlockEnsemble is NOT affected by
                    this method.
 
+        Waveforms of sequence steps that did not change since they have been written to the device
+        (same ensemble content, pulse generator settings and rotating frame offset) are reused and
+        not sampled or written again. The reuse decision for each step is logged.
+
         More sophisticated sequence sampling method can be implemented here.
         """
         # Get PulseSequence from saved sequences if string has been passed as argument
@@ -2014,6 +2219,8 @@ class SequenceGeneratorLogic(GenericLogic):
         # of the sampled Pulse_Block_Ensembles one has to introduce a running number as an
         # additional name tag, so keep the sampled files separate.
         offset_bin = 0  # that will be used for phase preservation
+        # Number of sequence steps with waveforms already present on the device
+        reused_steps = 0
         for step_index, seq_step in enumerate(sequence):
             if sequence.rotating_frame:
                 # to make something like 001
@@ -2022,11 +2229,25 @@ class SequenceGeneratorLogic(GenericLogic):
                 name_tag = seq_step.ensemble
                 offset_bin = 0  # Keep the offset at 0
 
-            # Only sample ensembles if they have not already been sampled
-            if sequence.rotating_frame or \
-                    not self.get_ensemble(name_tag).sampling_information or \
-                    self.get_ensemble(name_tag).sampling_information['pulse_generator_settings'] != self.pulse_generator_settings:
-
+            # Only sample ensembles if the exact same waveform is not already present on the device.
+            # This is the case if neither the ensemble (including its blocks) nor the pulse
+            # generator settings nor the rotating frame offset have changed since the last time
+            # this step has been sampled.
+            ensemble = self.get_ensemble(seq_step.ensemble)
+            ensemble_info = self.analyze_block_ensemble(ensemble)
+            cache_key = self._get_waveform_cache_key(ensemble, ensemble_info, offset_bin)
+            waveform_list = self._get_written_waveforms(name_tag, cache_key)
+            if waveform_list:
+                self.log.debug('Sequence step {0:d}: Reusing waveforms {1} of unchanged '
+                               'PulseBlockEnsemble "{2}".'.format(step_index, waveform_list,
+                                                                  seq_step.ensemble))
+                reused_steps += 1
+                if ensemble.rotating_frame:
+                    offset_bin += ensemble_info['number_of_samples']
+            else:
+                self.log.debug('Sequence step {0:d}: PulseBlockEnsemble "{1}" has changed or is '
+                               'not present on the device. Sampling waveform "{2}".'
+                               ''.format(step_index, seq_step.ensemble, name_tag))
                 offset_bin, waveform_list, ensemble_info = self.sample_pulse_block_ensemble(
                     ensemble=seq_step.ensemble,
                     offset_bin=offset_bin,
@@ -2041,20 +2262,14 @@ class SequenceGeneratorLogic(GenericLogic):
                     self.sigSampleSequenceComplete.emit(None)
                     return
 
-                # Add to generated ensembles
-                ensemble_info['waveforms'] = waveform_list
-                generated_ensembles[name_tag] = ensemble_info
-
-                # Add created waveform names to the set
-                written_waveforms.update(waveform_list)
-            else:
-                self.log.debug('Waveform already sampled: {0}'.format(name_tag))
-                ensemble_info = self.get_ensemble(name_tag).sampling_information.copy()
-                del(ensemble_info['pulse_generator_settings'])
-                generated_ensembles[name_tag] = ensemble_info
+            # Add to generated ensembles
+            ensemble_info = ensemble_info.copy()
+            ensemble_info['waveforms'] = waveform_list
+            ensemble_info['waveform_cache_key'] = self._written_waveform_keys[name_tag][0]
+            generated_ensembles[name_tag] = ensemble_info
 
-                # Add created waveform names to the set
-                written_waveforms.update(ensemble_info['waveforms'])
+            # Add created waveform names to the set
+            written_waveforms.update(waveform_list)
 
             # Append written sequence step to sequence_param_dict_list
             sequence_param_dict_list.append(
@@ -2081,6 +2296,8 @@ class SequenceGeneratorLogic(GenericLogic):
 
         self.log.info('Time needed for sampling and writing PulseSequence {0} to device: {1} sec.'
                       ''.format(sequence.name, int(np.rint(time.time() - start_time))))
+        self.log.info('Reused waveforms on device for {0:d} of {1:d} steps of PulseSequence {2}.'
+                      ''.format(reused_steps, len(sequence_param_dict_list), sequence.name))
 
         # unlock module
         self.module_state.unlock()
@@ -2105,6 +2322,7 @@ class SequenceGeneratorLogic(GenericLogic):
         wfm_to_delete = [wfm for wfm in self.sampled_waveforms if
                          wfm.rsplit('_', 1)[0] == nametag]
         self._delete_waveform(wfm_to_delete)
+        self._written_waveform_keys.pop(nametag, None)
         # Erase sampling information if a PulseBlockEnsemble by the same name can be found in saved
         # ensembles
         if nametag in self.saved_pulse_block_ensembles:
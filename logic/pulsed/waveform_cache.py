@@ -0,0 +1,300 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains the Qudi helper class to cache sampled waveforms in memory and on disk.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import logging
+import numpy as np
+from enum import Enum
+from collections import OrderedDict
+
+
+class WaveformCache:
+    """
+    Content-addressed least-recently-used cache for sampled waveforms.
+
+    Each entry holds the float32 analog and bool digital sample arrays of an entire waveform with
+    the generic channel names as keys. Entries are addressed by a hash of everything the samples
+    depend on (see waveform_key) and not by the waveform name.
+
+    The cache has two tiers:
+        - memory: the most recently used entries as numpy arrays
+        - disk: one directory per entry containing a .npy file per channel
+    New entries are only added to the memory tier. Entries evicted from memory are written to the
+    disk tier, so sampling a waveform never costs additional disk access. Both tiers have a size
+    limit in bytes. Setting a limit to 0 disables the respective tier.
+    """
+    _file_format_version = 1
+    # Version of the samples stored for a key. Increase whenever the samples of the sampling
+    # functions or engines change (e.g. bug fixes) in order to invalidate existing cache entries.
+    _key_version = 1
+    log = logging.getLogger(__name__)
+
+    def __init__(self, cache_dir, max_memory_bytes=0, max_disk_bytes=0):
+        self.cache_dir = cache_dir
+        self.max_memory_bytes = int(max_memory_bytes)
+        self.max_disk_bytes = int(max_disk_bytes)
+        self._memory_entries = OrderedDict()
+        self._memory_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        if self.max_disk_bytes > 0:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    @property
+    def enabled(self):
+        return self.max_memory_bytes > 0 or self.max_disk_bytes > 0
+
+    @property
+    def max_entry_bytes(self):
+        """ Largest waveform in bytes that can be added to the cache (see writer) """
+        return self.max_memory_bytes
+
+    @classmethod
+    def waveform_key(cls, ensemble, blocks, sample_rate, analog_amplitudes, channels, offset_bin,
+                     sampling_engine, chunk_length=0):
+        """
+        Create a stable hash for a waveform sampled from a PulseBlockEnsemble.
+
+        Only the properties the samples actually depend on are taken into account. The names of the
+        ensemble and blocks as well as measurement and sampling information are ignored.
+
+        @param PulseBlockEnsemble ensemble: The sampled PulseBlockEnsemble instance
+        @param dict blocks: PulseBlock instances used in ensemble with their names as keys
+        @param float sample_rate: The sample rate in Hz
+        @param dict analog_amplitudes: peak-to-peak amplitudes (V) of all analog channels
+        @param iterable channels: The active channels
+        @param int offset_bin: Offset of the first sample in the rotating frame
+        @param str sampling_engine: Name of the sampling engine (see
+                                    logic.pulsed.pulse_sampler.SAMPLING_ENGINES)
+        @param int chunk_length: Number of samples per chunk used for sampling. Only relevant if the
+                                 ensemble is not sampled in the rotating frame since the time axis
+                                 of elements split between chunks restarts at each chunk.
+
+        @return str: hexadecimal hash string
+        """
+        block_list = list()
+        for block_name, reps in ensemble.block_list:
+            elements = blocks[block_name].get_dict_representation()['element_list']
+            block_list.append((elements, reps))
+        key_dict = {'version': cls._file_format_version,
+                    'key_version': cls._key_version,
+                    'sampling_engine': str(sampling_engine),
+                    'rotating_frame': bool(ensemble.rotating_frame),
+                    'block_list': block_list,
+                    'sample_rate': float(sample_rate),
+                    'analog_amplitudes': {chnl: float(amp) for chnl, amp in
+                                          analog_amplitudes.items() if chnl in channels},
+                    'channels': sorted(channels),
+                    'offset_bin': int(offset_bin)}
+        if not ensemble.rotating_frame:
+            key_dict['chunk_length'] = int(chunk_length)
+        key_str = json.dumps(key_dict, sort_keys=True, default=cls._json_default)
+        return hashlib.sha256(key_str.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _json_default(obj):
+        if isinstance(obj, (set, frozenset)):
+            return sorted(obj)
+        if isinstance(obj, np.generic):
+            return obj.item()
+        if isinstance(obj, Enum):
+            return str(obj)
+        return repr(obj)
+
+    def get(self, key):
+        """
+        Get the sample arrays stored for a waveform key.
+
+        @param str key: waveform key (see waveform_key)
+
+        @return (dict, dict)|None: analog and digital sample arrays or None if not cached.
+                                   Arrays loaded from disk that do not fit in memory are returned
+                                   as read-only memory maps.
+        """
+        entry = self._memory_entries.get(key)
+        if entry is not None:
+            self._memory_entries.move_to_end(key)
+            self.hits += 1
+            return entry[0], entry[1]
+
+        entry = self._load_from_disk(key)
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def writer(self, key, analog_channels, digital_channels, number_of_samples):
+        """
+        Create a writer object to add a waveform to the cache chunk by chunk.
+
+        @param str key: waveform key (see waveform_key)
+        @param iterable analog_channels: analog channel names
+        @param iterable digital_channels: digital channel names
+        @param int number_of_samples: total number of samples of the waveform
+
+        @return WaveformCacheWriter|None: writer instance or None if the waveform is too large for
+                                          this cache.
+        """
+        nbytes = number_of_samples * (4 * len(analog_channels) + len(digital_channels))
+        if nbytes > self.max_entry_bytes or number_of_samples == 0:
+            return None
+        return WaveformCacheWriter(self, key, analog_channels, digital_channels,
+                                   number_of_samples)
+
+    def clear(self):
+        """ Remove all entries from memory and disk """
+        self._memory_entries.clear()
+        self._memory_bytes = 0
+        if os.path.isdir(self.cache_dir):
+            for entry in os.listdir(self.cache_dir):
+                shutil.rmtree(os.path.join(self.cache_dir, entry), ignore_errors=True)
+
+    def _load_from_disk(self, key):
+        """ Load an entry from the disk cache and add it to the memory cache if it fits """
+        entry_dir = os.path.join(self.cache_dir, key)
+        if self.max_disk_bytes <= 0 or not os.path.isdir(entry_dir):
+            return None
+
+        try:
+            nbytes = self._dir_size(entry_dir)
+            mmap_mode = None if nbytes <= self.max_memory_bytes else 'r'
+            analog_samples = dict()
+            digital_samples = dict()
+            for file_name in os.listdir(entry_dir):
+                chnl, ext = os.path.splitext(file_name)
+                if ext != '.npy':
+                    continue
+                samples = np.load(os.path.join(entry_dir, file_name), mmap_mode=mmap_mode)
+                if chnl.startswith('a_ch'):
+                    analog_samples[chnl] = samples
+                else:
+                    digital_samples[chnl] = samples
+            # Mark as recently used
+            os.utime(entry_dir)
+        except (OSError, ValueError):
+            self.log.exception('Unable to load cached waveform "{0}" from disk. Removing it from '
+                               'cache.'.format(key))
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            return None
+
+        if mmap_mode is None:
+            self._add_to_memory(key, analog_samples, digital_samples, nbytes)
+        return analog_samples, digital_samples
+
+    def _add_to_memory(self, key, analog_samples, digital_samples, nbytes):
+        if nbytes > self.max_memory_bytes:
+            return
+        if key in self._memory_entries:
+            self._memory_bytes -= self._memory_entries.pop(key)[2]
+        self._memory_entries[key] = (analog_samples, digital_samples, nbytes)
+        self._memory_bytes += nbytes
+        while self._memory_bytes > self.max_memory_bytes:
+            evicted_key, evicted_entry = self._memory_entries.popitem(last=False)
+            self._memory_bytes -= evicted_entry[2]
+            self._write_to_disk(evicted_key, *evicted_entry)
+
+    def _write_to_disk(self, key, analog_samples, digital_samples, nbytes):
+        """ Add an entry evicted from memory to the disk cache if it fits """
+        if nbytes > self.max_disk_bytes:
+            return
+        entry_dir = os.path.join(self.cache_dir, key)
+        if os.path.isdir(entry_dir):
+            # Mark as recently used
+            os.utime(entry_dir)
+            return
+        tmp_dir = os.path.join(self.cache_dir, '{0}_{1:d}.tmp'.format(key, os.getpid()))
+        try:
+            os.makedirs(tmp_dir, exist_ok=True)
+            for chnl, samples in (*analog_samples.items(), *digital_samples.items()):
+                np.save(os.path.join(tmp_dir, chnl + '.npy'), samples)
+            os.replace(tmp_dir, entry_dir)
+        except OSError:
+            self.log.exception('Unable to write cached waveform "{0}" to disk.'.format(key))
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return
+        self._evict_disk()
+
+    def _evict_disk(self):
+        """ Delete least recently used entries from disk until the size limit is met """
+        entries = list()
+        for entry in os.listdir(self.cache_dir):
+            entry_dir = os.path.join(self.cache_dir, entry)
+            if not os.path.isdir(entry_dir) or entry.endswith('.tmp'):
+                continue
+            entries.append((os.path.getmtime(entry_dir), self._dir_size(entry_dir), entry_dir))
+        total_bytes = sum(entry[1] for entry in entries)
+        for mtime, nbytes, entry_dir in sorted(entries):
+            if total_bytes <= self.max_disk_bytes:
+                break
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total_bytes -= nbytes
+
+    @staticmethod
+    def _dir_size(path):
+        return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+class WaveformCacheWriter:
+    """
+    Helper to add a waveform to a WaveformCache chunk by chunk while it is being sampled.
+    Call commit after the last chunk or discard on failure.
+    """
+    def __init__(self, cache, key, analog_channels, digital_channels, number_of_samples):
+        self._cache = cache
+        self._key = key
+        self._number_of_samples = int(number_of_samples)
+        self._write_index = 0
+        self._nbytes = self._number_of_samples * (4 * len(analog_channels) + len(digital_channels))
+        self._analog_samples = {chnl: np.empty(self._number_of_samples, dtype='float32') for chnl
+                                in analog_channels}
+        self._digital_samples = {chnl: np.empty(self._number_of_samples, dtype=bool) for chnl in
+                                 digital_channels}
+
+    def write(self, analog_samples, digital_samples):
+        """ Append the next chunk of samples """
+        chunk_length = 0
+        for chnl, samples in analog_samples.items():
+            chunk_length = len(samples)
+            self._analog_samples[chnl][self._write_index:self._write_index + chunk_length] = samples
+        for chnl, samples in digital_samples.items():
+            chunk_length = len(samples)
+            self._digital_samples[chnl][self._write_index:self._write_index + chunk_length] = samples
+        self._write_index += chunk_length
+
+    def commit(self):
+        """ Add the written waveform to the cache. The writer can not be used afterwards. """
+        if self._write_index != self._number_of_samples:
+            self._cache.log.error('Incomplete waveform can not be added to waveform cache.')
+            self.discard()
+            return
+        self._cache._add_to_memory(self._key, self._analog_samples, self._digital_samples,
+                                   self._nbytes)
+        self._analog_samples = dict()
+        self._digital_samples = dict()
+
+    def discard(self):
+        """ Throw away the written samples. The writer can not be used afterwards. """
+        self._analog_samples = dict()
+        self._digital_samples = dict()
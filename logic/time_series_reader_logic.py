@@ -20,7 +20,9 @@ top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi
 """
 
 from qtpy import QtCore
+import functools
 import numpy as np
+import os
 import datetime as dt
 import time
 import matplotlib.pyplot as plt
@@ -31,6 +33,10 @@ from core.configoption import ConfigOption
 from logic.generic_logic import GenericLogic
 from core.util.mutex import Mutex
 from core.util.units import ScaledFloat
+from core.util.ring_buffer import RingBuffer
+from core.util.stream_file import StreamFileWriter, StreamFileReader
+from core.util.buffer_pool import BufferPool
+from core.util.min_max_pyramid import MinMaxPyramid
 from interface.data_instream_interface import StreamChannelType, StreamingMode
 
 
@@ -44,6 +50,8 @@ class TimeSeriesReaderLogic(GenericLogic):
         module.Class: 'time_series_reader_logic.TimeSeriesReaderLogic'
         max_frame_rate: 10  # optional (10Hz by default)
         calc_digital_freq: True  # optional (True by default)
+        recording_queue_size: 64  # optional, data frames waiting to be written while recording
+        read_buffers: 4  # optional, number of buffers the streamer data is read into
         connect:
             _streamer_con: <streamer_name>
             _savelogic_con: <save_logic_name>
@@ -61,6 +69,12 @@ class TimeSeriesReaderLogic(GenericLogic):
     # config options
     _max_frame_rate = ConfigOption('max_frame_rate', default=10, missing='warn')
     _calc_digital_freq = ConfigOption('calc_digital_freq', default=True, missing='warn')
+    _recording_queue_size = ConfigOption('recording_queue_size', default=64, missing='nothing')
+    _number_of_read_buffers = ConfigOption('read_buffers', default=4, missing='nothing')
+
+    # Maximum time to wait for the recording file writer (s) and number of samples in saved figures
+    _recording_write_timeout = 10
+    _figure_max_samples = 100000
 
     # status vars
     _trace_window_size = StatusVar('trace_window_size', default=6)
@@ -83,14 +97,27 @@ class TimeSeriesReaderLogic(GenericLogic):
         self._samples_per_frame = None
         self._stop_requested = True
 
-        # Data arrays
-        self._trace_data = None
+        # Data ring buffers (samples x channels)
+        self._trace_buffer = None
         self._trace_times = None
-        self._trace_data_averaged = None
-        self.__moving_filter = None
-
-        # for data recording
-        self._recorded_data = None
+        self._average_buffer = None
+        # Min/max decimation pyramids of both traces and the plot width in pixels to decimate to
+        self._trace_pyramid = None
+        self._average_pyramid = None
+        self._display_width = 0
+        # Moving average state: running window sums of the averaged channels
+        self._averaged_indices = None
+        self._average_sum = None
+        self._samples_since_resum = 0
+        # Pool of buffers the streamer data is read into and their size in samples per channel
+        self._buffer_pool = None
+        self._read_buffer_samples = 0
+        # Reused work arrays for data processing
+        self._oversampling_work = None
+        self._average_work = None
+
+        # for data recording (frames are written to a stream file by a background thread)
+        self._stream_writer = None
         self._data_recording_active = False
         self._record_start_time = None
         return
@@ -162,12 +189,31 @@ class TimeSeriesReaderLogic(GenericLogic):
 
     def _init_data_arrays(self):
         window_size = self.trace_window_size_samples
-        self._trace_data = np.zeros(
-            [self.number_of_active_channels, window_size + self._moving_average_width // 2])
-        self._trace_data_averaged = np.zeros(
-            [len(self._averaged_channels), window_size - self._moving_average_width // 2])
+        # The raw trace holds moving_average_width // 2 samples more than displayed in order to
+        # align it with the centered moving average.
+        trace_length = window_size + self._moving_average_width // 2
+        self._trace_buffer = RingBuffer(trace_length, (self.number_of_active_channels,),
+                                        mirrored=True)
+        self._trace_buffer.extend(np.zeros((trace_length, self.number_of_active_channels)))
+        self._trace_pyramid = MinMaxPyramid(trace_length, self.number_of_active_channels)
+        self._trace_pyramid.extend(self._trace_buffer.latest())
+        average_length = window_size - self._moving_average_width // 2
+        self._average_buffer = RingBuffer(average_length, (len(self._averaged_channels),),
+                                          mirrored=True)
+        self._average_buffer.extend(np.zeros((average_length, len(self._averaged_channels))))
+        self._average_pyramid = MinMaxPyramid(average_length, len(self._averaged_channels))
+        self._average_pyramid.extend(self._average_buffer.latest())
+        self._averaged_indices = np.array(
+            [self.active_channel_names.index(ch) for ch in self._averaged_channels], dtype=int)
+        self._average_sum = np.zeros(len(self._averaged_channels))
+        self._samples_since_resum = 0
         self._trace_times = np.arange(window_size) / self.data_rate
-        self._recorded_data = list()
+        # Each read buffer holds the samples of up to two data frames
+        self._read_buffer_samples = max(1, 2 * self._samples_per_frame) * self.oversampling_factor
+        self._buffer_pool = BufferPool(
+            self._number_of_read_buffers,
+            (self.number_of_active_channels * self._read_buffer_samples,),
+            dtype=self._streamer.data_type)
         return
 
     @property
@@ -279,18 +325,105 @@ class TimeSeriesReaderLogic(GenericLogic):
 
     @property
     def trace_data(self):
-        data_offset = self._trace_data.shape[1] - self._moving_average_width // 2
-        data = {ch: self._trace_data[i, :data_offset] for i, ch in
-                enumerate(self.active_channel_names)}
+        """ Time axis and dict of the displayed trace of each channel. The traces are views of the
+        ring buffer and only valid until the next data frame has been processed.
+        """
+        trace = self._trace_buffer.latest()[:self._trace_times.size]
+        data = {ch: trace[:, i] for i, ch in enumerate(self.active_channel_names)}
         return self._trace_times, data
 
     @property
     def averaged_trace_data(self):
         if not self.averaged_channel_names or self.moving_average_width <= 1:
             return None, None
-        data = {ch: self._trace_data_averaged[i] for i, ch in
-                enumerate(self.averaged_channel_names)}
-        return self._trace_times[-self._trace_data_averaged.shape[1]:], data
+        averaged = self._average_buffer.latest()
+        data = {ch: averaged[:, i] for i, ch in enumerate(self.averaged_channel_names)}
+        return self._trace_times[-averaged.shape[0]:], data
+
+    @property
+    def display_trace_data(self):
+        """ Time axis and dict of the displayed trace of each channel, decimated to the display
+        width (see set_display_width). A copy of the full trace_data is returned if it is not
+        wider. In contrast to trace_data the traces stay valid, so they can be emitted to other
+        threads.
+        """
+        trace = self._trace_buffer.latest()[:self._trace_times.size]
+        start = self._trace_pyramid.number_of_samples - self._trace_buffer.capacity
+        times, decimated = self._decimate_trace(self._trace_pyramid, trace, start, 0)
+        # The ring buffer is overwritten in place with the next data frame
+        trace = np.array(trace) if decimated is trace else decimated
+        data = {ch: trace[:, i] for i, ch in enumerate(self.active_channel_names)}
+        return times, data
+
+    @property
+    def display_averaged_trace_data(self):
+        """ Time axis and dict of the averaged trace of each averaged channel, decimated to the
+        display width (see set_display_width). Like display_trace_data the traces are copies.
+        """
+        if not self.averaged_channel_names or self.moving_average_width <= 1:
+            return None, None
+        averaged = self._average_buffer.latest()
+        start = self._average_pyramid.number_of_samples - averaged.shape[0]
+        times, decimated = self._decimate_trace(self._average_pyramid,
+                                                averaged,
+                                                start,
+                                                self._trace_times.size - averaged.shape[0])
+        # The ring buffer is overwritten in place with the next moving average values
+        averaged = np.array(averaged) if decimated is averaged else decimated
+        data = {ch: averaged[:, i] for i, ch in enumerate(self.averaged_channel_names)}
+        return times, data
+
+    def _decimate_trace(self, pyramid, trace, start, offset):
+        """
+        Decimates a trace to about the display width using the coarsest level of its min/max
+        pyramid that still has at least half a bin per pixel. Each bin contributes its minimum and
+        maximum at the bin center. The partial bins at both ends of the trace are taken from the
+        trace itself, so the bins only cover displayed samples. The last sample of the trace is
+        appended, so the decimated trace ends at the current value.
+
+        @param MinMaxPyramid pyramid: pyramid of the stream the trace is taken from
+        @param numpy.ndarray trace: displayed samples (samples x channels)
+        @param int start: stream index of the first displayed sample
+        @param int offset: index of the first displayed sample on the time axis
+
+        @return (numpy.ndarray, numpy.ndarray): time axis and decimated trace (points x channels)
+        """
+        number_of_samples = trace.shape[0]
+        level = -1
+        if self._display_width > 0:
+            level = pyramid.select_level(number_of_samples, 2 * self._display_width)
+        if level < 0:
+            return self._trace_times[offset:offset + number_of_samples], trace
+
+        bin_size = pyramid.bin_sizes[level]
+        first_bin = -(-start // bin_size)
+        last_bin = max((start + number_of_samples) // bin_size, first_bin)
+        first, minima, maxima = pyramid.bins(level, first_bin * bin_size, last_bin * bin_size)
+        # trace indices of the first and after the last sample covered by the completed bins
+        head_stop = min(first - start, number_of_samples)
+        tail_start = head_stop + minima.shape[0] * bin_size
+        centers = np.arange(minima.shape[0]) * bin_size + (head_stop + (bin_size - 1) / 2)
+        if head_stop > 0:
+            centers = np.concatenate(([(head_stop - 1) / 2], centers))
+            minima = np.concatenate((np.min(trace[:head_stop], axis=0, keepdims=True), minima))
+            maxima = np.concatenate((np.max(trace[:head_stop], axis=0, keepdims=True), maxima))
+        if tail_start < number_of_samples:
+            centers = np.concatenate((centers, [(tail_start + number_of_samples - 1) / 2]))
+            minima = np.concatenate((minima, np.min(trace[tail_start:], axis=0, keepdims=True)))
+            maxima = np.concatenate((maxima, np.max(trace[tail_start:], axis=0, keepdims=True)))
+
+        number_of_bins = centers.size
+        times = np.empty(2 * number_of_bins + 1)
+        times[:-1:2] = centers
+        times[1:-1:2] = centers
+        times[-1] = number_of_samples - 1
+        times += offset
+        times /= self.data_rate
+        decimated = np.empty((2 * number_of_bins + 1, trace.shape[1]), dtype=trace.dtype)
+        decimated[:-1:2] = minima
+        decimated[1:-1:2] = maxima
+        decimated[-1] = trace[-1]
+        return times, decimated
 
     @property
     def all_settings(self):
@@ -373,8 +506,6 @@ class TimeSeriesReaderLogic(GenericLogic):
                 if new_val / data_rate > self.trace_window_size:
                     if 'data_rate' in settings_dict or 'trace_window_size' in settings_dict:
                         self._moving_average_width = new_val
-                        self.__moving_filter = np.full(shape=self.moving_average_width,
-                                                       fill_value=1.0 / self.moving_average_width)
                     else:
                         self.log.warning('Moving average width to set ({0:d}) is smaller than the '
                                          'trace window size. Will adjust trace window size to '
@@ -382,8 +513,6 @@ class TimeSeriesReaderLogic(GenericLogic):
                         self._trace_window_size = float(new_val / data_rate)
                 else:
                     self._moving_average_width = new_val
-                    self.__moving_filter = np.full(shape=self.moving_average_width,
-                                                   fill_value=1.0 / self.moving_average_width)
 
             if 'data_rate' in settings_dict:
                 new_val = float(settings_dict['data_rate'])
@@ -463,11 +592,27 @@ class TimeSeriesReaderLogic(GenericLogic):
             settings = self.all_settings
             self.sigSettingsChanged.emit(settings)
             if not restart:
-                self.sigDataChanged.emit(*self.trace_data, *self.averaged_trace_data)
+                self.sigDataChanged.emit(*self.display_trace_data, *self.display_averaged_trace_data)
         if restart:
             self.start_reading()
         return settings
 
+    @QtCore.Slot(int)
+    def set_display_width(self, width):
+        """
+        Sets the width of the trace display in pixels. The traces emitted with sigDataChanged are
+        decimated to about this width with the min/max pyramids, so their size does not depend on
+        trace_window_size and data_rate. 0 disables the decimation.
+
+        @param int width: display width in pixels
+        """
+        with self.threadlock:
+            self._display_width = max(0, int(width))
+            if self.module_state() != 'locked':
+                self.sigDataChanged.emit(*self.display_trace_data,
+                                         *self.display_averaged_trace_data)
+        return
+
     @QtCore.Slot()
     def start_reading(self):
         """
@@ -485,6 +630,9 @@ class TimeSeriesReaderLogic(GenericLogic):
             self.module_state.lock()
             self._stop_requested = False
 
+            if self._data_recording_active:
+                self._start_recording_file()
+
             self.sigStatusChanged.emit(True, self._data_recording_active)
 
             # # Configure streaming device
@@ -504,10 +652,6 @@ class TimeSeriesReaderLogic(GenericLogic):
             # settings = self.all_settings
             # self.sigSettingsChanged.emit(settings)
 
-            if self._data_recording_active:
-                self._record_start_time = dt.datetime.now()
-                self._recorded_data = list()
-
             if self._streamer.start_stream() < 0:
                 self.log.error('Error while starting streaming device data acquisition.')
                 self._stop_requested = True
@@ -546,7 +690,6 @@ class TimeSeriesReaderLogic(GenericLogic):
                             'Error while trying to stop streaming device data acquisition.')
                     if self._data_recording_active:
                         self._save_recorded_data(to_file=True, save_figure=True)
-                        self._recorded_data = list()
                     self._data_recording_active = False
                     self.module_state.unlock()
                     self.sigStatusChanged.emit(False, False)
@@ -555,41 +698,78 @@ class TimeSeriesReaderLogic(GenericLogic):
                 samples_to_read = max(
                     (self._streamer.available_samples // self._oversampling_factor) * self._oversampling_factor,
                     self._samples_per_frame * self._oversampling_factor)
+                # Read at most one buffer of the pool. The rest is read with the next data frame.
+                samples_to_read = min(samples_to_read, self._read_buffer_samples)
                 if samples_to_read < 1:
                     self._sigNextDataFrame.emit()
                     return
 
-                # read the current counter values
-                data = self._streamer.read_data(number_of_samples=samples_to_read)
-                if data.shape[1] != samples_to_read:
+                # Get a free buffer. Blocks if all buffers are still queued for recording.
+                buffer = self._buffer_pool.acquire(timeout=self._recording_write_timeout)
+                if buffer is None:
+                    self.log.error('No free buffer to read data into; '
+                                   'killing the stream with next data frame.')
+                    self._stop_requested = True
+                    self._sigNextDataFrame.emit()
+                    return
+
+                # read the current counter values directly into the buffer
+                read_samples = self._streamer.read_data_into_buffer(
+                    buffer, number_of_samples=samples_to_read)
+                if read_samples != samples_to_read:
+                    self._buffer_pool.release(buffer)
                     self.log.error('Reading data from streamer went wrong; '
                                    'killing the stream with next data frame.')
                     self._stop_requested = True
                     self._sigNextDataFrame.emit()
                     return
+                data = buffer[:self.number_of_active_channels * samples_to_read].reshape(
+                    (self.number_of_active_channels, samples_to_read))
 
-                # Process data
-                self._process_trace_data(data)
+                # Process data. The buffer is returned to the pool as soon as it is not needed.
+                self._process_trace_data(
+                    data, release=functools.partial(self._buffer_pool.release, buffer))
 
                 # Emit update signal
-                self.sigDataChanged.emit(*self.trace_data, *self.averaged_trace_data)
+                self.sigDataChanged.emit(*self.display_trace_data, *self.display_averaged_trace_data)
                 self._sigNextDataFrame.emit()
         return
 
-    def _process_trace_data(self, data):
+    def _process_trace_data(self, data, release=None):
         """
         Processes raw data from the streaming device
+
+        @param numpy.ndarray data: raw data (channels x samples)
+        @param callable release: optional, called without arguments as soon as data is not needed
+                                 anymore, e.g. to recycle the buffer data has been read into
         """
         # Down-sample and average according to oversampling factor
         if self.oversampling_factor > 1:
             if data.shape[1] % self.oversampling_factor != 0:
                 self.log.error('Number of samples per channel not an integer multiple of the '
                                'oversampling factor.')
+                if release is not None:
+                    release()
                 return -1
             tmp = data.reshape((data.shape[0],
                                 data.shape[1] // self.oversampling_factor,
                                 self.oversampling_factor))
-            data = np.mean(tmp, axis=2)
+            # Average into another buffer of the pool, so the recording can take it over without
+            # copying. Without a free buffer, average into a reused array.
+            averaged = None
+            if release is not None:
+                averaged = self._buffer_pool.acquire(timeout=0)
+            if averaged is None:
+                averaged_release = None
+                data = self._get_work_array('_oversampling_work', tmp.shape[:2])
+            else:
+                averaged_release = functools.partial(self._buffer_pool.release, averaged)
+                data = averaged[:tmp.shape[0] * tmp.shape[1]].reshape(tmp.shape[:2])
+            np.mean(tmp, axis=2, out=data)
+            # The raw data is not needed anymore
+            if release is not None:
+                release()
+            release = averaged_release
 
         digital_channels = [c for c, typ in self.active_channel_types.items() if
                             typ == StreamChannelType.DIGITAL]
@@ -597,29 +777,91 @@ class TimeSeriesReaderLogic(GenericLogic):
         if self._calc_digital_freq and digital_channels:
             data[:len(digital_channels)] *= self.sampling_rate
 
-        # Append data to save if necessary
+        # Pass data to the recording file writer if necessary. Blocks if the writer lags behind.
+        # If data can be released, the writer takes it over without copying and releases it.
         if self._data_recording_active:
-            self._recorded_data.append(data.copy())
+            if self._stream_writer.write(data, timeout=self._recording_write_timeout,
+                                         release=release):
+                release = None
+            else:
+                self.log.error('Writing the recorded data to disk failed or timed out. '
+                               'Data recording stopped.')
+                self._data_recording_active = False
+                self._save_recorded_data(to_file=True, save_figure=True)
+                self.sigStatusChanged.emit(True, False)
 
-        data = data[:, -self._trace_data.shape[1]:]
+        data = data[:, -self._trace_buffer.capacity:]
         new_samples = data.shape[1]
 
-        # Roll data array to have a continuously running time trace
-        self._trace_data = np.roll(self._trace_data, -new_samples, axis=1)
-        # Insert new data
-        self._trace_data[:, -new_samples:] = data
+        # Write the new samples into the ring buffer of the continuously running time trace
+        self._trace_buffer.extend(data.T)
+        self._trace_pyramid.extend(data.T)
 
-        # Calculate moving average by using numpy.convolve with a normalized uniform filter
+        # Update the moving average of the averaged channels from running window sums
         if self.moving_average_width > 1 and self.averaged_channel_names:
-            # Only convolve the new data and roll the previously calculated moving average
-            self._trace_data_averaged = np.roll(self._trace_data_averaged, -new_samples, axis=1)
-            offset = new_samples + len(self.__moving_filter) - 1
-            for i, ch in enumerate(self.averaged_channel_names):
-                data_index = self.active_channel_names.index(ch)
-                self._trace_data_averaged[i, -new_samples:] = np.convolve(
-                    self._trace_data[data_index, -offset:], self.__moving_filter, mode='valid')
+            self._update_moving_average(new_samples)
+
+        if release is not None:
+            release()
         return
 
+    def _update_moving_average(self, new_samples):
+        """
+        Calculates the moving average for the new samples in the trace ring buffer and appends it
+        to the ring buffer of the averaged trace.
+
+        The window sum of each averaged channel is carried from frame to frame and updated with the
+        differences of the samples entering and leaving the window (O(new samples) for all
+        channels at once). To avoid accumulating rounding errors, the sums are recalculated from
+        scratch once the whole trace has been replaced or a frame is too large for the window.
+
+        @param int new_samples: number of samples added to the trace ring buffer
+        """
+        width = self._moving_average_width
+        trace_length = self._trace_buffer.capacity
+        number_of_channels = self._averaged_indices.size
+        self._samples_since_resum += new_samples
+        if new_samples + width > trace_length or self._samples_since_resum >= trace_length:
+            # Recalculate the window sums from the cumulative sum of all required samples
+            number_of_values = min(new_samples, self._average_buffer.capacity)
+            rows = self._trace_buffer.latest(number_of_values + width - 1)
+            cumulative = np.cumsum(rows[:, self._averaged_indices], axis=0)
+            window_sums = cumulative[width - 1:]
+            window_sums[1:] -= cumulative[:number_of_values - 1]
+            self._samples_since_resum = 0
+        else:
+            work = self._get_work_array('_average_work', (2, new_samples, number_of_channels))
+            window_sums, leaving = work
+            rows = self._trace_buffer.latest(new_samples + width)
+            np.take(rows[width:], self._averaged_indices, axis=1, out=window_sums, mode='clip')
+            np.take(rows[:new_samples], self._averaged_indices, axis=1, out=leaving, mode='clip')
+            # samples entering minus samples leaving the window, accumulated over the new samples
+            window_sums -= leaving
+            np.cumsum(window_sums, axis=0, out=window_sums)
+            window_sums += self._average_sum
+        self._average_sum[:] = window_sums[-1]
+        window_sums *= 1 / width
+        self._average_buffer.extend(window_sums)
+        self._average_pyramid.extend(window_sums)
+        return
+
+    def _get_work_array(self, name, shape):
+        """
+        Returns a C-contiguous work array of the requested shape that is reused between data
+        frames. The array is only reallocated if its size is not sufficient.
+
+        @param str name: attribute name holding the array
+        @param tuple shape: shape of the array
+
+        @return numpy.ndarray: uninitialized work array
+        """
+        work = getattr(self, name)
+        size = int(np.prod(shape))
+        if work is None or work.size < size:
+            work = np.empty(size)
+            setattr(self, name, work)
+        return work[:size].reshape(shape)
+
     @QtCore.Slot()
     def start_recording(self):
         """
@@ -635,9 +877,8 @@ class TimeSeriesReaderLogic(GenericLogic):
 
             self._data_recording_active = True
             if self.module_state() == 'locked':
-                self._recorded_data = list()
-                self._record_start_time = dt.datetime.now()
-                self.sigStatusChanged.emit(True, True)
+                self._start_recording_file()
+                self.sigStatusChanged.emit(True, self._data_recording_active)
             else:
                 self.start_reading()
         return 0
@@ -658,50 +899,95 @@ class TimeSeriesReaderLogic(GenericLogic):
             self._data_recording_active = False
             if self.module_state() == 'locked':
                 self._save_recorded_data(to_file=True, save_figure=True)
-                self._recorded_data = list()
                 self.sigStatusChanged.emit(True, False)
         return 0
 
+    def _start_recording_file(self):
+        """ Sets the recording start time and opens a new stream file in the data directory the
+        recorded data frames are written to. Deactivates the recording if this fails.
+
+        @return int: Error code (0: OK, -1: Error)
+        """
+        self._record_start_time = dt.datetime.now()
+        filepath = self._savelogic.get_path_for_module(module_name='TimeSeriesReader')
+        filename = self._record_start_time.strftime('%Y%m%d-%H%M-%S') + '_data_trace'
+        try:
+            self._stream_writer = StreamFileWriter(
+                os.path.join(filepath, filename),
+                channels=self.active_channel_names,
+                max_queued_blocks=self._recording_queue_size,
+                attributes={'Channel units': self.active_channel_units,
+                            'Data rate (Hz)': self.data_rate,
+                            'Start recording time': self._record_start_time.strftime(
+                                '%d.%m.%Y, %H:%M:%S.%f')})
+        except OSError:
+            self.log.exception('Unable to create the file to record data to. Data recording '
+                               'aborted.')
+            self._stream_writer = None
+            self._data_recording_active = False
+            return -1
+        return 0
+
     def _save_recorded_data(self, to_file=True, name_tag='', save_figure=True):
-        """ Save the counter trace data and writes it to a file.
+        """ Finish the recording file and save a header file with the parameters.
 
-        @param bool to_file: indicate, whether data have to be saved to file
+        The recorded data has already been written to a binary stream file (see
+        core.util.stream_file) while recording. The header file names the stream file.
+
+        @param bool to_file: indicate, whether the header file and figure have to be saved
         @param str name_tag: an additional tag, which will be added to the filename upon save
         @param bool save_figure: select whether png and pdf should be saved
 
-        @return dict parameters: Dictionary which contains the saving parameters
+        @return str, dict: path of the stream file holding the recorded data (see
+                           core.util.stream_file.StreamFileReader) or None if nothing has been
+                           recorded, Dictionary which contains the saving parameters
         """
-        if not self._recorded_data:
+        writer = self._stream_writer
+        self._stream_writer = None
+        if writer is None:
             self.log.error('No data has been recorded. Save to file failed.')
-            return np.empty(0), dict()
-
-        data_arr = np.concatenate(self._recorded_data, axis=1)
-        if data_arr.size == 0:
-            self.log.error('No data has been recorded. Save to file failed.')
-            return np.empty(0), dict()
+            return None, dict()
 
         saving_stop_time = self._record_start_time + dt.timedelta(
-            seconds=data_arr.shape[1] / self.data_rate)
+            seconds=writer.number_of_samples / self.data_rate)
 
         # write the parameters:
         parameters = dict()
-        parameters['Start recoding time'] = self._record_start_time.strftime(
+        parameters['Start recording time'] = self._record_start_time.strftime(
             '%d.%m.%Y, %H:%M:%S.%f')
-        parameters['Stop recoding time'] = saving_stop_time.strftime('%d.%m.%Y, %H:%M:%S.%f')
+        parameters['Stop recording time'] = saving_stop_time.strftime('%d.%m.%Y, %H:%M:%S.%f')
         parameters['Data rate (Hz)'] = self.data_rate
         parameters['Oversampling factor (samples)'] = self.oversampling_factor
         parameters['Sampling rate (Hz)'] = self.sampling_rate
+        parameters['Raw data file'] = os.path.basename(writer.raw_path)
+        parameters['Raw data format'] = '{0}, samples x channels ({1})'.format(
+            writer.dtype.str, ', '.join(writer.channels))
+
+        if not writer.close(attributes=parameters):
+            self.log.error('Error while writing recorded data to "{0}": {1}'
+                           ''.format(writer.raw_path, writer.error))
+        # Only the figure needs the samples. Release the memory map of the file right away.
+        with StreamFileReader(writer.path) as reader:
+            number_of_samples = len(reader)
+            number_of_channels = len(reader.channels)
+            if number_of_samples > 0 and to_file and save_figure:
+                # Plot every n-th sample only to keep the figure small
+                figure_data, step = reader.downsampled(self._figure_max_samples)
+        parameters['Number of samples'] = number_of_samples
+        if number_of_samples == 0:
+            self.log.error('No data has been recorded. Save to file failed.')
+            return None, parameters
 
         if to_file:
             # If there is a postfix then add separating underscore
             filelabel = 'data_trace_{0}'.format(name_tag) if name_tag else 'data_trace'
 
-            # prepare the data in a dict:
+            # The data is in the raw data file already. Only save the header.
             header = ', '.join(
                 '{0} ({1})'.format(ch, unit) for ch, unit in self.active_channel_units.items())
 
-            data = {header: data_arr.transpose()}
-            filepath = self._savelogic.get_path_for_module(module_name='TimeSeriesReader')
+            data = {header: np.empty((0, number_of_channels))}
+            filepath = os.path.dirname(writer.path)
             set_of_units = set(self.active_channel_units.values())
             unit_list = tuple(self.active_channel_units)
             y_unit = 'arb.u.'
@@ -712,7 +998,10 @@ class TimeSeriesReaderLogic(GenericLogic):
                     occurrences = count
                     y_unit = unit
 
-            fig = self._draw_figure(data_arr, self.data_rate, y_unit) if save_figure else None
+            if save_figure:
+                fig = self._draw_figure(figure_data.T, self.data_rate / step, y_unit)
+            else:
+                fig = None
 
             self._savelogic.save_data(data=data,
                                       filepath=filepath,
@@ -720,9 +1009,9 @@ class TimeSeriesReaderLogic(GenericLogic):
                                       filelabel=filelabel,
                                       plotfig=fig,
                                       delimiter='\t',
-                                      timestamp=saving_stop_time)
+                                      timestamp=self._record_start_time)
             self.log.info('Time series saved to: {0}'.format(filepath))
-        return data_arr, parameters
+        return writer.path, parameters
 
     def _draw_figure(self, data, timebase, y_unit):
         """ Draw figure to save with data file.
@@ -774,8 +1063,7 @@ class TimeSeriesReaderLogic(GenericLogic):
 
             header = ', '.join(
                 '{0} ({1})'.format(ch, unit) for ch, unit in self.active_channel_units.items())
-            data_offset = self._trace_data.shape[1] - self.moving_average_width // 2
-            data = {header: self._trace_data[:, :data_offset].transpose()}
+            data = {header: self._trace_buffer.latest()[:self._trace_times.size].copy()}
 
             if to_file:
                 filepath = self._savelogic.get_path_for_module(module_name='TimeSeriesReader')
@@ -807,7 +1095,6 @@ class TimeSeriesReaderLogic(GenericLogic):
                     'Error while trying to stop streaming device data acquisition.')
             if self._data_recording_active:
                 self._save_recorded_data(to_file=True, save_figure=True)
-                self._recorded_data = list()
             self._data_recording_active = False
             self.module_state.unlock()
             self.sigStatusChanged.emit(False, False)
@@ -359,7 +359,7 @@ class WavemeterLoggerLogic(GenericLogic):
         # TODO: Does this depend on things, or do we loop fast enough to get every wavelength value?
         wavelength_recentness = np.min([5, len(self._wavelength_data)])
 
-        recent_counts = np.array(self._counter_logic._data_to_save[-count_recentness:])
+        recent_counts = self._counter_logic._data_to_save[-count_recentness:]
         recent_wavelengths = np.array(self._wavelength_data[-wavelength_recentness:])
 
         # The latest counts are those recorded during the recent_wavelength_window
@@ -424,7 +424,7 @@ class WavemeterLoggerLogic(GenericLogic):
             self.sig_update_histogram_next.emit(False)
             return
 
-        temp = np.array(self._counter_logic._data_to_save[-count_window:])
+        temp = self._counter_logic._data_to_save[-count_window:]
 
         # only do something if there is wavelength data to work with
         if len(self._wavelength_data) > 0:
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+Standalone benchmark of the analysis methods of BasicPulseAnalyzer
+(see logic/pulsed/pulsed_analysis_methods/basic_analysis_methods.py).
+
+The analysis methods operate on the whole laser_data matrix at once. This script compares them to
+the previous implementations looping over all laser pulses (kept below as reference) for different
+numbers of laser pulses and checks the results for equality.
+
+Usage (from the qudi main directory):
+
+    python tools/pulse_analysis_benchmark.py [--lasers 10 100 1000 10000 100000] [--bins 3000]
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+import warnings
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from logic.pulsed.pulsed_analysis_methods.basic_analysis_methods import BasicPulseAnalyzer
+
+
+class MeasurementLogicStub:
+    """ Provides the read-only settings BasicPulseAnalyzer needs from PulsedMeasurementLogic """
+    def __init__(self, bin_width):
+        self.fast_counter_settings = {'bin_width': bin_width, 'is_gated': True}
+        self.measurement_settings = dict()
+        self.sampling_information = dict()
+        self.log = logging.getLogger('pulse_analysis_benchmark')
+
+
+def _windows(bin_width, *times):
+    return [round(t / bin_width) for t in times]
+
+
+def reference_mean_norm(laser_data, bin_width, signal_start, signal_end, norm_start, norm_end):
+    signal_start_bin, signal_end_bin, norm_start_bin, norm_end_bin = _windows(
+        bin_width, signal_start, signal_end, norm_start, norm_end)
+    signal_data = np.empty(laser_data.shape[0], dtype=float)
+    error_data = np.empty(laser_data.shape[0], dtype=float)
+    for ii, laser_arr in enumerate(laser_data):
+        tmp_data = laser_arr[norm_start_bin:norm_end_bin]
+        reference_sum = np.sum(tmp_data)
+        reference_mean = (reference_sum / len(tmp_data)) if len(tmp_data) != 0 else 0.0
+        tmp_data = laser_arr[signal_start_bin:signal_end_bin]
+        signal_sum = np.sum(tmp_data)
+        signal_mean = (signal_sum / len(tmp_data)) if len(tmp_data) != 0 else 0.0
+        if reference_mean > 0 and signal_mean >= 0:
+            signal_data[ii] = signal_mean / reference_mean
+        else:
+            signal_data[ii] = 0.0
+        if reference_sum > 0 and signal_sum > 0:
+            error_data[ii] = signal_data[ii] * np.sqrt(1 / signal_sum + 1 / reference_sum)
+        else:
+            error_data[ii] = 0.0
+    return signal_data, error_data
+
+
+def reference_mean_reference(laser_data, bin_width, signal_start, signal_end, norm_start,
+                             norm_end):
+    signal_start_bin, signal_end_bin, norm_start_bin, norm_end_bin = _windows(
+        bin_width, signal_start, signal_end, norm_start, norm_end)
+    signal_data = np.empty(laser_data.shape[0], dtype=float)
+    error_data = np.empty(laser_data.shape[0], dtype=float)
+    for ii, laser_arr in enumerate(laser_data):
+        tmp_data = laser_arr[norm_start_bin:norm_end_bin]
+        reference_sum = np.sum(tmp_data)
+        reference_mean = (reference_sum / len(tmp_data)) if len(tmp_data) != 0 else 0.0
+        tmp_data = laser_arr[signal_start_bin:signal_end_bin]
+        signal_sum = np.sum(tmp_data)
+        signal_mean = (signal_sum / len(tmp_data)) if len(tmp_data) != 0 else 0.0
+        signal_data[ii] = signal_mean - reference_mean
+        error_data[ii] = signal_data[ii] * np.sqrt(1 / abs(signal_sum) + 1 / abs(reference_sum))
+    return signal_data, error_data
+
+
+def reference_sum(laser_data, bin_width, signal_start, signal_end):
+    signal_start_bin, signal_end_bin = _windows(bin_width, signal_start, signal_end)
+    signal_data = np.empty(laser_data.shape[0], dtype=float)
+    error_data = np.empty(laser_data.shape[0], dtype=float)
+    for ii, laser_arr in enumerate(laser_data):
+        signal = laser_arr[signal_start_bin:signal_end_bin].sum()
+        signal_error = np.sqrt(signal)
+        if signal < 0 or signal != signal:
+            signal_data[ii] = 0.0
+            error_data[ii] = 0.0
+        else:
+            signal_data[ii] = signal
+            error_data[ii] = signal_error
+    return signal_data, error_data
+
+
+def reference_mean(laser_data, bin_width, signal_start, signal_end):
+    signal_start_bin, signal_end_bin = _windows(bin_width, signal_start, signal_end)
+    signal_data = np.empty(laser_data.shape[0], dtype=float)
+    error_data = np.empty(laser_data.shape[0], dtype=float)
+    for ii, laser_arr in enumerate(laser_data):
+        signal = laser_arr[signal_start_bin:signal_end_bin].mean()
+        signal_sum = laser_arr[signal_start_bin:signal_end_bin].sum()
+        signal_error = np.sqrt(signal_sum) / (signal_end_bin - signal_start_bin)
+        if signal < 0 or signal != signal:
+            signal_data[ii] = 0.0
+            error_data[ii] = 0.0
+        else:
+            signal_data[ii] = signal
+            error_data[ii] = signal_error
+    return signal_data, error_data
+
+
+# (analysis method name, reference implementation, window parameters)
+CASES = [('analyse_mean_norm', reference_mean_norm,
+          {'signal_start': 0.0, 'signal_end': 200e-9, 'norm_start': 300e-9, 'norm_end': 500e-9}),
+         ('analyse_mean_reference', reference_mean_reference,
+          {'signal_start': 0.0, 'signal_end': 200e-9, 'norm_start': 300e-9, 'norm_end': 500e-9}),
+         ('analyse_sum', reference_sum, {'signal_start': 0.0, 'signal_end': 200e-9}),
+         ('analyse_mean', reference_mean, {'signal_start': 0.0, 'signal_end': 200e-9})]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark of the pulse analysis methods')
+    parser.add_argument('--lasers', type=int, nargs='*', default=[10, 100, 1000, 10000, 100000],
+                        help='Numbers of laser pulses to benchmark')
+    parser.add_argument('--bins', type=int, default=3000, help='Number of time bins per laser')
+    parser.add_argument('--bin-width', type=float, default=1e-9)
+    args = parser.parse_args()
+
+    analyzer = BasicPulseAnalyzer(MeasurementLogicStub(args.bin_width))
+    rng = np.random.default_rng(42)
+
+    print('{0:>24s} {1:>8s} {2:>10s} {3:>10s} {4:>8s} {5:>6s}'.format(
+        'method', 'lasers', 'loop', 'matrix', 'speedup', 'equal'))
+    for num_of_lasers in args.lasers:
+        laser_data = rng.poisson(5, size=(num_of_lasers, args.bins)).astype('int64')
+        # Include some empty lasers to cover the zero-division rules
+        laser_data[::7] = 0
+        for method_name, reference, params in CASES:
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', RuntimeWarning)
+                start = time.perf_counter()
+                expected = reference(laser_data, args.bin_width, **params)
+                t_loop = time.perf_counter() - start
+                start = time.perf_counter()
+                result = getattr(analyzer, method_name)(laser_data, **params)
+                t_matrix = time.perf_counter() - start
+            equal = all(np.array_equal(res, exp, equal_nan=True) for res, exp in
+                        zip(result, expected))
+            print('{0:>24s} {1:>8d} {2:>9.4f}s {3:>9.4f}s {4:>7.1f}x {5:>6s}'.format(
+                method_name, num_of_lasers, t_loop, t_matrix, t_loop / t_matrix, str(equal)))
+
+
+if __name__ == '__main__':
+    main()
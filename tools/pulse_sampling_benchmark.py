@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""
+Standalone benchmark comparing the sampling engines of the SequenceGeneratorLogic
+(see logic/pulsed/pulse_sampler.py) on the shipped predefined methods.
+
+All predefined methods are generated with their default parameters using a SequenceGeneratorLogic
+connected to the dummy pulser. Every resulting PulseBlockEnsemble is then sampled by each engine
+and the results of the legacy and vectorized engine are checked for bit-by-bit equality. The
+vectorized_lut engine uses lookup tables of periodic sampling functions and may deviate from the
+legacy engine on the level of floating point rounding, so its maximum deviation is reported
+instead. No samples are uploaded to any device.
+
+Usage (from the qudi main directory):
+
+    python tools/pulse_sampling_benchmark.py [--methods xy8_tau rabi] [--chunk-samples 1000000]
+                                          [--sample-rate 12e9] [--params xy8_order=16]
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import os
+import ast
+import sys
+import time
+import argparse
+import tempfile
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from hardware.pulser_dummy import PulserDummy
+from logic.pulsed.sequence_generator_logic import SequenceGeneratorLogic
+from logic.pulsed.pulse_sampler import SAMPLING_ENGINES
+from logic.pulsed.sampling_functions import SamplingFunctions
+
+
+def create_sequence_generator(assets_dir, sample_rate=25e9, activation_config='config0'):
+    """ Create and activate a SequenceGeneratorLogic connected to a PulserDummy outside of qudi """
+    pulser = PulserDummy(manager=None, name='pulser_dummy', config={})
+    pulser.module_state.activate()
+    logic = SequenceGeneratorLogic(manager=None,
+                                   name='sequencegeneratorlogic',
+                                   config={'assets_storage_path': assets_dir})
+    logic.connectors['pulsegenerator'].connect(pulser)
+    logic.module_state.activate()
+    logic.set_pulse_generator_settings(
+        sample_rate=sample_rate,
+        activation_config=pulser.get_constraints().activation_config[activation_config])
+    logic.set_generation_parameters(laser_channel='d_ch1',
+                                    sync_channel='d_ch2',
+                                    gate_channel='',
+                                    microwave_channel='a_ch1',
+                                    microwave_amplitude=0.25)
+    return logic
+
+
+def create_sampler(logic, engine, ensemble, ensemble_info, array_length):
+    """ Create a sampling engine instance and preallocated buffers for an ensemble """
+    settings = logic.pulse_generator_settings
+    sampler = SAMPLING_ENGINES[engine](
+        ensemble=ensemble,
+        blocks={name: logic.get_block(name) for name, reps in ensemble.block_list},
+        ensemble_info=ensemble_info,
+        analog_amplitudes=settings['analog_levels'][0],
+        sample_rate=settings['sample_rate'])
+    analog_buffer = {chnl: np.empty(array_length, dtype='float32') for chnl in
+                     ensemble_info['analog_channels']}
+    digital_buffer = {chnl: np.empty(array_length, dtype=bool) for chnl in
+                      ensemble_info['digital_channels']}
+    return sampler.iter_chunks(array_length, analog_buffer, digital_buffer)
+
+
+def compare_engines(logic, ensemble, chunk_samples,
+                    engines=('legacy', 'vectorized', 'vectorized_lut')):
+    """
+    Sample an ensemble with all given engines in lockstep, chunk by chunk.
+
+    @return (int, dict, dict, dict): number of samples, sampling time per engine, flag per engine
+                                     indicating if the engine created exactly the same samples as
+                                     the first engine, maximum absolute deviation of the
+                                     (normalized) analog samples from the first engine per engine
+    """
+    ensemble_info = logic.analyze_block_ensemble(ensemble)
+    number_of_samples = int(ensemble_info['number_of_samples'])
+    array_length = min(chunk_samples, number_of_samples) if chunk_samples else number_of_samples
+    times = {engine: 0.0 for engine in engines}
+    equal = {engine: True for engine in engines}
+    deviation = {engine: 0.0 for engine in engines}
+    if number_of_samples == 0:
+        return number_of_samples, times, equal, deviation
+
+    chunk_iters = dict()
+    for engine in engines:
+        start = time.perf_counter()
+        chunk_iters[engine] = create_sampler(logic, engine, ensemble, ensemble_info, array_length)
+        times[engine] += time.perf_counter() - start
+
+    while True:
+        chunks = dict()
+        for engine in engines:
+            start = time.perf_counter()
+            chunks[engine] = next(chunk_iters[engine], None)
+            times[engine] += time.perf_counter() - start
+        if chunks[engines[0]] is None:
+            break
+        reference = chunks[engines[0]]
+        for engine in engines[1:]:
+            for ii in (0, 1):
+                for chnl, samples in reference[ii].items():
+                    equal[engine] &= np.array_equal(samples, chunks[engine][ii][chnl])
+            for chnl, samples in reference[0].items():
+                deviation[engine] = max(deviation[engine],
+                                        float(np.max(np.abs(samples - chunks[engine][0][chnl]))))
+    return number_of_samples, times, equal, deviation
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark of the pulse sampling engines')
+    parser.add_argument('--methods', nargs='*', default=None,
+                        help='Names of the predefined methods to benchmark (default: all)')
+    parser.add_argument('--chunk-samples', type=int, default=2 ** 24,
+                        help='Number of samples per chunk (like overhead_bytes). 0 means no chunks.')
+    parser.add_argument('--sample-rate', type=float, default=12e9)
+    parser.add_argument('--params', nargs='*', default=list(),
+                        help='Generation parameters as key=value pairs, e.g. xy8_order=16. '
+                             'Parameters not accepted by a method are ignored for that method.')
+    args = parser.parse_args()
+    gen_params = dict()
+    for param in args.params:
+        key, value = param.split('=', 1)
+        gen_params[key] = ast.literal_eval(value)
+
+    with tempfile.TemporaryDirectory() as assets_dir:
+        logic = create_sequence_generator(assets_dir, sample_rate=args.sample_rate)
+        methods = args.methods if args.methods else sorted(logic.generate_methods)
+
+        print('{0:>24s} {1:>12s} {2:>10s} {3:>10s} {4:>8s} {5:>6s} {6:>10s} {7:>9s}'.format(
+            'method', 'samples', 'legacy', 'vectorized', 'speedup', 'equal', 'lut', 'lut dev.'))
+        all_equal = True
+        for method in methods:
+            try:
+                kwargs = {key: value for key, value in gen_params.items() if
+                          key in logic.generate_method_params[method]}
+                blocks, ensembles, sequences = logic.generate_methods[method](**kwargs)
+            except Exception as err:
+                print('{0:>24s} generation failed: {1}'.format(method, err))
+                continue
+            for block in blocks:
+                logic.save_block(block)
+            for ensemble in ensembles:
+                number_of_samples, times, equal, deviation = compare_engines(logic, ensemble,
+                                                                             args.chunk_samples)
+                if number_of_samples == 0:
+                    continue
+                all_equal &= equal['vectorized']
+                print('{0:>24s} {1:>12d} {2:>9.3f}s {3:>9.3f}s {4:>7.1f}x {5!s:>6} {6:>9.3f}s '
+                      '{7:>9.1e}'.format(ensemble.name,
+                                         number_of_samples,
+                                         times['legacy'],
+                                         times['vectorized'],
+                                         times['legacy'] / times['vectorized'],
+                                         equal['vectorized'],
+                                         times['vectorized_lut'],
+                                         deviation['vectorized_lut']))
+
+        print('\nSampling function fast path usage (fast path calls / total calls):')
+        for name, (fast_calls, calls) in sorted(SamplingFunctions.get_fast_path_statistics().items()):
+            print('{0:>24s} {1:>8d} / {2:d}'.format(name, fast_calls, calls))
+
+        logic.module_state.deactivate()
+
+    if not all_equal:
+        print('\nThe vectorized engine did not reproduce the samples of the legacy engine exactly.')
+    return 0 if all_equal else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
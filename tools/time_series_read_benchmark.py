@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""
+Standalone benchmark of the data acquisition loop of TimeSeriesReaderLogic
+(see logic/time_series_reader_logic.py) with the dummy data streamer
+(see hardware/data_instream_dummy.py).
+
+The logic reads each data frame into a buffer of its buffer pool with read_data_into_buffer and
+recycles the buffer after processing and recording. This script compares it to the previous
+acquisition reading with read_data (kept below as reference), which requires a copy of every frame
+for the recording. For both, the memory allocated while processing and recording a data frame is
+measured with tracemalloc (peak of the traced memory above the memory in use before) and given in
+MB per second of streamed data. The read itself is not traced, since the dummy streamer allocates
+its simulated signal on every read.
+
+Usage (from the qudi main directory):
+
+    python tools/time_series_read_benchmark.py [--rate 1e6] [--channels 4] [--frames 50]
+                                               [--oversampling 1 10] [--no-recording]
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import functools
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from qtpy import QtCore
+from hardware.data_instream_dummy import InStreamDummy
+from logic.time_series_reader_logic import TimeSeriesReaderLogic
+
+
+class SaveLogicStub:
+    """ Provides the data directory TimeSeriesReaderLogic writes its recordings to """
+    def __init__(self, path):
+        self.path = path
+
+    def get_path_for_module(self, module_name):
+        return self.path
+
+    def save_data(self, *args, **kwargs):
+        pass
+
+
+def samples_to_read(logic):
+    """ Number of samples read per data frame, as in TimeSeriesReaderLogic.acquire_data_block """
+    samples = max(
+        (logic._streamer.available_samples // logic.oversampling_factor) * logic.oversampling_factor,
+        logic._samples_per_frame * logic.oversampling_factor)
+    return min(samples, logic._read_buffer_samples)
+
+
+def reference_read(logic):
+    """ Previous data acquisition: read_data returns the data, the recording copies it """
+    data = logic._streamer.read_data(number_of_samples=samples_to_read(logic))
+    return data, None
+
+
+def pool_read(logic):
+    """ Data acquisition of TimeSeriesReaderLogic: read into a buffer of the pool """
+    number_of_samples = samples_to_read(logic)
+    buffer = logic._buffer_pool.acquire()
+    logic._streamer.read_data_into_buffer(buffer, number_of_samples=number_of_samples)
+    data = buffer[:logic.number_of_active_channels * number_of_samples].reshape(
+        (logic.number_of_active_channels, number_of_samples))
+    return data, functools.partial(logic._buffer_pool.release, buffer)
+
+
+def measure(logic, read, frames):
+    """
+    Run frames data frames. Only the processing and recording of the data read is traced, since the
+    dummy streamer allocates its simulated signal itself.
+
+    @return (float, float): allocated bytes per frame and time per frame in seconds
+    """
+    logic._process_trace_data(*read(logic))  # warm up (work arrays, file writer scratch)
+    allocated = 0
+    elapsed = 0
+    for _ in range(frames):
+        data, release = read(logic)
+        tracemalloc.reset_peak()
+        in_use = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        logic._process_trace_data(data, release=release)
+        elapsed += time.perf_counter() - start
+        allocated += tracemalloc.get_traced_memory()[1] - in_use
+    return allocated / frames, elapsed / frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark of the time series acquisition loop')
+    parser.add_argument('--rate', type=float, default=1e6, help='Data rate in Hz')
+    parser.add_argument('--channels', type=int, default=4, help='Number of analog channels')
+    parser.add_argument('--frames', type=int, default=50, help='Data frames per measurement')
+    parser.add_argument('--oversampling', type=int, nargs='*', default=[1, 10],
+                        help='Oversampling factors to benchmark')
+    parser.add_argument('--no-recording', action='store_true', help='Do not record the data')
+    args = parser.parse_args()
+
+    app = QtCore.QCoreApplication.instance() or QtCore.QCoreApplication(sys.argv)
+    tmp_dir = tempfile.mkdtemp(prefix='time_series_read_benchmark_')
+    channels = ['analog {0:d}'.format(i) for i in range(args.channels)]
+    streamer = InStreamDummy(manager=None, name='instream_dummy',
+                             config={'analog_channels': channels})
+    streamer.module_state.activate()
+    logic = TimeSeriesReaderLogic(manager=None, name='time_series_reader', config={})
+    logic.connectors['_streamer_con'].obj = streamer
+    logic.connectors['_savelogic_con'].obj = SaveLogicStub(tmp_dir)
+
+    print('{0:>12s} {1:>10s} {2:>14s} {3:>14s} {4:>14s} {5:>14s}'.format(
+        'oversampling', 'frame', 'read_data', 'ms/frame', 'buffer pool', 'ms/frame'))
+    tracemalloc.start()
+    try:
+        for oversampling in args.oversampling:
+            logic.module_state.activate()
+            logic.configure_settings(data_rate=args.rate / oversampling,
+                                     oversampling_factor=oversampling,
+                                     trace_window_size=6)
+            logic.module_state.lock()
+            logic._stop_requested = False
+            logic._data_recording_active = not args.no_recording
+            if logic._data_recording_active:
+                logic._start_recording_file()
+            streamer.start_stream()
+
+            frames_per_second = logic.data_rate / logic._samples_per_frame
+            results = [measure(logic, reference_read, args.frames),
+                       measure(logic, pool_read, args.frames)]
+
+            streamer.stop_stream()
+            if logic._data_recording_active:
+                logic._data_recording_active = False
+                logic._save_recorded_data(to_file=False)
+            logic.module_state.unlock()
+            logic.module_state.deactivate()
+            print('{0:>12d} {1:>10d} {2:>9.1f}MB/s {3:>14.2f} {4:>9.1f}MB/s {5:>14.2f}'.format(
+                oversampling,
+                logic._samples_per_frame * oversampling,
+                results[0][0] * frames_per_second / 1e6,
+                results[0][1] * 1e3,
+                results[1][0] * frames_per_second / 1e6,
+                results[1][1] * 1e3))
+    finally:
+        tracemalloc.stop()
+        streamer.module_state.deactivate()
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        del app
+
+
+if __name__ == '__main__':
+    main()